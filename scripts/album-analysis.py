@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Incremental album analysis: only photos an edit adds or changes are re-analyzed
+
+Summaries, clusters, themes and the spread plan are stored per album (default
+~/.cache/photobook/albums.db) with the inputs they were derived from, so
+re-running after adding, removing or editing photos redoes only what changed.
+
+Usage:
+    python scripts/album-analysis.py update trip bucketlistly_images --pages 12 --no-verify-ssl
+    python scripts/album-analysis.py update trip bucketlistly_images new_photos --themes-tolerance 0.05
+    python scripts/album-analysis.py show trip --output trip.json
+    python scripts/album-analysis.py list
+    python scripts/album-analysis.py gc
+    python scripts/album-analysis.py benchmark --photos 400 --add 5 --remove 5 --edit 1
+"""
+
+import argparse
+import json
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from photobook.accounting import estimate_image_tokens
+from photobook.console import Colors, log, log_section, positive_int
+from photobook.corpus import synthetic_library
+from photobook.incremental import DEFAULT_STORE, AlbumStore
+from photobook.metadata import iter_photo_files
+from photobook.midas import API_KEY
+
+STATUS_COLORS = {"reused": Colors.GREEN, "stale": Colors.YELLOW, "computed": Colors.BLUE,
+                 "skipped": Colors.GRAY, "failed": Colors.RED}
+
+
+def progress_reporter(label: str):
+    reported = [0]
+
+    def on_progress(done: int, total: int):
+        if done - reported[0] >= max(1, total // 10) or done == total:
+            reported[0] = done
+            log(f"  {label}: {done}/{total}", Colors.GRAY)
+
+    return on_progress
+
+
+def open_store(args) -> AlbumStore:
+    return AlbumStore(args.store, deployment=args.deployment, max_edge=args.max_edge, pack_size=args.pack_size,
+                      themes_deployment=args.themes_deployment, api_key=API_KEY,
+                      verify_ssl=not args.no_verify_ssl)
+
+
+def print_report(report: Dict[str, Any]):
+    log(f"Photos {report['photos']}: +{report['added']} added, -{report['removed']} removed, "
+        f"{report['edited']} edited; {report['hashed']} files read", Colors.GRAY)
+    failed = f", {report['failed']} failed" if report["failed"] else ""
+    log(f"Summaries: {report['analyzed']} photos analyzed in {report['calls']} calls{failed}",
+        Colors.GREEN if report["analyzed"] else Colors.GRAY)
+    log(f"Clusters: {report['clusters']} events, {report['clusters_changed']} changed", Colors.GRAY)
+    log(f"Themes: {report['themes']}", STATUS_COLORS[report["themes"]])
+    log(f"Plan: {report['plan']}", STATUS_COLORS[report["plan"]])
+    log(f"⏱️  {report['elapsed']:.2f}s (" + ", ".join(f"{k} {v:.2f}s" for k, v in report["timings"].items()) + ")",
+        Colors.GRAY)
+
+
+def update(args):
+    store = open_store(args)
+    files = iter_photo_files(args.paths)
+    log_section(f"🔁 Album '{args.album}' ({len(files)} photos)")
+    report = store.update(args.album, files, pages=args.pages, theme_count=args.themes,
+                          themes_tolerance=args.themes_tolerance, theme_id=args.theme,
+                          on_progress=progress_reporter("analyzed"))
+    print_report(report)
+
+
+def show(args):
+    state = open_store(args).album(args.album)
+    log_section(f"🔁 Album '{args.album}'")
+    log(f"{len(state['photos'])} photos, {sum(p['summary'] is not None for p in state['photos'])} with summaries",
+        Colors.GRAY)
+    log(f"{len(state['clusters'] or [])} clusters", Colors.GRAY)
+    for theme in (state["themes"] or {}).get("themes", []):
+        log(f"  🎨 {theme.get('name')} ({theme.get('mood')})", Colors.GRAY)
+    if state["plan"]:
+        log(f"Plan: {state['plan']['pageCount']} pages, cost {state['plan']['cost']}", Colors.GRAY)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        log(f"\n📝 Album saved to: {args.output}", Colors.BLUE)
+
+
+def list_albums(args):
+    log_section("🔁 Albums")
+    for row in open_store(args).albums():
+        log(f"  {row['album']:<30} {row['photos']:>6} photos", Colors.GRAY)
+
+
+def gc(args):
+    removed = open_store(args).gc()
+    log(f"🧹 Removed {removed['summaries']} unreferenced summaries and {removed['sources']} missing sources",
+        Colors.GREEN)
+
+
+class SimulatedModel:
+    """
+    Offline stand-in for post_completion: answers packed analysis and theme
+    requests with well-formed JSON and counts calls, images and tokens
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.images = 0
+        self.prompt_tokens = 0
+
+    def __call__(self, request: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        content = request["messages"][-1]["content"]
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        images = sum(part.get("type") == "image_url" for part in parts)
+        text = " ".join(part.get("text", "") for part in parts) + " ".join(
+            m["content"] for m in request["messages"][:-1] if isinstance(m["content"], str))
+        if images:
+            labels = [int(n) for n in re.findall(r"Image (\d+):", text)] or [1]
+            reply = json.dumps({"images": [{"index": n, "description": f"Photo {n} of a trip", "lighting": "Natural",
+                                            "mood": "Joyful"} for n in labels]})
+        else:
+            reply = json.dumps({"themes": [{"theme_id": f"theme_{n}", "name": f"Theme {n}", "mood": "Warm",
+                                            "lighting": "Soft", "background": "Clean", "editing_style": "Film"}
+                                           for n in range(1, 5)]})
+        prompt = len(text) // 4 + images * estimate_image_tokens(768, 576)
+        self.calls += 1
+        self.images += images
+        self.prompt_tokens += prompt
+        return {"success": True, "response_time": 0.0, "response": reply,
+                "usage": {"prompt_tokens": prompt, "completion_tokens": len(reply) // 4,
+                          "total_tokens": prompt + len(reply) // 4}}
+
+
+def benchmark(args):
+    log_section(f"🔁 Incremental Analysis Benchmark ({args.photos} photos, pack size {args.pack_size})")
+    root = Path(tempfile.mkdtemp(prefix="photobook-albums-"))
+    rows = []
+    try:
+        library = root / "library"
+        library.mkdir()
+        synthetic_library(library, args.photos + args.add, args.seed)
+        files = iter_photo_files([library])
+        album, extra = files[:args.photos], files[args.photos:]
+
+        def run(label: str, paths, store_path: Path):
+            model = SimulatedModel()
+            store = AlbumStore(store_path, pack_size=args.pack_size, post=model)
+            start = time.perf_counter()
+            report = store.update("benchmark", paths, pages=max(2, len(paths) // 3),
+                                  themes_tolerance=args.themes_tolerance)
+            elapsed = time.perf_counter() - start
+            model_seconds = model.calls * args.call_seconds
+            rows.append({"step": label, "photos": len(paths), "hashed": report["hashed"],
+                         "analyzed": report["analyzed"], "model_calls": model.calls,
+                         "prompt_tokens": model.prompt_tokens, "themes": report["themes"], "plan": report["plan"],
+                         "clusters_changed": report["clusters_changed"], "local_s": round(elapsed, 3),
+                         "model_s_estimated": round(model_seconds, 1)})
+            log(f"\n{label}: {len(paths)} photos", Colors.CYAN)
+            log(f"  {report['hashed']} read, {report['analyzed']} analyzed, {model.calls} model calls "
+                f"({model.prompt_tokens:,} prompt tokens), themes {report['themes']}, plan {report['plan']}, "
+                f"{report['clusters_changed']}/{report['clusters']} clusters changed", Colors.GRAY)
+            log(f"  Local work {elapsed:.2f}s + {model_seconds:.0f}s of model calls at {args.call_seconds}s each",
+                Colors.GREEN)
+            return report
+
+        store_path = root / "albums.db"
+        run("Initial analysis", album, store_path)
+        run("Unchanged re-run", album, store_path)
+
+        album = album + extra
+        run(f"Add {len(extra)}", album, store_path)
+        run(f"Full re-analysis of the same {len(album)} (no store)", album, root / "fresh.db")
+
+        removed, album = album[:args.remove], album[args.remove:]
+        run(f"Remove {len(removed)}", album, store_path)
+
+        for path in album[:args.edit]:
+            with open(path, "rb") as f:
+                data = f.read()
+            comment = b"edited"
+            with open(path, "wb") as f:
+                f.write(data[:2] + b"\xff\xfe" + (len(comment) + 2).to_bytes(2, "big") + comment + data[2:])
+        run(f"Edit {args.edit}", album, store_path)
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+            log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental album analysis")
+    parser.add_argument("--store", default=str(DEFAULT_STORE), help=f"Analysis store (default: {DEFAULT_STORE})")
+    parser.add_argument("--deployment", default="Claude-Sonnet-4", help="Vision deployment for summaries")
+    parser.add_argument("--themes-deployment", default="GPT 4o", help="Deployment for theme generation")
+    parser.add_argument("--max-edge", type=int, default=768, help="Longest image edge sent (default: 768)")
+    parser.add_argument("--pack-size", type=positive_int, default=4, help="Photos per analysis request (default: 4)")
+    parser.add_argument("--no-verify-ssl", action="store_true")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = sub.add_parser("update", help="Bring an album up to date with its photos")
+    update_parser.add_argument("album")
+    update_parser.add_argument("paths", nargs="+", help="Photos or directories, in album order")
+    update_parser.add_argument("--pages", type=int, help="Also plan this many pages")
+    update_parser.add_argument("--theme", help="templateService theme for the plan")
+    update_parser.add_argument("--themes", type=int, default=4, help="Themes to generate (default: 4)")
+    update_parser.add_argument("--themes-tolerance", type=float, default=0.0,
+                               help="Keep themes until this fraction of summaries changed (default: 0)")
+
+    show_parser = sub.add_parser("show", help="Stored summaries, clusters, themes and plan")
+    show_parser.add_argument("album")
+    show_parser.add_argument("--output", help="Save the album state as JSON")
+
+    sub.add_parser("list", help="Albums in the store")
+    sub.add_parser("gc", help="Drop summaries no album uses")
+
+    bench_parser = sub.add_parser("benchmark", help="Edits on a synthetic album with a simulated model")
+    bench_parser.add_argument("--photos", type=int, default=400, help="Album size (default: 400)")
+    bench_parser.add_argument("--add", type=int, default=5)
+    bench_parser.add_argument("--remove", type=int, default=5)
+    bench_parser.add_argument("--edit", type=int, default=1)
+    bench_parser.add_argument("--call-seconds", type=float, default=3.0,
+                              help="Model latency used for the time estimate (default: 3.0)")
+    bench_parser.add_argument("--themes-tolerance", type=float, default=0.0)
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    if args.command == "benchmark":
+        benchmark(args)
+        return
+    {"update": update, "show": show, "list": list_albums, "gc": gc}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
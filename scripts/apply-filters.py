@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Apply editor presets and adjustments to photos at full print resolution
+
+Compiles canvasEditorService FILTER_PRESETS or an ImageLayerProps-style
+adjustment set into one LUT + color-matrix pass per image and filters whole
+print jobs across a process pool.
+
+Usage:
+    python scripts/apply-filters.py apply bucketlistly_images --preset vintage --output-dir filtered
+    python scripts/apply-filters.py apply photo.jpg --adjustments '{"brightness": 10, "hue": 15}' --output-dir out
+    python scripts/apply-filters.py apply --jobs print-job.json --output-dir filtered --workers 4
+    python scripts/apply-filters.py presets
+    python scripts/apply-filters.py fixtures
+    python scripts/apply-filters.py benchmark --images bucketlistly_images --photos 24
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from photobook.console import Colors, log, log_section, positive_int
+from photobook.filters import (JPEG_QUALITY, PRESETS, apply_batch, apply_program, compile_chain, fixture_parity,
+                               konva_chain, konva_reference, normalize_adjustments)
+from photobook.metadata import iter_photo_files
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+
+
+def progress_reporter(label: str):
+    reported = [0]
+
+    def on_progress(done: int, total: int):
+        if done - reported[0] >= max(1, total // 10) or done == total:
+            reported[0] = done
+            log(f"  {label}: {done}/{total}", Colors.GRAY)
+
+    return on_progress
+
+
+def load_jobs(args) -> list:
+    if args.jobs:
+        with open(args.jobs, "r", encoding="utf-8") as f:
+            return json.load(f)
+    if args.adjustments:
+        text = args.adjustments
+        if Path(text).is_file():
+            text = Path(text).read_text(encoding="utf-8")
+        spec = {"adjustments": normalize_adjustments(json.loads(text))}
+    else:
+        spec = {"preset": args.preset}
+    return [{"path": str(path), **spec} for path in iter_photo_files(args.paths)]
+
+
+def apply(args):
+    jobs = load_jobs(args)
+    if not jobs:
+        log("❌ No photos given (paths or --jobs)", Colors.RED)
+        sys.exit(1)
+    try:
+        for job in jobs:
+            normalize_adjustments(job.get("adjustments", job.get("preset")))
+    except (KeyError, ValueError) as e:
+        log(f"❌ Invalid job: {e}", Colors.RED)
+        sys.exit(1)
+    log_section(f"🎛️  Filters ({len(jobs)} photos -> {args.output_dir})")
+    records, stats = apply_batch(jobs, args.output_dir, workers=args.workers, quality=args.quality,
+                                 on_progress=progress_reporter("photos"))
+    for record in records:
+        if "error" in record:
+            log(f"❌ {Path(record['path']).name}: {record['error']}", Colors.RED)
+    log(f"\n✅ {stats['photos'] - stats['errors']} photos ({stats['megapixels']:.0f} MP) in {stats['elapsed']:.2f}s "
+        f"({stats['megapixels'] / max(stats['elapsed'], 1e-9):.1f} MP/s)", Colors.GREEN)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2)
+        log(f"\n📝 Records saved to: {args.output}", Colors.BLUE)
+
+
+def presets(args):
+    log_section("🎛️  Presets")
+    for name, preset in PRESETS.items():
+        program = compile_chain(konva_chain(preset))
+        stages = ", ".join(f"color ({len(value[1])} matrix)" if kind == "color" else kind for kind, value in program)
+        log(f"  {name:<10} {' -> '.join(step for step, _ in konva_chain(preset)) or '-':<45} {stages or 'copy'}",
+            Colors.GRAY)
+
+
+def check_fixtures() -> list:
+    """Log fixture_parity per case; the fused engine may be off by one level, the reference not at all"""
+    results = fixture_parity()
+    for row in results:
+        ok = row["reference_max_diff"] == 0 and row["engine_max_diff"] <= 1
+        log(f"  {row['name']:<15} engine max diff {row['engine_max_diff']} ({row['engine_differing']} values), "
+            f"reference max diff {row['reference_max_diff']}", Colors.GREEN if ok else Colors.RED)
+    return results
+
+
+def fixtures(args):
+    log_section("🎛️  Engine vs the editor's Konva pixels (konva-filter-fixtures.json)")
+    results = check_fixtures()
+    if any(row["reference_max_diff"] or row["engine_max_diff"] > 1 for row in results):
+        log("\n❌ The engine no longer matches the editor; regenerate the fixtures only if the editor changed",
+            Colors.RED)
+        sys.exit(1)
+    log(f"\n✅ {len(results)} cases match", Colors.GREEN)
+
+
+def benchmark(args):
+    width, height = (int(v) for v in args.source_size.split("x"))
+    sources = iter_photo_files([args.images])[:args.photos]
+    if not sources:
+        log(f"❌ No images found in {args.images}", Colors.RED)
+        sys.exit(1)
+    log_section(f"🎛️  Filter Engine Benchmark ({len(sources)} photos at {width}x{height})")
+    root = Path(tempfile.mkdtemp(prefix="photobook-filters-"))
+    try:
+        files = []
+        for index, path in enumerate(sources):
+            with Image.open(path) as image:
+                image = ImageOps.exif_transpose(image).convert("RGB").resize((width, height), Image.BICUBIC)
+            target = root / f"photo-{index:04d}.jpg"
+            image.save(target, quality=92)
+            files.append(target)
+
+        log_section("Parity with the editor's Konva pixels (konva-filter-fixtures.json)")
+        fixture_results = check_fixtures()
+
+        log_section("Parity with the Konva filter chain")
+        sample = [np.asarray(Image.open(path).convert("RGB")) for path in files[:args.parity_sample]]
+        parity = {}
+        for name, preset in PRESETS.items():
+            steps = konva_chain(preset)
+            program = compile_chain(steps)
+            fused_s = reference_s = 0.0
+            worst, differing, pixels = 0, 0, 0
+            for array in sample:
+                start = time.perf_counter()
+                fused = apply_program(array, program)
+                fused_s += time.perf_counter() - start
+                start = time.perf_counter()
+                reference = konva_reference(array, steps)
+                reference_s += time.perf_counter() - start
+                diff = np.abs(fused.astype(np.int16) - reference)
+                worst = max(worst, int(diff.max()))
+                differing += int(np.count_nonzero(diff))
+                pixels += diff.size
+            parity[name] = {"max_diff": worst, "differing_pct": round(differing * 100 / max(1, pixels), 3),
+                            "fused_ms": round(fused_s * 1000 / len(sample), 1),
+                            "per_filter_ms": round(reference_s * 1000 / len(sample), 1)}
+            log(f"  {name:<10} max diff {worst} level(s), {parity[name]['differing_pct']:6.2f}% of values off by one; "
+                f"fused {parity[name]['fused_ms']:7.1f} ms vs per-filter {parity[name]['per_filter_ms']:7.1f} ms",
+                Colors.GREEN if worst <= 1 else Colors.YELLOW)
+
+        log_section("Print job throughput")
+        workers = args.workers or os.cpu_count() or 1
+        jobs = [{"path": str(path), "preset": list(PRESETS)[1 + index % (len(PRESETS) - 1)]}
+                for index, path in enumerate(files)]
+        records, stats = apply_batch(jobs, root / "out", workers=workers, on_progress=progress_reporter("photos"))
+        log(f"{stats['photos']} photos, {stats['megapixels']:.0f} MP in {stats['elapsed']:.2f}s "
+            f"({stats['elapsed'] * 1000 / max(1, stats['photos']):.0f} ms/photo including decode and JPEG encode, "
+            f"{workers} workers)", Colors.GREEN)
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"photos": len(files), "source_size": args.source_size, "workers": workers,
+                           "fixtures": fixture_results, "parity": parity, "batch_s": round(stats["elapsed"], 2),
+                           "ms_per_photo": round(stats["elapsed"] * 1000 / max(1, stats["photos"]), 1)}, f, indent=2)
+            log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch filter/adjustment engine for print output")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    apply_parser = sub.add_parser("apply", help="Filter files or directories into --output-dir")
+    apply_parser.add_argument("paths", nargs="*")
+    source = apply_parser.add_mutually_exclusive_group()
+    source.add_argument("--preset", choices=list(PRESETS), default="none", help="FILTER_PRESETS entry")
+    source.add_argument("--adjustments", help="Adjustments JSON (or a file): brightness/contrast/saturation/hue, filters")
+    source.add_argument("--jobs", help='JSON list of {"path", "preset" or "adjustments", "output"}')
+    apply_parser.add_argument("--output-dir", required=True)
+    apply_parser.add_argument("--quality", type=int, default=JPEG_QUALITY, help=f"JPEG quality (default: {JPEG_QUALITY})")
+    apply_parser.add_argument("--workers", type=int, help="Processes (default: CPU count)")
+    apply_parser.add_argument("--output", help="Save per-photo records as JSON")
+
+    sub.add_parser("presets", help="Each preset's Konva chain and compiled stages")
+    sub.add_parser("fixtures", help="Check the engine against pixels computed from the editor's Konva filters")
+
+    bench_parser = sub.add_parser("benchmark", help="Konva parity and throughput on upscaled photos")
+    bench_parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Source photos")
+    bench_parser.add_argument("--photos", type=positive_int, default=24, help="Photos in the print job (default: 24)")
+    bench_parser.add_argument("--source-size", default="4032x3024", help="Resolution to upscale to (default: 4032x3024)")
+    bench_parser.add_argument("--parity-sample", type=positive_int, default=4, help="Photos compared per preset (default: 4)")
+    bench_parser.add_argument("--workers", type=int, help="Processes (default: CPU count)")
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    {"apply": apply, "presets": presets, "fixtures": fixtures, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
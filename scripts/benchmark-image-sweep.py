@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Sweep image resolution, JPEG quality and detail level for each vision model
+
+Every corpus image is first analyzed at full resolution with detail "high"
+(what test-vision-analysis.py sends today) to get a baseline answer. Each
+operating point is then scored on latency, payload bytes, total tokens and
+similarity of its answer to that baseline, and a recommended operating
+point is chosen per model.
+
+Usage:
+    python scripts/benchmark-image-sweep.py --no-verify-ssl
+    python scripts/benchmark-image-sweep.py --model "GPT 4o" --limit 4
+    python scripts/benchmark-image-sweep.py --max-edges 512,1024 --qualities 70,90 --details low,high
+    python scripts/benchmark-image-sweep.py --dry-run
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from photobook.console import Colors, log, log_section
+from photobook.imaging import image_type_for, list_images, to_base64
+from photobook.midas import API_KEY, VISION_MODELS, post_completion, select_models
+from photobook.patterns import pattern_corpus
+from photobook.sweep import (
+    BASELINE_LABEL,
+    aggregate,
+    build_settings,
+    encode_variant,
+    recommend,
+    vision_request,
+)
+from photobook.textsim import similarity
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_corpus(directory: str, limit: int, include_patterns: bool) -> List[Tuple[str, bytes, str]]:
+    """(name, original bytes, data URL subtype) for photos plus generated patterns"""
+    corpus = [(p.name, p.read_bytes(), image_type_for(p)) for p in list_images(directory, limit)]
+    if include_patterns:
+        corpus.extend((name, data, "png") for name, data in pattern_corpus())
+    return corpus
+
+
+def dry_run(corpus: List[Tuple[str, bytes, str]], settings: List[Dict[str, Any]]):
+    """Payload size per operating point without calling the API"""
+    log_section("Dry Run - Payload Sizes")
+    original_kb = sum(len(data) for _, data, _ in corpus) / len(corpus) / 1024
+    log(f"  {BASELINE_LABEL:<22} {original_kb:>8.0f} KB avg", Colors.BLUE)
+    for setting in settings:
+        sizes = [encode_variant(data, setting)[1] for _, data, _ in corpus]
+        log(f"  {setting['label']:<22} {sum(sizes) / len(sizes) / 1024:>8.0f} KB avg", Colors.BLUE)
+
+
+def print_report(rows: List[Dict[str, Any]], picks: Dict[str, Dict[str, Any]]):
+    """Per-model table plus the recommended operating point"""
+    log_section("Sweep Results")
+    for model in sorted({r["model"] for r in rows}):
+        log(f"\n{model}", Colors.CYAN)
+        log(f"  {'setting':<22} {'median ms':>10} {'p90 ms':>8} {'KB':>7} {'tokens':>7} {'similar':>8} {'fail':>5}", Colors.GRAY)
+        for row in sorted((r for r in rows if r["model"] == model), key=lambda r: r["median_ms"] or 0):
+            similar = "-" if row["similarity"] is None else f"{row['similarity']:.2f}"
+            median = "-" if row["median_ms"] is None else f"{row['median_ms']:.0f}"
+            p90 = "-" if row["p90_ms"] is None else f"{row['p90_ms']:.0f}"
+            tokens = "-" if row["mean_tokens"] is None else f"{row['mean_tokens']:.0f}"
+            log(
+                f"  {row['label']:<22} {median:>10} {p90:>8} {row['mean_payload_kb']:>7.0f} "
+                f"{tokens:>7} {similar:>8} {row['failures']:>5}",
+                Colors.GREEN if row["failures"] == 0 else Colors.YELLOW,
+            )
+
+        pick = picks.get(model)
+        if pick:
+            log(
+                f"  ⭐ Recommended: {pick['label']} "
+                f"({pick['median_ms']:.0f}ms median, similarity {pick['similarity']:.2f} ≥ {pick['similarity_bar']:.2f})",
+                Colors.MAGENTA,
+            )
+        else:
+            log("  ⚠️  No setting met the similarity bar; keep full resolution", Colors.YELLOW)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep image size / quality / detail for vision models")
+    parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Directory of photos")
+    parser.add_argument("--limit", type=int, default=6, help="Number of photos to use (default: 6)")
+    parser.add_argument("--no-patterns", action="store_true", help="Skip generated test patterns")
+    parser.add_argument("--model", help="Test specific model only")
+    parser.add_argument("--max-edges", default="512,768,1024,1536", help="Longest-edge sizes in px")
+    parser.add_argument("--qualities", default="60,80,90", help="JPEG qualities")
+    parser.add_argument("--details", default="low,high", help="image_url detail levels")
+    parser.add_argument("--baseline-repeats", type=int, default=2, help="Baseline calls per image; >1 measures noise floor")
+    parser.add_argument("--min-similarity", type=float, default=0.8, help="Required similarity relative to noise floor")
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds between requests (default: 0.5)")
+    parser.add_argument("--api-key", help="Midas API key (optional)")
+    parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL verification (for corporate APIs)")
+    parser.add_argument("--dry-run", action="store_true", help="Show payload sizes without calling the API")
+    parser.add_argument("--output", default=str(Path(__file__).parent / "image-sweep-results.json"))
+
+    args = parser.parse_args()
+
+    log_section("📐 Vision Image Size / Detail Sweep")
+
+    models = select_models(args.model)
+    if not models:
+        log(f"❌ Model not found: {args.model}", Colors.RED)
+        log("Available models:", Colors.YELLOW)
+        for m in VISION_MODELS:
+            log(f"  - {m['name']}", Colors.CYAN)
+        sys.exit(1)
+
+    corpus = load_corpus(args.images, args.limit, not args.no_patterns)
+    if not corpus:
+        log(f"❌ No images found in {args.images}", Colors.RED)
+        sys.exit(1)
+
+    settings = build_settings(
+        int_list(args.max_edges), int_list(args.qualities), [d for d in args.details.split(",") if d]
+    )
+    log(f"Corpus: {len(corpus)} images", Colors.GRAY)
+    log(f"Models: {', '.join(m['name'] for m in models)}", Colors.GRAY)
+    log(f"Operating points: {len(settings)} + baseline", Colors.GRAY)
+
+    if args.dry_run:
+        dry_run(corpus, settings)
+        return
+
+    if args.no_verify_ssl:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        log("⚠️  SSL verification disabled", Colors.YELLOW)
+
+    api_key = args.api_key or API_KEY
+    verify_ssl = not args.no_verify_ssl
+    records: List[Dict[str, Any]] = []
+    noise_floor: Dict[str, float] = {}
+
+    # Encode each variant once; they are reused for every model
+    variants = {
+        (name, s["label"]): encode_variant(data, s) for name, data, _ in corpus for s in settings
+    }
+
+    for model in models:
+        log_section(f"Testing {model['name']}")
+        self_agreement: List[float] = []
+
+        for name, data, image_type in corpus:
+            log(f"  {name}", Colors.GRAY)
+            baseline_b64 = to_base64(data)
+            baselines = []
+            for _ in range(max(1, args.baseline_repeats)):
+                result = post_completion(
+                    vision_request(model["deployment"], baseline_b64, image_type, "high"),
+                    api_key=api_key,
+                    verify_ssl=verify_ssl,
+                )
+                records.append(
+                    {
+                        "model": model["name"],
+                        "image": name,
+                        "label": BASELINE_LABEL,
+                        "success": result["success"],
+                        "response_time": result["response_time"],
+                        "payload_bytes": len(data),
+                        "total_tokens": (result.get("usage") or {}).get("total_tokens", 0),
+                        "similarity": None,
+                        "error": result.get("error"),
+                    }
+                )
+                if result["success"]:
+                    baselines.append(result["response"])
+                time.sleep(args.delay)
+
+            if len(baselines) > 1:
+                self_agreement.append(similarity(baselines[0], baselines[1]))
+            if not baselines:
+                log(f"    ❌ Baseline failed; skipping {name}", Colors.RED)
+                continue
+
+            for setting in settings:
+                image_b64, payload_bytes = variants[(name, setting["label"])]
+                result = post_completion(
+                    vision_request(model["deployment"], image_b64, "jpeg", setting["detail"]),
+                    api_key=api_key,
+                    verify_ssl=verify_ssl,
+                )
+                records.append(
+                    {
+                        "model": model["name"],
+                        "image": name,
+                        "label": setting["label"],
+                        "success": result["success"],
+                        "response_time": result["response_time"],
+                        "payload_bytes": payload_bytes,
+                        "total_tokens": (result.get("usage") or {}).get("total_tokens", 0),
+                        "similarity": similarity(baselines[0], result["response"]) if result["success"] else None,
+                        "error": result.get("error"),
+                    }
+                )
+                time.sleep(args.delay)
+
+        if self_agreement:
+            noise_floor[model["name"]] = sum(self_agreement) / len(self_agreement)
+            log(f"  Baseline self-agreement: {noise_floor[model['name']]:.2f}", Colors.GRAY)
+
+    rows = aggregate(records)
+    picks = recommend(rows, args.min_similarity, noise_floor)
+    print_report(rows, picks)
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "corpus": [name for name, _, _ in corpus],
+                "settings": settings,
+                "noise_floor": noise_floor,
+                "results": rows,
+                "recommended": {model: pick["label"] for model, pick in picks.items()},
+                "requests": records,
+            },
+            f,
+            indent=2,
+        )
+    log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+    print("\n")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Sweep interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmark packed-batch image analysis against one-photo-per-call analysis
+
+Runs the same photo set through a vision deployment at several pack sizes
+(K photos per request) and compares wall time, API calls, token usage and
+agreement with the K=1 baseline answers.
+
+Usage:
+    python scripts/benchmark-packing.py --no-verify-ssl
+    python scripts/benchmark-packing.py --pack-sizes 1,4,8 --limit 32
+    python scripts/benchmark-packing.py --model "GPT 4o" --max-edge 512 --detail low
+    python scripts/benchmark-packing.py --dry-run
+    python scripts/benchmark-packing.py --pack-sizes 4 --limit 500 --trace trace.jsonl
+    python scripts/benchmark-packing.py --dry-run --limit 500 --profile-memory memory.json --memory-budget 2
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from photobook import tracing
+from photobook.console import Colors, log, log_section, positive_ints
+from photobook.imaging import list_images
+from photobook.midas import API_KEY, select_models
+from photobook.packing import analyze_packed, build_packed_request, build_single_request, prepare_images
+from photobook.textsim import summary_agreement
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+
+
+def summarize_run(
+    pack_size: int, run: Dict[str, Any], elapsed_ms: float, baseline: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """Collapse one analyze_packed run into the numbers the report compares"""
+    count = len(run["summaries"])
+    calls = run["calls"]
+    total_tokens = run["usage"].get("total_tokens", 0)
+
+    accuracy = None
+    if baseline and pack_size != 1:
+        scores = [
+            summary_agreement(ours, theirs)["overall"]
+            for ours, theirs in zip(run["summaries"], baseline)
+            if theirs.get("description") != "Analysis failed"
+        ]
+        accuracy = sum(scores) / len(scores) if scores else None
+
+    return {
+        "pack_size": pack_size,
+        "images": count,
+        "api_calls": len(calls),
+        "failed_calls": sum(1 for c in calls if not c["success"]),
+        "fallbacks": len(run["fallback_ids"]),
+        "wall_time_ms": elapsed_ms,
+        "ms_per_image": elapsed_ms / count if count else 0,
+        "avg_call_ms": sum(c["response_time"] for c in calls) / len(calls) if calls else 0,
+        "prompt_tokens": run["usage"].get("prompt_tokens", 0),
+        "completion_tokens": run["usage"].get("completion_tokens", 0),
+        "total_tokens": total_tokens,
+        "tokens_per_image": total_tokens / count if count else 0,
+        "agreement_with_k1": accuracy,
+    }
+
+
+def dry_run(images: List[Dict[str, Any]], deployment: str, pack_sizes: List[int], detail: str):
+    """Show request counts and body sizes per pack size without calling the API"""
+    log_section("Dry Run - Request Sizes")
+    for k in pack_sizes:
+        bodies = []
+        for start in range(0, len(images), k):
+            group = [img["image_base64"] for img in images[start : start + k]]
+            if k == 1:
+                request = build_single_request(deployment, group[0], detail)
+            else:
+                request = build_packed_request(deployment, group, detail)
+            bodies.append(len(json.dumps(request)))
+        log(
+            f"  K={k:<3} {len(bodies):>4} requests, "
+            f"avg body {sum(bodies) / len(bodies) / 1024:.0f} KB, "
+            f"max body {max(bodies) / 1024:.0f} KB",
+            Colors.BLUE,
+        )
+
+
+def print_table(rows: List[Dict[str, Any]]):
+    """Render the comparison table"""
+    log_section("Packing Benchmark Results")
+    header = f"{'K':>3} {'calls':>6} {'fallbk':>6} {'wall s':>8} {'ms/img':>8} {'tok/img':>8} {'agree':>6}"
+    log(header, Colors.CYAN)
+    for row in rows:
+        agreement = row["agreement_with_k1"]
+        log(
+            f"{row['pack_size']:>3} {row['api_calls']:>6} {row['fallbacks']:>6} "
+            f"{row['wall_time_ms'] / 1000:>8.1f} {row['ms_per_image']:>8.0f} "
+            f"{row['tokens_per_image']:>8.0f} {'-' if agreement is None else f'{agreement:.2f}':>6}",
+            Colors.GREEN if row["failed_calls"] == 0 else Colors.YELLOW,
+        )
+
+    baseline = next((r for r in rows if r["pack_size"] == 1), None)
+    if baseline and baseline["wall_time_ms"] > 0:
+        for row in rows:
+            if row is baseline or row["wall_time_ms"] <= 0:
+                continue
+            speedup = baseline["wall_time_ms"] / row["wall_time_ms"]
+            token_ratio = row["tokens_per_image"] / baseline["tokens_per_image"] if baseline["tokens_per_image"] else 0
+            log(f"  K={row['pack_size']}: {speedup:.1f}x throughput, {token_ratio:.2f}x tokens per image", Colors.GRAY)
+
+
+def run(args):
+    """Prepare the photos, then analyze them at every pack size (or only size the requests)"""
+    pack_sizes = sorted(set(args.pack_sizes))
+    if 1 not in pack_sizes and not args.dry_run:
+        # Agreement is measured against single-image answers
+        pack_sizes.insert(0, 1)
+
+    models = select_models(args.model)
+    if not models:
+        log(f"❌ Model not found: {args.model}", Colors.RED)
+        sys.exit(1)
+    model = models[0]
+
+    log_section("📦 Packed Vision Analysis Benchmark")
+    paths = list_images(args.images, args.limit)
+    if not paths:
+        log(f"❌ No images found in {args.images}", Colors.RED)
+        sys.exit(1)
+
+    log(f"Model: {model['name']} ({model['deployment']})", Colors.GRAY)
+    log(f"Images: {len(paths)} from {args.images}", Colors.GRAY)
+    log(f"Pack sizes: {', '.join(str(k) for k in pack_sizes)}", Colors.GRAY)
+
+    images = prepare_images(paths, max_edge=args.max_edge, quality=args.quality)
+    upload_kb = sum(img["bytes"] for img in images) / 1024
+    log(f"Prepared {len(images)} images at max edge {args.max_edge}px ({upload_kb:.0f} KB total)", Colors.GRAY)
+
+    if args.dry_run:
+        dry_run(images, model["deployment"], pack_sizes, args.detail)
+        return
+
+    if args.no_verify_ssl:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        log("⚠️  SSL verification disabled", Colors.YELLOW)
+
+    api_key = args.api_key or API_KEY
+    rows: List[Dict[str, Any]] = []
+    runs: Dict[int, Dict[str, Any]] = {}
+    baseline: List[Dict[str, str]] = []
+
+    for k in pack_sizes:
+        log_section(f"K = {k}")
+        start_time = time.time()
+        run = analyze_packed(
+            images,
+            model["deployment"],
+            pack_size=k,
+            api_key=api_key,
+            verify_ssl=not args.no_verify_ssl,
+            detail=args.detail,
+            on_progress=lambda done, total: log(f"  {done}/{total} images", Colors.GRAY),
+        )
+        elapsed_ms = (time.time() - start_time) * 1000
+        if k == 1:
+            baseline = run["summaries"]
+
+        row = summarize_run(k, run, elapsed_ms, baseline)
+        rows.append(row)
+        runs[k] = run
+        log(f"  ✅ {row['api_calls']} calls, {row['fallbacks']} fallbacks, {elapsed_ms / 1000:.1f}s", Colors.GREEN)
+
+    print_table(rows)
+
+    with tracing.span("result.write", path=args.output), open(args.output, "w") as f:
+        json.dump(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "model": model["deployment"],
+                "image_source": args.images,
+                "max_edge": args.max_edge,
+                "quality": args.quality,
+                "detail": args.detail,
+                "results": rows,
+                "summaries": {str(k): run["summaries"] for k, run in runs.items()},
+            },
+            f,
+            indent=2,
+        )
+    log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+    print("\n")
+
+
+def report_memory(report: Dict[str, Any], path: str, budget_mb: Optional[float]):
+    """Log and save the memory report; exit with BUDGET_EXIT_CODE when over budget"""
+    from photobook.memprofile import BUDGET_EXIT_CODE, budget_error, summary_lines, write_report
+
+    log_section("🧠 Memory Profile")
+    for line in summary_lines(report):
+        log(line, Colors.GRAY if line.startswith("    ") else Colors.CYAN)
+    write_report(report, path)
+    log(f"\n📝 Memory report saved to: {path}", Colors.BLUE)
+    error = budget_error(report, budget_mb)
+    if error:
+        log(f"❌ Over memory budget: {error}", Colors.RED)
+        sys.exit(BUDGET_EXIT_CODE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark packed multi-image vision requests")
+    parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Directory of photos to analyze")
+    parser.add_argument("--limit", type=int, default=24, help="Number of photos to use (default: 24)")
+    parser.add_argument("--pack-sizes", type=positive_ints,
+                        default="1,2,4,8", help="Comma-separated K values (default: 1,2,4,8)")
+    parser.add_argument("--model", default="Claude-Sonnet-4", help="Vision model name or deployment")
+    parser.add_argument("--max-edge", type=int, default=768, help="Downscale longest edge to this (default: 768)")
+    parser.add_argument("--quality", type=int, default=85, help="JPEG quality for uploads (default: 85)")
+    parser.add_argument("--detail", choices=["low", "high", "auto"], help="image_url detail level")
+    parser.add_argument("--api-key", help="Midas API key (optional)")
+    parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL verification (for corporate APIs)")
+    parser.add_argument("--dry-run", action="store_true", help="Show request sizes without calling the API")
+    parser.add_argument("--output", default=str(Path(__file__).parent / "packing-benchmark-results.json"))
+    parser.add_argument("--trace", help="Append OTLP-JSON spans to this file (see trace-report.py)")
+
+    parser.add_argument("--profile-memory", nargs="?", const="", metavar="REPORT",
+                        help="Profile memory per stage and call site; report path (default: memory-report.json)")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="Fail (exit 3) if RSS grows by more than this per image; implies --profile-memory")
+
+    args = parser.parse_args()
+    tracing.configure(args.trace, service="benchmark-packing")
+    profiler = None
+    if args.profile_memory is not None or args.memory_budget:
+        from photobook.memprofile import MemoryProfiler
+
+        profiler = MemoryProfiler().start()
+    run(args)
+    if profiler is not None:
+        report_memory(profiler.stop(), args.profile_memory or "memory-report.json", args.memory_budget)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Benchmark interrupted by user", Colors.YELLOW)
+        sys.exit(130)
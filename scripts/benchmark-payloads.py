@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: precompiled request bodies vs json= serialization
+
+Compares what it costs per call to produce the bytes requests sends, from
+building the request up to requests' prepared body:
+
+- json=: build the request dict, requests serializes it (what every call
+  did before photobook/payloads.py)
+- spliced: the precompiled template's fragments joined with the call's
+  base64 data, sent with data=
+
+for a config samplePayload (test-models.py), a single-photo analysis
+request, packed requests of K photos (analyze_packed) and the vision test
+request with a full-size photo (test-vision-analysis.py). Both ways give
+identical bytes; that is checked before timing.
+
+Usage:
+    python scripts/benchmark-payloads.py
+    python scripts/benchmark-payloads.py --pack-sizes 4,8,16 --max-edge 1024 --output payloads.json
+"""
+
+import argparse
+import importlib.util
+import json
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from requests.models import PreparedRequest
+
+from photobook.console import Colors, log, log_section, positive_ints
+from photobook.imaging import list_images, read_base64
+from photobook.midas import load_model_configs
+from photobook.packing import build_packed_request, build_single_request, packed_body, prepare_images, single_body
+from photobook.payloads import PayloadCompiler, compiler, slot
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+
+
+def prepared_body(**body: Any) -> bytes:
+    """The body requests would send for json=... or data=..."""
+    request = PreparedRequest()
+    request.prepare_headers({})
+    request.prepare_body(data=body.get("data"), files=None, json=body.get("json"))
+    return request.body
+
+
+def per_call(fn: Callable[[], Any], repeat: int) -> float:
+    """Best-of-repeat seconds per call, timeit style"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def vision_test_module():
+    path = Path(__file__).parent / "test-vision-analysis.py"
+    spec = importlib.util.spec_from_file_location("test_vision_analysis", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_cases(args, images: List[Dict[str, Any]], originals: List[str]) -> List[Dict[str, Any]]:
+    """Each case: name, json= builder and spliced builder taking a rotating call number"""
+    deployment = args.deployment
+    sample = next(model["samplePayload"] for models in load_model_configs()["models"].values() for model in models
+                  if model["deploymentName"] == deployment)
+    photos = [image["image_base64"] for image in images]
+    vision = vision_test_module()
+
+    def group(n: int, k: int) -> List[str]:
+        return [photos[(n + offset) % len(photos)] for offset in range(k)]
+
+    cases = [
+        {"name": "samplePayload (text)", "json": lambda n: sample,
+         "data": lambda n: compiler.static(sample).render()},
+        {"name": f"single photo, {args.max_edge}px",
+         "json": lambda n: build_single_request(deployment, photos[n % len(photos)]),
+         "data": lambda n: single_body(deployment, photos[n % len(photos)]).data()},
+    ]
+    for k in args.pack_sizes:
+        cases.append({"name": f"packed K={k}, {args.max_edge}px",
+                      "json": lambda n, k=k: build_packed_request(deployment, group(n, k)),
+                      "data": lambda n, k=k: packed_body(deployment, group(n, k)).data()})
+
+    def vision_body(n: int) -> bytes:
+        template = compiler.template(("vision-test", "jpeg"), deployment,
+                                     lambda: vision.build_vision_request(deployment, slot("image"), "jpeg"))
+        return template.body(originals[n % len(originals)]).data()
+
+    cases.append({"name": "vision test, original file",
+                  "json": lambda n: vision.build_vision_request(deployment, originals[n % len(originals)], "jpeg"),
+                  "data": vision_body})
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompiled request bodies vs json= serialization")
+    parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Directory of photos")
+    parser.add_argument("--limit", type=int, default=8, help="Photos rotated through the calls (default: 8)")
+    parser.add_argument("--deployment", default="Claude-Sonnet-4", help="Deployment the requests are built for")
+    parser.add_argument("--pack-sizes", type=positive_ints,
+                        default="4,8", help="Comma-separated K values (default: 4,8)")
+    parser.add_argument("--max-edge", type=int, default=768, help="Upload size of prepared photos (default: 768)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repeats, best is kept (default: 5)")
+    parser.add_argument("--output", help="Save results as JSON")
+    args = parser.parse_args()
+
+    paths = list_images(args.images, args.limit)
+    if not paths:
+        log(f"❌ No images found in {args.images}", Colors.RED)
+        sys.exit(1)
+    images = prepare_images(paths, max_edge=args.max_edge)
+    originals = [read_base64(path) for path in paths if path.suffix.lower() in (".jpg", ".jpeg")] or \
+        [read_base64(paths[0])]
+    cases = build_cases(args, images, originals)
+
+    log_section(f"📦 Request Body Benchmark ({args.deployment}, {len(paths)} photos rotated, "
+                f"format {compiler.format(args.deployment)})")
+    log(f"  {'Case':<30} {'Body':>9} {'json=':>10} {'spliced':>10} {'Speedup':>8} {'CPU per 1k calls':>17}",
+        Colors.GRAY)
+    results = []
+    for case in cases:
+        counter = {"json": 0, "data": 0}
+
+        def run(kind: str):
+            counter[kind] += 1
+            payload = case[kind](counter[kind])
+            return prepared_body(**{kind: payload})
+
+        for n in range(len(paths)):
+            if case["data"](n) != prepared_body(json=case["json"](n)):
+                log(f"❌ {case['name']}: spliced body differs from json= for call {n}", Colors.RED)
+                sys.exit(1)
+        size = len(case["data"](0))
+        json_s = per_call(lambda: run("json"), args.repeat)
+        data_s = per_call(lambda: run("data"), args.repeat)
+        results.append({"case": case["name"], "body_bytes": size, "json_us": json_s * 1e6,
+                        "spliced_us": data_s * 1e6, "speedup": json_s / data_s})
+        log(f"  {case['name']:<30} {size / 1024:>7.0f}KB {json_s * 1e6:>8.1f}µs {data_s * 1e6:>8.1f}µs "
+            f"{json_s / data_s:>7.1f}x {json_s * 1000:>7.2f}s → {data_s * 1000:.2f}s", Colors.CYAN)
+
+    k = max(args.pack_sizes or [1])
+
+    def compile_template():
+        PayloadCompiler({args.deployment: compiler.format(args.deployment)}).template(
+            "packed", args.deployment,
+            lambda: build_packed_request(args.deployment, [slot(f"image{n}") for n in range(k)]),
+        )
+
+    compile_s = per_call(compile_template, args.repeat)
+    log(f"\nCompiling a K={k} template once: {compile_s * 1e6:.0f} µs; every body is checked byte for byte "
+        f"against json=", Colors.GRAY)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results, "compile_us": compile_s * 1e6}, f, indent=2)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
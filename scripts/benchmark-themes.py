@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark map-reduce theme generation against one-shot generation as albums grow
+
+Builds synthetic album summaries (clustered into events) at several sizes and
+generates themes both ways against a simulated deployment whose latency grows
+with prompt and completion tokens and which rejects prompts over its context
+window. Reports calls, tokens and latency for each size.
+
+Usage:
+    python scripts/benchmark-themes.py
+    python scripts/benchmark-themes.py --sizes 50,500,5000 --shard-size 40 --max-shards 16
+    python scripts/benchmark-themes.py --context-tokens 32000 --time-scale 0.01 --output themes-bench.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+from photobook.console import Colors, log, log_section
+from photobook.themes import (CANDIDATES_PER_SHARD, DEFAULT_SHARD_SIZE, MAX_SHARDS, build_themes_request,
+                              generate_themes, generate_themes_mapreduce)
+
+PLACES = ["beach", "old town", "mountain pass", "night market", "temple", "harbor", "rice terraces", "desert camp",
+          "lakeside cabin", "city rooftop", "forest trail", "street food stall"]
+SUBJECTS = ["two friends laughing", "a family portrait", "a lone hiker", "fishing boats", "lanterns", "a street vendor",
+            "a plate of noodles", "children playing", "a couple walking", "a wide landscape", "a dog asleep"]
+LIGHTING = ["Golden hour", "Overcast", "Harsh midday sun", "Blue hour", "Neon night", "Soft window light"]
+MOODS = ["Joyful", "Calm", "Adventurous", "Nostalgic", "Energetic", "Romantic"]
+THEME_NAMES = ["Golden Coast", "Quiet Mornings", "Neon Nights", "Mountain Air", "Market Colors", "Film Memories",
+               "Blue Hour Calm", "Festival Glow"]
+
+
+def synthetic_album(size: int, seed: int) -> Dict[str, Any]:
+    """Summaries in events of 5-40 photos sharing a place and lighting, plus the clusters"""
+    rng = random.Random(seed)
+    summaries, clusters = [], []
+    while len(summaries) < size:
+        length = min(size - len(summaries), rng.randint(5, 40))
+        place, lighting = rng.choice(PLACES), rng.choice(LIGHTING)
+        clusters.append(list(range(len(summaries), len(summaries) + length)))
+        for _ in range(length):
+            summaries.append({"description": f"{rng.choice(SUBJECTS).capitalize()} at the {place}, "
+                                             f"{rng.choice(['close up', 'wide shot', 'candid', 'posed'])}",
+                              "lighting": lighting, "mood": rng.choice(MOODS)})
+    return {"summaries": summaries, "clusters": clusters}
+
+
+def prompt_tokens(request: Dict[str, Any]) -> int:
+    return sum(len(m["content"]) for m in request["messages"]) // 4
+
+
+class SimulatedDeployment:
+    """
+    Offline stand-in for post_completion: latency is a fixed overhead plus
+    per-token prefill and decode time, slept at `time_scale` so large sweeps
+    stay quick, and prompts over `context_tokens` fail like the real API
+    """
+
+    def __init__(self, context_tokens: int, overhead: float, prefill: float, decode: float, time_scale: float):
+        self.context_tokens = context_tokens
+        self.overhead, self.prefill, self.decode = overhead, prefill, decode
+        self.time_scale = time_scale
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, request: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        text = " ".join(m["content"] for m in request["messages"])
+        prompt = prompt_tokens(request)
+        with self.lock:
+            self.calls += 1
+        if prompt > self.context_tokens:
+            time.sleep(self.overhead * self.time_scale)
+            return {"success": False, "response_time": self.overhead, "usage": {},
+                    "error": f"context_length_exceeded: {prompt} prompt tokens > {self.context_tokens}"}
+        rng = random.Random(len(text))
+        names = rng.sample(THEME_NAMES, 4)
+        reply = json.dumps({"themes": [{"theme_id": name.lower().replace(" ", "_"), "name": name,
+                                        "mood": rng.choice(MOODS), "lighting": rng.choice(LIGHTING),
+                                        "background": "Natural surroundings", "editing_style": "Warm film tones",
+                                        "photos": rng.randint(5, 40)} for name in names]})
+        completion = len(reply) // 4
+        latency = self.overhead + prompt * self.prefill + completion * self.decode
+        time.sleep(latency * self.time_scale)
+        return {"success": True, "response_time": latency, "response": reply,
+                "usage": {"prompt_tokens": prompt, "completion_tokens": completion,
+                          "total_tokens": prompt + completion}}
+
+
+def run_size(size: int, args) -> Dict[str, Any]:
+    album = synthetic_album(size, args.seed + size)
+    model = SimulatedDeployment(args.context_tokens, args.overhead, args.prefill, args.decode, args.time_scale)
+
+    start = time.perf_counter()
+    one_shot = generate_themes(album["summaries"], count=args.count, post=model)
+    one_shot_seconds = (time.perf_counter() - start) / args.time_scale
+
+    start = time.perf_counter()
+    mapped = generate_themes_mapreduce(album["summaries"], count=args.count, shard_size=args.shard_size,
+                                       clusters=album["clusters"], max_shards=args.max_shards, post=model)
+    mapreduce_seconds = (time.perf_counter() - start) / args.time_scale
+
+    return {
+        "photos": size,
+        "clusters": len(album["clusters"]),
+        "one_shot": {"success": one_shot["success"], "error": one_shot.get("error"),
+                     "prompt_tokens": prompt_tokens(build_themes_request(album["summaries"], count=args.count)),
+                     "latency_s": round(one_shot_seconds, 1)},
+        "mapreduce": {"success": mapped["success"], "fallback": mapped.get("fallback", False),
+                      "calls": mapped["calls"], "shards": mapped["shards"], "candidates": mapped["candidates"],
+                      "prompt_tokens": mapped["usage"].get("prompt_tokens", 0),
+                      "completion_tokens": mapped["usage"].get("completion_tokens", 0),
+                      "map_s": round(mapped["map_seconds"] / args.time_scale, 1),
+                      "reduce_s": round(mapped["reduce_seconds"] / args.time_scale, 1),
+                      "latency_s": round(mapreduce_seconds, 1)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map-reduce vs one-shot theme generation")
+    parser.add_argument("--sizes", default="50,500,5000", help="Album sizes (default: 50,500,5000)")
+    parser.add_argument("--count", type=int, default=4, help="Themes to generate (default: 4)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f"Summaries per map call (default: {DEFAULT_SHARD_SIZE})")
+    parser.add_argument("--max-shards", type=int, default=MAX_SHARDS,
+                        help=f"Shards before shards grow instead (default: {MAX_SHARDS})")
+    parser.add_argument("--context-tokens", type=int, default=128000,
+                        help="Simulated context window (default: 128000)")
+    parser.add_argument("--overhead", type=float, default=0.5, help="Per-call latency in seconds (default: 0.5)")
+    parser.add_argument("--prefill", type=float, default=0.0002,
+                        help="Seconds per prompt token (default: 0.0002, 5k tokens/s)")
+    parser.add_argument("--decode", type=float, default=0.02,
+                        help="Seconds per completion token (default: 0.02, 50 tokens/s)")
+    parser.add_argument("--time-scale", type=float, default=0.05,
+                        help="Fraction of simulated latency actually slept (default: 0.05)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Save results as JSON")
+    args = parser.parse_args()
+
+    sizes = [int(v) for v in args.sizes.split(",")]
+    log_section(f"🎨 Theme Generation Scaling ({', '.join(map(str, sizes))} photos)")
+    log(f"Simulated deployment: {args.overhead}s + {args.prefill * 1000:g} ms/prompt token + "
+        f"{args.decode * 1000:g} ms/completion token, {args.context_tokens:,} token context; "
+        f"{CANDIDATES_PER_SHARD} candidates per shard", Colors.GRAY)
+
+    rows: List[Dict[str, Any]] = []
+    for size in sizes:
+        row = run_size(size, args)
+        rows.append(row)
+        one, mapped = row["one_shot"], row["mapreduce"]
+        log(f"\n{size} photos ({row['clusters']} events)", Colors.CYAN)
+        if one["success"]:
+            log(f"  One-shot:   1 call, {one['prompt_tokens']:>9,} prompt tokens, {one['latency_s']:6.1f}s",
+                Colors.YELLOW)
+        else:
+            log(f"  One-shot:   failed ({one['error']})", Colors.RED)
+        log(f"  Map-reduce: {mapped['calls']} calls ({mapped['shards']} shards, {mapped['candidates']} candidates), "
+            f"{mapped['prompt_tokens']:>9,} prompt tokens, {mapped['latency_s']:6.1f}s "
+            f"(map {mapped['map_s']}s + reduce {mapped['reduce_s']}s)",
+            Colors.GREEN if mapped["success"] and not mapped["fallback"] else Colors.RED)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Adaptive call timeouts and job deadlines
+
+Shows the latencies that test-models.py, test-vision-analysis.py and the job
+service have observed per deployment and kind of call, and the timeouts
+derived from them. The
+benchmark runs batches of calls through post_completion against a simulated
+endpoint (lognormal latency per deployment, occasional stalled calls) with
+the fixed 60s timeout, with adaptive timeouts, and with adaptive timeouts
+plus a per-batch deadline.
+
+Usage:
+    python scripts/call-timeouts.py show
+    python scripts/call-timeouts.py show --latency /tmp/latency.json
+    python scripts/call-timeouts.py benchmark --batches 50 --batch-size 20 --stall-rate 0.02
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from photobook.console import Colors, log, log_section
+from photobook.deadlines import DEFAULT_LATENCY_PATH, TIMEOUT_ERRORS, Deadline, LatencyTracker, latency_key
+from photobook.midas import post_completion
+
+# Simulated median latency (seconds) per deployment
+MEDIANS = {
+    "Claude-Sonnet-4": 7.0,
+    "GPT 4o": 4.0,
+    "GPT 4.1": 5.0,
+    "Gemini-2.5-pro": 11.0,
+    "Gemini-2.0-flash": 2.5,
+}
+
+
+def show(args):
+    tracker = LatencyTracker(args.latency)
+    log_section(f"⏱️  Observed Latency ({args.latency})")
+    stats = tracker.stats()
+    if not stats:
+        log("No latencies recorded yet; calls use their fixed timeouts until there are enough", Colors.YELLOW)
+        return
+    log(f"  {'Deployment (kind)':<34} {'Calls':>6} {'p50':>8} {'p99':>8} {'Connect':>8} {'Read':>8}", Colors.GRAY)
+    for key, entry in stats.items():
+        p50 = f"{entry['p50']:.2f}s" if entry["p50"] is not None else "-"
+        p99 = f"{entry['p99']:.2f}s" if entry["p99"] is not None else "-"
+        log(f"  {key:<34} {entry['samples']:>6} {p50:>8} {p99:>8} {entry['connect_timeout']:>7.1f}s "
+            f"{entry['read_timeout']:>7.1f}s", Colors.CYAN)
+    log("\nRead timeouts shown are for a 60s caller timeout with no deadline", Colors.GRAY)
+
+
+class SimulatedEndpoint:
+    """
+    requests.Session stand-in for post_completion
+
+    Latencies are drawn per deployment and slept at `time_scale`; a call
+    slower than its read timeout sleeps that long and raises ReadTimeout,
+    as requests would.
+    """
+
+    def __init__(self, rng: random.Random, sigma: float, stall_rate: float, stall_seconds: float, time_scale: float):
+        self.rng = rng
+        self.sigma = sigma
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.time_scale = time_scale
+
+    def latency(self, deployment: str) -> float:
+        if self.rng.random() < self.stall_rate:
+            return self.stall_seconds
+        return self.rng.lognormvariate(math.log(MEDIANS[deployment]), self.sigma)
+
+    def post(self, url: str, json: Dict[str, Any], timeout: Any = None, **kwargs) -> requests.Response:
+        latency = self.latency(json["model"]) * self.time_scale
+        read = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read is not None and latency > read:
+            time.sleep(read)
+            raise requests.exceptions.ReadTimeout(f"Read timed out. (read timeout={read / self.time_scale:.1f}s)")
+        time.sleep(latency)
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = b'{"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 1}}'
+        return response
+
+
+def run_policy(args, name: str, adaptive: bool, batch_deadline: Optional[float]) -> Dict[str, Any]:
+    """Batches of calls, each timed-out call retried once; times are reported unscaled"""
+    rng = random.Random(args.seed)
+    scale = args.time_scale
+    endpoint = SimulatedEndpoint(rng, args.sigma, args.stall_rate, args.stall_seconds, scale)
+    deployments = list(MEDIANS)
+    latency = None
+    if adaptive:
+        latency = LatencyTracker(None, min_read=5.0 * scale, connect=5.0 * scale)
+        # What earlier runs would have left in the latency file
+        # (stalled calls timed out there and were never recorded)
+        history = SimulatedEndpoint(random.Random(args.seed + 1), args.sigma, 0.0, args.stall_seconds, scale)
+        for deployment in deployments:
+            for _ in range(args.warmup):
+                latency.observe(latency_key(deployment), history.latency(deployment) * scale)
+
+    batch_times: List[float] = []
+    call_times: List[float] = []
+    errors: Dict[str, int] = {}
+    retries = 0
+    over_deadline = 0
+    for batch in range(args.batches):
+        deadline = Deadline.after(batch_deadline * scale, min_call=0.5 * scale) if batch_deadline else None
+        start = time.perf_counter()
+        for number in range(args.batch_size):
+            request = {"model": deployments[(batch * args.batch_size + number) % len(deployments)], "messages": []}
+            call_start = time.perf_counter()
+            for attempt in range(2):
+                result = post_completion(request, timeout=60.0 * scale, session=endpoint, deadline=deadline,
+                                         latency=latency)
+                if result["success"] or result.get("error_type") != "read_timeout" or attempt:
+                    break
+                retries += 1
+            call_times.append((time.perf_counter() - call_start) / scale)
+            if not result["success"]:
+                errors[result["error_type"]] = errors.get(result["error_type"], 0) + 1
+        batch_times.append((time.perf_counter() - start) / scale)
+        if batch_deadline and batch_times[-1] > batch_deadline:
+            over_deadline += 1
+
+    def quantile(values: List[float], q: float) -> float:
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))], 1)
+
+    return {
+        "policy": name,
+        "batch_p50_s": quantile(batch_times, 0.5),
+        "batch_p95_s": quantile(batch_times, 0.95),
+        "batch_max_s": round(max(batch_times), 1),
+        "call_p99_s": quantile(call_times, 0.99),
+        "call_max_s": round(max(call_times), 1),
+        "retries": retries,
+        "failed": errors,
+        "batches_over_deadline": over_deadline if batch_deadline else None,
+        "read_timeouts": {d: round(latency.timeouts(latency_key(d), 60.0 * scale)[1] / scale, 1) for d in deployments}
+        if latency else None,
+    }
+
+
+def benchmark(args):
+    log_section(f"⏱️  Timeout Benchmark ({args.batches} batches x {args.batch_size} calls, "
+                f"{args.stall_rate:.0%} stalled for {args.stall_seconds:g}s)")
+    policies = [
+        ("fixed 60s", False, None),
+        ("adaptive", True, None),
+        (f"adaptive + {args.batch_deadline:g}s deadline", True, args.batch_deadline),
+    ]
+    results = []
+    for name, adaptive, batch_deadline in policies:
+        result = run_policy(args, name, adaptive, batch_deadline)
+        results.append(result)
+        failed = ", ".join(f"{count} {kind}" for kind, count in sorted(result["failed"].items())) or "none"
+        log(f"  {name:<28} batch p50 {result['batch_p50_s']:>6.1f}s  p95 {result['batch_p95_s']:>6.1f}s  "
+            f"max {result['batch_max_s']:>6.1f}s  | call p99 {result['call_p99_s']:>5.1f}s  "
+            f"max {result['call_max_s']:>6.1f}s  | {result['retries']} retries, failed: {failed}",
+            Colors.GREEN if adaptive else Colors.CYAN)
+        if result["batches_over_deadline"] is not None:
+            over = result["batches_over_deadline"]
+            by = f" (by at most {result['batch_max_s'] - batch_deadline:.1f}s)" if over else ""
+            log(f"  {'':<28} batches over the deadline: {over}{by}", Colors.GRAY)
+    if results[1]["read_timeouts"]:
+        log("\nLearned read timeouts: " + ", ".join(f"{d} {t:g}s" for d, t in results[1]["read_timeouts"].items()),
+            Colors.GRAY)
+    timed_out = sum(results[-1]["failed"].get(kind, 0) for kind in TIMEOUT_ERRORS)
+    log(f"Calls cut short by the deadline policy: {timed_out}", Colors.GRAY)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "policies": results}, f, indent=2, default=str)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive call timeouts and job deadlines")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    show_parser = sub.add_parser("show", help="Observed latencies and the timeouts derived from them")
+    show_parser.add_argument("--latency", default=str(DEFAULT_LATENCY_PATH), help="Latency file")
+
+    bench_parser = sub.add_parser("benchmark", help="Fixed vs adaptive timeouts on a simulated endpoint")
+    bench_parser.add_argument("--batches", type=int, default=50)
+    bench_parser.add_argument("--batch-size", type=int, default=20, help="Sequential calls per batch (default: 20)")
+    bench_parser.add_argument("--sigma", type=float, default=0.35, help="Lognormal latency spread (default: 0.35)")
+    bench_parser.add_argument("--stall-rate", type=float, default=0.02, help="Share of calls that hang (default: 0.02)")
+    bench_parser.add_argument("--stall-seconds", type=float, default=120, help="How long a stalled call hangs")
+    bench_parser.add_argument("--batch-deadline", type=float, default=180, help="Deadline per batch (default: 180s)")
+    bench_parser.add_argument("--warmup", type=int, default=50,
+                              help="Latencies per deployment known before the first batch (default: 50)")
+    bench_parser.add_argument("--time-scale", type=float, default=0.01,
+                              help="Fraction of simulated time actually slept (default: 0.01)")
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    {"show": show, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Rasterize every photobook page to PNG/JPEG and bundle them into a ZIP
+
+Server-side counterpart of exportService.downloadAllPagesAsZip: pages are
+rendered from the exportAsJSON photobook across a process pool and streamed
+into the archive in page order (page-1.png, page-2.png, ...). Encoded pages
+are stored without re-compression, since PNG and JPEG are compressed already.
+
+Usage:
+    python scripts/export-pages.py --book photobook.json --photos ./photos --output pages.zip
+    python scripts/export-pages.py --book photobook.json --photos ./photos --format jpeg --dpi 150
+    python scripts/export-pages.py --book photobook.json --photos ./photos --output pages/ --no-zip
+    python scripts/export-pages.py --benchmark --pages 200 --photos bucketlistly_images --workers 8
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+
+from photobook.console import Colors, log, log_section
+from photobook.document import PhotoResolver, load_photobook, synthetic_photobook
+from photobook.raster import FORMATS, export_directory, export_zip
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS of this process plus its finished workers, in MB"""
+    factor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / factor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / factor
+    return max(own, children)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rasterize photobook pages into a ZIP")
+    parser.add_argument("--book", help="Photobook JSON from exportService.exportAsJSON")
+    parser.add_argument("--photos", help="Directory of source photos named <photoId>.<ext>")
+    parser.add_argument("--photo-map", help="JSON file mapping photoId to a file path")
+    parser.add_argument("--output", help="ZIP file, or a directory with --no-zip (default: photobook-pages.zip)")
+    parser.add_argument("--no-zip", action="store_true", help="Write page files into the --output directory")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="png", help="Page image format (default: png)")
+    parser.add_argument("--dpi", type=int, default=300, help="Output resolution (default: 300, the canvas size)")
+    parser.add_argument("--workers", type=int, help="Render processes (default: CPU count)")
+    parser.add_argument("--benchmark", action="store_true", help="Export a synthetic book built from --photos")
+    parser.add_argument("--pages", type=int, default=200, help="Pages in the benchmark book (default: 200)")
+    parser.add_argument("--seed", type=int, default=42, help="Benchmark book seed (default: 42)")
+
+    args = parser.parse_args()
+    if not args.benchmark and not args.book:
+        parser.error("--book is required unless --benchmark is given")
+    if not args.photos and not args.photo_map:
+        parser.error("--photos or --photo-map is required")
+
+    resolver = (PhotoResolver.from_map_file(args.photo_map, args.photos) if args.photo_map
+                else PhotoResolver(args.photos))
+    if args.benchmark:
+        book = synthetic_photobook(sorted(resolver.paths), args.pages, seed=args.seed)
+        default_output = os.path.join(tempfile.gettempdir(), f"photobook-benchmark-{args.pages}")
+        log_section(f"🖼️  Page Raster Export Benchmark ({args.pages} pages)")
+    else:
+        book = load_photobook(args.book)
+        default_output = "photobook-pages"
+        log_section("🖼️  Photobook Page Export")
+
+    output = args.output or (default_output if args.no_zip else default_output + ".zip")
+    workers = args.workers or os.cpu_count() or 1
+    log(f"Pages: {len(book['pages'])}, photos available: {len(resolver)}", Colors.GRAY)
+    log(f"Format: {args.format}, {args.dpi} DPI, {workers} workers", Colors.GRAY)
+    log(f"Output: {output}", Colors.GRAY)
+
+    reported = [0]
+
+    def on_progress(done: int, total: int):
+        if done - reported[0] >= max(1, total // 10) or done == total:
+            reported[0] = done
+            log(f"  {done}/{total} pages", Colors.GRAY)
+
+    export = export_directory if args.no_zip else export_zip
+    stats = export(book, resolver, output, dpi=args.dpi, image_format=args.format, workers=workers,
+                   on_progress=on_progress)
+
+    log_section("Export Summary")
+    log(f"✅ {stats['pages']} pages in {stats['elapsed']:.1f}s ({stats['pages'] / stats['elapsed']:.1f} pages/s)",
+        Colors.GREEN)
+    log(f"Output size: {stats['bytes'] / (1024 * 1024):.1f} MB", Colors.GRAY)
+    log(f"Peak RSS (largest process): {peak_rss_mb():.0f} MB", Colors.GRAY)
+    if stats["missing_photos"]:
+        log(f"⚠️  {stats['missing_photos']} placements had no matching photo file and were left blank", Colors.YELLOW)
+    if stats["stickers_skipped"]:
+        log(f"⚠️  {stats['stickers_skipped']} SVG/remote stickers skipped (only raster stickers are drawn)",
+            Colors.YELLOW)
+
+    if args.benchmark:
+        results_file = os.path.join(os.path.dirname(__file__), "page-export-benchmark.json")
+        with open(results_file, "w") as f:
+            json.dump({**stats, "format": args.format, "dpi": args.dpi, "workers": workers,
+                       "peak_rss_mb": round(peak_rss_mb(), 1)}, f, indent=2)
+        log(f"\n📝 Results saved to: {results_file}", Colors.BLUE)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Export interrupted by user", Colors.YELLOW)
+        sys.exit(130)
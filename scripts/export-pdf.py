@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Export a studio photobook to a print-ready PDF on the server
+
+Takes the JSON written by exportService.exportAsJSON plus the source photos.
+Pages are streamed to disk one at a time and each photo is embedded once at
+the target DPI, so memory stays flat for books of any length.
+
+Photos are matched by photoId: either files named <photoId>.<ext> in
+--photos, or an explicit {"photoId": "path"} JSON map via --photo-map.
+
+Usage:
+    python scripts/export-pdf.py --book photobook.json --photos ./photos --output book.pdf
+    python scripts/export-pdf.py --book photobook.json --photo-map photo-map.json --dpi 200
+    python scripts/export-pdf.py --benchmark --pages 200 --photos bucketlistly_images
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+
+from photobook.console import Colors, log, log_section
+from photobook.document import PhotoResolver, load_photobook, synthetic_photobook
+from photobook.pdf import export_pdf
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def print_stats(stats: dict):
+    log_section("Export Summary")
+    log(f"✅ {stats['pages']} pages in {stats['elapsed']:.1f}s ({stats['pages'] / stats['elapsed']:.1f} pages/s)",
+        Colors.GREEN)
+    log(f"PDF size: {stats['bytes'] / (1024 * 1024):.1f} MB", Colors.GRAY)
+    log(f"Photo placements: {stats['image_placements']}, embedded once as {stats['images_embedded']} images "
+        f"({stats['jpeg_passthrough']} JPEGs copied without re-encoding)", Colors.GRAY)
+    log(f"Image data: {stats['image_bytes'] / (1024 * 1024):.1f} MB", Colors.GRAY)
+    log(f"Peak RSS: {peak_rss_mb():.0f} MB", Colors.GRAY)
+    if stats["missing_photos"]:
+        log(f"⚠️  {stats['missing_photos']} placements had no matching photo file and were left blank", Colors.YELLOW)
+    if stats["stickers_skipped"]:
+        log(f"⚠️  {stats['stickers_skipped']} SVG/remote stickers skipped (only raster stickers are embedded)",
+            Colors.YELLOW)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a photobook JSON to PDF")
+    parser.add_argument("--book", help="Photobook JSON from exportService.exportAsJSON")
+    parser.add_argument("--photos", help="Directory of source photos named <photoId>.<ext>")
+    parser.add_argument("--photo-map", help='JSON file mapping photoId to a file path')
+    parser.add_argument("--output", help="Output PDF (default: <book>.pdf)")
+    parser.add_argument("--dpi", type=int, default=300, help="Target image resolution (default: 300)")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality for resampled photos (default: 90)")
+    parser.add_argument("--benchmark", action="store_true", help="Export a synthetic book built from --photos")
+    parser.add_argument("--pages", type=int, default=200, help="Pages in the benchmark book (default: 200)")
+    parser.add_argument("--seed", type=int, default=42, help="Benchmark book seed (default: 42)")
+
+    args = parser.parse_args()
+    if not args.benchmark and not args.book:
+        parser.error("--book is required unless --benchmark is given")
+    if not args.photos and not args.photo_map:
+        parser.error("--photos or --photo-map is required")
+
+    resolver = (PhotoResolver.from_map_file(args.photo_map, args.photos) if args.photo_map
+                else PhotoResolver(args.photos))
+
+    if args.benchmark:
+        book = synthetic_photobook(sorted(resolver.paths), args.pages, seed=args.seed)
+        output = args.output or os.path.join(tempfile.gettempdir(), f"photobook-benchmark-{args.pages}.pdf")
+        log_section(f"📕 PDF Export Benchmark ({args.pages} pages)")
+    else:
+        book = load_photobook(args.book)
+        output = args.output or os.path.splitext(args.book)[0] + ".pdf"
+        log_section("📕 Photobook PDF Export")
+
+    log(f"Pages: {len(book['pages'])}, photos available: {len(resolver)}", Colors.GRAY)
+    log(f"Target DPI: {args.dpi}, JPEG quality: {args.quality}", Colors.GRAY)
+    log(f"Output: {output}", Colors.GRAY)
+
+    reported = [0]
+
+    def on_progress(done: int, total: int):
+        if done - reported[0] >= max(1, total // 10) or done == total:
+            reported[0] = done
+            log(f"  {done}/{total} pages", Colors.GRAY)
+
+    stats = export_pdf(book, resolver, output, dpi=args.dpi, quality=args.quality, on_progress=on_progress)
+    print_stats(stats)
+
+    if args.benchmark:
+        results_file = os.path.join(os.path.dirname(__file__), "pdf-export-benchmark.json")
+        with open(results_file, "w") as f:
+            json.dump({**stats, "dpi": args.dpi, "quality": args.quality, "peak_rss_mb": round(peak_rss_mb(), 1)},
+                      f, indent=2)
+        log(f"\n📝 Results saved to: {results_file}", Colors.BLUE)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Export interrupted by user", Colors.YELLOW)
+        sys.exit(130)
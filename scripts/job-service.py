@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Album job service: persistent priority queue + per-stage worker pool
+
+Runs image analysis, theme generation and theme preview as background jobs
+instead of inline in the browser. Interactive jobs always run ahead of
+batch and backfill jobs, and each stage can reserve workers for
+interactive work only. Call timeouts follow each deployment's observed
+latency, and a job submitted with --deadline stops waiting on calls once
+that much time has passed since submission (photobook/deadlines.py).
+With --shadow, analyze jobs are also sent to candidate deployments whose
+answers are only logged for shadow-compare.py (photobook/shadow.py). With
+--budget, each analyze job is planned by the budget scheduler (cheaper
+model, smaller images as the month's budget runs down), its calls wait for
+room under --tokens-per-minute / --spend-per-minute, and every call is
+recorded in the usage ledger (photobook/scheduler.py).
+
+Usage:
+    python scripts/job-service.py serve --analyze-workers 4 --themes-workers 2 --no-verify-ssl
+    python scripts/job-service.py serve --trace trace.jsonl
+    python scripts/job-service.py serve --shadow "GPT 4.1" Gemini-2.5-pro --shadow-rate 0.2
+    python scripts/job-service.py serve --budget 500 --tokens-per-minute 200000
+    python scripts/job-service.py submit analyze --images bucketlistly_images --priority batch
+    python scripts/job-service.py submit themes --summaries summaries.json --priority interactive --stream
+    python scripts/job-service.py submit analyze --images bucketlistly_images --deadline 600
+    python scripts/job-service.py status
+    python scripts/job-service.py status 12
+    python scripts/job-service.py events 12 --follow
+    python scripts/job-service.py cancel 12
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from photobook import tracing
+from photobook.accounting import DEFAULT_LEDGER_PATH, DEFAULT_PRICES_PATH
+from photobook.console import Colors, log, log_section, positive_int
+from photobook.deadlines import DEFAULT_LATENCY_PATH, TIMEOUT_ERRORS, Deadline, LatencyTracker
+from photobook.imaging import list_images
+from photobook.jobs import PRIORITIES, TERMINAL_STATUSES, JobContext, JobQueue, WorkerPool
+
+DEFAULT_DB = str(Path(__file__).parent / "jobs.db")
+
+STATUS_COLORS = {
+    "queued": Colors.GRAY,
+    "running": Colors.BLUE,
+    "done": Colors.GREEN,
+    "failed": Colors.RED,
+    "cancelled": Colors.YELLOW,
+}
+
+
+def make_handlers(api_key: str, verify_ssl: bool, latency: Optional[LatencyTracker] = None,
+                  shadow: Optional[Any] = None, scheduler: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Stage handlers; imports are local so status/cancel work without Pillow
+
+    shadow is a ShadowRunner, scheduler a BudgetScheduler for analyze jobs.
+    """
+
+    def job_deadline(payload: Dict[str, Any]) -> Deadline:
+        """The payload's absolute deadline; raises DeadlineExceeded if it passed while queued"""
+        deadline = Deadline(payload.get("deadline"))
+        deadline.check("Job deadline")
+        return deadline
+
+    def analyze(payload: Dict[str, Any], ctx: JobContext):
+        from photobook.accounting import estimate_image_tokens
+        from photobook.packing import analyze_packed, prepare_images
+        from photobook.scheduler import BASE_CALL_TOKENS
+
+        deadline = job_deadline(payload)
+        paths = [Path(p) for p in payload["images"]]
+        deployment = payload.get("deployment", "Claude-Sonnet-4")
+        max_edge = payload.get("max_edge", 768)
+        pack_size = payload.get("pack_size", 1)
+        decision = None
+        if scheduler is not None:
+            # One plan per job: what is left of the budget picks the model, image size and detail
+            estimate = pack_size * estimate_image_tokens(max_edge, max_edge) + BASE_CALL_TOKENS
+            decision = scheduler.plan(deployment, estimated_tokens=estimate)
+            deployment = decision["deployment"]
+            max_edge = min(max_edge, decision["max_edge"] or max_edge)
+        images = prepare_images(paths, max_edge=max_edge)
+        kwargs = dict(
+            pack_size=pack_size,
+            api_key=api_key,
+            verify_ssl=verify_ssl,
+            on_progress=ctx.progress,
+            on_summary=(lambda position, summary: ctx.partial({"index": position, "summary": summary}))
+            if payload.get("stream") else None,
+            deadline=deadline,
+            latency=latency,
+        )
+        if decision is not None:
+            detail = decision["detail"]
+            tokens_per_image = sum(
+                estimate_image_tokens(image["width"], image["height"], detail or "high") for image in images
+            ) // max(1, len(images))
+            kwargs.update(detail=detail, post=scheduler.poster(decision, job_id=f"job {ctx.job_id}",
+                                                               tokens_per_image=tokens_per_image))
+        if shadow is not None:
+            run = shadow.analyze(images, deployment, label=f"job {ctx.job_id}", **kwargs)
+        else:
+            run = analyze_packed(images, deployment, **kwargs)
+        timed_out = sum(1 for call in run["calls"] if call.get("error_type") in TIMEOUT_ERRORS)
+        result = {"summaries": run["summaries"], "usage": run["usage"], "fallbacks": len(run["fallback_ids"]),
+                  "timed_out_calls": timed_out}
+        if decision is not None:
+            result["budget"] = {key: decision[key]
+                                for key in ("requested", "deployment", "level", "max_edge", "detail")}
+        return result
+
+    def themes(payload: Dict[str, Any], ctx: JobContext):
+        from photobook.themes import DEFAULT_SHARD_SIZE, generate_themes_mapreduce
+
+        deadline = job_deadline(payload)
+        ctx.progress(0, 1)
+        result = generate_themes_mapreduce(
+            payload["summaries"],
+            payload.get("deployment", "GPT 4o"),
+            shard_size=payload.get("shard_size", DEFAULT_SHARD_SIZE),
+            clusters=payload.get("clusters"),
+            on_theme=(lambda theme: ctx.partial({"theme": theme})) if payload.get("stream") else None,
+            api_key=api_key,
+            verify_ssl=verify_ssl,
+            deadline=deadline,
+            latency=latency,
+        )
+        if not result["success"]:
+            raise RuntimeError(result.get("error") or "Theme generation failed")
+        ctx.progress(1, 1)
+        return {"themes": result["themes"], "usage": result.get("usage")}
+
+    def preview(payload: Dict[str, Any], ctx: JobContext):
+        from photobook.midas import post_completion
+        from photobook.themes import build_preview_request, preview_sample, shard_summaries
+
+        deadline = job_deadline(payload)
+        ctx.progress(0, 1)
+        summaries = payload["summaries"]
+        sample = preview_sample(summaries, shard_summaries(len(summaries), clusters=payload.get("clusters")))
+        result = post_completion(
+            build_preview_request(sample, payload.get("deployment", "Gemini-2.5-pro")),
+            api_key=api_key,
+            verify_ssl=verify_ssl,
+            deadline=deadline,
+            latency=latency,
+        )
+        if not result["success"]:
+            raise RuntimeError(result.get("error") or "Theme preview failed")
+        ctx.progress(1, 1)
+        return {"text": result["response"], "usage": result.get("usage")}
+
+    return {"analyze": analyze, "themes": themes, "preview": preview}
+
+
+def serve(args, queue: JobQueue):
+    from photobook.midas import API_KEY
+
+    if args.no_verify_ssl:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    concurrency = {"analyze": args.analyze_workers, "themes": args.themes_workers, "preview": args.preview_workers}
+    reserve = {kind: args.interactive_reserve for kind in concurrency}
+
+    def on_event(event: str, job: Dict[str, Any]):
+        if event == "requeued":
+            log(f"↩️  Re-queued {job['count']} job(s) left running by a service that stopped heartbeating",
+                Colors.YELLOW)
+            return
+        color = {"done": Colors.GREEN, "failed": Colors.RED, "cancelled": Colors.YELLOW}.get(event, Colors.GRAY)
+        log(f"  [{event}] job {job['id']} {job['kind']} ({job['priority']})", color)
+
+    latency = LatencyTracker(args.latency)
+    tracing.configure(args.trace, service="job-service")
+    shadow = None
+    if args.shadow:
+        from photobook.shadow import ShadowRunner
+
+        shadow = ShadowRunner(args.shadow, log_path=args.shadow_log, sample_rate=args.shadow_rate,
+                              max_pending=args.shadow_pending)
+    scheduler = None
+    if args.budget is not None:
+        from photobook.accounting import PriceTable, UsageLedger
+        from photobook.scheduler import BudgetScheduler
+
+        scheduler = BudgetScheduler(UsageLedger(PriceTable.load(args.prices), args.ledger), args.budget,
+                                    tokens_per_minute=args.tokens_per_minute, spend_per_minute=args.spend_per_minute)
+    pool = WorkerPool(
+        queue,
+        make_handlers(args.api_key or API_KEY, not args.no_verify_ssl, latency, shadow, scheduler),
+        concurrency=concurrency,
+        interactive_reserve=reserve,
+        on_event=on_event,
+    )
+
+    log_section("⚙️  Album Job Service")
+    log(f"Queue: {queue.path}", Colors.GRAY)
+    if args.trace:
+        log(f"Tracing to: {args.trace}", Colors.GRAY)
+    if shadow is not None:
+        log(f"Shadowing {args.shadow_rate:.0%} of analyze jobs to {', '.join(args.shadow)} (log: {args.shadow_log})",
+            Colors.GRAY)
+    if scheduler is not None:
+        spent = scheduler.ledger.spent()
+        log(f"Budget: {spent:.2f} of {args.budget:.2f} {scheduler.ledger.prices.currency} spent this month "
+            f"(ledger: {args.ledger})", Colors.GRAY)
+    for kind, count in concurrency.items():
+        log(f"  {kind}: {count} worker(s), {min(args.interactive_reserve, count)} reserved for interactive", Colors.GRAY)
+    log("Press Ctrl+C to stop\n", Colors.GRAY)
+
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        log("\n⏹  Stopping; waiting for running jobs to finish...", Colors.YELLOW)
+        pool.stop()
+        latency.save()
+        if shadow is not None:
+            log("⏳ Waiting for shadow calls to finish...", Colors.GRAY)
+            shadow.close(args.shadow_drain)
+            stats = shadow.stats
+            log(f"🪞 Shadowed {stats['shadowed']} of {stats['batches']} analyze jobs ({stats['records']} logged, "
+                f"{stats['skipped_busy']} skipped while busy)", Colors.GRAY)
+
+
+def submit(args, queue: JobQueue):
+    if args.kind == "analyze":
+        if not args.images:
+            log("❌ analyze jobs need --images DIR", Colors.RED)
+            sys.exit(1)
+        payload = {
+            "images": [str(p) for p in list_images(args.images, args.limit)],
+            "pack_size": args.pack_size,
+        }
+    else:
+        if not args.summaries:
+            log(f"❌ {args.kind} jobs need --summaries FILE", Colors.RED)
+            sys.exit(1)
+        with open(args.summaries, "r") as f:
+            summaries = json.load(f)
+        payload = {"summaries": summaries.get("summaries", summaries) if isinstance(summaries, dict) else summaries}
+    if args.deployment:
+        payload["deployment"] = args.deployment
+    if args.stream:
+        payload["stream"] = True
+    if args.deadline:
+        payload["deadline"] = time.time() + args.deadline
+
+    job_id = queue.enqueue(args.kind, payload, priority=args.priority)
+    log(f"✅ Queued job {job_id} ({args.kind}, {args.priority})", Colors.GREEN)
+
+
+def status(args, queue: JobQueue):
+    if args.job_id:
+        job = queue.get(args.job_id)
+        if not job:
+            log(f"❌ No job with id {args.job_id}", Colors.RED)
+            sys.exit(1)
+        print(json.dumps(job, indent=2))
+        return
+
+    log_section("Jobs")
+    for job in queue.list_jobs(limit=args.limit):
+        progress = f"{job['progress_index']}/{job['progress_total']}" if job["progress_total"] else ""
+        log(
+            f"  {job['id']:>5}  {job['kind']:<8} {job['priority']:<12} {job['status']:<10} {progress}",
+            STATUS_COLORS.get(job["status"], Colors.RESET),
+        )
+
+
+def events(args, queue: JobQueue):
+    last_seq = 0
+    while True:
+        for event in queue.events(args.job_id, after_seq=last_seq):
+            last_seq = event["seq"]
+            progress = f" {event['index']}/{event['total']}" if event["type"] == "progress" else ""
+            data = event["data"] or {}
+            if event["type"] == "partial" and "theme" in data:
+                progress = f" theme {data['theme'].get('name')!r}"
+            elif event["type"] == "partial":
+                progress = f" photo {data.get('index')}: {(data.get('summary') or {}).get('description', '')[:60]}"
+            log(f"  {time.strftime('%H:%M:%S', time.localtime(event['created_at']))} {event['type']}{progress}", Colors.GRAY)
+        job = queue.get(args.job_id)
+        if not args.follow or not job or job["status"] in TERMINAL_STATUSES:
+            return
+        time.sleep(0.5)
+
+
+def cancel(args, queue: JobQueue):
+    try:
+        new_status = queue.cancel(args.job_id)
+    except KeyError as e:
+        log(f"❌ {e}", Colors.RED)
+        sys.exit(1)
+    log(f"Job {args.job_id}: {new_status}", STATUS_COLORS.get(new_status, Colors.RESET))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Album analysis job service")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite queue path (default: scripts/jobs.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the worker pool")
+    serve_parser.add_argument("--analyze-workers", type=int, default=4)
+    serve_parser.add_argument("--themes-workers", type=int, default=2)
+    serve_parser.add_argument("--preview-workers", type=int, default=2)
+    serve_parser.add_argument("--interactive-reserve", type=int, default=1, help="Workers per stage kept for interactive jobs")
+    serve_parser.add_argument("--api-key", help="Midas API key (optional)")
+    serve_parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL verification (for corporate APIs)")
+    serve_parser.add_argument("--latency", default=str(DEFAULT_LATENCY_PATH),
+                              help="Observed call latencies, loaded at start and saved on stop")
+    serve_parser.add_argument("--trace", help="Append OTLP-JSON spans to this file (see trace-report.py)")
+    serve_parser.add_argument("--shadow", nargs="+", metavar="DEPLOYMENT",
+                              help="Also send analyze jobs to these deployments and log the comparison")
+    serve_parser.add_argument("--shadow-rate", type=float, default=1.0, help="Share of analyze jobs shadowed (default: 1)")
+    serve_parser.add_argument("--shadow-pending", type=int, default=2,
+                              help="Jobs waiting on shadow calls before further jobs are not shadowed (default: 2)")
+    serve_parser.add_argument("--shadow-log", default=str(Path(__file__).parent / "shadow-log.jsonl"),
+                              help="Shadow log (default: scripts/shadow-log.jsonl; see shadow-compare.py report)")
+    serve_parser.add_argument("--shadow-drain", type=float, default=300,
+                              help="Seconds to wait for shadow calls on stop (default: 300)")
+    serve_parser.add_argument("--budget", type=float,
+                              help="Monthly budget for analyze jobs; enables the budget scheduler and usage ledger")
+    serve_parser.add_argument("--tokens-per-minute", type=int, help="Token cap over the trailing minute (with --budget)")
+    serve_parser.add_argument("--spend-per-minute", type=float, help="Spend cap over the trailing minute (with --budget)")
+    serve_parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH,
+                              help="Usage ledger (default: scripts/usage-ledger.jsonl)")
+    serve_parser.add_argument("--prices", default=DEFAULT_PRICES_PATH,
+                              help="Price table (default: scripts/model-prices.json)")
+
+    submit_parser = commands.add_parser("submit", help="Queue a job")
+    submit_parser.add_argument("kind", choices=["analyze", "themes", "preview"])
+    submit_parser.add_argument("--priority", choices=list(PRIORITIES), default="batch")
+    submit_parser.add_argument("--images", help="Directory of photos (analyze)")
+    submit_parser.add_argument("--limit", type=int, help="Only the first N photos (analyze)")
+    submit_parser.add_argument("--pack-size", type=positive_int, default=1, help="Photos per vision request (analyze)")
+    submit_parser.add_argument("--summaries", help="JSON file with ImageSummary list (themes, preview)")
+    submit_parser.add_argument("--deployment", help="Override the stage's default deployment")
+    submit_parser.add_argument("--stream", action="store_true",
+                               help="Stream replies; each summary or theme becomes a partial event (analyze, themes)")
+    submit_parser.add_argument("--deadline", type=float,
+                               help="Seconds from now after which the job's calls fail fast instead of waiting")
+
+    status_parser = commands.add_parser("status", help="Show jobs")
+    status_parser.add_argument("job_id", type=int, nargs="?")
+    status_parser.add_argument("--limit", type=int, default=20)
+
+    events_parser = commands.add_parser("events", help="Show a job's progress events")
+    events_parser.add_argument("job_id", type=int)
+    events_parser.add_argument("--follow", "-f", action="store_true", help="Keep polling until the job finishes")
+
+    cancel_parser = commands.add_parser("cancel", help="Cancel a queued or running job")
+    cancel_parser.add_argument("job_id", type=int)
+
+    args = parser.parse_args()
+    queue = JobQueue(args.db)
+    {"serve": serve, "submit": submit, "status": status, "events": events, "cancel": cancel}[args.command](args, queue)
+
+
+if __name__ == "__main__":
+    main()
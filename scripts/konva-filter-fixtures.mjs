@@ -0,0 +1,290 @@
+/**
+ * Expected pixels for the print filter engine, computed the way the editor does
+ *
+ * photobook/filters.py compiles the editor's Konva filter chains into a fused
+ * engine and checks it against konva_reference(), a Python replay of the
+ * same chain. Both live in one file and could drift together, so this script
+ * computes the expected output independently: Konva's Brighten, Contrast,
+ * HSL, Sepia and Grayscale filters as written in Konva's source, the filter
+ * list canvasEditorService builds (applyAdjustments, then applyFilter for
+ * each filter), and its custom vignette and vintage filters. The presets are
+ * read from canvasEditorService.FILTER_PRESETS.
+ *
+ * Needs only Node (no packages). Run after changing the editor's filters and
+ * commit the JSON; apply-filters.py fixtures checks the engine against it.
+ *
+ * Usage:
+ *   node scripts/konva-filter-fixtures.mjs
+ *   node scripts/konva-filter-fixtures.mjs --output /tmp/fixtures.json
+ */
+
+import * as fs from 'fs';
+import * as path from 'path';
+import { fileURLToPath } from 'url';
+
+const SCRIPTS_DIR = path.dirname(fileURLToPath(import.meta.url));
+const EDITOR_SERVICE = path.join(SCRIPTS_DIR, '..', 'src', 'services', 'canvasEditorService.ts');
+const DEFAULT_OUTPUT = path.join(SCRIPTS_DIR, 'konva-filter-fixtures.json');
+
+const WIDTH = 9;
+const HEIGHT = 7;
+
+// ============================================================================
+// Konva.Filters (same arithmetic as Konva's src/filters)
+// ============================================================================
+
+function Brighten(imageData) {
+  const brightness = this.brightness() * 255;
+  const data = imageData.data;
+  for (let i = 0; i < data.length; i += 4) {
+    data[i] += brightness;
+    data[i + 1] += brightness;
+    data[i + 2] += brightness;
+  }
+}
+
+function Contrast(imageData) {
+  const adjust = Math.pow((this.contrast() + 100) / 100, 2);
+  const data = imageData.data;
+  for (let i = 0; i < data.length; i += 4) {
+    let red = data[i];
+    let green = data[i + 1];
+    let blue = data[i + 2];
+    red /= 255; red -= 0.5; red *= adjust; red += 0.5; red *= 255;
+    green /= 255; green -= 0.5; green *= adjust; green += 0.5; green *= 255;
+    blue /= 255; blue -= 0.5; blue *= adjust; blue += 0.5; blue *= 255;
+    red = red < 0 ? 0 : red > 255 ? 255 : red;
+    green = green < 0 ? 0 : green > 255 ? 255 : green;
+    blue = blue < 0 ? 0 : blue > 255 ? 255 : blue;
+    data[i] = red;
+    data[i + 1] = green;
+    data[i + 2] = blue;
+  }
+}
+
+function HSL(imageData) {
+  const data = imageData.data;
+  const v = 1;
+  const s = Math.pow(2, this.saturation());
+  const h = Math.abs(this.hue() + 360) % 360;
+  const l = this.luminance() * 127;
+  const vsu = v * s * Math.cos((h * Math.PI) / 180);
+  const vsw = v * s * Math.sin((h * Math.PI) / 180);
+  const rr = 0.299 * v + 0.701 * vsu + 0.167 * vsw;
+  const rg = 0.587 * v - 0.587 * vsu + 0.33 * vsw;
+  const rb = 0.114 * v - 0.114 * vsu - 0.497 * vsw;
+  const gr = 0.299 * v - 0.299 * vsu - 0.328 * vsw;
+  const gg = 0.587 * v + 0.413 * vsu + 0.035 * vsw;
+  const gb = 0.114 * v - 0.114 * vsu + 0.293 * vsw;
+  const br = 0.299 * v - 0.3 * vsu + 1.25 * vsw;
+  const bg = 0.587 * v - 0.586 * vsu - 1.05 * vsw;
+  const bb = 0.114 * v + 0.886 * vsu - 0.2 * vsw;
+  for (let i = 0; i < data.length; i += 4) {
+    const r = data[i];
+    const g = data[i + 1];
+    const b = data[i + 2];
+    data[i] = rr * r + rg * g + rb * b + l;
+    data[i + 1] = gr * r + gg * g + gb * b + l;
+    data[i + 2] = br * r + bg * g + bb * b + l;
+  }
+}
+
+function Sepia(imageData) {
+  const data = imageData.data;
+  for (let i = 0; i < data.length; i += 4) {
+    const r = data[i];
+    const g = data[i + 1];
+    const b = data[i + 2];
+    data[i] = Math.min(255, r * 0.393 + g * 0.769 + b * 0.189);
+    data[i + 1] = Math.min(255, r * 0.349 + g * 0.686 + b * 0.168);
+    data[i + 2] = Math.min(255, r * 0.272 + g * 0.534 + b * 0.131);
+  }
+}
+
+function Grayscale(imageData) {
+  const data = imageData.data;
+  for (let i = 0; i < data.length; i += 4) {
+    const brightness = 0.34 * data[i] + 0.5 * data[i + 1] + 0.16 * data[i + 2];
+    data[i] = brightness;
+    data[i + 1] = brightness;
+    data[i + 2] = brightness;
+  }
+}
+
+// ============================================================================
+// canvasEditorService filter lists
+// ============================================================================
+
+function createNode() {
+  const attrs = { brightness: 0, contrast: 0, saturation: 0, hue: 0, luminance: 0, filters: null };
+  const node = {};
+  for (const name of Object.keys(attrs)) {
+    node[name] = (value) => {
+      if (value === undefined) return attrs[name];
+      attrs[name] = value;
+      return node;
+    };
+  }
+  return node;
+}
+
+function applyAdjustments(node, adjustments) {
+  const filters = [];
+  if (adjustments.brightness !== 0) {
+    filters.push(Brighten);
+    node.brightness(adjustments.brightness / 100);
+  }
+  if (adjustments.contrast !== 0) {
+    filters.push(Contrast);
+    node.contrast(adjustments.contrast);
+  }
+  if (adjustments.saturation !== 0) {
+    filters.push(HSL);
+    node.saturation(adjustments.saturation / 100);
+  }
+  if (adjustments.hue !== 0) {
+    filters.push(HSL);
+    node.hue(adjustments.hue);
+  }
+  node.filters(filters);
+}
+
+function applyFilter(node, filterType, intensity = 100) {
+  const filters = node.filters() || [];
+  switch (filterType) {
+    case 'vintage':
+      applyVintageFilter(filters, intensity);
+      break;
+    case 'bw':
+      filters.push(Grayscale);
+      break;
+    case 'sepia':
+      filters.push(Sepia);
+      break;
+    case 'vignette':
+      applyVignetteFilter(node, intensity);
+      break;
+    default:
+      // blur is approximated in Python and Konva has no Sharpen: no fixtures for either
+      throw new Error(`No fixture support for ${filterType}`);
+  }
+  node.filters(filters);
+}
+
+function applyVintageFilter(filters, intensity) {
+  const s = Math.pow(2, -0.2 * (intensity / 100));
+  const desaturateFilter = (imageData) => {
+    const { data } = imageData;
+    for (let i = 0; i < data.length; i += 4) {
+      const r = data[i];
+      const g = data[i + 1];
+      const b = data[i + 2];
+      data[i] = (0.299 + 0.701 * s) * r + (0.587 - 0.587 * s) * g + (0.114 - 0.114 * s) * b;
+      data[i + 1] = (0.299 - 0.299 * s) * r + (0.587 + 0.413 * s) * g + (0.114 - 0.114 * s) * b;
+      data[i + 2] = (0.299 - 0.3 * s) * r + (0.587 - 0.586 * s) * g + (0.114 + 0.886 * s) * b;
+    }
+  };
+  filters.push(Sepia);
+  filters.push(desaturateFilter);
+}
+
+function applyVignetteFilter(node, intensity) {
+  const customFilter = (imageData) => {
+    const { data, width, height } = imageData;
+    const centerX = width / 2;
+    const centerY = height / 2;
+    const maxDist = Math.sqrt(centerX * centerX + centerY * centerY);
+    for (let y = 0; y < height; y++) {
+      for (let x = 0; x < width; x++) {
+        const idx = (y * width + x) * 4;
+        const dx = x - centerX;
+        const dy = y - centerY;
+        const dist = Math.sqrt(dx * dx + dy * dy);
+        const vignette = 1 - (dist / maxDist) * (intensity / 100);
+        data[idx] *= vignette;
+        data[idx + 1] *= vignette;
+        data[idx + 2] *= vignette;
+      }
+    }
+  };
+  const filters = node.filters() || [];
+  filters.push(customFilter);
+  node.filters(filters);
+}
+
+// ============================================================================
+// Fixtures
+// ============================================================================
+
+function loadPresets() {
+  const source = fs.readFileSync(EDITOR_SERVICE, 'utf8');
+  const match = source.match(/export const FILTER_PRESETS = (\{[\s\S]*?\n\});/);
+  if (!match) throw new Error(`FILTER_PRESETS not found in ${EDITOR_SERVICE}`);
+  return new Function(`return ${match[1]};`)();
+}
+
+/** Gradients plus black, white and the primaries, so clamping is exercised */
+function sourcePixels() {
+  const data = new Uint8ClampedArray(WIDTH * HEIGHT * 4);
+  const swatches = [[0, 0, 0], [255, 255, 255], [255, 0, 0], [0, 255, 0], [0, 0, 255], [128, 128, 128]];
+  for (let y = 0; y < HEIGHT; y++) {
+    for (let x = 0; x < WIDTH; x++) {
+      const i = (y * WIDTH + x) * 4;
+      const swatch = y === 0 ? swatches[x] : undefined;
+      const [r, g, b] = swatch || [(x * 31 + y * 17) % 256, (x * 13 + y * 41 + 60) % 256, (x * 53 + y * 7 + 120) % 256];
+      data[i] = r;
+      data[i + 1] = g;
+      data[i + 2] = b;
+      data[i + 3] = 255;
+    }
+  }
+  return data;
+}
+
+function render(adjustments) {
+  const node = createNode();
+  applyAdjustments(node, adjustments);
+  for (const filter of adjustments.filters) {
+    applyFilter(node, filter.type, filter.intensity);
+  }
+  const imageData = { data: sourcePixels(), width: WIDTH, height: HEIGHT };
+  for (const filter of node.filters()) {
+    filter.call(node, imageData);
+  }
+  return rgb(imageData.data);
+}
+
+function rgb(data) {
+  const out = [];
+  for (let i = 0; i < data.length; i += 4) out.push(data[i], data[i + 1], data[i + 2]);
+  return out;
+}
+
+function main() {
+  const outputIndex = process.argv.indexOf('--output');
+  const output = outputIndex >= 0 ? process.argv[outputIndex + 1] : DEFAULT_OUTPUT;
+  const plain = { brightness: 0, contrast: 0, saturation: 0, hue: 0, filters: [] };
+
+  const cases = Object.entries(loadPresets()).map(([name, preset]) => ({ name, preset: name, adjustments: preset }));
+  const extra = {
+    'vintage-filter': { ...plain, saturation: 30, filters: [{ type: 'vintage', intensity: 100 }] },
+    'bw-vignette': { ...plain, brightness: -15, filters: [{ type: 'bw', intensity: 100 }, { type: 'vignette', intensity: 90 }] },
+    'clamping': { ...plain, brightness: 45, contrast: 80, saturation: 60, hue: 120, filters: [] },
+    'hue-only': { ...plain, hue: -75, filters: [{ type: 'sepia', intensity: 100 }] },
+  };
+  for (const [name, adjustments] of Object.entries(extra)) cases.push({ name, adjustments });
+
+  const fixtures = {
+    generator: 'scripts/konva-filter-fixtures.mjs',
+    width: WIDTH,
+    height: HEIGHT,
+    source: rgb(sourcePixels()),
+    cases: cases.map((item) => ({ ...item, expected: render(item.adjustments) })),
+  };
+  // One line per pixel array keeps the JSON reviewable
+  const text = JSON.stringify(fixtures, null, 2).replace(/\[\s+([\d,\s]+?)\s+\]/g, (_, body) => `[${body.replace(/\s+/g, ' ')}]`);
+  fs.writeFileSync(output, text + '\n');
+  console.log(`Wrote ${fixtures.cases.length} cases to ${output}`);
+}
+
+main();
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Convert, diff and benchmark the binary photobook format (.pbk)
+
+Usage:
+    python scripts/photobook-format.py encode photobook.json photobook.pbk
+    python scripts/photobook-format.py decode photobook.pbk photobook.json
+    python scripts/photobook-format.py diff old.json new.json --output change.pbkp
+    python scripts/photobook-format.py apply old.json change.pbkp --output new.json
+    python scripts/photobook-format.py benchmark --pages 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+from photobook.bookformat import (
+    HAS_MSGPACK,
+    BookJournal,
+    apply_patch,
+    decode_book,
+    decode_patch,
+    encode_book,
+    encode_patch,
+    load_book,
+    make_patch,
+    save_book,
+    to_json,
+)
+from photobook.console import Colors, log, log_section
+from photobook.document import synthetic_photobook
+
+
+def best_of(fn: Callable, repeat: int) -> Tuple[float, object]:
+    """Fastest of several runs in milliseconds, plus the last result"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def edit_one_element(book: dict, page_index: int) -> dict:
+    """Copy-on-write edit, the way the studio store produces a new state: move one photo"""
+    page = book["pages"][page_index]
+    element = {**page["elements"][0], "x": page["elements"][0]["x"] + 1.5}
+    new_page = {**page, "elements": [element] + page["elements"][1:]}
+    pages = list(book["pages"])
+    pages[page_index] = new_page
+    return {**book, "pages": pages, "updatedAt": f"2026-01-01T00:00:{page_index % 60:02d}.000Z"}
+
+
+def benchmark(args):
+    log_section(f"📦 Binary Photobook Format Benchmark ({args.pages} pages)")
+    log(f"Codec: {'msgpack' if HAS_MSGPACK else 'pure Python (pip install msgpack for the C codec)'}", Colors.GRAY)
+    photo_ids = [f"photo-{i:04d}-{'x' * 24}" for i in range(args.photos)]
+    book = synthetic_photobook(photo_ids, args.pages)
+    repeat = args.repeat
+
+    json_text = to_json(book)
+    rows = []
+    ms, _ = best_of(lambda: to_json(book), repeat)
+    load_ms, _ = best_of(lambda: json.loads(json_text), repeat)
+    rows.append(("JSON (exportAsJSON)", len(json_text.encode("utf-8")), ms, load_ms))
+
+    for label, compress in (("PBK", False), ("PBK + zlib", True)):
+        ms, data = best_of(lambda: encode_book(book, compress), repeat)
+        load_ms, decoded = best_of(lambda: decode_book(data), repeat)
+        if decoded != book:
+            log(f"❌ {label} round trip changed the book", Colors.RED)
+            sys.exit(1)
+        rows.append((label, len(data), ms, load_ms))
+
+    log(f"\n{'Format':<22}{'Size':>12}{'Save':>12}{'Load':>12}", Colors.CYAN)
+    for label, size, save_ms, load_ms in rows:
+        log(f"{label:<22}{size / 1024:>10.1f}KB{save_ms:>10.1f}ms{load_ms:>10.1f}ms")
+
+    edited = edit_one_element(book, args.pages // 2)
+    diff_ms, patch = best_of(lambda: make_patch(book, edited), repeat)
+    encode_ms, patch_bytes = best_of(lambda: encode_patch(patch), repeat)
+    apply_ms, patched = best_of(lambda: apply_patch(book, decode_patch(patch_bytes)), repeat)
+    if patched != edited:
+        log("❌ Patch did not reproduce the edited book", Colors.RED)
+        sys.exit(1)
+
+    log_section("Autosave After Moving One Element")
+    log(f"Full JSON re-serialization: {rows[0][1] / 1024:.1f} KB in {rows[0][2]:.1f} ms", Colors.GRAY)
+    log(f"Patch: {len(patch_bytes)} bytes, diff {diff_ms:.2f} ms + encode {encode_ms:.2f} ms, "
+        f"apply {apply_ms:.2f} ms", Colors.GREEN)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = BookJournal(Path(tmp) / "book.pbkj")
+        journal.save(book)
+        current, total_ms, written = book, 0.0, 0
+        for i in range(args.edits):
+            current = edit_one_element(current, i % args.pages)
+            start = time.perf_counter()
+            written += journal.save(current)
+            total_ms += (time.perf_counter() - start) * 1000
+        load_ms, reloaded = best_of(lambda: BookJournal(journal.path).load(), 1)
+        if reloaded != current:
+            log("❌ Journal replay did not reproduce the latest book", Colors.RED)
+            sys.exit(1)
+        log(f"Journal: {args.edits} autosaves, {total_ms / args.edits:.2f} ms and "
+            f"{written / args.edits:.0f} bytes each on average; replay {load_ms:.1f} ms "
+            f"({os.path.getsize(journal.path) / 1024:.1f} KB on disk)", Colors.GREEN)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"pages": args.pages, "msgpack": HAS_MSGPACK,
+                       "formats": [{"format": r[0], "bytes": r[1], "save_ms": round(r[2], 2),
+                                    "load_ms": round(r[3], 2)} for r in rows],
+                       "patch": {"bytes": len(patch_bytes), "diff_ms": round(diff_ms, 3),
+                                 "encode_ms": round(encode_ms, 3), "apply_ms": round(apply_ms, 3)}}, f, indent=2)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary photobook format tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    encode = sub.add_parser("encode", help="JSON (or .pbk journal) -> .pbk document")
+    encode.add_argument("input")
+    encode.add_argument("output")
+    encode.add_argument("--no-compress", action="store_true", help="Skip zlib on the body")
+
+    decode = sub.add_parser("decode", help=".pbk document or journal -> exportAsJSON-style JSON")
+    decode.add_argument("input")
+    decode.add_argument("output")
+
+    diff = sub.add_parser("diff", help="Write the patch that turns OLD into NEW")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--output", required=True)
+
+    apply = sub.add_parser("apply", help="Apply a patch to a book")
+    apply.add_argument("book")
+    apply.add_argument("patch")
+    apply.add_argument("--output", required=True, help="Output .json or .pbk")
+
+    bench = sub.add_parser("benchmark", help="Compare load/save against JSON on a synthetic book")
+    bench.add_argument("--pages", type=int, default=200, help="Pages (default: 200)")
+    bench.add_argument("--photos", type=int, default=300, help="Distinct photo ids (default: 300)")
+    bench.add_argument("--repeat", type=int, default=5, help="Runs per measurement, best is kept (default: 5)")
+    bench.add_argument("--edits", type=int, default=50, help="Autosaves in the journal test (default: 50)")
+    bench.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args)
+    elif args.command == "encode":
+        size = save_book(load_book(args.input), args.output, compress=not args.no_compress)
+        log(f"✅ {args.output}: {size / 1024:.1f} KB (from {os.path.getsize(args.input) / 1024:.1f} KB)", Colors.GREEN)
+    elif args.command == "decode":
+        Path(args.output).write_text(to_json(load_book(args.input)), encoding="utf-8")
+        log(f"✅ {args.output}", Colors.GREEN)
+    elif args.command == "diff":
+        data = encode_patch(make_patch(load_book(args.old), load_book(args.new)))
+        Path(args.output).write_bytes(data)
+        log(f"✅ {args.output}: {len(data)} bytes", Colors.GREEN)
+    elif args.command == "apply":
+        book = apply_patch(load_book(args.book), decode_patch(Path(args.patch).read_bytes()))
+        if args.output.endswith(".json"):
+            Path(args.output).write_text(to_json(book), encoding="utf-8")
+        else:
+            save_book(book, args.output)
+        log(f"✅ {args.output}", Colors.GREEN)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -0,0 +1,7 @@
+"""
+Shared Python tooling for the Midas benchmark and pipeline scripts
+
+The hyphenated scripts in scripts/ are the command-line entry points; the
+modules in this package hold the logic they have in common so each script
+stays a thin argparse wrapper.
+"""
@@ -0,0 +1,157 @@
+"""
+Token usage and cost accounting per deployment and per job
+
+Every completions call is appended to a JSONL ledger with its prompt,
+completion and (estimated) image tokens and the cost from a configurable
+price table. The ledger survives restarts, so monthly totals and the
+remaining budget can be read back by any script.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PRICES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model-prices.json")
+DEFAULT_LEDGER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "usage-ledger.jsonl")
+
+
+class PriceTable:
+    """Per-deployment input/output prices per 1M tokens"""
+
+    def __init__(self, models: Dict[str, Dict[str, float]], default: Optional[Dict[str, float]] = None,
+                 currency: str = "USD"):
+        self.models = models
+        self.default = default or {"input": 0.0, "output": 0.0}
+        self.currency = currency
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PRICES_PATH) -> "PriceTable":
+        with open(path, "r") as f:
+            config = json.load(f)
+        return cls(config.get("models", {}), config.get("default"), config.get("currency", "USD"))
+
+    def rates(self, deployment: str) -> Dict[str, float]:
+        return self.models.get(deployment, self.default)
+
+    def cost(self, deployment: str, prompt_tokens: int, completion_tokens: int) -> float:
+        rates = self.rates(deployment)
+        return (prompt_tokens * rates["input"] + completion_tokens * rates["output"]) / 1_000_000
+
+    def blended_rate(self, deployment: str, output_share: float = 0.25) -> float:
+        """Cost per token assuming a typical input/output mix, for ranking models"""
+        rates = self.rates(deployment)
+        return (rates["input"] * (1 - output_share) + rates["output"] * output_share) / 1_000_000
+
+
+def estimate_image_tokens(width: int, height: int, detail: Optional[str] = "high") -> int:
+    """
+    Approximate prompt tokens for one image (OpenAI tiling rule).
+
+    The API only reports image tokens folded into prompt_tokens, so this is
+    what the ledger uses to split them out. Other vendors tokenize images
+    differently; treat the number as an estimate for them.
+    """
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+class UsageLedger:
+    """
+    Append-only usage ledger, thread-safe, optionally persisted as JSONL.
+
+    Only entries from the current calendar month are loaded, since that is
+    the period the quota applies to.
+    """
+
+    def __init__(self, prices: PriceTable, path: Optional[str] = DEFAULT_LEDGER_PATH):
+        self.prices = prices
+        self.path = path
+        self.entries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load_current_month()
+
+    def _load_current_month(self):
+        month = datetime.now().strftime("%Y-%m")
+        with open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if entry.get("timestamp", "").startswith(month):
+                    self.entries.append(entry)
+
+    def record(
+        self,
+        deployment: str,
+        usage: Optional[Dict[str, int]],
+        job_id: str = "default",
+        image_tokens: int = 0,
+        images: int = 0,
+        success: bool = True,
+    ) -> Dict[str, Any]:
+        """Record one call; usage is the dict from midas.extract_usage"""
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "epoch": time.time(),
+            "deployment": deployment,
+            "job_id": job_id,
+            "success": success,
+            "images": images,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            # Image tokens are part of prompt_tokens; never claim more than were billed
+            "image_tokens": min(image_tokens, prompt_tokens) if prompt_tokens else image_tokens,
+            "total_tokens": usage.get("total_tokens") or prompt_tokens + completion_tokens,
+            "cost": self.prices.cost(deployment, prompt_tokens, completion_tokens),
+        }
+        with self._lock:
+            self.entries.append(entry)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def totals(self, by: str = "deployment") -> Dict[str, Dict[str, float]]:
+        """Sum calls, tokens and cost grouped by 'deployment' or 'job_id'"""
+        groups: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            entries = list(self.entries)
+        for entry in entries:
+            group = groups.setdefault(
+                entry[by],
+                {"calls": 0, "images": 0, "prompt_tokens": 0, "completion_tokens": 0, "image_tokens": 0,
+                 "total_tokens": 0, "cost": 0.0},
+            )
+            group["calls"] += 1
+            for key in ("images", "prompt_tokens", "completion_tokens", "image_tokens", "total_tokens", "cost"):
+                group[key] += entry[key]
+        return groups
+
+    def spent(self) -> float:
+        with self._lock:
+            return sum(entry["cost"] for entry in self.entries)
+
+    def window(self, seconds: float = 60.0) -> Dict[str, float]:
+        """Tokens, cost and the oldest timestamp within the trailing window"""
+        cutoff = time.time() - seconds
+        with self._lock:
+            recent = [e for e in self.entries if e["epoch"] >= cutoff]
+        return {
+            "tokens": sum(e["total_tokens"] for e in recent),
+            "cost": sum(e["cost"] for e in recent),
+            "oldest": min((e["epoch"] for e in recent), default=None),
+        }
@@ -0,0 +1,556 @@
+"""
+Compact binary photobook format with delta patches
+
+A .pbk frame is a small header followed by a MessagePack body. Every dict key
+and every string value that occurs more than once (photo ids, sticker URLs,
+fonts, colors, element types) is stored once in a string table and referenced
+by index, so a 200-page book shrinks to a fraction of exportAsJSON's output.
+
+Patches record only the pages and elements that changed between two versions
+of a book, and a journal file appends them after a base document so autosave
+writes kilobytes instead of re-serializing the whole book.
+
+The msgpack package is used when installed; otherwise a pure-Python codec
+reads and writes the same wire format.
+"""
+
+import copy
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+MAGIC = b"PBK\x01"
+VERSION = 1
+
+KIND_DOCUMENT = 0
+KIND_PATCH = 1
+
+FLAG_ZLIB = 0x01
+
+# MessagePack extension type for string-table references
+EXT_STRING_REF = 1
+
+HEADER = struct.Struct(">4sBBB")
+FRAME_LENGTH = struct.Struct(">I")
+
+
+class PatchConflict(ValueError):
+    """A patch was applied to a different version of the book than it was made from"""
+
+
+class ExtRef:
+    """String-table reference used by the pure-Python codec"""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int):
+        self.index = index
+
+
+# -- pure-Python MessagePack --
+
+def _pack(value: Any, out: List[bytes]):
+    if value is None:
+        out.append(b"\xc0")
+    elif value is True:
+        out.append(b"\xc3")
+    elif value is False:
+        out.append(b"\xc2")
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(struct.pack("B", value))
+        elif -32 <= value < 0:
+            out.append(struct.pack("b", value))
+        elif 0 <= value <= 0xFF:
+            out.append(struct.pack(">BB", 0xCC, value))
+        elif 0 <= value <= 0xFFFF:
+            out.append(struct.pack(">BH", 0xCD, value))
+        elif 0 <= value <= 0xFFFFFFFF:
+            out.append(struct.pack(">BI", 0xCE, value))
+        elif value > 0:
+            out.append(struct.pack(">BQ", 0xCF, value))
+        elif value >= -0x80:
+            out.append(struct.pack(">Bb", 0xD0, value))
+        elif value >= -0x8000:
+            out.append(struct.pack(">Bh", 0xD1, value))
+        elif value >= -0x80000000:
+            out.append(struct.pack(">Bi", 0xD2, value))
+        else:
+            out.append(struct.pack(">Bq", 0xD3, value))
+    elif isinstance(value, float):
+        out.append(struct.pack(">Bd", 0xCB, value))
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        size = len(data)
+        if size < 32:
+            out.append(struct.pack("B", 0xA0 | size))
+        elif size <= 0xFF:
+            out.append(struct.pack(">BB", 0xD9, size))
+        elif size <= 0xFFFF:
+            out.append(struct.pack(">BH", 0xDA, size))
+        else:
+            out.append(struct.pack(">BI", 0xDB, size))
+        out.append(data)
+    elif isinstance(value, ExtRef):
+        data = _ref_bytes(value.index)
+        out.append(struct.pack(">Bb", {1: 0xD4, 2: 0xD5, 4: 0xD6}[len(data)], EXT_STRING_REF))
+        out.append(data)
+    elif isinstance(value, (list, tuple)):
+        size = len(value)
+        if size < 16:
+            out.append(struct.pack("B", 0x90 | size))
+        elif size <= 0xFFFF:
+            out.append(struct.pack(">BH", 0xDC, size))
+        else:
+            out.append(struct.pack(">BI", 0xDD, size))
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, dict):
+        size = len(value)
+        if size < 16:
+            out.append(struct.pack("B", 0x80 | size))
+        elif size <= 0xFFFF:
+            out.append(struct.pack(">BH", 0xDE, size))
+        else:
+            out.append(struct.pack(">BI", 0xDF, size))
+        for key, item in value.items():
+            _pack(key, out)
+            _pack(item, out)
+    elif isinstance(value, (bytes, bytearray)):
+        size = len(value)
+        out.append(struct.pack(">BB", 0xC4, size) if size <= 0xFF else
+                   struct.pack(">BH", 0xC5, size) if size <= 0xFFFF else struct.pack(">BI", 0xC6, size))
+        out.append(bytes(value))
+    else:
+        raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+class _Reader:
+    """Pure-Python MessagePack decoder over a bytes buffer"""
+
+    def __init__(self, data: bytes, table: Optional[List[str]] = None):
+        self.data = data
+        self.pos = 0
+        self.table = table
+
+    def take(self, count: int) -> bytes:
+        chunk = self.data[self.pos:self.pos + count]
+        self.pos += count
+        return chunk
+
+    def unpack(self, fmt: str) -> Any:
+        size = struct.calcsize(fmt)
+        value = struct.unpack_from(fmt, self.data, self.pos)[0]
+        self.pos += size
+        return value
+
+    def read(self) -> Any:
+        byte = self.data[self.pos]
+        self.pos += 1
+        if byte < 0x80:
+            return byte
+        if byte >= 0xE0:
+            return byte - 0x100
+        if 0xA0 <= byte <= 0xBF:
+            return self.take(byte & 0x1F).decode("utf-8")
+        if 0x90 <= byte <= 0x9F:
+            return [self.read() for _ in range(byte & 0x0F)]
+        if 0x80 <= byte <= 0x8F:
+            return self.read_map(byte & 0x0F)
+        if byte == 0xC0:
+            return None
+        if byte == 0xC2:
+            return False
+        if byte == 0xC3:
+            return True
+        if byte in (0xC4, 0xC5, 0xC6):
+            return self.take(self.unpack({0xC4: ">B", 0xC5: ">H", 0xC6: ">I"}[byte]))
+        if byte == 0xCA:
+            return self.unpack(">f")
+        if byte == 0xCB:
+            return self.unpack(">d")
+        if 0xCC <= byte <= 0xD3:
+            return self.unpack({0xCC: ">B", 0xCD: ">H", 0xCE: ">I", 0xCF: ">Q",
+                                0xD0: ">b", 0xD1: ">h", 0xD2: ">i", 0xD3: ">q"}[byte])
+        if byte in (0xD4, 0xD5, 0xD6, 0xD7, 0xD8, 0xC7, 0xC8, 0xC9):
+            if byte >= 0xD4:
+                size = {0xD4: 1, 0xD5: 2, 0xD6: 4, 0xD7: 8, 0xD8: 16}[byte]
+            else:
+                size = self.unpack({0xC7: ">B", 0xC8: ">H", 0xC9: ">I"}[byte])
+            code = self.unpack(">b")
+            return _ext_hook(code, self.take(size), self.table)
+        if byte in (0xD9, 0xDA, 0xDB):
+            return self.take(self.unpack({0xD9: ">B", 0xDA: ">H", 0xDB: ">I"}[byte])).decode("utf-8")
+        if byte in (0xDC, 0xDD):
+            return [self.read() for _ in range(self.unpack(">H" if byte == 0xDC else ">I"))]
+        if byte in (0xDE, 0xDF):
+            return self.read_map(self.unpack(">H" if byte == 0xDE else ">I"))
+        raise ValueError(f"invalid MessagePack byte 0x{byte:02x} at offset {self.pos - 1}")
+
+    def read_map(self, size: int) -> Dict[Any, Any]:
+        result = {}
+        table = self.table
+        for _ in range(size):
+            key = self.read()
+            result[table[key] if table is not None else key] = self.read()
+        return result
+
+
+def _ref_bytes(index: int) -> bytes:
+    if index <= 0xFF:
+        return struct.pack(">B", index)
+    if index <= 0xFFFF:
+        return struct.pack(">H", index)
+    return struct.pack(">I", index)
+
+
+def _ext_hook(code: int, data: bytes, table: Optional[List[str]] = None) -> Any:
+    if code != EXT_STRING_REF:
+        raise ValueError(f"unknown extension type {code}")
+    index = int.from_bytes(data, "big")
+    return table[index] if table is not None else ExtRef(index)
+
+
+def pack(value: Any) -> bytes:
+    """MessagePack-encode a value, using msgpack when it is installed"""
+    if HAS_MSGPACK:
+        return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+    out: List[bytes] = []
+    _pack(value, out)
+    return b"".join(out)
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, ExtRef):
+        return msgpack.ExtType(EXT_STRING_REF, _ref_bytes(value.index))
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+# -- string interning --
+
+def _count_strings(value: Any, counts: Dict[str, int], keys: Dict[str, None]):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            keys.setdefault(key)
+            _count_strings(item, counts, keys)
+    elif isinstance(value, list):
+        for item in value:
+            _count_strings(item, counts, keys)
+    elif isinstance(value, str):
+        counts[value] = counts.get(value, 0) + 1
+
+
+def _intern(value: Any, index: Dict[str, int]) -> Any:
+    if isinstance(value, dict):
+        return {index[key]: _intern(item, index) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_intern(item, index) for item in value]
+    if isinstance(value, str) and value in index:
+        return ExtRef(index[value])
+    return value
+
+
+def intern_strings(value: Any) -> Tuple[List[str], Any]:
+    """(string table, value with keys and repeated strings replaced by indices)"""
+    counts: Dict[str, int] = {}
+    keys: Dict[str, None] = {}
+    _count_strings(value, counts, keys)
+    table = list(keys)
+    index = {s: i for i, s in enumerate(table)}
+    for text, count in counts.items():
+        if count > 1 and text not in index:
+            index[text] = len(table)
+            table.append(text)
+    return table, _intern(value, index)
+
+
+# -- frames --
+
+def encode_frame(value: Any, kind: int = KIND_DOCUMENT, compress: bool = True) -> bytes:
+    """Header + (optionally zlib-compressed) body: MessagePack string table, then the value"""
+    table, interned = intern_strings(value)
+    body = pack(table) + pack(interned)
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 6)
+        flags |= FLAG_ZLIB
+    return HEADER.pack(MAGIC, VERSION, kind, flags) + body
+
+
+def decode_frame(data: bytes) -> Tuple[int, Any]:
+    """(kind, value) from an encoded frame"""
+    magic, version, kind, flags = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a binary photobook frame")
+    if version > VERSION:
+        raise ValueError(f"frame version {version} is newer than this reader ({VERSION})")
+    body = data[HEADER.size:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    if HAS_MSGPACK:
+        # Resolve keys and string references while decoding instead of in a second pass
+        table: List[str] = []
+        unpacker = msgpack.Unpacker(
+            raw=False, strict_map_key=False, max_buffer_size=len(body) + 1,
+            ext_hook=lambda code, raw: _ext_hook(code, raw, table),
+            object_pairs_hook=lambda pairs: {table[k]: v for k, v in pairs} if table else dict(pairs))
+        unpacker.feed(body)
+        table.extend(unpacker.unpack())
+        return kind, unpacker.unpack()
+    reader = _Reader(body)
+    reader.table = reader.read()
+    return kind, reader.read()
+
+
+def encode_book(book: Dict[str, Any], compress: bool = True) -> bytes:
+    return encode_frame(book, KIND_DOCUMENT, compress)
+
+
+def decode_book(data: bytes) -> Dict[str, Any]:
+    kind, book = decode_frame(data)
+    if kind != KIND_DOCUMENT:
+        raise ValueError("frame is a patch, not a document")
+    return book
+
+
+def save_book(book: Dict[str, Any], path: Union[str, Path], compress: bool = True) -> int:
+    """Write a single-document .pbk file; returns its size"""
+    data = encode_book(book, compress)
+    Path(path).write_bytes(data)
+    return len(data)
+
+
+def load_book(path: Union[str, Path]) -> Dict[str, Any]:
+    """Load a .pbk document or journal, or an exportAsJSON file"""
+    data = Path(path).read_bytes()
+    if data[:4] == MAGIC:
+        return decode_book(data)
+    if data[4:8] == MAGIC:
+        return BookJournal(path).load()
+    return json.loads(data.decode("utf-8"))
+
+
+def to_json(book: Dict[str, Any]) -> str:
+    """Same layout as exportService.exportAsJSON (JSON.stringify with 2-space indent)"""
+    return json.dumps(book, indent=2, ensure_ascii=False)
+
+
+# -- deltas --
+
+def _index_by_id(items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {item["id"]: item for item in items}
+
+
+def make_patch(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Record what changed from old to new, at page and element granularity
+
+    Unchanged pages are skipped with a single deep equality check each, so the
+    cost is dominated by the pages that actually changed.
+    """
+    patch: Dict[str, Any] = {"base": {"id": old.get("id"), "updatedAt": old.get("updatedAt")}}
+    fields = {k: v for k, v in new.items() if k != "pages" and old.get(k) != v}
+    removed_fields = [k for k in old if k != "pages" and k not in new]
+    if fields:
+        patch["set"] = fields
+    if removed_fields:
+        patch["unset"] = removed_fields
+
+    old_pages = _index_by_id(old["pages"])
+    new_order = [p["id"] for p in new["pages"]]
+    if new_order != [p["id"] for p in old["pages"]]:
+        patch["pageOrder"] = new_order
+    removed = [page_id for page_id in old_pages if page_id not in set(new_order)]
+    if removed:
+        patch["removePages"] = removed
+
+    pages: Dict[str, Any] = {}
+    for page in new["pages"]:
+        before = old_pages.get(page["id"])
+        if before is None:
+            pages[page["id"]] = {"add": page}
+        elif before != page:
+            pages[page["id"]] = _page_patch(before, page)
+    if pages:
+        patch["pages"] = pages
+    return patch
+
+
+def _page_patch(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    fields = {k: v for k, v in new.items() if k != "elements" and old.get(k) != v}
+    removed_fields = [k for k in old if k != "elements" and k not in new]
+    if fields:
+        result["set"] = fields
+    if removed_fields:
+        result["unset"] = removed_fields
+
+    old_elements = _index_by_id(old.get("elements", []))
+    new_elements = new.get("elements", [])
+    order = [e["id"] for e in new_elements]
+    if order != [e["id"] for e in old.get("elements", [])]:
+        result["order"] = order
+    upserts = {e["id"]: e for e in new_elements if old_elements.get(e["id"]) != e}
+    if upserts:
+        result["upsert"] = upserts
+    removed = [element_id for element_id in old_elements if element_id not in set(order)]
+    if removed:
+        result["remove"] = removed
+    return result
+
+
+def patch_is_empty(patch: Dict[str, Any]) -> bool:
+    return set(patch) <= {"base"}
+
+
+def apply_patch(book: Dict[str, Any], patch: Dict[str, Any], check_base: bool = True) -> Dict[str, Any]:
+    """
+    Return a new book with the patch applied; untouched pages are shared, not copied
+
+    Raises PatchConflict when the book is not the version the patch was made from.
+    """
+    base = patch.get("base", {})
+    if check_base and (base.get("id") != book.get("id") or base.get("updatedAt") != book.get("updatedAt")):
+        raise PatchConflict(f"patch was made against {base}, book is "
+                            f"{{'id': {book.get('id')!r}, 'updatedAt': {book.get('updatedAt')!r}}}")
+
+    result = {k: v for k, v in book.items() if k not in patch.get("unset", [])}
+    result.update(patch.get("set", {}))
+    pages = _index_by_id(book["pages"])
+    for page_id in patch.get("removePages", []):
+        pages.pop(page_id, None)
+    for page_id, change in patch.get("pages", {}).items():
+        if "add" in change:
+            pages[page_id] = change["add"]
+        else:
+            pages[page_id] = _apply_page_patch(pages[page_id], change)
+    order = patch.get("pageOrder") or [p["id"] for p in book["pages"] if p["id"] in pages]
+    order += [page_id for page_id in pages if page_id not in set(order)]
+    result["pages"] = [pages[page_id] for page_id in order]
+    return result
+
+
+def _apply_page_patch(page: Dict[str, Any], change: Dict[str, Any]) -> Dict[str, Any]:
+    result = {k: v for k, v in page.items() if k not in change.get("unset", [])}
+    result.update(change.get("set", {}))
+    elements = _index_by_id(page.get("elements", []))
+    for element_id in change.get("remove", []):
+        elements.pop(element_id, None)
+    elements.update(change.get("upsert", {}))
+    order = change.get("order") or [e["id"] for e in page.get("elements", []) if e["id"] in elements]
+    order += [element_id for element_id in elements if element_id not in set(order)]
+    result["elements"] = [elements[element_id] for element_id in order]
+    return result
+
+
+def encode_patch(patch: Dict[str, Any]) -> bytes:
+    """Patches are small, so they skip zlib"""
+    return encode_frame(patch, KIND_PATCH, compress=False)
+
+
+def decode_patch(data: bytes) -> Dict[str, Any]:
+    kind, patch = decode_frame(data)
+    if kind != KIND_PATCH:
+        raise ValueError("frame is a document, not a patch")
+    return patch
+
+
+# -- journal --
+
+class BookJournal:
+    """
+    Append-only autosave file: a base document frame followed by patch frames
+
+    Each save appends only the delta from the previous save. Once the patches
+    outgrow compact_ratio x the base document, the next save rewrites the file
+    as a single fresh document.
+
+    The journal diffs against its own snapshot of the last saved book, so
+    callers may keep editing the dict they saved (or loaded) in place.
+    """
+
+    def __init__(self, path: Union[str, Path], compact_ratio: float = 0.5, fsync: bool = False):
+        self.path = Path(path)
+        self.compact_ratio = compact_ratio
+        self.fsync = fsync
+        self.book: Optional[Dict[str, Any]] = None
+        self.base_bytes = 0
+        self.patch_bytes = 0
+
+    def frames(self) -> Iterator[bytes]:
+        with open(self.path, "rb") as f:
+            while True:
+                prefix = f.read(FRAME_LENGTH.size)
+                if len(prefix) < FRAME_LENGTH.size:
+                    return
+                (length,) = FRAME_LENGTH.unpack(prefix)
+                frame = f.read(length)
+                if len(frame) < length:
+                    # Torn write from a crash mid-append: ignore the partial frame
+                    return
+                yield frame
+
+    def load(self) -> Dict[str, Any]:
+        """Rebuild the latest book by replaying every patch onto the base"""
+        self.book, self.base_bytes, self.patch_bytes = None, 0, 0
+        for frame in self.frames():
+            kind, value = decode_frame(frame)
+            if kind == KIND_DOCUMENT:
+                self.book, self.base_bytes, self.patch_bytes = value, len(frame), 0
+            elif self.book is None:
+                raise ValueError(f"{self.path}: patch frame before any document")
+            else:
+                self.book = apply_patch(self.book, value)
+                self.patch_bytes += len(frame)
+        if self.book is None:
+            raise ValueError(f"{self.path}: journal has no document")
+        return copy.deepcopy(self.book)
+
+    def _append(self, frame: bytes, mode: str = "ab"):
+        with open(self.path, mode) as f:
+            f.write(FRAME_LENGTH.pack(len(frame)) + frame)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compact(self, book: Optional[Dict[str, Any]] = None) -> int:
+        """Rewrite the journal as one document frame; returns bytes written"""
+        book = book if book is not None else self.book
+        frame = encode_book(book)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        self.path, original = tmp, self.path
+        try:
+            self._append(frame, "wb")
+        finally:
+            self.path = original
+        os.replace(tmp, self.path)
+        # The snapshot is decoded from what was written, never the caller's dict
+        self.book, self.base_bytes, self.patch_bytes = decode_book(frame), len(frame), 0
+        return len(frame) + FRAME_LENGTH.size
+
+    def save(self, book: Dict[str, Any]) -> int:
+        """Persist the book, appending only what changed; returns bytes written"""
+        if self.book is None:
+            if self.path.exists():
+                self.load()
+            else:
+                return self.compact(book)
+        patch = make_patch(self.book, book)
+        if patch_is_empty(patch):
+            return 0
+        frame = encode_patch(patch)
+        if self.patch_bytes + len(frame) > self.base_bytes * self.compact_ratio:
+            return self.compact(book)
+        self._append(frame)
+        self.book = apply_patch(self.book, decode_patch(frame))
+        self.patch_bytes += len(frame)
+        return len(frame) + FRAME_LENGTH.size
@@ -0,0 +1,43 @@
+"""
+Colored console output and argument types shared by the command-line scripts
+"""
+
+import argparse
+from typing import List
+
+
+# ANSI color codes
+class Colors:
+    RESET = "\033[0m"
+    RED = "\033[31m"
+    GREEN = "\033[32m"
+    YELLOW = "\033[33m"
+    BLUE = "\033[34m"
+    MAGENTA = "\033[35m"
+    CYAN = "\033[36m"
+    GRAY = "\033[90m"
+
+
+def log(message: str, color: str = Colors.RESET):
+    """Print colored message"""
+    print(f"{color}{message}{Colors.RESET}")
+
+
+def log_section(title: str):
+    """Print section header"""
+    print("\n" + "=" * 80)
+    log(title, Colors.CYAN)
+    print("=" * 80 + "\n")
+
+
+def positive_int(text: str) -> int:
+    """argparse type for counts that must be at least 1 (--pack-size)"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def positive_ints(text: str) -> List[int]:
+    """argparse type for comma-separated counts of at least 1 (--pack-sizes 1,4,8)"""
+    return [positive_int(part) for part in text.split(",") if part.strip()]
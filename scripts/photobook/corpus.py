@@ -0,0 +1,299 @@
+"""
+Deterministic synthetic image corpus for benchmarks
+
+Every image is a pure function of (seed, index): the same seed produces the
+same specs on any machine, and the same pixels wherever the Pillow build
+(and so its codecs and embedded font) is the same, so preprocessing, dedup
+and vision throughput numbers are comparable across runs. Images vary in resolution,
+aspect ratio, container format, EXIF orientation, capture time/GPS, text
+overlay, noise and blur, and the manifest records the ground truth for
+each of those.
+"""
+
+import hashlib
+import io
+import json
+import os
+import random
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageFont
+
+FORMATS = {"jpeg": ".jpg", "png": ".png", "webp": ".webp"}
+FORMAT_WEIGHTS = {"jpeg": 0.7, "png": 0.15, "webp": 0.15}
+
+# (width, height) ratios seen in phone and camera uploads
+ASPECT_RATIOS = [(4, 3), (3, 2), (16, 9), (1, 1), (3, 4), (2, 3), (9, 16), (21, 9)]
+
+# Long-edge sizes in px, weighted toward common phone output
+LONG_EDGES = [640, 1024, 1600, 2048, 3024, 4032]
+LONG_EDGE_WEIGHTS = [0.1, 0.15, 0.2, 0.2, 0.2, 0.15]
+
+# EXIF orientation -> transpose that turns the upright image into stored pixels
+ORIENTATION_STORE = {
+    1: None,
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_90,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_270,
+}
+
+WORDS = [
+    "beach", "sunset", "mountain", "harbor", "market", "temple", "forest", "river", "bridge",
+    "castle", "desert", "island", "canyon", "village", "summit", "glacier", "valley", "lagoon",
+    "festival", "station", "garden", "museum", "lighthouse", "vineyard",
+]
+
+PALETTE = [
+    "#FF6B6B", "#4ECDC4", "#45B7D1", "#FFA07A", "#98D8C8", "#F7DC6F", "#BB8FCE", "#2E4057",
+    "#E76F51", "#264653", "#E9C46A", "#8AB17D",
+]
+
+CORPUS_START = datetime(2024, 1, 1, 8, 0, 0)
+
+# EXIF tag ids
+TAG_ORIENTATION = 0x0112
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+
+
+def corpus_font(size: int) -> ImageFont.FreeTypeFont:
+    """Pillow's embedded font, so text pixels do not depend on which fonts are installed"""
+    return ImageFont.load_default(size)
+
+
+def noise_tile(rng: random.Random, sigma: float, size: Tuple[int, int] = (128, 128)) -> Image.Image:
+    """Gaussian noise around mid-grey from rng (effect_noise is seeded from libc rand)"""
+    tile = Image.new("L", size)
+    tile.putdata([max(0, min(255, round(rng.gauss(128, sigma)))) for _ in range(size[0] * size[1])])
+    return tile
+
+
+def image_spec(seed: int, index: int) -> Dict[str, Any]:
+    """Everything needed to render image #index, drawn from its own RNG stream"""
+    rng = random.Random(f"{seed}:{index}")
+
+    ratio_w, ratio_h = rng.choice(ASPECT_RATIOS)
+    long_edge = rng.choices(LONG_EDGES, LONG_EDGE_WEIGHTS)[0]
+    if ratio_w >= ratio_h:
+        width, height = long_edge, max(1, round(long_edge * ratio_h / ratio_w))
+    else:
+        width, height = max(1, round(long_edge * ratio_w / ratio_h)), long_edge
+
+    fmt = rng.choices(list(FORMAT_WEIGHTS), list(FORMAT_WEIGHTS.values()))[0]
+    has_text = rng.random() < 0.6
+    has_gps = rng.random() < 0.7
+
+    return {
+        "index": index,
+        "file": f"synthetic-{index:06d}{FORMATS[fmt]}",
+        "format": fmt,
+        "width": width,
+        "height": height,
+        "aspect_ratio": f"{ratio_w}:{ratio_h}",
+        "orientation": rng.choice(list(ORIENTATION_STORE)) if fmt != "png" or rng.random() < 0.5 else 1,
+        "quality": rng.randint(70, 95),
+        "background": [rng.choice(PALETTE), rng.choice(PALETTE)],
+        "shapes": [
+            {
+                "kind": rng.choice(["rectangle", "ellipse"]),
+                "color": rng.choice(PALETTE),
+                "box": sorted(rng.sample(range(0, 1000), 2)) + sorted(rng.sample(range(0, 1000), 2)),
+            }
+            for _ in range(rng.randint(1, 6))
+        ],
+        "text": " ".join(rng.sample(WORDS, rng.randint(1, 3))).upper() if has_text else None,
+        "noise_sigma": rng.choice([0, 0, 4, 10, 25]),
+        "blur_radius": rng.choice([0, 0, 0, 1.5, 4.0]),
+        "captured_at": (CORPUS_START + timedelta(minutes=index * 7 + rng.randint(0, 6))).strftime(
+            "%Y:%m:%d %H:%M:%S"
+        ),
+        "gps": [round(rng.uniform(-60, 70), 5), round(rng.uniform(-180, 180), 5)] if has_gps else None,
+    }
+
+
+def render(spec: Dict[str, Any]) -> Image.Image:
+    """Draw the upright (display-orientation) image for a spec"""
+    width, height = spec["width"], spec["height"]
+    top, bottom = (Image.new("RGB", (1, 1), c).getpixel((0, 0)) for c in spec["background"])
+
+    # Vertical gradient built at 1px wide, then stretched
+    gradient = Image.new("RGB", (1, height))
+    for y in range(height):
+        t = y / max(1, height - 1)
+        gradient.putpixel((0, y), tuple(round(a + (b - a) * t) for a, b in zip(top, bottom)))
+    image = gradient.resize((width, height))
+
+    draw = ImageDraw.Draw(image)
+    for shape in spec["shapes"]:
+        x0, x1, y0, y1 = shape["box"]
+        box = (x0 * width // 1000, y0 * height // 1000, x1 * width // 1000, y1 * height // 1000)
+        if shape["kind"] == "rectangle":
+            draw.rectangle(box, fill=shape["color"], outline="#000000", width=max(1, width // 400))
+        else:
+            draw.ellipse(box, fill=shape["color"], outline="#000000", width=max(1, width // 400))
+
+    if spec["text"]:
+        font = corpus_font(max(12, min(width, height) // 10))
+        bbox = draw.textbbox((0, 0), spec["text"], font=font)
+        x = (width - (bbox[2] - bbox[0])) // 2
+        y = (height - (bbox[3] - bbox[1])) // 2
+        draw.rectangle((x - 10, y - 10 + bbox[1], x + bbox[2] - bbox[0] + 10, y + bbox[3] + 10), fill="#FFFFFF")
+        draw.text((x, y), spec["text"], fill="#111111", font=font)
+
+    if spec["blur_radius"]:
+        image = image.filter(ImageFilter.GaussianBlur(spec["blur_radius"]))
+
+    if spec["noise_sigma"]:
+        tile = noise_tile(random.Random(f"noise:{spec['index']}"), spec["noise_sigma"])
+        noise = Image.new("L", (width, height))
+        for ty in range(0, height, 128):
+            for tx in range(0, width, 128):
+                noise.paste(tile.rotate(90 * ((tx + ty) // 128 % 4)), (tx, ty))
+        image = ImageChops.add(image, Image.merge("RGB", (noise, noise, noise)), scale=1.0, offset=-128)
+
+    return image
+
+
+def _dms(value: float):
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 2)
+    return (degrees, minutes, seconds)
+
+
+def build_exif(spec: Dict[str, Any]) -> Image.Exif:
+    """Orientation, DateTimeOriginal and optional GPS for a spec"""
+    exif = Image.Exif()
+    exif[TAG_ORIENTATION] = spec["orientation"]
+    exif.get_ifd(TAG_EXIF_IFD)[TAG_DATETIME_ORIGINAL] = spec["captured_at"]
+    if spec["gps"]:
+        lat, lon = spec["gps"]
+        gps = exif.get_ifd(TAG_GPS_IFD)
+        gps[1] = "N" if lat >= 0 else "S"
+        gps[2] = _dms(lat)
+        gps[3] = "E" if lon >= 0 else "W"
+        gps[4] = _dms(lon)
+    return exif
+
+
+def write_image(spec: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+    """Render, orient, encode and write one image; returns its manifest entry"""
+    image = render(spec)
+    transpose = ORIENTATION_STORE[spec["orientation"]]
+    stored = image.transpose(transpose) if transpose is not None else image
+
+    path = os.path.join(output_dir, spec["file"])
+    options: Dict[str, Any] = {"exif": build_exif(spec).tobytes()}
+    if spec["format"] in ("jpeg", "webp"):
+        options["quality"] = spec["quality"]
+    # Favour encode speed over size; the corpus is regenerated, not shipped
+    if spec["format"] == "webp":
+        options["method"] = 2
+    elif spec["format"] == "png":
+        options["compress_level"] = 1
+    stored.save(path, format=spec["format"].upper(), **options)
+
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+
+    return {
+        **spec,
+        "stored_width": stored.width,
+        "stored_height": stored.height,
+        "bytes": os.path.getsize(path),
+        "sha256": digest,
+    }
+
+
+def _write_chunk(args) -> List[Dict[str, Any]]:
+    seed, indexes, output_dir = args
+    return [write_image(image_spec(seed, index), output_dir) for index in indexes]
+
+
+def generate_corpus(
+    output_dir: str,
+    count: int,
+    seed: int = 42,
+    workers: Optional[int] = None,
+    chunk_size: int = 16,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Write count images plus manifest.json into output_dir using a process pool.
+
+    Work is split into index chunks so results do not depend on how many
+    workers ran or in which order they finished.
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    chunks = [
+        (seed, range(start, min(start + chunk_size, count)), output_dir) for start in range(0, count, chunk_size)
+    ]
+
+    entries: List[Dict[str, Any]] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk_entries in pool.map(_write_chunk, chunks):
+            entries.extend(chunk_entries)
+            if on_progress:
+                on_progress(len(entries), count)
+
+    manifest = {
+        "generator": "photobook.corpus",
+        "seed": seed,
+        "count": count,
+        "created_at": datetime.now().isoformat(),
+        "images": sorted(entries, key=lambda e: e["index"]),
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def synthetic_library(directory: Union[str, Path], count: int, seed: int = 42) -> None:
+    """
+    JPEGs with realistic headers: EXIF (orientation, capture time, GPS) spliced
+    in front of one pre-encoded body, so building 10k files does not need 10k encodes
+
+    Capture times come in events (bursts minutes apart, then a jump of hours
+    or days to somewhere else), and file names are out of capture order, as
+    after a multi-device import. Every file has distinct bytes.
+    """
+    rng = random.Random(seed)
+    body = io.BytesIO()
+    noise_tile(random.Random(f"body:{seed}"), 40, (480, 360)).convert("RGB").save(body, "JPEG", quality=85)
+    body = body.getvalue()[2:]  # drop SOI; the spliced file re-adds it ahead of APP1
+    clock = datetime(2023, 6, 1, 9, 0, 0)
+    place = (48.8566, 2.3522)
+    for index in range(count):
+        if index == 0 or rng.random() < 0.03:  # a new event: hours or days later, somewhere else
+            clock += timedelta(hours=rng.choice([5, 20, 48]))
+            place = (rng.uniform(-50, 60), rng.uniform(-170, 170))
+        clock += timedelta(seconds=rng.expovariate(1 / 120))
+        exif = Image.Exif()
+        exif[TAG_ORIENTATION] = rng.choice([1, 1, 1, 6, 8, 3])
+        exif.get_ifd(TAG_EXIF_IFD)[TAG_DATETIME_ORIGINAL] = clock.strftime("%Y:%m:%d %H:%M:%S")
+        if rng.random() < 0.8:
+            lat, lon = place[0] + rng.gauss(0, 0.01), place[1] + rng.gauss(0, 0.01)
+            gps = exif.get_ifd(TAG_GPS_IFD)
+            gps[1], gps[3] = ("N" if lat >= 0 else "S"), ("E" if lon >= 0 else "W")
+            gps[2] = (int(abs(lat)), int(abs(lat) * 60 % 60), round(abs(lat) * 3600 % 60, 2))
+            gps[4] = (int(abs(lon)), int(abs(lon) * 60 % 60), round(abs(lon) * 3600 % 60, 2))
+        app1 = exif.tobytes()
+        name = f"IMG_{rng.randrange(10 ** 8):08d}_{index}.jpg"
+        with open(Path(directory) / name, "wb") as f:
+            f.write(b"\xff\xd8\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + body)
+
+
+def load_manifest(corpus_dir: str) -> Dict[str, Any]:
+    """Read a corpus manifest written by generate_corpus"""
+    with open(os.path.join(corpus_dir, "manifest.json"), "r") as f:
+        return json.load(f)
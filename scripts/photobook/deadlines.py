@@ -0,0 +1,231 @@
+"""
+Job deadlines and adaptive per-deployment timeouts for completion calls
+
+test_model and test_vision_model wait a fixed 30 or 60 seconds on every
+call, however fast the deployment usually answers and however little of the
+job's time is left, so a few stalled calls set a batch's worst case.
+
+A Deadline is created once per job and passed to every call the job makes
+(post_completion's `deadline`). LatencyTracker keeps the recent latencies
+of each kind of call to each deployment (latency_key: a one-line text ping,
+a vision request and a streamed reply's time to first delta are not
+comparable): once it has enough of them, the read timeout is the
+observed p99 times `factor`, never below `min_read` and never above the
+caller's fixed timeout. Each read timeout in a row doubles it again, so a
+deployment that really slowed down gets longer timeouts instead of failing
+every call until its window catches up. Both timeouts are capped by what is
+left of the deadline, and a call is not sent at all once too little is left.
+
+Failed calls are classified (classify_error) so slow calls can be told
+apart from broken ones: "connect_timeout", "read_timeout", "deadline",
+"http", "network" or "invalid_response".
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple, Union
+
+import requests
+
+DEFAULT_LATENCY_PATH = Path.home() / ".cache" / "photobook" / "latency.json"
+# Version 1 files keyed latencies by deployment only
+LATENCY_VERSION = 2
+
+# Latencies kept per latency_key
+WINDOW = 200
+# Latencies needed before the observed p99 replaces the caller's timeout
+MIN_SAMPLES = 10
+PERCENTILE = 0.99
+TIMEOUT_FACTOR = 2.0
+MIN_READ_TIMEOUT = 5.0
+# Every deployment sits behind the same endpoint, so connecting does not depend on the model
+CONNECT_TIMEOUT = 5.0
+# Calls are not sent with less than this many seconds left
+MIN_CALL_SECONDS = 0.5
+
+# error_type values of calls cut short by a timeout or the deadline
+TIMEOUT_ERRORS = ("connect_timeout", "read_timeout", "deadline")
+
+
+def latency_key(deployment: str, kind: str = "text", stream: bool = False) -> str:
+    """
+    What LatencyTracker keys latencies by: deployment, kind of call and streaming
+
+    kind is "text" or "vision" (post_completion tells them apart by the
+    request), or "ping" for test-models.py's sample payloads. Streamed calls
+    record the time to the first delta, so they are kept apart too.
+    """
+    return f"{deployment} ({kind}, streamed)" if stream else f"{deployment} ({kind})"
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a job's deadline passes before or during a call"""
+
+
+class Deadline:
+    """
+    Absolute wall-clock deadline (time.time() seconds), or none
+
+    Wall-clock time so a deadline set when a job is submitted still holds
+    in the worker process that runs it.
+    """
+
+    def __init__(self, expires_at: Optional[float] = None, min_call: float = MIN_CALL_SECONDS):
+        self.expires_at = expires_at
+        self.min_call = min_call
+
+    @classmethod
+    def after(cls, seconds: Optional[float], min_call: float = MIN_CALL_SECONDS) -> "Deadline":
+        return cls(None if seconds is None else time.time() + seconds, min_call)
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return math.inf
+        return self.expires_at - time.time()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def exhausted(self) -> bool:
+        """Too little time left to send another call"""
+        return self.remaining() < self.min_call
+
+    def check(self, what: str = "Deadline"):
+        """Raise DeadlineExceeded once the deadline has passed"""
+        if self.expired():
+            raise DeadlineExceeded(f"{what} passed {-self.remaining():.1f}s ago")
+
+
+class LatencyTracker:
+    """
+    Recent successful-call latencies and read-timeout streaks per latency_key; thread-safe
+
+    With a path, latencies are loaded from and saved to one JSON file, so
+    short runs (test-models.py) start from what earlier runs observed.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        window: int = WINDOW,
+        min_samples: int = MIN_SAMPLES,
+        percentile: float = PERCENTILE,
+        factor: float = TIMEOUT_FACTOR,
+        min_read: float = MIN_READ_TIMEOUT,
+        connect: float = CONNECT_TIMEOUT,
+    ):
+        self.path = Path(path) if path else None
+        self.window = window
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.factor = factor
+        self.min_read = min_read
+        self.connect = connect
+        self.samples: Dict[str, Deque[float]] = {}
+        self.streaks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if self.path:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == LATENCY_VERSION:
+                    for key, values in data["latencies"].items():
+                        self.samples[key] = deque(values, maxlen=window)
+            except (OSError, ValueError, KeyError):
+                pass
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(key, deque(maxlen=self.window)).append(round(seconds, 3))
+            self.streaks.pop(key, None)
+
+    def timed_out(self, key: str):
+        with self._lock:
+            self.streaks[key] = self.streaks.get(key, 0) + 1
+
+    def quantile(self, key: str, q: Optional[float] = None) -> Optional[float]:
+        """Latency quantile (nearest rank), None until min_samples latencies are known"""
+        with self._lock:
+            values = sorted(self.samples.get(key, ()))
+        if len(values) < self.min_samples:
+            return None
+        q = self.percentile if q is None else q
+        return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+    def timeouts(self, key: str, default: float = 60, deadline: Optional[Deadline] = None) -> Tuple[float, float]:
+        """(connect, read) timeouts in seconds for the next call of this latency_key"""
+        p99 = self.quantile(key)
+        with self._lock:
+            backoff = 2 ** self.streaks.get(key, 0)
+        read = default if p99 is None else min(default, max(self.min_read, p99 * self.factor) * backoff)
+        return cap_timeouts((min(self.connect, read), read), deadline)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            counts = {key: len(values) for key, values in self.samples.items()}
+        result = {}
+        for key in sorted(counts):
+            connect, read = self.timeouts(key)
+            result[key] = {
+                "samples": counts[key],
+                "p50": self.quantile(key, 0.5),
+                "p99": self.quantile(key),
+                "connect_timeout": connect,
+                "read_timeout": read,
+            }
+        return result
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {key: list(values) for key, values in self.samples.items()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_suffix(".tmp")
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"version": LATENCY_VERSION, "latencies": data}, f, separators=(",", ":"))
+        os.replace(partial, self.path)
+
+
+def cap_timeouts(timeouts: Tuple[float, float], deadline: Optional[Deadline] = None) -> Tuple[float, float]:
+    """(connect, read) shortened to what is left of the deadline"""
+    if deadline is None:
+        return timeouts
+    remaining = max(0.0, deadline.remaining())
+    return min(timeouts[0], remaining), min(timeouts[1], remaining)
+
+
+def call_timeouts(
+    key: str,
+    default: float,
+    deadline: Optional[Deadline] = None,
+    latency: Optional[LatencyTracker] = None,
+) -> Tuple[float, float]:
+    """Timeouts for one call (key: latency_key): adaptive with a tracker, else `default`, capped by the deadline"""
+    if latency is not None:
+        return latency.timeouts(key, default, deadline)
+    return cap_timeouts((default, default), deadline)
+
+
+def classify_error(error: BaseException, deadline: Optional[Deadline] = None) -> str:
+    """error_type of a failed call; a timeout after the deadline passed counts as "deadline" """
+    if isinstance(error, DeadlineExceeded):
+        return "deadline"
+    timed_out = None
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        timed_out = "connect_timeout"
+    elif isinstance(error, requests.exceptions.ReadTimeout):
+        timed_out = "read_timeout"
+    elif isinstance(error, requests.exceptions.ConnectionError) and "Read timed out" in str(error):
+        # requests reports a read timeout while streaming the body as a ConnectionError
+        timed_out = "read_timeout"
+    if timed_out:
+        return "deadline" if deadline is not None and deadline.exhausted() else timed_out
+    if isinstance(error, requests.exceptions.RequestException):
+        return "network"
+    return "invalid_response"
@@ -0,0 +1,414 @@
+"""
+Photobook document model shared by the server-side PDF and raster exporters
+
+Mirrors the studio's Konva renderers (PageCanvas, PhotoElementRenderer,
+ShapeElementRenderer, TextElementRenderer) closely enough that exports match
+the editor: element boxes are percentages of the page, rotation is around the
+element's top-left corner, and photos use the same cover-fit crop.
+"""
+
+import base64
+import json
+import math
+import random
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import unquote
+
+from PIL import Image, ImageOps
+
+from .imaging import RASTER_EXTENSIONS
+
+# STUDIO_PAGE_DIMENSIONS from src/types/index.ts (pixels at 300 DPI)
+PAGE_DIMENSIONS = {
+    ("A4", "portrait"): (2480, 3508),
+    ("A4", "landscape"): (3508, 2480),
+    ("Square", "portrait"): (3000, 3000),
+    ("Square", "landscape"): (3000, 3000),
+}
+
+# Page pixel coordinates are defined at this resolution
+CANVAS_DPI = 300
+
+DEFAULT_TRANSFORM = {
+    "zoom": 1,
+    "fit": "cover",
+    "rotation": 0,
+    "flipHorizontal": False,
+    "flipVertical": False,
+    "panX": 0,
+    "panY": 0,
+}
+
+NAMED_COLORS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "gray": (128, 128, 128),
+    "grey": (128, 128, 128),
+    "orange": (255, 165, 0),
+    "purple": (128, 0, 128),
+    "pink": (255, 192, 203),
+}
+
+Color = Tuple[int, int, int, float]
+Box = Tuple[float, float, float, float]
+Primitive = Tuple[Any, ...]
+
+
+def load_photobook(path: Union[str, Path]) -> Dict[str, Any]:
+    """Read a photobook exported with exportService.exportAsJSON"""
+    with open(path, "r", encoding="utf-8") as f:
+        book = json.load(f)
+    if not isinstance(book.get("pages"), list):
+        raise ValueError(f"{path} is not an exported photobook (no pages array)")
+    return book
+
+
+def page_dimensions(config: Dict[str, Any]) -> Tuple[int, int]:
+    """Page size in 300 DPI pixels, same rules as getPageDimensions"""
+    if config.get("dimensions"):
+        return int(config["dimensions"]["width"]), int(config["dimensions"]["height"])
+    key = (config.get("pageSize", "A4"), config.get("orientation", "portrait"))
+    return PAGE_DIMENSIONS.get(key, PAGE_DIMENSIONS[("A4", "portrait")])
+
+
+def sorted_pages(book: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Pages in print order"""
+    return sorted(book["pages"], key=lambda p: p.get("pageNumber", 0))
+
+
+def sorted_elements(page: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Elements bottom to top; ties keep their array order like Konva"""
+    return sorted(page.get("elements", []), key=lambda e: e.get("zIndex", 0))
+
+
+def element_box(element: Dict[str, Any], page_width: int, page_height: int) -> Box:
+    """Element (x, y, width, height) in page pixels"""
+    return (
+        element["x"] / 100 * page_width,
+        element["y"] / 100 * page_height,
+        element["width"] / 100 * page_width,
+        element["height"] / 100 * page_height,
+    )
+
+
+def photo_transform(element: Dict[str, Any]) -> Dict[str, Any]:
+    """Photo transform with the renderer's defaults filled in"""
+    return {**DEFAULT_TRANSFORM, **(element.get("transform") or {})}
+
+
+def photo_crop(image_width: int, image_height: int, box_width: float, box_height: float,
+               transform: Dict[str, Any]) -> Box:
+    """Source crop (x, y, width, height) for a photo, as in PhotoElementRenderer"""
+    placeholder_aspect = box_width / box_height
+    if image_width / image_height > placeholder_aspect:
+        base_h = image_height
+        base_w = image_height * placeholder_aspect
+    else:
+        base_w = image_width
+        base_h = image_width / placeholder_aspect
+
+    zoom = transform.get("zoom") or 1
+    crop_w = base_w / zoom
+    crop_h = base_h / zoom
+    slack_x = max(0.0, image_width - crop_w)
+    slack_y = max(0.0, image_height - crop_h)
+    crop_x = max(0.0, min(slack_x / 2 + (transform.get("panX") or 0) * slack_x, slack_x))
+    crop_y = max(0.0, min(slack_y / 2 + (transform.get("panY") or 0) * slack_y, slack_y))
+    return crop_x, crop_y, crop_w, crop_h
+
+
+def parse_color(value: Optional[str]) -> Optional[Color]:
+    """CSS color string -> (r, g, b, alpha); None for missing or transparent"""
+    if not value or value == "transparent":
+        return None
+    value = value.strip().lower()
+    if value.startswith("#"):
+        digits = value[1:]
+        if len(digits) in (3, 4):
+            digits = "".join(c * 2 for c in digits)
+        if len(digits) not in (6, 8):
+            return None
+        alpha = int(digits[6:8], 16) / 255 if len(digits) == 8 else 1.0
+        return int(digits[0:2], 16), int(digits[2:4], 16), int(digits[4:6], 16), alpha
+    match = re.match(r"rgba?\(([^)]*)\)", value)
+    if match:
+        parts = [p.strip() for p in match.group(1).split(",")]
+        alpha = float(parts[3]) if len(parts) > 3 else 1.0
+        return int(float(parts[0])), int(float(parts[1])), int(float(parts[2])), alpha
+    if value in NAMED_COLORS:
+        return (*NAMED_COLORS[value], 1.0)
+    return None
+
+
+def dash_pattern(style: Optional[str], width: float) -> Optional[List[float]]:
+    """Dash array for photo frame styles (getDashArray)"""
+    if style == "dashed":
+        return [width * 4, width * 2]
+    if style == "dotted":
+        return [width, width]
+    return None
+
+
+def shape_stroke(element: Dict[str, Any]) -> Tuple[Optional[Color], float, Optional[List[float]]]:
+    """(color, width, dash) for a shape; an enabled border overrides stroke*"""
+    border = element.get("border") or {}
+    if border.get("enabled"):
+        dash = {"dashed": [10, 5], "dotted": [2, 2]}.get(border.get("style"))
+        return parse_color(border.get("color")), border.get("width", 1), dash
+    return parse_color(element.get("strokeColor")), element.get("strokeWidth") or 0, None
+
+
+def _star(cx: float, cy: float, points: int, outer: float, inner: float) -> List[Tuple[float, float]]:
+    step = math.pi * 2 / points
+    result = []
+    for i in range(points):
+        angle = i * step - math.pi / 2
+        result.append((cx + outer * math.cos(angle), cy + outer * math.sin(angle)))
+        result.append((cx + inner * math.cos(angle + step / 2), cy + inner * math.sin(angle + step / 2)))
+    return result
+
+
+def _wave_banner(w: float, h: float) -> List[Tuple[float, float]]:
+    depth = h * 0.2
+    points = [(0, 0), (w, 0)]
+    points += [(w + math.sin(i / 10 * math.pi * 2) * depth, h * i / 10) for i in range(11)]
+    return points + [(0, h)]
+
+
+def _cloud_callout(w: float, h: float) -> List[Tuple[float, float]]:
+    bumps = 6
+    bump = h * 0.1
+    points = [(w * i / bumps, 0 if i % 2 == 0 else -bump) for i in range(bumps + 1)]
+    points.append((w, h * 0.5))
+    points += [(w * i / bumps, h * 0.6 + (0 if i % 2 == 0 else bump)) for i in range(bumps, -1, -1)]
+    points += [(w * 0.3, h * 0.6), (w * 0.2, h), (w * 0.25, h * 0.6), (0, h * 0.5)]
+    return points
+
+
+def shape_primitives(element: Dict[str, Any], w: float, h: float) -> List[Primitive]:
+    """
+    Geometry of a shape in element-local pixels, ported from ShapeElementRenderer
+
+    Returns ("rect", w, h, radius), ("ellipse", cx, cy, rx, ry) or
+    ("polygon", [(x, y), ...]) tuples; unknown shape types render nothing.
+    """
+    shape = element.get("shapeType")
+    short = min(w, h)
+    if shape == "rectangle":
+        return [("rect", w, h, element.get("cornerRadius") or 0)]
+    if shape == "circle":
+        return [("ellipse", w / 2, h / 2, short / 2, short / 2)]
+    if shape == "oval":
+        return [("ellipse", w / 2, h / 2, w / 2, h / 2)]
+    if shape == "triangle":
+        return [("polygon", [(w / 2, 0), (0, h), (w, h)])]
+    if shape == "polygon":
+        points = element.get("points") or []
+        if len(points) < 3:
+            step = math.pi * 2 / 6
+            return [("polygon", [(w / 2 + short / 2 * math.cos(i * step - math.pi / 2),
+                                  h / 2 + short / 2 * math.sin(i * step - math.pi / 2)) for i in range(6)])]
+        return [("polygon", [(p["x"] / 100 * w, p["y"] / 100 * h) for p in points])]
+    if shape in ("star-5", "star-6", "star-8"):
+        count = int(shape.split("-")[1])
+        inner = short / 4 if count == 5 else short / 3.5
+        return [("polygon", _star(w / 2, h / 2, count, short / 2, inner))]
+    if shape == "burst":
+        return [("polygon", _star(w / 2, h / 2, 16, short / 2, short / 3))]
+    if shape == "ribbon":
+        return [("polygon", [(0, 0), (w, 0), (w, h * 0.7), (w * 0.5, h), (0, h * 0.7)])]
+    if shape == "banner-wave":
+        return [("polygon", _wave_banner(w, h))]
+    if shape == "banner-fold":
+        fold = w * 0.1
+        return [("polygon", [(0, 0), (w - fold, 0), (w, h * 0.5), (w - fold, h), (0, h)])]
+    if shape == "speech-bubble":
+        tail, body = w * 0.15, h * 0.75
+        return [("polygon", [(0, 0), (w, 0), (w, body), (w * 0.3 + tail, body), (w * 0.2, h),
+                             (w * 0.3, body), (0, body)])]
+    if shape == "callout-rounded":
+        tail = w * 0.15
+        return [("polygon", [(0, 0), (w, 0), (w, h * 0.6), (w * 0.7 + tail, h * 0.6), (w * 0.7, h),
+                             (w * 0.7, h * 0.6), (0, h * 0.6)])]
+    if shape == "callout-cloud":
+        return [("polygon", _cloud_callout(w, h))]
+    if shape == "thought-bubble":
+        main = short * 0.35
+        return [
+            ("ellipse", w / 2, h * 0.3, main, main),
+            ("ellipse", w * 0.3, h * 0.7, main * 0.3, main * 0.3),
+            ("ellipse", w * 0.2, h * 0.9, main * 0.2, main * 0.2),
+        ]
+    return []
+
+
+def apply_effect(image: Image.Image, effect: Optional[Dict[str, Any]]) -> Image.Image:
+    """Approximate the Konva photo effects (PhotoElementRenderer.getEffectFilters)"""
+    if not effect or effect.get("type", "none") == "none" or not effect.get("intensity"):
+        return image
+    kind = effect["type"]
+    strength = effect["intensity"] / 100
+
+    if kind == "grayscale":
+        return ImageOps.grayscale(image).convert("RGB")
+    if kind in ("sepia", "vintage"):
+        toned = ImageOps.colorize(ImageOps.grayscale(image), (40, 26, 13), (255, 240, 196))
+        if kind == "vintage":
+            toned = Image.blend(toned, ImageOps.grayscale(toned).convert("RGB"), strength * 0.3)
+        return toned
+    if kind in ("warm", "cool"):
+        shift = (50, 20, -30) if kind == "warm" else (-30, 10, 50)
+        bands = [band.point(lambda v, d=round(d * strength): max(0, min(255, v + d)))
+                 for band, d in zip(image.split(), shift)]
+        return Image.merge("RGB", bands)
+    if kind == "vignette":
+        return image.point(lambda v: round(v * (1 - strength * 0.3)))
+    return image
+
+
+def decode_data_url(url: str) -> Optional[Tuple[str, bytes]]:
+    """data: URL -> (mime type, bytes)"""
+    match = re.match(r"data:([^;,]+)(;base64)?,(.*)", url, re.DOTALL)
+    if not match:
+        return None
+    mime, is_base64, payload = match.groups()
+    return mime, base64.b64decode(payload) if is_base64 else unquote(payload).encode("utf-8")
+
+
+class PhotoResolver:
+    """
+    Map studio photo ids to source files
+
+    The exported JSON only carries photoId, so the files come from an explicit
+    {photoId: path} map, a directory of <photoId>.<ext> files, or both.
+    """
+
+    def __init__(self, photo_dir: Optional[Union[str, Path]] = None,
+                 photo_map: Optional[Dict[str, str]] = None):
+        self.paths: Dict[str, Path] = {}
+        if photo_dir:
+            for path in sorted(Path(photo_dir).iterdir()):
+                if path.suffix.lower() in RASTER_EXTENSIONS:
+                    self.paths.setdefault(path.stem, path)
+        for photo_id, path in (photo_map or {}).items():
+            self.paths[photo_id] = Path(path)
+
+    @classmethod
+    def from_map_file(cls, path: Union[str, Path], photo_dir: Optional[Union[str, Path]] = None) -> "PhotoResolver":
+        """Load a {photoId: path} JSON map; relative paths resolve against the map file"""
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        base = Path(path).parent
+        return cls(photo_dir, {k: str(base / v) for k, v in raw.items()})
+
+    def resolve(self, photo_id: Optional[str]) -> Optional[Path]:
+        return self.paths.get(photo_id) if photo_id else None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+def oriented_size(path: Union[str, Path]) -> Tuple[int, int]:
+    """Upright image size from the header alone (EXIF orientations 5-8 swap axes)"""
+    with Image.open(path) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            return height, width
+        return width, height
+
+
+def iter_photo_elements(book: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(page, element) for every photo element that has a photo assigned"""
+    for page in book["pages"]:
+        for element in page.get("elements", []):
+            if element.get("type") == "photo" and element.get("photoId"):
+                yield page, element
+
+
+# Slot layouts for synthetic books, in page percentages
+SYNTHETIC_LAYOUTS = [
+    [(5, 5, 90, 80)],
+    [(5, 5, 43, 80), (52, 5, 43, 80)],
+    [(5, 5, 90, 38), (5, 47, 90, 38)],
+    [(5, 5, 43, 38), (52, 5, 43, 38), (5, 47, 43, 38), (52, 47, 43, 38)],
+    [(5, 5, 58, 80), (67, 5, 28, 38), (67, 47, 28, 38)],
+]
+
+SYNTHETIC_SHAPES = ["rectangle", "circle", "star-5", "ribbon", "speech-bubble", "thought-bubble"]
+
+
+def synthetic_photobook(photo_ids: List[str], page_count: int, seed: int = 42,
+                        page_size: str = "A4", orientation: str = "portrait") -> Dict[str, Any]:
+    """
+    Build a reproducible photobook in the exportAsJSON shape for benchmarks
+
+    Photos are reused across pages the way real books reuse favourites, which
+    is what the exporters' asset sharing is meant to handle.
+    """
+    if not photo_ids:
+        raise ValueError("synthetic_photobook needs at least one photo id")
+    rng = random.Random(seed)
+    pages = []
+    for number in range(1, page_count + 1):
+        slots = rng.choice(SYNTHETIC_LAYOUTS)
+        elements: List[Dict[str, Any]] = []
+        for index, (x, y, w, h) in enumerate(slots):
+            elements.append({
+                "id": f"p{number}-photo-{index}",
+                "type": "photo",
+                "photoId": rng.choice(photo_ids),
+                "x": x, "y": y, "width": w, "height": h,
+                "rotation": 0,
+                "zIndex": index,
+                "transform": {**DEFAULT_TRANSFORM, "zoom": round(rng.uniform(1, 1.5), 2),
+                              "panX": round(rng.uniform(-0.3, 0.3), 2)},
+                "frame": {"enabled": rng.random() < 0.3, "color": "#ffffff", "width": 12, "style": "solid"},
+            })
+        elements.append({
+            "id": f"p{number}-caption",
+            "type": "text",
+            "content": f"Page {number} - day {rng.randint(1, 30)} of the trip",
+            "x": 5, "y": 88, "width": 90, "height": 6,
+            "rotation": 0,
+            "zIndex": len(elements),
+            "fontFamily": "Arial",
+            "fontSize": 72,
+            "fontWeight": "normal",
+            "fontStyle": "normal",
+            "textAlign": "center",
+            "color": "#1f2937",
+            "lineHeight": 1.2,
+        })
+        if rng.random() < 0.25:
+            elements.append({
+                "id": f"p{number}-shape",
+                "type": "shape",
+                "shapeType": rng.choice(SYNTHETIC_SHAPES),
+                "x": rng.uniform(60, 80), "y": rng.uniform(60, 75), "width": 12, "height": 9,
+                "rotation": rng.choice([0, 0, 15, -10]),
+                "zIndex": len(elements),
+                "fillColor": "#f59e0b",
+                "strokeColor": "#78350f",
+                "strokeWidth": 4,
+            })
+        pages.append({
+            "id": f"page-{number}",
+            "pageNumber": number,
+            "type": "cover" if number == 1 else "content",
+            "elements": elements,
+            "layout": {"id": f"synthetic-{len(slots)}", "name": f"{len(slots)} photos", "template": {"photoSlots": []}},
+            "background": {"type": "color", "color": "#ffffff"},
+        })
+    return {
+        "id": f"synthetic-{seed}",
+        "createdAt": "2026-01-01T00:00:00.000Z",
+        "updatedAt": "2026-01-01T00:00:00.000Z",
+        "pages": pages,
+        "config": {"pageSize": page_size, "orientation": orientation, "coverType": "hardcover", "binding": "perfect"},
+    }
@@ -0,0 +1,359 @@
+"""
+Print-resolution filter engine for the editor's presets and adjustments
+
+canvasEditorService.applyAdjustments / applyFilter chain Konva filters
+(Brighten, Contrast, HSL, Sepia, Grayscale, a custom vignette) on the
+client, one full pass over the pixels per filter. Here the same chain is
+compiled once per preset or adjustment set: per-channel steps become one
+256-entry lookup table and the color steps a 3x3 matrix, so each image is a
+single strip-wise pass of a LUT gather, a matmul and the vignette mask.
+
+konva_reference() replays the chain filter by filter with Konva's
+arithmetic (Uint8ClampedArray rounding after every step) for parity checks.
+Both are checked against konva-filter-fixtures.json (fixture_parity), pixels
+computed by scripts/konva-filter-fixtures.mjs from Konva's own filter code
+and the editor's filter lists, so the two cannot drift together.
+"""
+
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+# canvasEditorService.FILTER_PRESETS
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "none": {"brightness": 0, "contrast": 0, "saturation": 0, "hue": 0, "filters": []},
+    "vintage": {"brightness": 5, "contrast": 10, "saturation": -20, "hue": 0,
+                "filters": [{"type": "sepia", "intensity": 40}]},
+    "dramatic": {"brightness": -10, "contrast": 40, "saturation": 10, "hue": 0,
+                 "filters": [{"type": "vignette", "intensity": 60}]},
+    "bright": {"brightness": 20, "contrast": -5, "saturation": 15, "hue": 0, "filters": []},
+    "cool": {"brightness": 0, "contrast": 10, "saturation": -10, "hue": -10, "filters": []},
+    "warm": {"brightness": 10, "contrast": 5, "saturation": 10, "hue": 15, "filters": []},
+}
+
+# PhotobookImageFilter types that map onto ImageLayerProps adjustments
+ADJUSTMENT_TYPES = ("brightness", "contrast", "saturation", "hue")
+
+# Rows per strip: bounds the float32 working set (~20 MB at 6000 px wide)
+STRIP_ROWS = 256
+
+JPEG_QUALITY = 95
+
+# Expected pixels from scripts/konva-filter-fixtures.mjs
+FIXTURES = Path(__file__).parent.parent / "konva-filter-fixtures.json"
+
+Step = Tuple[str, Tuple[float, ...]]
+Program = List[Tuple[str, Any]]
+
+
+def normalize_adjustments(spec: Union[str, Dict[str, Any], Sequence[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """
+    ImageLayerProps-shaped adjustments from a preset name, an adjustments
+    dict (brightness/contrast/saturation/hue plus {type, intensity} filters),
+    or an ImageElement.filters list of {type, value}
+    """
+    if spec is None:
+        return dict(PRESETS["none"])
+    if isinstance(spec, str):
+        if spec not in PRESETS:
+            raise ValueError(f"Unknown preset {spec!r} (expected one of {', '.join(PRESETS)})")
+        return dict(PRESETS[spec])
+    if isinstance(spec, dict):
+        return {**{k: 0 for k in ADJUSTMENT_TYPES}, "filters": [], **spec}
+    adjustments: Dict[str, Any] = {**{k: 0 for k in ADJUSTMENT_TYPES}, "filters": []}
+    for item in spec:
+        if item["type"] in ADJUSTMENT_TYPES:
+            adjustments[item["type"]] = item.get("value", 0)
+        else:
+            adjustments["filters"].append({"type": item["type"], "intensity": item.get("value", 100)})
+    return adjustments
+
+
+def konva_chain(adjustments: Dict[str, Any]) -> List[Step]:
+    """
+    The Konva filter list applyAdjustments then applyFilter build, in order
+
+    HSL reads saturation and hue from the node, and applyAdjustments pushes
+    it once for each of them, so with both set the editor applies the same
+    HSL matrix twice; the chain keeps that. 'vintage' appends sepia and
+    applyVintageFilter's desaturation, HSL's matrix with hue 0 and its own
+    fixed saturation. Konva has no Sharpen filter, so 'sharpen' is skipped
+    there and here.
+    """
+    steps: List[Step] = []
+    saturation = adjustments.get("saturation", 0) / 100
+    hue = adjustments.get("hue", 0)
+    if adjustments.get("brightness", 0):
+        steps.append(("brighten", (adjustments["brightness"] / 100,)))
+    if adjustments.get("contrast", 0):
+        steps.append(("contrast", (float(adjustments["contrast"]),)))
+    steps.extend(("hsl", (saturation, hue)) for value in (saturation, hue) if value)
+    for item in adjustments.get("filters", []):
+        kind, intensity = item["type"], item.get("intensity", 100)
+        if kind == "sepia":
+            steps.append(("sepia", ()))
+        elif kind == "bw":
+            steps.append(("grayscale", ()))
+        elif kind == "vintage":
+            steps.extend([("sepia", ()), ("hsl", (-0.2 * intensity / 100, 0))])
+        elif kind == "vignette":
+            steps.append(("vignette", (intensity / 100,)))
+        elif kind == "blur":
+            steps.append(("blur", (intensity / 100 * 20,)))
+    return steps
+
+
+def _channel_function(kind: str, params: Tuple[float, ...]) -> Callable[[np.ndarray], np.ndarray]:
+    if kind == "brighten":
+        return lambda v: v + params[0] * 255
+    adjust = ((params[0] + 100) / 100) ** 2
+    return lambda v: ((v / 255 - 0.5) * adjust + 0.5) * 255
+
+
+def _color_matrix(kind: str, params: Tuple[float, ...]) -> np.ndarray:
+    """Konva.Filters.HSL / Sepia / Grayscale as 3x3 matrices (rows produce R, G, B)"""
+    if kind == "sepia":
+        return np.array([[0.393, 0.769, 0.189], [0.349, 0.686, 0.168], [0.272, 0.534, 0.131]])
+    if kind == "grayscale":
+        return np.array([[0.34, 0.5, 0.16]] * 3)
+    saturation, hue = params
+    s = 2 ** saturation
+    h = math.radians(abs(hue + 360) % 360)
+    vsu, vsw = s * math.cos(h), s * math.sin(h)
+    return np.array([
+        [0.299 + 0.701 * vsu + 0.167 * vsw, 0.587 - 0.587 * vsu + 0.33 * vsw, 0.114 - 0.114 * vsu - 0.497 * vsw],
+        [0.299 - 0.299 * vsu - 0.328 * vsw, 0.587 + 0.413 * vsu + 0.035 * vsw, 0.114 - 0.114 * vsu + 0.293 * vsw],
+        [0.299 - 0.3 * vsu + 1.25 * vsw, 0.587 - 0.586 * vsu - 1.05 * vsw, 0.114 + 0.886 * vsu - 0.2 * vsw],
+    ])
+
+
+def _store(values: np.ndarray) -> np.ndarray:
+    """Uint8ClampedArray assignment: clamp, round half to even"""
+    return np.rint(np.clip(values, 0, 255)).astype(np.uint8)
+
+
+def _stays_in_range(matrix: np.ndarray) -> bool:
+    """True if the matrix maps [0, 255]^3 into itself, so no clamp is lost by fusing past it"""
+    return bool((matrix >= 0).all() and (matrix.sum(axis=1) <= 1 + 1e-9).all())
+
+
+def compile_chain(steps: Sequence[Step]) -> Program:
+    """
+    Fuse a Konva chain into stages: ("color", (lut, matrices)) for each run
+    of per-channel and matrix steps, ("vignette", strength), ("blur", radius)
+
+    Per-channel steps compose into one uint8 LUT, rounding included, so that
+    part is exact. Consecutive matrices are multiplied together unless the
+    earlier one can leave [0, 255], where Konva's clamp in between changes
+    the result (HSL with any saturation does); those stay separate matrices
+    applied in the same pass, stored (clamped and rounded) between them.
+    """
+    program: Program = []
+    lut: Optional[np.ndarray] = None
+    matrices: List[np.ndarray] = []
+
+    def flush():
+        nonlocal lut, matrices
+        if lut is not None or matrices:
+            program.append(("color", (lut, [m.T.astype(np.float32) for m in matrices])))
+        lut, matrices = None, []
+
+    for kind, params in steps:
+        if kind in ("brighten", "contrast"):
+            if matrices:
+                flush()
+            base = lut if lut is not None else np.arange(256)
+            lut = _store(_channel_function(kind, params)(base.astype(np.float64)))
+        elif kind in ("hsl", "sepia", "grayscale"):
+            step = _color_matrix(kind, params)
+            if matrices and _stays_in_range(matrices[-1]):
+                matrices[-1] = step @ matrices[-1]
+            else:
+                matrices.append(step)
+        else:
+            flush()
+            program.append((kind, params[0]))
+    flush()
+    return program
+
+
+def compile_adjustments(spec: Union[str, Dict[str, Any], Sequence[Dict[str, Any]], None]) -> Program:
+    return compile_chain(konva_chain(normalize_adjustments(spec)))
+
+
+def _vignette_mask(width: int, height: int, rows: slice, strength: float) -> np.ndarray:
+    """applyVignetteFilter: 1 - distance from the centre / corner distance * strength"""
+    cx, cy = width / 2, height / 2
+    ys = np.arange(rows.start, rows.stop, dtype=np.float32)[:, None] - cy
+    xs = np.arange(width, dtype=np.float32)[None, :] - cx
+    return 1 - np.sqrt(xs * xs + ys * ys) / math.hypot(cx, cy) * strength
+
+
+def apply_program(pixels: np.ndarray, program: Program) -> np.ndarray:
+    """
+    Run a compiled program over an HxWx3 uint8 array; returns a new array
+
+    A color stage and a vignette right after it share one strip-wise pass:
+    LUT gather, a 3x3 matmul per matrix, the vignette mask, one rounding.
+    """
+    out = pixels
+    height, width = pixels.shape[:2]
+    index = 0
+    while index < len(program):
+        kind, value = program[index]
+        index += 1
+        if kind == "blur":
+            # Gaussian sigma of half the radius is close to Konva's stack blur
+            out = np.asarray(Image.fromarray(out).filter(ImageFilter.GaussianBlur(value / 2)))
+            continue
+        lut, matrices = value if kind == "color" else (None, [])
+        strength = value if kind == "vignette" else None
+        if kind == "color" and index < len(program) and program[index][0] == "vignette":
+            strength = program[index][1]
+            index += 1
+        if lut is not None and not matrices and strength is None:
+            out = lut[out]
+            continue
+        result = np.empty_like(out)
+        for top in range(0, height, STRIP_ROWS):
+            rows = slice(top, min(height, top + STRIP_ROWS))
+            strip = lut[out[rows]] if lut is not None else out[rows]
+            values = strip.astype(np.float32)
+            for number, matrix in enumerate(matrices):
+                if number:
+                    np.rint(np.clip(values, 0, 255, out=values), out=values)
+                values = values @ matrix
+            if strength is not None:
+                if matrices:
+                    np.clip(values, 0, 255, out=values)
+                values *= _vignette_mask(width, height, rows, strength)[..., None]
+            np.clip(values, 0, 255, out=values)
+            result[rows] = np.rint(values)
+        out = result
+    return out.copy() if out is pixels else out
+
+
+def konva_reference(pixels: np.ndarray, steps: Sequence[Step]) -> np.ndarray:
+    """The chain one filter at a time, as Konva runs it, for parity checks"""
+    out = pixels.astype(np.float64)
+    height, width = pixels.shape[:2]
+    for kind, params in steps:
+        if kind in ("brighten", "contrast"):
+            out = _store(_channel_function(kind, params)(out)).astype(np.float64)
+        elif kind in ("hsl", "sepia", "grayscale"):
+            out = _store(out @ _color_matrix(kind, params).T).astype(np.float64)
+        elif kind == "vignette":
+            mask = _vignette_mask(width, height, slice(0, height), params[0]).astype(np.float64)
+            out = _store(out * mask[..., None]).astype(np.float64)
+        elif kind == "blur":
+            out = np.asarray(Image.fromarray(_store(out)).filter(ImageFilter.GaussianBlur(params[0] / 2)),
+                             dtype=np.float64)
+    return _store(out)
+
+
+def fixture_parity(path: Union[str, Path] = FIXTURES) -> List[Dict[str, Any]]:
+    """
+    Per fixture case: the largest difference from the editor's expected
+    pixels of the fused engine (engine_max_diff) and of konva_reference
+    (reference_max_diff), and how many values the engine got wrong
+    """
+    with open(path, "r") as f:
+        fixtures = json.load(f)
+    shape = (fixtures["height"], fixtures["width"], 3)
+    source = np.array(fixtures["source"], dtype=np.uint8).reshape(shape)
+    results = []
+    for case in fixtures["cases"]:
+        expected = np.array(case["expected"], dtype=np.int16).reshape(shape)
+        steps = konva_chain(normalize_adjustments(case.get("preset") or case["adjustments"]))
+        engine = np.abs(apply_program(source, compile_chain(steps)).astype(np.int16) - expected)
+        reference = np.abs(konva_reference(source, steps).astype(np.int16) - expected)
+        results.append({"name": case["name"], "engine_max_diff": int(engine.max()),
+                        "engine_differing": int(np.count_nonzero(engine)),
+                        "reference_max_diff": int(reference.max())})
+    return results
+
+
+def filter_image(image: Image.Image, spec: Union[str, Dict[str, Any], Sequence[Dict[str, Any]], None]) -> Image.Image:
+    """Apply a preset or adjustments to a PIL image (RGB out; alpha is kept)"""
+    program = compile_adjustments(spec)
+    if not program:
+        return image
+    alpha = image.getchannel("A") if image.mode in ("RGBA", "LA") else None
+    result = Image.fromarray(apply_program(np.asarray(image.convert("RGB")), program))
+    if alpha is not None:
+        result.putalpha(alpha)
+    return result
+
+
+def _filter_file(job: Dict[str, Any], output_dir: str, quality: int) -> Dict[str, Any]:
+    source = Path(job["path"])
+    target = Path(output_dir) / (job.get("output") or source.name)
+    start = time.perf_counter()
+    try:
+        with Image.open(source) as image:
+            icc = image.info.get("icc_profile")
+            image = ImageOps.exif_transpose(image)
+            filtered = filter_image(image.convert("RGB"), job.get("adjustments", job.get("preset")))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return {"path": str(source), "error": f"{type(e).__name__}: {e}"}
+    save: Dict[str, Any] = {"icc_profile": icc} if icc else {}
+    if target.suffix.lower() in (".jpg", ".jpeg"):
+        save.update(quality=quality, subsampling=0)
+    filtered.save(target, **save)
+    return {"path": str(source), "output": str(target), "width": filtered.width, "height": filtered.height,
+            "seconds": time.perf_counter() - start}
+
+
+def _filter_chunk(task: Tuple[List[Dict[str, Any]], str, int]) -> List[Dict[str, Any]]:
+    jobs, output_dir, quality = task
+    return [_filter_file(job, output_dir, quality) for job in jobs]
+
+
+def apply_batch(
+    jobs: Sequence[Dict[str, Any]],
+    output_dir: Union[str, Path],
+    workers: Optional[int] = None,
+    quality: int = JPEG_QUALITY,
+    chunk_size: int = 4,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Filter every job ({"path", "preset" or "adjustments", optional "output"
+    file name}) into output_dir at full resolution, in input order
+
+    Jobs are split into chunks for a process pool (or run inline for one
+    worker or a single chunk); EXIF orientation is applied and ICC profiles
+    are carried over.
+    """
+    start = time.perf_counter()
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    tasks = [(list(jobs[i:i + chunk_size]), str(output_dir), quality) for i in range(0, len(jobs), chunk_size)]
+    records: List[Dict[str, Any]] = []
+
+    def collect(done: List[Dict[str, Any]]):
+        records.extend(done)
+        if on_progress:
+            on_progress(len(records), len(jobs))
+
+    if (workers or os.cpu_count() or 1) > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for done in pool.map(_filter_chunk, tasks):
+                collect(done)
+    else:
+        for task in tasks:
+            collect(_filter_chunk(task))
+
+    stats = {
+        "photos": len(records),
+        "errors": sum("error" in r for r in records),
+        "megapixels": sum(r.get("width", 0) * r.get("height", 0) for r in records) / 1e6,
+        "elapsed": time.perf_counter() - start,
+    }
+    return records, stats
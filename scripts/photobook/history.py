@@ -0,0 +1,664 @@
+"""
+Persistent (structurally shared) photobook documents and unlimited undo history
+
+studioStore.saveSnapshot deep-copies the whole photobook with
+JSON.parse(JSON.stringify(...)) on every edit, and undo/redo copy it again,
+so history costs a full book per step and is capped at
+STUDIO_MAX_HISTORY_SIZE (50) to bound memory.
+
+Here a document is frozen once into immutable nodes:
+
+- PVector: a 32-way path-copied trie (pages, elements, any JSON array)
+- PMap: an ordered array map up to ARRAY_MAP_MAX entries (pages, elements
+  and their fields), promoted to a hash array mapped trie above that
+
+An edit copies only the path from the root to what changed (a few small
+tuples); every other page and element is shared with the previous version.
+A version is just its root, history is two persistent stacks, so commit,
+undo and redo are O(1), and diff() skips every subtree two versions share.
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+# 32-bit hashes: seven 5-bit levels, after which equal hashes share a collision node
+_HASH_MASK = 0xFFFFFFFF
+_MAX_SHIFT = 30
+
+# Maps up to this size stay ordered key/value tuples, like Clojure's PersistentArrayMap
+ARRAY_MAP_MAX = 16
+
+_MISSING = object()
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count("1")
+
+
+# -- hash array mapped trie --
+
+class _HashNode:
+    """Bitmap-indexed node: `entries` holds a (key, value) pair or a child node per set bit"""
+
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap: int, entries: tuple):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _CollisionNode:
+    """Keys whose full 32-bit hashes are equal"""
+
+    __slots__ = ("pairs",)
+
+    def __init__(self, pairs: tuple):
+        self.pairs = pairs
+
+
+def _hash(key: Any) -> int:
+    return hash(key) & _HASH_MASK
+
+
+def _lookup(node: Any, h: int, key: Any) -> Any:
+    shift = 0
+    while True:
+        if isinstance(node, _CollisionNode):
+            for k, v in node.pairs:
+                if k == key:
+                    return v
+            return _MISSING
+        bit = 1 << ((h >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return _MISSING
+        entry = node.entries[_popcount(node.bitmap & (bit - 1))]
+        if isinstance(entry, tuple):
+            return entry[1] if entry[0] == key else _MISSING
+        node, shift = entry, shift + _BITS
+
+
+def _merge(k1: Any, v1: Any, k2: Any, v2: Any, h2: int, shift: int) -> Any:
+    """Smallest subtree holding two keys that collided at `shift`"""
+    if shift > _MAX_SHIFT:
+        return _CollisionNode(((k1, v1), (k2, v2)))
+    h1 = _hash(k1)
+    b1, b2 = 1 << ((h1 >> shift) & _MASK), 1 << ((h2 >> shift) & _MASK)
+    if b1 == b2:
+        return _HashNode(b1, (_merge(k1, v1, k2, v2, h2, shift + _BITS),))
+    pairs = ((k1, v1), (k2, v2)) if b1 < b2 else ((k2, v2), (k1, v1))
+    return _HashNode(b1 | b2, pairs)
+
+
+def _assoc(node: Any, h: int, shift: int, key: Any, value: Any) -> Tuple[Any, bool]:
+    """(new node, whether a key was added); returns `node` itself when nothing changed"""
+    if isinstance(node, _CollisionNode):
+        for i, (k, v) in enumerate(node.pairs):
+            if k == key:
+                if v is value:
+                    return node, False
+                return _CollisionNode(node.pairs[:i] + ((key, value),) + node.pairs[i + 1:]), False
+        return _CollisionNode(node.pairs + ((key, value),)), True
+    bit = 1 << ((h >> shift) & _MASK)
+    index = _popcount(node.bitmap & (bit - 1))
+    entries = node.entries
+    if not node.bitmap & bit:
+        return _HashNode(node.bitmap | bit, entries[:index] + ((key, value),) + entries[index:]), True
+    entry = entries[index]
+    if isinstance(entry, tuple):
+        if entry[0] == key:
+            if entry[1] is value:
+                return node, False
+            replacement, added = (key, value), False
+        else:
+            replacement, added = _merge(entry[0], entry[1], key, value, h, shift + _BITS), True
+    else:
+        replacement, added = _assoc(entry, h, shift + _BITS, key, value)
+        if replacement is entry:
+            return node, False
+    return _HashNode(node.bitmap, entries[:index] + (replacement,) + entries[index + 1:]), added
+
+
+def _dissoc(node: Any, h: int, shift: int, key: Any) -> Any:
+    """New node without `key` (None if it became empty); `node` itself if the key is absent"""
+    if isinstance(node, _CollisionNode):
+        pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+        if len(pairs) == len(node.pairs):
+            return node
+        return _CollisionNode(pairs) if pairs else None
+    bit = 1 << ((h >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+    index = _popcount(node.bitmap & (bit - 1))
+    entry = node.entries[index]
+    if isinstance(entry, tuple):
+        if entry[0] != key:
+            return node
+        replacement = None
+    else:
+        replacement = _dissoc(entry, h, shift + _BITS, key)
+        if replacement is entry:
+            return node
+        # A child left holding a single pair collapses back into this node
+        if isinstance(replacement, _HashNode) and len(replacement.entries) == 1 \
+                and isinstance(replacement.entries[0], tuple):
+            replacement = replacement.entries[0]
+    if replacement is None:
+        if node.bitmap == bit:
+            return None
+        return _HashNode(node.bitmap ^ bit, node.entries[:index] + node.entries[index + 1:])
+    return _HashNode(node.bitmap, node.entries[:index] + (replacement,) + node.entries[index + 1:])
+
+
+def _node_items(node: Any) -> Iterator[Tuple[Any, Any]]:
+    if isinstance(node, _CollisionNode):
+        yield from node.pairs
+        return
+    for entry in node.entries:
+        if isinstance(entry, tuple):
+            yield entry
+        else:
+            yield from _node_items(entry)
+
+
+class PMap:
+    """
+    Immutable mapping; set() and delete() return a new map sharing structure
+
+    Small maps keep insertion order (so thawed pages and elements serialize
+    like exportAsJSON); maps past ARRAY_MAP_MAX become a HAMT, iterated in
+    hash order.
+    """
+
+    __slots__ = ("_keys", "_values", "_root", "_count")
+
+    def __init__(self, items: Optional[Any] = None):
+        pairs = list(items.items() if isinstance(items, dict) else items or [])
+        if len(pairs) <= ARRAY_MAP_MAX and len({k for k, _ in pairs}) == len(pairs):
+            self._keys = tuple(k for k, _ in pairs)
+            self._values = tuple(v for _, v in pairs)
+            self._root = None
+            self._count = len(pairs)
+            return
+        root, count = _HashNode(0, ()), 0
+        for key, value in pairs:
+            root, added = _assoc(root, _hash(key), 0, key, value)
+            count += added
+        self._keys = self._values = None
+        self._root, self._count = root, count
+
+    @classmethod
+    def _array(cls, keys: tuple, values: tuple) -> "PMap":
+        result = cls.__new__(cls)
+        result._keys, result._values, result._root, result._count = keys, values, None, len(keys)
+        return result
+
+    @classmethod
+    def _trie(cls, root: Any, count: int) -> "PMap":
+        result = cls.__new__(cls)
+        result._keys = result._values = None
+        result._root, result._count = root, count
+        return result
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if self._root is None:
+            try:
+                return self._values[self._keys.index(key)]
+            except ValueError:
+                return default
+        value = _lookup(self._root, _hash(key), key)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: Any) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def set(self, key: Any, value: Any) -> "PMap":
+        if self._root is None:
+            try:
+                index = self._keys.index(key)
+            except ValueError:
+                if self._count < ARRAY_MAP_MAX:
+                    return PMap._array(self._keys + (key,), self._values + (value,))
+                return PMap(list(self.items()) + [(key, value)])
+            if self._values[index] is value:
+                return self
+            return PMap._array(self._keys, self._values[:index] + (value,) + self._values[index + 1:])
+        root, added = _assoc(self._root, _hash(key), 0, key, value)
+        return self if root is self._root else PMap._trie(root, self._count + added)
+
+    def delete(self, key: Any) -> "PMap":
+        if self._root is None:
+            if key not in self._keys:
+                return self
+            index = self._keys.index(key)
+            return PMap._array(self._keys[:index] + self._keys[index + 1:],
+                               self._values[:index] + self._values[index + 1:])
+        root = _dissoc(self._root, _hash(key), 0, key)
+        if root is self._root:
+            return self
+        return PMap._trie(root if root is not None else _HashNode(0, ()), self._count - 1)
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        if self._root is None:
+            return iter(zip(self._keys, self._values))
+        return _node_items(self._root)
+
+    def keys(self) -> Iterator[Any]:
+        return (k for k, _ in self.items())
+
+    def values(self) -> Iterator[Any]:
+        return (v for _, v in self.items())
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, PMap):
+            return NotImplemented
+        if len(other) != len(self):
+            return False
+        return all(other.get(k, _MISSING) == v for k, v in self.items())
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"PMap({dict(self.items())!r})"
+
+
+# -- path-copied vector trie --
+
+def _new_path(shift: int, value: Any) -> tuple:
+    node = (value,)
+    while shift > 0:
+        node, shift = (node,), shift - _BITS
+    return node
+
+
+def _push(node: tuple, shift: int, index: int, value: Any) -> tuple:
+    if shift == 0:
+        return node + (value,)
+    slot = (index >> shift) & _MASK
+    if slot < len(node):
+        return node[:slot] + (_push(node[slot], shift - _BITS, index, value),) + node[slot + 1:]
+    return node + (_new_path(shift - _BITS, value),)
+
+
+def _set(node: tuple, shift: int, index: int, value: Any) -> tuple:
+    slot = (index >> shift) & _MASK
+    if shift == 0:
+        if node[slot] is value:
+            return node
+        return node[:slot] + (value,) + node[slot + 1:]
+    child = _set(node[slot], shift - _BITS, index, value)
+    return node if child is node[slot] else node[:slot] + (child,) + node[slot + 1:]
+
+
+def _leaves(node: tuple, shift: int) -> Iterator[tuple]:
+    if shift == 0:
+        yield node
+        return
+    for child in node:
+        yield from _leaves(child, shift - _BITS)
+
+
+class PVector:
+    """
+    Immutable sequence on a 32-way trie: get/set/append touch one root-to-leaf
+    path (O(log32 n)); insert and delete in the middle rebuild the trie
+    (O(n), for adding or removing pages, not for editing them)
+    """
+
+    __slots__ = ("_root", "_shift", "_count")
+
+    def __init__(self, items: Sequence[Any] = ()):
+        level = [tuple(items[i:i + _WIDTH]) for i in range(0, len(items), _WIDTH)] or [()]
+        shift = 0
+        while len(level) > 1:
+            level = [tuple(level[i:i + _WIDTH]) for i in range(0, len(level), _WIDTH)]
+            shift += _BITS
+        self._root, self._shift, self._count = level[0], shift, len(items)
+
+    @classmethod
+    def _make(cls, root: tuple, shift: int, count: int) -> "PVector":
+        result = cls.__new__(cls)
+        result._root, result._shift, result._count = root, shift, count
+        return result
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("PVector index out of range")
+        node, shift = self._root, self._shift
+        while shift > 0:
+            node, shift = node[(index >> shift) & _MASK], shift - _BITS
+        return node[index & _MASK]
+
+    def set(self, index: int, value: Any) -> "PVector":
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("PVector index out of range")
+        root = _set(self._root, self._shift, index, value)
+        return self if root is self._root else PVector._make(root, self._shift, self._count)
+
+    def append(self, value: Any) -> "PVector":
+        if self._count == _WIDTH ** (self._shift // _BITS + 1):
+            root = (self._root, _new_path(self._shift, value))
+            return PVector._make(root, self._shift + _BITS, self._count + 1)
+        return PVector._make(_push(self._root, self._shift, self._count, value), self._shift, self._count + 1)
+
+    def insert(self, index: int, value: Any) -> "PVector":
+        if index >= self._count:
+            return self.append(value)
+        items = list(self)
+        items.insert(index, value)
+        return PVector(items)
+
+    def delete(self, index: int) -> "PVector":
+        items = list(self)
+        del items[index]
+        return PVector(items)
+
+    def __iter__(self) -> Iterator[Any]:
+        for leaf in _leaves(self._root, self._shift):
+            yield from leaf
+
+    def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, PVector):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"PVector({list(self)!r})"
+
+
+# -- documents --
+
+def freeze(value: Any) -> Any:
+    """JSON value (dicts, lists, scalars) -> PMap / PVector tree"""
+    if isinstance(value, dict):
+        return PMap([(k, freeze(v)) for k, v in value.items()])
+    if isinstance(value, (list, tuple)):
+        return PVector([freeze(v) for v in value])
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """PMap / PVector tree -> plain dicts and lists"""
+    if isinstance(value, PMap):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, PVector):
+        return [thaw(v) for v in value]
+    return value
+
+
+def get_in(node: Any, path: Sequence[Any], default: Any = None) -> Any:
+    for key in path:
+        try:
+            node = node[key]
+        except (KeyError, IndexError, TypeError):
+            return default
+    return node
+
+
+def update_in(node: Any, path: Sequence[Any], fn: Callable[[Any], Any]) -> Any:
+    """New root with fn applied at path; only the nodes along the path are copied"""
+    if not path:
+        return fn(node)
+    head = path[0]
+    child = node.get(head) if isinstance(node, PMap) else node[head]
+    return node.set(head, update_in(child, path[1:], fn))
+
+
+def assoc_in(node: Any, path: Sequence[Any], value: Any) -> Any:
+    return update_in(node, path, lambda _: freeze(value))
+
+
+def find_index(vector: PVector, item_id: Any) -> int:
+    """Position of the item whose "id" is item_id (pages, elements); -1 if absent"""
+    for index, item in enumerate(vector):
+        if isinstance(item, PMap) and item.get("id") == item_id:
+            return index
+    return -1
+
+
+# -- diff --
+
+def diff(old: Any, new: Any, path: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    """
+    Changes from old to new as {"op", "path", ...} records
+
+    ops are "replace" / "add" / "remove" (with "value" for the new value),
+    and for arrays of items with ids, "move" (with the new id order). Items
+    of such arrays are matched by id, so inserting a page is one "add", not
+    a replace of every later page. Subtrees shared by both versions are
+    skipped by identity, so diffing consecutive versions costs O(changes).
+    """
+    changes: List[Dict[str, Any]] = []
+    _diff(old, new, list(path), changes)
+    return changes
+
+
+def _diff(old: Any, new: Any, path: List[Any], out: List[Dict[str, Any]]):
+    if old is new:
+        return
+    if isinstance(old, PMap) and isinstance(new, PMap):
+        _diff_maps(old, new, path, out)
+    elif isinstance(old, PVector) and isinstance(new, PVector):
+        _diff_vectors(old, new, path, out)
+    elif type(old) is not type(new) or old != new:
+        out.append({"op": "replace", "path": path, "value": thaw(new)})
+
+
+def _diff_maps(old: PMap, new: PMap, path: List[Any], out: List[Dict[str, Any]]):
+    if old._root is not None and new._root is not None:
+        _diff_nodes(old._root, new._root, path, out)
+        return
+    _diff_items(dict(old.items()), dict(new.items()), path, out)
+
+
+def _diff_items(old: Dict[Any, Any], new: Dict[Any, Any], path: List[Any], out: List[Dict[str, Any]]):
+    for key, value in old.items():
+        if key not in new:
+            out.append({"op": "remove", "path": path + [key]})
+        elif new[key] is not value:
+            _diff(value, new[key], path + [key], out)
+    for key, value in new.items():
+        if key not in old:
+            out.append({"op": "add", "path": path + [key], "value": thaw(value)})
+
+
+def _diff_nodes(old: Any, new: Any, path: List[Any], out: List[Dict[str, Any]]):
+    """Walk two HAMT nodes in parallel, skipping children they share"""
+    if old is new:
+        return
+    if not (isinstance(old, _HashNode) and isinstance(new, _HashNode)):
+        _diff_items(dict(_node_items(old)), dict(_node_items(new)), path, out)
+        return
+    bits = old.bitmap | new.bitmap
+    while bits:
+        bit = bits & -bits
+        bits ^= bit
+        a = old.entries[_popcount(old.bitmap & (bit - 1))] if old.bitmap & bit else None
+        b = new.entries[_popcount(new.bitmap & (bit - 1))] if new.bitmap & bit else None
+        if a is b:
+            continue
+        if isinstance(a, tuple) and isinstance(b, tuple) and a[0] == b[0]:
+            _diff(a[1], b[1], path + [a[0]], out)
+        elif isinstance(a, _HashNode) and isinstance(b, _HashNode):
+            _diff_nodes(a, b, path, out)
+        else:
+            _diff_items(_entry_items(a), _entry_items(b), path, out)
+
+
+def _entry_items(entry: Any) -> Dict[Any, Any]:
+    if entry is None:
+        return {}
+    return {entry[0]: entry[1]} if isinstance(entry, tuple) else dict(_node_items(entry))
+
+
+def _item_id(item: Any) -> Any:
+    return item.get("id") if isinstance(item, PMap) else None
+
+
+def _changed_positions(old: tuple, new: tuple, shift: int, offset: int, out: List[int]):
+    """Indexes where two same-shaped tries hold different objects"""
+    if old is new:
+        return
+    if shift == 0:
+        out.extend(offset + i for i, (a, b) in enumerate(zip(old, new)) if a is not b)
+        return
+    span = 1 << shift
+    for i, (a, b) in enumerate(zip(old, new)):
+        _changed_positions(a, b, shift - _BITS, offset + i * span, out)
+
+
+def _diff_vectors(old: PVector, new: PVector, path: List[Any], out: List[Dict[str, Any]]):
+    if len(old) == len(new) and old._shift == new._shift:
+        positions: List[int] = []
+        _changed_positions(old._root, new._root, old._shift, 0, positions)
+        pairs = [(i, old[i], new[i]) for i in positions]
+        if not any(_item_id(a) is not None and _item_id(a) != _item_id(b) for _, a, b in pairs):
+            for i, a, b in pairs:
+                _diff(a, b, path + [i], out)
+            return
+    old_ids, new_ids = [_item_id(item) for item in old], [_item_id(item) for item in new]
+    keyed = None not in old_ids and None not in new_ids and len(set(old_ids)) == len(old_ids) \
+        and len(set(new_ids)) == len(new_ids)
+    if not keyed:
+        for i in range(min(len(old), len(new))):
+            _diff(old[i], new[i], path + [i], out)
+        for i in range(len(old) - 1, len(new) - 1, -1):
+            out.append({"op": "remove", "path": path + [i]})
+        for i in range(len(old), len(new)):
+            out.append({"op": "add", "path": path + [i], "value": thaw(new[i])})
+        return
+    old_index = {item_id: i for i, item_id in enumerate(old_ids)}
+    new_set = set(new_ids)
+    for i in range(len(old_ids) - 1, -1, -1):
+        if old_ids[i] not in new_set:
+            out.append({"op": "remove", "path": path + [i], "id": old_ids[i]})
+    kept = [item_id for item_id in old_ids if item_id in new_set]
+    if kept != [item_id for item_id in new_ids if item_id in old_index]:
+        out.append({"op": "move", "path": path, "value": new_ids})
+    for j, item_id in enumerate(new_ids):
+        if item_id not in old_index:
+            out.append({"op": "add", "path": path + [j], "id": item_id, "value": thaw(new[j])})
+        else:
+            _diff(old[old_index[item_id]], new[j], path + [j], out)
+
+
+def apply_changes(document: Any, changes: Sequence[Dict[str, Any]]) -> Any:
+    """Apply diff() output to a document (e.g. one received from another editor)"""
+    for change in changes:
+        op, path = change["op"], change["path"]
+        if op == "replace":
+            document = assoc_in(document, path, change["value"])
+        elif op == "move":
+            def reorder(vector: PVector, order=change["value"]) -> PVector:
+                by_id = {_item_id(item): item for item in vector}
+                return PVector([by_id[item_id] for item_id in order if item_id in by_id])
+            document = update_in(document, path, reorder)
+        else:
+            def edit(container: Any, key=path[-1], change=change) -> Any:
+                if isinstance(container, PVector):
+                    return container.delete(key) if change["op"] == "remove" else \
+                        container.insert(key, freeze(change["value"]))
+                return container.delete(key) if change["op"] == "remove" else container.set(key, freeze(change["value"]))
+            document = update_in(document, path[:-1], edit)
+    return document
+
+
+# -- history --
+
+class History:
+    """
+    Unlimited undo/redo over persistent document versions
+
+    Past and future versions are persistent stacks ((entry, rest) pairs), so
+    commit, undo and redo are O(1) and never copy a document. Every entry is
+    {"document", "action", "timestamp"}, like StudioPhotoBookSnapshot.
+    """
+
+    def __init__(self, document: Any, action: str = "Loaded"):
+        self.present = {"document": document, "action": action, "timestamp": time.time()}
+        self._past: Optional[tuple] = None
+        self._future: Optional[tuple] = None
+        self._past_count = 0
+        self._future_count = 0
+
+    @property
+    def document(self) -> Any:
+        return self.present["document"]
+
+    def commit(self, document: Any, action: str) -> Any:
+        """Record a new version (dropping any redo branch); no-op if nothing changed"""
+        if document is self.document:
+            return document
+        self._past = (self.present, self._past)
+        self._past_count += 1
+        self._future, self._future_count = None, 0
+        self.present = {"document": document, "action": action, "timestamp": time.time()}
+        return document
+
+    def update(self, path: Sequence[Any], fn: Callable[[Any], Any], action: str) -> Any:
+        """Commit update_in(document, path, fn)"""
+        return self.commit(update_in(self.document, path, fn), action)
+
+    def can_undo(self) -> bool:
+        return self._past is not None
+
+    def can_redo(self) -> bool:
+        return self._future is not None
+
+    def undo(self) -> Any:
+        if self._past is None:
+            return self.document
+        self._future = (self.present, self._future)
+        self.present, self._past = self._past
+        self._past_count, self._future_count = self._past_count - 1, self._future_count + 1
+        return self.document
+
+    def redo(self) -> Any:
+        if self._future is None:
+            return self.document
+        self._past = (self.present, self._past)
+        self.present, self._future = self._future
+        self._past_count, self._future_count = self._past_count + 1, self._future_count - 1
+        return self.document
+
+    def __len__(self) -> int:
+        return self._past_count + 1 + self._future_count
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Every version, oldest first (O(n); for listing, not per edit)"""
+        past, node = [], self._past
+        while node is not None:
+            past.append(node[0])
+            node = node[1]
+        future, node = [], self._future
+        while node is not None:
+            future.append(node[0])
+            node = node[1]
+        return past[::-1] + [self.present] + future
@@ -0,0 +1,107 @@
+"""
+Image loading and downscaling helpers for vision requests
+"""
+
+import base64
+import io
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image, ImageOps
+
+from . import tracing
+
+# File extension -> data URL subtype (same mapping as test-vision-analysis.py)
+IMAGE_TYPES = {
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".png": "png",
+    ".gif": "gif",
+    ".webp": "webp",
+    ".svg": "svg+xml",
+}
+
+RASTER_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+ImageSource = Union[str, Path, bytes]
+
+
+def image_type_for(path: Union[str, Path]) -> str:
+    """Data URL subtype for a file path, defaulting to jpeg"""
+    return IMAGE_TYPES.get(Path(path).suffix.lower(), "jpeg")
+
+
+def list_images(directory: Union[str, Path], limit: Optional[int] = None) -> List[Path]:
+    """Raster images in a directory, sorted by name for reproducible runs"""
+    paths = sorted(
+        p for p in Path(directory).iterdir() if p.is_file() and p.suffix.lower() in RASTER_EXTENSIONS
+    )
+    return paths[:limit] if limit else paths
+
+
+def read_base64(path: Union[str, Path]) -> str:
+    """Base64-encode a file as-is"""
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+
+def open_image(source: ImageSource) -> Image.Image:
+    """Open a path or raw bytes as an upright RGB image"""
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else os.fspath(source))
+    image = ImageOps.exif_transpose(image)
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Upright (width, height) read from the header only; None if Pillow cannot read it (SVG)"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            # EXIF orientations 5-8 are rotated by 90 degrees
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):
+                width, height = height, width
+    except (OSError, ValueError):
+        return None
+    return width, height
+
+
+def downscale(image: Image.Image, max_edge: Optional[int]) -> Image.Image:
+    """Shrink so the longest edge is at most max_edge; never upscales"""
+    if not max_edge or max(image.size) <= max_edge:
+        return image
+    scale = max_edge / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS)
+
+
+def encode_jpeg(image: Image.Image, quality: int = 85) -> bytes:
+    """Encode an RGB image as JPEG bytes"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def downscaled_jpeg(source: ImageSource, max_edge: Optional[int] = 768, quality: int = 85) -> bytes:
+    """Decode, orient, shrink and re-encode an image as JPEG for upload"""
+    with tracing.span("image.load") as span:
+        if not isinstance(source, bytes) and max_edge:
+            # Let libjpeg skip DCT coefficients we would throw away anyway
+            image = Image.open(os.fspath(source))
+            if image.format == "JPEG":
+                image.draft("RGB", (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+        else:
+            image = open_image(source)
+        span.set(width=image.width, height=image.height)
+    with tracing.span("image.preprocess", max_edge=max_edge):
+        image = downscale(image, max_edge)
+    with tracing.span("image.encode", quality=quality) as span:
+        data = encode_jpeg(image, quality)
+        span.set(bytes=len(data))
+    return data
+
+
+def to_base64(data: bytes) -> str:
+    """Base64-encode raw bytes as a str"""
+    return base64.b64encode(data).decode("utf-8")
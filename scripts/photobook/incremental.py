@@ -0,0 +1,341 @@
+"""
+Incremental album analysis: recompute only what an album edit invalidates
+
+claudeService.analyzeImages and gptService.generateThemes reprocess every
+photo of an album on each run. Here each stage's output is stored with the
+inputs it was derived from, and an update only redoes stages whose inputs
+changed:
+
+- fingerprint: SHA-256 of the file, re-read only when path, mtime or size
+  changed (sources table); header metadata is scanned at the same time
+- summary: the vision ImageSummary per fingerprint and analysis config,
+  shared by every album containing the same photo; only fingerprints with
+  no stored summary are sent, packed, to the model
+- clusters: group_events over the metadata, which is cheap; each cluster is
+  identified by its member fingerprints, so the report says how many events
+  an edit touched
+- themes: stored with the summary fingerprints they came from; regenerated
+  when that set changed, or only once it drifted past `themes_tolerance`,
+  by map-reduce over event clusters with map results cached per shard
+- plan: plan_spreads over the album's features, stored under a hash of
+  features, page count and theme
+
+Adding five photos to a 400-photo album therefore hashes, scans and
+analyzes five photos, and re-maps only the theme shards they landed in.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .metadata import group_events, scan_file, to_features
+from .midas import post_completion
+from .packing import FAILED_SUMMARY, analyze_packed, prepare_images
+from .spreads import plan_spreads
+from .themes import generate_themes_mapreduce
+
+DEFAULT_STORE = Path.home() / ".cache" / "photobook" / "albums.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    fingerprint TEXT NOT NULL,
+    config TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (fingerprint, config)
+);
+CREATE TABLE IF NOT EXISTS album_photos (
+    album TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (album, position)
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    album TEXT NOT NULL,
+    name TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    value TEXT NOT NULL,
+    computed_at REAL NOT NULL,
+    PRIMARY KEY (album, name)
+);
+"""
+
+
+def signature(value: Any) -> str:
+    """Stable hash of a JSON-serializable dependency list"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def _fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AlbumStore:
+    """
+    Persistent per-photo and per-album analysis state (SQLite, WAL)
+
+    deployment and max_edge change what the model sees, so they are part of
+    the summary key; pack_size only changes how requests are batched.
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_STORE, deployment: str = "Claude-Sonnet-4",
+                 max_edge: Optional[int] = 768, pack_size: int = 4, themes_deployment: str = "GPT 4o",
+                 post: Callable[..., Dict[str, Any]] = post_completion, api_key: str = "", verify_ssl: bool = True):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.deployment = deployment
+        self.max_edge = max_edge
+        self.pack_size = pack_size
+        self.themes_deployment = themes_deployment
+        self.config = f"{deployment}|{max_edge}"
+        self.post = post
+        self.api_key = api_key
+        self.verify_ssl = verify_ssl
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # -- stages --
+
+    def _fingerprints(self, conn: sqlite3.Connection, keys: List[str]) -> Tuple[List[str], List[Dict[str, Any]], int]:
+        """Fingerprint and metadata per path; only new or changed files are read"""
+        fingerprints, records, hashed = [], [], 0
+        changed = []
+        for key in keys:
+            stat = os.stat(key)
+            row = conn.execute("SELECT fingerprint, metadata FROM sources WHERE path = ? AND mtime_ns = ? AND size = ?",
+                               (key, stat.st_mtime_ns, stat.st_size)).fetchone()
+            if row is None:
+                fingerprint, metadata = _fingerprint(key), scan_file(key)
+                changed.append((key, stat.st_mtime_ns, stat.st_size, fingerprint, json.dumps(metadata)))
+                hashed += 1
+            else:
+                fingerprint, metadata = row["fingerprint"], json.loads(row["metadata"])
+            fingerprints.append(fingerprint)
+            records.append({**metadata, "path": key, "fingerprint": fingerprint})
+        if changed:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO sources (path, mtime_ns, size, fingerprint, metadata) "
+                             "VALUES (?, ?, ?, ?, ?)", changed)
+            conn.execute("COMMIT")
+        return fingerprints, records, hashed
+
+    def _summaries(self, conn: sqlite3.Connection, keys: List[str], fingerprints: List[str],
+                   on_progress: Optional[Callable[[int, int], None]]) -> Tuple[Dict[str, Dict[str, str]], Dict[str, Any]]:
+        """Stored summaries for the album, analyzing fingerprints that have none"""
+        stored: Dict[str, Dict[str, str]] = {}
+        for start in range(0, len(fingerprints), 500):
+            batch = fingerprints[start:start + 500]
+            rows = conn.execute(f"SELECT fingerprint, summary FROM summaries WHERE config = ? AND fingerprint IN "
+                                f"({','.join('?' * len(batch))})", (self.config, *batch)).fetchall()
+            stored.update((row["fingerprint"], json.loads(row["summary"])) for row in rows)
+
+        missing: Dict[str, str] = {}
+        for key, fingerprint in zip(keys, fingerprints):
+            if fingerprint not in stored and fingerprint not in missing:
+                missing[fingerprint] = key
+        work: Dict[str, Any] = {"analyzed": len(missing), "calls": 0, "failed": 0, "usage": {}}
+        if not missing:
+            return stored, work
+
+        images = prepare_images([Path(p) for p in missing.values()], max_edge=self.max_edge)
+        run = analyze_packed(images, self.deployment, pack_size=self.pack_size, api_key=self.api_key,
+                             verify_ssl=self.verify_ssl, on_progress=on_progress, post=self.post)
+        work.update(calls=len(run["calls"]), usage=run["usage"])
+        now = time.time()
+        rows = []
+        for fingerprint, summary in zip(missing, run["summaries"]):
+            fields = {k: v for k, v in summary.items() if k != "image_id"}
+            if fields == FAILED_SUMMARY:
+                work["failed"] += 1  # not stored, so the next update retries it
+                continue
+            stored[fingerprint] = fields
+            rows.append((fingerprint, self.config, json.dumps(fields), now))
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR REPLACE INTO summaries (fingerprint, config, summary, created_at) "
+                         "VALUES (?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+        return stored, work
+
+    def _artifact(self, conn: sqlite3.Connection, album: str, name: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute("SELECT inputs, value, computed_at FROM artifacts WHERE album = ? AND name = ?",
+                           (album, name)).fetchone()
+        if row is None:
+            return None
+        return {"inputs": json.loads(row["inputs"]), "value": json.loads(row["value"]), "computed_at": row["computed_at"]}
+
+    def _save_artifact(self, conn: sqlite3.Connection, album: str, name: str, inputs: Any, value: Any):
+        conn.execute("INSERT OR REPLACE INTO artifacts (album, name, inputs, value, computed_at) VALUES (?, ?, ?, ?, ?)",
+                     (album, name, json.dumps(inputs), json.dumps(value), time.time()))
+
+    # -- public API --
+
+    def update(self, album: str, paths: Sequence[Union[str, Path]], pages: Optional[int] = None,
+               theme_count: int = 4, themes_tolerance: float = 0.0, theme_id: Optional[str] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Bring an album's summaries, clusters, themes and plan up to date with `paths` (in album order)
+
+        themes_tolerance is the fraction of summaries that may have been
+        added or removed since the stored themes before they are regenerated;
+        0 regenerates on any change. Without `pages` no plan is made.
+        Returns what was reused and what had to be recomputed, with timings.
+        """
+        timings: Dict[str, float] = {}
+        keys = [str(Path(p).resolve()) for p in paths]
+        report: Dict[str, Any] = {"album": album, "photos": len(keys)}
+
+        with self._connect() as conn:
+            start = time.perf_counter()
+            fingerprints, records, hashed = self._fingerprints(conn, keys)
+            previous = {row["path"]: row["fingerprint"] for row in
+                        conn.execute("SELECT path, fingerprint FROM album_photos WHERE album = ?", (album,))}
+            current = dict(zip(keys, fingerprints))
+            report.update(hashed=hashed,
+                          added=sum(1 for k in current if k not in previous),
+                          removed=sum(1 for k in previous if k not in current),
+                          edited=sum(1 for k, f in current.items() if k in previous and previous[k] != f))
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM album_photos WHERE album = ?", (album,))
+            conn.executemany("INSERT INTO album_photos (album, position, path, fingerprint) VALUES (?, ?, ?, ?)",
+                             [(album, position, key, fingerprint)
+                              for position, (key, fingerprint) in enumerate(zip(keys, fingerprints))])
+            conn.execute("COMMIT")
+            timings["fingerprint"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            summaries, work = self._summaries(conn, keys, fingerprints, on_progress)
+            report.update(work)
+            timings["summaries"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            groups = group_events([r for r in records if "error" not in r])
+            clusters = [[r["fingerprint"] for r in group] for group in groups]
+            stored_clusters = self._artifact(conn, album, "clusters")
+            before = {signature(c) for c in stored_clusters["value"]} if stored_clusters else set()
+            report.update(clusters=len(clusters), clusters_changed=sum(signature(c) not in before for c in clusters))
+            conn.execute("BEGIN IMMEDIATE")
+            self._save_artifact(conn, album, "clusters", signature(fingerprints), clusters)
+            conn.execute("COMMIT")
+            timings["clusters"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            report["themes"] = self._update_themes(conn, album, fingerprints, clusters, summaries, theme_count,
+                                                   themes_tolerance)
+            timings["themes"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            report["plan"] = "skipped"
+            if pages:
+                features = to_features(groups)
+                inputs = signature([features, pages, theme_id])
+                stored_plan = self._artifact(conn, album, "plan")
+                if stored_plan and stored_plan["inputs"] == inputs:
+                    report["plan"] = "reused"
+                else:
+                    plan = plan_spreads(features, pages, theme_id=theme_id)
+                    conn.execute("BEGIN IMMEDIATE")
+                    self._save_artifact(conn, album, "plan", inputs, plan)
+                    conn.execute("COMMIT")
+                    report["plan"] = "computed"
+            timings["plan"] = time.perf_counter() - start
+
+        report["timings"] = timings
+        report["elapsed"] = sum(timings.values())
+        return report
+
+    def _update_themes(self, conn: sqlite3.Connection, album: str, fingerprints: List[str],
+                       clusters: List[List[str]], summaries: Dict[str, Dict[str, str]], count: int,
+                       tolerance: float) -> str:
+        analyzed = [f for f in dict.fromkeys(fingerprints) if f in summaries]
+        if not analyzed:
+            return "skipped"
+        stored = self._artifact(conn, album, "themes")
+        if stored and stored["value"].get("count") == count:
+            before = set(stored["inputs"])
+            drift = len(before.symmetric_difference(analyzed)) / max(1, len(analyzed))
+            if drift == 0:
+                return "reused"
+            if drift <= tolerance:
+                return "stale"
+        # Map calls are cached per shard, so an edit re-maps only the events it touched
+        position = {f: n for n, f in enumerate(analyzed)}
+        shard_cache = self._artifact(conn, album, "theme_shards")
+        cache = shard_cache["value"] if shard_cache else {}
+        result = generate_themes_mapreduce(
+            [summaries[f] for f in analyzed], self.themes_deployment, count,
+            clusters=[list(dict.fromkeys(position[f] for f in c if f in position)) for c in clusters],
+            cache=cache, post=self.post, api_key=self.api_key, verify_ssl=self.verify_ssl)
+        if not result["success"]:
+            return "failed"
+        conn.execute("BEGIN IMMEDIATE")
+        self._save_artifact(conn, album, "theme_shards", None,
+                            {key: cache[key] for key in result.get("shard_keys", []) if key in cache})
+        conn.execute("COMMIT")
+        conn.execute("BEGIN IMMEDIATE")
+        self._save_artifact(conn, album, "themes", sorted(analyzed), {"count": count, "themes": result["themes"]})
+        conn.execute("COMMIT")
+        return "computed"
+
+    def album(self, album: str) -> Dict[str, Any]:
+        """Stored state of an album: photos in order with summaries, and every artifact"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT p.path, p.fingerprint, s.summary FROM album_photos p LEFT JOIN summaries s "
+                "ON s.fingerprint = p.fingerprint AND s.config = ? WHERE p.album = ? ORDER BY p.position",
+                (self.config, album)).fetchall()
+            artifacts = {name: self._artifact(conn, album, name) for name in ("clusters", "themes", "plan")}
+        photos = [{"path": row["path"], "fingerprint": row["fingerprint"],
+                   "summary": json.loads(row["summary"]) if row["summary"] else None} for row in rows]
+        return {"album": album, "photos": photos,
+                **{name: artifact["value"] if artifact else None for name, artifact in artifacts.items()}}
+
+    def albums(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT album, COUNT(*) AS photos FROM album_photos GROUP BY album ORDER BY album")
+            return [dict(row) for row in rows]
+
+    def delete_album(self, album: str):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM album_photos WHERE album = ?", (album,))
+            conn.execute("DELETE FROM artifacts WHERE album = ?", (album,))
+            conn.execute("COMMIT")
+
+    def gc(self) -> Dict[str, int]:
+        """Drop summaries no album references and sources whose file is gone"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            summaries = conn.execute("DELETE FROM summaries WHERE fingerprint NOT IN "
+                                     "(SELECT fingerprint FROM album_photos)").rowcount
+            gone = [(row["path"],) for row in conn.execute("SELECT path FROM sources") if not os.path.exists(row["path"])]
+            conn.executemany("DELETE FROM sources WHERE path = ?", gone)
+            conn.execute("COMMIT")
+        return {"summaries": summaries, "sources": len(gone)}
@@ -0,0 +1,420 @@
+"""
+Persistent priority job queue and worker pool for album processing
+
+Jobs live in a local SQLite database so the service needs no external
+broker and survives restarts. Each job has a kind (pipeline stage such as
+"analyze" or "themes") and a priority class; workers always take the
+highest-priority queued job of their stage, so interactive work jumps ahead
+of batch uploads and backfills. Stages get their own worker counts, and a
+few workers per stage can be reserved for interactive jobs only so a large
+batch never occupies every slot.
+
+Handlers receive the job payload and a JobContext whose progress(index,
+total) has the same shape as the app's onProgress callbacks; every call is
+stored as an event that clients can poll. partial(data) stores pieces of
+the result (streamed themes, summaries) the same way, ahead of completion.
+
+Several service processes may share one database. Each WorkerPool
+heartbeats the jobs it is running, and only jobs whose heartbeat went
+stale (their service died) are put back in the queue.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from . import tracing
+
+PRIORITIES = {"interactive": 0, "batch": 1, "backfill": 2}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+# Running jobs are heartbeated this often, and requeued after STALE_AFTER without one
+HEARTBEAT_INTERVAL = 10.0
+STALE_AFTER = 3 * HEARTBEAT_INTERVAL
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    progress_index INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, kind, priority, id);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    progress_index INTEGER,
+    progress_total INTEGER,
+    data TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_by_job ON job_events (job_id, seq);
+"""
+
+Handler = Callable[[Dict[str, Any], "JobContext"], Any]
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class JobQueue:
+    """SQLite-backed queue; safe to share between threads and processes"""
+
+    def __init__(self, path: str = "jobs.db"):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "heartbeat_at" not in columns:
+                # Databases created before heartbeats
+                conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _event(self, conn: sqlite3.Connection, job_id: int, type: str, index: Optional[int] = None,
+               total: Optional[int] = None, data: Any = None):
+        conn.execute(
+            "INSERT INTO job_events (job_id, type, progress_index, progress_total, data, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, type, index, total, None if data is None else json.dumps(data), time.time()),
+        )
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: str = "batch") -> int:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}' (expected one of {', '.join(PRIORITIES)})")
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, priority, payload, created_at) VALUES (?, ?, ?, ?)",
+                (kind, PRIORITIES[priority], json.dumps(payload), time.time()),
+            )
+            job_id = cursor.lastrowid
+            self._event(conn, job_id, "queued", data={"kind": kind, "priority": priority})
+            conn.execute("COMMIT")
+        return job_id
+
+    def claim(self, kind: str, worker: str = "", max_priority: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Atomically move the best queued job of a kind to running"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            query = "SELECT * FROM jobs WHERE status = 'queued' AND kind = ?"
+            params: List[Any] = [kind]
+            if max_priority is not None:
+                query += " AND priority <= ?"
+                params.append(max_priority)
+            row = conn.execute(query + " ORDER BY priority, id LIMIT 1", params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (worker, now, now, row["id"]),
+            )
+            self._event(conn, row["id"], "started", data={"worker": worker})
+            conn.execute("COMMIT")
+        return self._decode(row, status="running")
+
+    def progress(self, job_id: int, index: int, total: int) -> bool:
+        """Record progress; returns True if cancellation has been requested"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET progress_index = ?, progress_total = ? WHERE id = ?", (index, total, job_id)
+            )
+            self._event(conn, job_id, "progress", index, total)
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+        return bool(row and row["cancel_requested"])
+
+    def heartbeat(self, job_ids: List[int]):
+        """Mark running jobs as still owned by a live service"""
+        if not job_ids:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' "
+                f"AND id IN ({', '.join('?' for _ in job_ids)})",
+                [time.time(), *job_ids],
+            )
+
+    def partial(self, job_id: int, data: Any):
+        """Record a partial result (a streamed theme or summary) as a "partial" event"""
+        with self._connect() as conn:
+            self._event(conn, job_id, "partial", data=data)
+
+    def _finish(self, job_id: int, status: str, result: Any = None, error: Optional[str] = None):
+        # Serialized first, so a result that is not JSON raises before anything is written
+        result_json = None if result is None else json.dumps(result)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result_json, error, time.time(), job_id),
+            )
+            self._event(conn, job_id, status, data={"error": error} if error else None)
+            conn.execute("COMMIT")
+
+    def complete(self, job_id: int, result: Any):
+        self._finish(job_id, "done", result=result)
+
+    def fail(self, job_id: int, error: str):
+        self._finish(job_id, "failed", error=error)
+
+    def mark_cancelled(self, job_id: int):
+        self._finish(job_id, "cancelled")
+
+    def cancel(self, job_id: int) -> str:
+        """
+        Cancel a job: queued jobs are cancelled immediately, running jobs are
+        flagged and stop at their next progress() call. Returns the new status.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                raise KeyError(f"No job with id {job_id}")
+            status = row["status"]
+            if status == "queued":
+                status = "cancelled"
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?", (time.time(), job_id)
+                )
+                self._event(conn, job_id, "cancelled")
+            elif status == "running":
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+                self._event(conn, job_id, "cancel_requested")
+            conn.execute("COMMIT")
+        return status
+
+    def requeue_running(self, stale_after: float = STALE_AFTER) -> int:
+        """
+        Put jobs left running by a dead service back in the queue
+
+        Only jobs without a heartbeat for stale_after seconds count as left
+        behind; jobs another live service is running keep running there.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            ids = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (time.time() - stale_after,),
+            )]
+            for job_id in ids:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL, heartbeat_at = NULL "
+                    "WHERE id = ?",
+                    (job_id,),
+                )
+                self._event(conn, job_id, "requeued")
+            conn.execute("COMMIT")
+        return len(ids)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query, params = "SELECT * FROM jobs", []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def events(self, job_id: int, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """Events for a job newer than after_seq, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after_seq)
+            ).fetchall()
+        return [
+            {
+                "seq": row["seq"],
+                "job_id": row["job_id"],
+                "type": row["type"],
+                "index": row["progress_index"],
+                "total": row["progress_total"],
+                "data": json.loads(row["data"]) if row["data"] else None,
+                "created_at": row["created_at"],
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _decode(row: sqlite3.Row, status: Optional[str] = None) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["priority"] = PRIORITY_NAMES.get(job["priority"], job["priority"])
+        if status:
+            job["status"] = status
+        return job
+
+
+class JobContext:
+    """Passed to handlers: progress and partial results, cooperative cancellation"""
+
+    def __init__(self, queue: JobQueue, job: Dict[str, Any]):
+        self.queue = queue
+        self.job = job
+        self.job_id = job["id"]
+        self._cancelled = False
+
+    def progress(self, index: int, total: int):
+        """onProgress(index, total); raises JobCancelled if the job was cancelled"""
+        self._cancelled = self.queue.progress(self.job_id, index, total) or self._cancelled
+        self.check_cancelled()
+
+    def partial(self, data: Any):
+        """Publish a piece of the result before the job finishes (see JobQueue.events)"""
+        self.queue.partial(self.job_id, data)
+
+    def is_cancelled(self) -> bool:
+        if not self._cancelled:
+            job = self.queue.get(self.job_id)
+            self._cancelled = bool(job and job["cancel_requested"])
+        return self._cancelled
+
+    def check_cancelled(self):
+        if self._cancelled:
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+
+class WorkerPool:
+    """
+    Worker threads per stage pulling from a JobQueue.
+
+    concurrency maps kind -> worker count. interactive_reserve maps kind ->
+    how many of those workers only ever take interactive jobs. A heartbeat
+    thread keeps this pool's running jobs fresh every heartbeat_interval
+    and requeues jobs of services that stopped heartbeating.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, Handler],
+        concurrency: Optional[Dict[str, int]] = None,
+        interactive_reserve: Optional[Dict[str, int]] = None,
+        poll_interval: float = 0.5,
+        on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        name: Optional[str] = None,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = {kind: (concurrency or {}).get(kind, 1) for kind in handlers}
+        self.interactive_reserve = interactive_reserve or {}
+        self.poll_interval = poll_interval
+        self.on_event = on_event or (lambda event, job: None)
+        self.heartbeat_interval = heartbeat_interval
+        # host:pid, so the worker column tells services sharing the database apart
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        # Set once the workers have finished, so jobs still finishing on stop() keep their heartbeat
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def _requeue_stale(self):
+        requeued = self.queue.requeue_running(stale_after=3 * self.heartbeat_interval)
+        if requeued:
+            self.on_event("requeued", {"count": requeued})
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            with self._lock:
+                job_ids = list(self._running)
+            self.queue.heartbeat(job_ids)
+            self._requeue_stale()
+
+    def start(self):
+        self._requeue_stale()
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"{self.name}-heartbeat", daemon=True)
+        heartbeat.start()
+        for kind, count in self.concurrency.items():
+            reserve = min(self.interactive_reserve.get(kind, 0), count)
+            for slot in range(count):
+                interactive_only = slot < reserve
+                name = f"{self.name}:{kind}-{slot}{'-interactive' if interactive_only else ''}"
+                thread = threading.Thread(
+                    target=self._work, args=(kind, name, interactive_only), name=name, daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop taking new jobs and wait for running ones to finish"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._stopped.set()
+
+    def _work(self, kind: str, name: str, interactive_only: bool):
+        max_priority = PRIORITIES["interactive"] if interactive_only else None
+        while not self._stop.is_set():
+            job = self.queue.claim(kind, worker=name, max_priority=max_priority)
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: Dict[str, Any]):
+        context = JobContext(self.queue, job)
+        with self._lock:
+            self._running.add(job["id"])
+        self.on_event("started", job)
+        with tracing.span("job", job_id=job["id"], job_kind=job["kind"], priority=job["priority"]) as span:
+            try:
+                result = self.handlers[job["kind"]](job["payload"], context)
+                # Inside the try: a result that cannot be stored (not JSON-serializable) fails the job
+                with tracing.span("result.write"):
+                    self.queue.complete(job["id"], result)
+            except JobCancelled:
+                self.queue.mark_cancelled(job["id"])
+                span.set(outcome="cancelled")
+                self.on_event("cancelled", job)
+            except Exception as e:
+                self.queue.fail(job["id"], f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}")
+                span.error(f"{type(e).__name__}: {e}")
+                self.on_event("failed", job)
+            else:
+                self.on_event("done", job)
+            finally:
+                with self._lock:
+                    self._running.discard(job["id"])
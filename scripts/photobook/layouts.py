@@ -0,0 +1,266 @@
+"""
+Layout template index for aspect-aware template selection
+
+Every layout from templateService (TEMPLATES) and photobookGenerator
+(getLayoutTemplate and the back cover) is keyed by slot count and an
+orientation signature, such as (L, P, P) for one landscape and two portrait
+slots. Queries go straight to the matching buckets of an inverted index, and
+candidates are ranked by how closely the slot aspect ratios fit the photos.
+
+scripts/layout-templates.json mirrors the TypeScript definitions and is
+regenerated from them with `template-index.py sync`.
+"""
+
+import json
+import math
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .document import PAGE_DIMENSIONS
+
+DEFAULT_TEMPLATES_PATH = Path(__file__).resolve().parent.parent / "layout-templates.json"
+
+TEMPLATE_SERVICE_TS = "src/services/templateService.ts"
+PHOTOBOOK_GENERATOR_TS = "src/services/photobook-studio/photobookGenerator.ts"
+
+# Aspect ratio (width / height) bands for the orientation signature
+PORTRAIT_BELOW = 0.8
+LANDSCAPE_ABOVE = 1.25
+
+# Ranking penalty per empty slot or photo left over when no template has exactly K slots
+COUNT_MISMATCH_PENALTY = 1.0
+
+Signature = Tuple[str, ...]
+
+
+def orientation(aspect: float) -> str:
+    """P(ortrait), S(quare-ish) or L(andscape)"""
+    if aspect < PORTRAIT_BELOW:
+        return "P"
+    if aspect > LANDSCAPE_ABOVE:
+        return "L"
+    return "S"
+
+
+def signature(aspects: Iterable[float]) -> Signature:
+    """Sorted orientation classes, so slot and photo order do not matter"""
+    return tuple(sorted(orientation(a) for a in aspects))
+
+
+def signature_distance(a: Signature, b: Signature) -> int:
+    """How many photos would land in a slot of a different orientation (or have no slot)"""
+    mismatched = sum(abs(a.count(c) - b.count(c)) for c in "LPS")
+    return (mismatched - abs(len(a) - len(b))) // 2 + abs(len(a) - len(b))
+
+
+# -- TypeScript mirror --
+
+def _literal_block(source: str, declaration: str) -> str:
+    """The bracketed literal assigned in `declaration`, matched brace by brace"""
+    start = source.index(declaration) + len(declaration)
+    start = min(i for i in (source.find("[", start), source.find("{", start)) if i >= 0)
+    depth, quote = 0, None
+    for i in range(start, len(source)):
+        char = source[i]
+        if quote:
+            if char == quote and source[i - 1] != "\\":
+                quote = None
+        elif char in "'\"`":
+            quote = char
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return source[start:i + 1]
+    raise ValueError(f"unterminated literal after {declaration!r}")
+
+
+def ts_literal_to_json(literal: str) -> Any:
+    """Convert a plain TypeScript object/array literal (no expressions) to Python"""
+    text = re.sub(r"(^|\s)//[^\n]*", r"\1", literal)
+    text = re.sub(r"'((?:[^'\\]|\\.)*)'", lambda m: json.dumps(m.group(1)), text)
+    text = re.sub(r"([{,]\s*)([A-Za-z_$][\w$]*)\s*:", r'\1"\2":', text)
+    text = re.sub(r",(\s*[}\]])", r"\1", text)
+    return json.loads(text)
+
+
+def _slot(raw: Dict[str, Any]) -> Dict[str, Any]:
+    slot = {k: raw[k] for k in ("id", "x", "y", "width", "height")}
+    slot["rotation"] = raw.get("rotation", 0)
+    return slot
+
+
+def extract_templates(repo_root: Union[str, Path]) -> List[Dict[str, Any]]:
+    """Read every layout template out of the TypeScript sources"""
+    root = Path(repo_root)
+    templates = []
+
+    service = (root / TEMPLATE_SERVICE_TS).read_text(encoding="utf-8")
+    for raw in ts_literal_to_json(_literal_block(service, "const TEMPLATES: PhotoTemplate[] =")):
+        layout = raw["layout"]
+        templates.append({
+            "id": raw["template_id"],
+            "source": "templateService",
+            "name": raw["name"],
+            "theme_id": raw["theme_id"],
+            "category": raw["category"],
+            "pageSize": layout["pageSize"],
+            "slots": [_slot(s) for s in layout["imageSlots"]],
+        })
+
+    generator = (root / PHOTOBOOK_GENERATOR_TS).read_text(encoding="utf-8")
+    a4 = dict(zip(("width", "height"), PAGE_DIMENSIONS[("A4", "portrait")]))
+    layouts = ts_literal_to_json(_literal_block(generator, "const layouts: Record<string, StudioLayoutTemplate> ="))
+    layouts["back-cover"] = ts_literal_to_json(_literal_block(generator, "const backCoverTemplate: StudioLayoutTemplate ="))
+    for layout_id, layout in layouts.items():
+        if not layout["photoSlots"]:
+            continue
+        templates.append({
+            "id": layout_id,
+            "source": "photobookGenerator",
+            "name": layout_id,
+            "theme_id": None,
+            "category": layout_id.split("-")[0] if layout_id != "back-cover" else "back-cover",
+            "pageSize": a4,
+            "slots": [_slot(s) for s in layout["photoSlots"]],
+        })
+    return templates
+
+
+def spread(count: int, length: int) -> List[int]:
+    """`count` evenly spaced positions in range(length), for pairing unequal lists"""
+    if count >= length:
+        return list(range(length))
+    if count == 1:
+        return [length // 2]
+    return [round(i * (length - 1) / (count - 1)) for i in range(count)]
+
+
+def load_templates(path: Union[str, Path] = DEFAULT_TEMPLATES_PATH) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["templates"]
+
+
+def slot_aspect(slot: Dict[str, Any], page_size: Dict[str, int]) -> float:
+    """Slot width / height in pixels (slot sizes are percentages of the page)"""
+    return (slot["width"] * page_size["width"]) / (slot["height"] * page_size["height"])
+
+
+# -- index --
+
+class TemplateIndex:
+    """
+    Inverted index from (slot count, orientation signature) to templates
+
+    Each entry keeps its slots' log aspect ratios pre-sorted, so scoring a
+    candidate against K photos is one linear pass; per-query work is limited to
+    the buckets whose signature is closest to the photos'.
+    """
+
+    def __init__(self, templates: List[Dict[str, Any]], page_size: Optional[Dict[str, int]] = None):
+        self.templates = {t["id"]: t for t in templates}
+        self.entries: List[Dict[str, Any]] = []
+        self.positions: Dict[str, int] = {}
+        self.buckets: Dict[Tuple[int, Signature], List[int]] = {}
+        self.facets: Dict[Tuple[str, Any], set] = {}
+        self._plans: Dict[Tuple, List[List[int]]] = {}
+
+        for template in templates:
+            size = page_size or template["pageSize"]
+            aspects = [slot_aspect(slot, size) for slot in template["slots"]]
+            order = sorted(range(len(aspects)), key=lambda i: aspects[i])
+            entry = {
+                "id": template["id"],
+                "count": len(aspects),
+                "signature": signature(aspects),
+                "log_aspects": [math.log(aspects[i]) for i in order],
+                "slot_ids": [template["slots"][i]["id"] for i in order],
+            }
+            number = len(self.entries)
+            self.entries.append(entry)
+            self.positions[template["id"]] = number
+            self.buckets.setdefault((entry["count"], entry["signature"]), []).append(number)
+            for facet in ("theme_id", "category", "source"):
+                self.facets.setdefault((facet, template.get(facet)), set()).add(number)
+            self.facets.setdefault(("slots", entry["count"]), set()).add(number)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _plan(self, key: Tuple[int, Signature], filters: Tuple[Tuple[str, Any], ...]) -> List[List[int]]:
+        """Candidate entries grouped by signature distance, best group first (cached per query shape)"""
+        cache_key = (key, filters)
+        if cache_key not in self._plans:
+            allowed = None
+            for facet in filters:
+                members = self.facets.get(facet, set())
+                allowed = members if allowed is None else allowed & members
+            groups: Dict[int, List[int]] = {}
+            for bucket_key, members in self.buckets.items():
+                distance = signature_distance(key[1], bucket_key[1])
+                kept = [m for m in members if allowed is None or m in allowed]
+                if kept:
+                    groups.setdefault(distance, []).extend(kept)
+            self._plans[cache_key] = [groups[d] for d in sorted(groups)]
+        return self._plans[cache_key]
+
+    @staticmethod
+    def _cost(entry: Dict[str, Any], log_photos: Sequence[float]) -> float:
+        """Mean |log aspect| mismatch of the sorted pairing (optimal for 1-D matching)"""
+        slots = entry["log_aspects"]
+        if len(slots) == len(log_photos):
+            return sum(abs(s - p) for s, p in zip(slots, log_photos)) / len(slots)
+        paired = min(len(slots), len(log_photos))
+        extra = COUNT_MISMATCH_PENALTY * abs(len(slots) - len(log_photos))
+        if paired == 0:
+            return extra
+        # With unequal counts, the shorter list pairs with an evenly spread subset of the longer one
+        slot_picks = [slots[i] for i in spread(paired, len(slots))]
+        photo_picks = [log_photos[i] for i in spread(paired, len(log_photos))]
+        return sum(abs(s - p) for s, p in zip(slot_picks, photo_picks)) / paired + extra
+
+    def query(self, aspects: Sequence[float], top: int = 5, theme_id: Optional[str] = None,
+              category: Optional[str] = None, source: Optional[str] = None,
+              slots: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Best templates for photos with these aspect ratios (width / height)
+
+        Results are ordered by signature distance, then aspect mismatch, and
+        each carries the slot-to-photo assignment. `slots` restricts results
+        to templates with exactly that many slots.
+        """
+        log_photos = sorted(math.log(a) for a in aspects)
+        key = (len(aspects), signature(aspects))
+        filters = tuple(f for f in (("theme_id", theme_id), ("category", category), ("source", source),
+                                    ("slots", slots)) if f[1])
+
+        results: List[Tuple[Tuple[int, float], int]] = []
+        for distance, group in enumerate(self._plan(key, filters)):
+            results.extend(((distance, self._cost(self.entries[i], log_photos)), i) for i in group)
+            if len(results) >= top:
+                break
+        results.sort()
+        return [{"id": self.entries[i]["id"], "distance": rank[0], "cost": round(rank[1], 4),
+                 "slots": self.entries[i]["count"], "assignment": self.assign(self.entries[i]["id"], aspects)}
+                for rank, i in results[:top]]
+
+    def assign(self, template_id: str, aspects: Sequence[float]) -> Dict[str, int]:
+        """
+        Slot id -> photo index, pairing photos and slots in aspect-ratio order
+
+        Aspect-aware replacement for mapImagesToSlots' array-order assignment.
+        """
+        slots = self.entries[self.positions[template_id]]["slot_ids"]
+        photos = sorted(range(len(aspects)), key=lambda i: aspects[i])
+        paired = min(len(slots), len(photos))
+        return {slots[s]: photos[p] for s, p in zip(spread(paired, len(slots)), spread(paired, len(photos)))}
+
+    def linear_query(self, aspects: Sequence[float], top: int = 5) -> List[str]:
+        """Reference implementation scanning every template, for benchmarks and checks"""
+        log_photos = sorted(math.log(a) for a in aspects)
+        sig = signature(aspects)
+        ranked = sorted((signature_distance(sig, e["signature"]), self._cost(e, log_photos), i)
+                        for i, e in enumerate(self.entries))
+        return [self.entries[i]["id"] for _, _, i in ranked[:top]]
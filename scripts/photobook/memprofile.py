@@ -0,0 +1,318 @@
+"""
+Memory profiling for batch runs: peak and retained memory per stage and call site
+
+The vision scripts hold several copies of each photo at once (file bytes,
+base64 str, the request JSON, parsed responses), and peak RSS was only ever
+guessed when sizing worker containers. MemoryProfiler combines:
+
+- tracemalloc, for Python allocations: the peak and what is still alive at
+  the end, each grouped by the innermost call site in scripts/ (so a base64
+  str made in json.dumps is charged to the line that built the request)
+- RSS sampled on a background thread, which also sees what tracemalloc
+  cannot (Pillow's decode buffers, libjpeg, numpy)
+- tracing spans (photobook/tracing.py): every stage that opens a span gets
+  its own peak, retained bytes and RSS growth, also set as mem.* attributes
+  on the span when a trace file is written
+
+Per-image figures divide by the number of image.load spans (photos loaded),
+unless the caller sets `images`. budget_error() compares RSS growth per
+image with a budget, so a run that would no longer fit its container fails.
+
+tracemalloc slows allocation-heavy Python code, so profile a representative
+run rather than leaving it on. Stage peaks are exact for stages that run
+one at a time; with concurrent stages, a stage's peak is the process's peak
+while it was open.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from . import tracing
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Traceback depth kept per allocation; deep enough to get from json/base64 back to our code
+FRAMES = 16
+SAMPLE_INTERVAL = 0.05
+TOP_SITES = 12
+# Smaller call sites are left out of the printed summary (not the report)
+SITE_MIN_BYTES = 64 * 1024
+# Take a new peak snapshot once traced memory is this much above the last one
+SNAPSHOT_GROWTH = 1.10
+SNAPSHOT_MIN_BYTES = 1024 ** 2
+# RSS timeline points kept in the report
+TIMELINE_POINTS = 200
+# Process exit status when a run goes over its memory budget
+BUDGET_EXIT_CODE = 3
+
+SCRIPTS_DIR = str(Path(__file__).resolve().parent.parent)
+IMAGE_STAGE = "image.load"
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    # The profiler's own bookkeeping (RSS timeline, stage table)
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size in bytes, None where /proc is not available"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_rss() -> int:
+    """Peak RSS of the process so far, in bytes (ru_maxrss is KB on Linux, bytes on macOS); 0 if unknown"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _site(traceback: tracemalloc.Traceback) -> str:
+    """Innermost frame in scripts/, with the frame that allocated when that is elsewhere"""
+    innermost = traceback[-1]
+    for frame in reversed(traceback):
+        if frame.filename.startswith(SCRIPTS_DIR):
+            site = f"{os.path.relpath(frame.filename, SCRIPTS_DIR)}:{frame.lineno}"
+            if (frame.filename, frame.lineno) != (innermost.filename, innermost.lineno):
+                site += f" via {os.path.basename(innermost.filename)}:{innermost.lineno}"
+            return site
+    return f"{innermost.filename}:{innermost.lineno}"
+
+
+def top_sites(snapshot: tracemalloc.Snapshot, top: int = TOP_SITES) -> List[Dict[str, Any]]:
+    sites: Dict[str, List[int]] = {}
+    for stat in snapshot.statistics("traceback"):
+        entry = sites.setdefault(_site(stat.traceback), [0, 0])
+        entry[0] += stat.size
+        entry[1] += stat.count
+    ranked = sorted(sites.items(), key=lambda item: -item[1][0])[:top]
+    return [{"site": site, "bytes": size, "blocks": count} for site, (size, count) in ranked]
+
+
+class _Frame:
+    __slots__ = ("name", "start_traced", "peak_traced", "start_rss", "max_rss")
+
+    def __init__(self, name: str, traced: int, rss: int):
+        self.name = name
+        self.start_traced = traced
+        self.peak_traced = traced
+        self.start_rss = rss
+        self.max_rss = rss
+
+
+class MemoryProfiler:
+    """
+    tracemalloc + RSS sampling for the duration of a run, attributed to tracing spans
+
+        profiler = MemoryProfiler().start()
+        ...run the batch...
+        report = profiler.stop()
+    """
+
+    def __init__(self, frames: int = FRAMES, interval: float = SAMPLE_INTERVAL, top: int = TOP_SITES,
+                 images: Optional[int] = None):
+        self.frames = frames
+        self.interval = interval
+        self.top = top
+        self.images = images
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.image_count = 0
+        self._local = threading.local()
+        self._open: Dict[int, _Frame] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._timeline: List[List[float]] = []
+        self._peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._peak_snapshot_bytes = 0
+        # tracemalloc's own peak is reset at every span start, so the run's peak is kept here
+        self._max_traced = 0
+        self._started_tracemalloc = False
+
+    def start(self) -> "MemoryProfiler":
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        self._start_time = time.perf_counter()
+        self._baseline_rss = current_rss() or max_rss()
+        self._baseline_traced = tracemalloc.get_traced_memory()[0]
+        self._start_snapshot = tracemalloc.take_snapshot()
+        self._peak_rss = self._baseline_rss
+        tracing.add_listener(self)
+        self._sampler = threading.Thread(target=self._sample, name="memory-sampler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def _rss(self) -> int:
+        rss = current_rss()
+        return rss if rss is not None else max_rss()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = self._rss()
+            traced = tracemalloc.get_traced_memory()[0]
+            with self._lock:
+                self._peak_rss = max(self._peak_rss, rss)
+                for frame in self._open.values():
+                    frame.max_rss = max(frame.max_rss, rss)
+                self._timeline.append([round(time.perf_counter() - self._start_time, 3), rss])
+            if traced > max(SNAPSHOT_MIN_BYTES, self._peak_snapshot_bytes * SNAPSHOT_GROWTH):
+                # The snapshot is taken a little after `traced` was read; it is the closest we get to the peak
+                self._peak_snapshot = tracemalloc.take_snapshot()
+                self._peak_snapshot_bytes = traced
+
+    # tracing listener
+
+    def span_started(self, span: "tracing.Span"):
+        traced, peak = tracemalloc.get_traced_memory()
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        if stack:
+            stack[-1].peak_traced = max(stack[-1].peak_traced, peak)
+        tracemalloc.reset_peak()
+        frame = _Frame(span.name, traced, self._rss())
+        stack.append(frame)
+        with self._lock:
+            self._open[id(frame)] = frame
+
+    def span_ended(self, span: "tracing.Span"):
+        traced, peak = tracemalloc.get_traced_memory()
+        rss = self._rss()
+        stack = getattr(self._local, "stack", None)
+        if not stack:
+            # Opened before the profiler started
+            return
+        frame = stack.pop()
+        with self._lock:
+            self._open.pop(id(frame), None)
+            frame.max_rss = max(frame.max_rss, rss)
+        frame.peak_traced = max(frame.peak_traced, peak)
+        if stack:
+            stack[-1].peak_traced = max(stack[-1].peak_traced, frame.peak_traced)
+        self._max_traced = max(self._max_traced, frame.peak_traced)
+        peak_delta = frame.peak_traced - frame.start_traced
+        retained = traced - frame.start_traced
+        rss_growth = frame.max_rss - frame.start_rss
+        span.set(**{"mem.peak_bytes": peak_delta, "mem.retained_bytes": retained, "mem.rss_growth_bytes": rss_growth})
+        with self._lock:
+            if span.name == IMAGE_STAGE:
+                self.image_count += 1
+            stage = self.stages.setdefault(span.name, {"count": 0, "peak_bytes_max": 0, "peak_bytes_total": 0,
+                                                       "retained_bytes": 0, "rss_growth_max": 0})
+            stage["count"] += 1
+            stage["peak_bytes_max"] = max(stage["peak_bytes_max"], peak_delta)
+            stage["peak_bytes_total"] += peak_delta
+            stage["retained_bytes"] += retained
+            stage["rss_growth_max"] = max(stage["rss_growth_max"], rss_growth)
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling and tracing allocations; returns the report"""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        tracing.remove_listener(self)
+        final_traced, peak_traced = tracemalloc.get_traced_memory()
+        peak_traced = max(peak_traced, self._max_traced)
+        final_snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        # Filtering is slow on large snapshots, so it is done once here rather than while sampling
+        final_snapshot = final_snapshot.filter_traces(_FILTERS)
+        if self._peak_snapshot is None or final_traced >= self._peak_snapshot_bytes:
+            self._peak_snapshot = final_snapshot
+        else:
+            self._peak_snapshot = self._peak_snapshot.filter_traces(_FILTERS)
+        final_rss = self._rss()
+        peak_rss = max(self._peak_rss, final_rss, max_rss())
+        images = self.images if self.images is not None else self.image_count
+
+        retained = final_snapshot.compare_to(self._start_snapshot.filter_traces(_FILTERS), "traceback")
+        retained_sites: Dict[str, int] = {}
+        for diff in retained:
+            if diff.size_diff > 0:
+                site = _site(diff.traceback)
+                retained_sites[site] = retained_sites.get(site, 0) + diff.size_diff
+        stride = max(1, len(self._timeline) // TIMELINE_POINTS)
+        stages = {}
+        for name, stage in sorted(self.stages.items(), key=lambda item: -item[1]["peak_bytes_max"]):
+            stages[name] = {**stage, "peak_bytes_mean": stage["peak_bytes_total"] // max(1, stage["count"])}
+            del stages[name]["peak_bytes_total"]
+        return {
+            "seconds": round(time.perf_counter() - self._start_time, 3),
+            "images": images,
+            "rss": {"baseline": self._baseline_rss, "peak": peak_rss, "final": final_rss,
+                    "per_image": (peak_rss - self._baseline_rss) // images if images else None},
+            "traced": {"peak": peak_traced - self._baseline_traced, "retained": final_traced - self._baseline_traced,
+                       "per_image": (peak_traced - self._baseline_traced) // images if images else None},
+            "stages": stages,
+            "peak_sites": top_sites(self._peak_snapshot, self.top),
+            "retained_sites": [{"site": site, "bytes": size} for site, size in
+                               sorted(retained_sites.items(), key=lambda item: -item[1])[: self.top]],
+            "rss_timeline": self._timeline[::stride],
+        }
+
+
+def budget_error(report: Dict[str, Any], budget_mb: Optional[float]) -> Optional[str]:
+    """Why the run is over its per-image RSS budget, or None"""
+    per_image = report["rss"]["per_image"]
+    if not budget_mb or per_image is None:
+        return None
+    if per_image > budget_mb * 1024 ** 2:
+        return (f"RSS grew {per_image / 1024 ** 2:.1f} MB per image over {report['images']} images, "
+                f"above the {budget_mb:g} MB budget")
+    return None
+
+
+def summary_lines(report: Dict[str, Any], top: int = 8) -> List[str]:
+    """Plain-text summary for the scripts to log"""
+
+    def mb(value: Optional[int]) -> str:
+        return "-" if value is None else f"{value / 1024 ** 2:.1f} MB"
+
+    rss, traced = report["rss"], report["traced"]
+    lines = [
+        f"RSS: {mb(rss['baseline'])} at start, {mb(rss['peak'])} peak, {mb(rss['final'])} at end "
+        f"({mb(rss['per_image'])} per image over {report['images']} images)",
+        f"Python allocations: {mb(traced['peak'])} peak, {mb(traced['retained'])} still held at end "
+        f"({mb(traced['per_image'])} per image)",
+        "",
+        f"  {'Stage':<22} {'Count':>6} {'Peak max':>10} {'Peak mean':>10} {'Retained':>10} {'RSS growth':>11}",
+    ]
+    for name, stage in list(report["stages"].items())[:top]:
+        lines.append(f"  {name:<22} {stage['count']:>6} {mb(stage['peak_bytes_max']):>10} "
+                     f"{mb(stage['peak_bytes_mean']):>10} {mb(stage['retained_bytes']):>10} "
+                     f"{mb(stage['rss_growth_max']):>11}")
+    for title, sites in (("Largest at peak", report["peak_sites"]), ("Still held at end", report["retained_sites"])):
+        sites = [site for site in sites[:top] if site["bytes"] >= SITE_MIN_BYTES]
+        lines += ["", f"  {title}:" if sites else f"  {title}: nothing over {SITE_MIN_BYTES // 1024} KB"]
+        lines += [f"    {mb(site['bytes']):>10}  {site['site']}" for site in sites]
+    return lines
+
+
+def write_report(report: Dict[str, Any], path: Union[str, Path]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,641 @@
+"""
+Header-only photo metadata: dimensions, capture time, orientation, GPS, ICC
+
+Layout code only has originalDimensions, and Pillow's getexif() needs an
+opened image. This scanner walks container headers directly (JPEG markers up
+to SOS, PNG chunks up to IDAT, WebP RIFF chunks, HEIC/AVIF ISO-BMFF boxes)
+and never touches compressed pixel data, so a photo costs a few small reads.
+
+Results are cached by path and validated against the file's mtime and size,
+so re-scanning an unchanged library only costs a stat() per file.
+"""
+
+import json
+import math
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+SCAN_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif", ".avif")
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "photobook" / "metadata.json"
+CACHE_VERSION = 1
+
+# TIFF field type -> byte size
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_ORIENTATION = 0x0112
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_OFFSET_TIME_ORIGINAL = 0x9011
+
+IFD0_TAGS = {TAG_MAKE, TAG_MODEL, TAG_ORIENTATION, TAG_DATETIME, TAG_EXIF_IFD, TAG_GPS_IFD}
+EXIF_TAGS = {TAG_DATETIME_ORIGINAL, TAG_OFFSET_TIME_ORIGINAL}
+GPS_TAGS = {1, 2, 3, 4, 5, 6}
+
+# JPEG start-of-frame markers (C4 DHT, C8 JPG and CC DAC share the range but are not frames)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# HEIF irot (counter-clockwise quarter turns) and imir axis -> EXIF orientation
+HEIF_ORIENTATION = {
+    (0, None): 1, (1, None): 8, (2, None): 3, (3, None): 6,
+    (0, 0): 2, (1, 0): 7, (2, 0): 4, (3, 0): 5,
+    (0, 1): 4, (1, 1): 5, (2, 1): 2, (3, 1): 7,
+}
+
+EARTH_RADIUS_KM = 6371.0
+
+
+# -- EXIF (TIFF) --
+
+def _tiff_value(data: bytes, endian: str, field_type: int, count: int, offset: int) -> Any:
+    if field_type == 2:
+        return data[offset:offset + count].split(b"\0", 1)[0].decode("latin-1").strip()
+    if field_type in (1, 7):
+        raw = data[offset:offset + count]
+        return raw[0] if count == 1 and raw else raw
+    if field_type in (5, 10):
+        code = "I" if field_type == 5 else "i"
+        pairs = struct.unpack_from(f"{endian}{2 * count}{code}", data, offset)
+        values = tuple(n / d if d else 0.0 for n, d in zip(pairs[::2], pairs[1::2]))
+    else:
+        code = {3: "H", 4: "I", 9: "i"}[field_type]
+        values = struct.unpack_from(f"{endian}{count}{code}", data, offset)
+    return values[0] if count == 1 else values
+
+
+def _read_ifd(data: bytes, endian: str, offset: int, wanted: set) -> Dict[int, Any]:
+    entries: Dict[int, Any] = {}
+    if offset <= 0 or offset + 2 > len(data):
+        return entries
+    (count,) = struct.unpack_from(f"{endian}H", data, offset)
+    for n in range(count):
+        position = offset + 2 + 12 * n
+        if position + 12 > len(data):
+            break
+        tag, field_type, values = struct.unpack_from(f"{endian}HHI", data, position)
+        if tag not in wanted or field_type not in TIFF_TYPE_SIZES:
+            continue
+        size = TIFF_TYPE_SIZES[field_type] * values
+        value_offset = position + 8
+        if size > 4:
+            (value_offset,) = struct.unpack_from(f"{endian}I", data, position + 8)
+        if value_offset + size > len(data):
+            continue
+        entries[tag] = _tiff_value(data, endian, field_type, values, value_offset)
+    return entries
+
+
+def _gps_degrees(value: Any, ref: Any, negative: str) -> Optional[float]:
+    if not isinstance(value, tuple) or len(value) != 3:
+        return None
+    degrees = value[0] + value[1] / 60 + value[2] / 3600
+    return round(-degrees if ref == negative else degrees, 6)
+
+
+def exif_time(value: Optional[str], offset: Optional[str] = None) -> Optional[str]:
+    """'2024:01:01 08:00:00' (+ OffsetTimeOriginal) -> ISO 8601, or None if unset/invalid"""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.strptime(value[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    iso = parsed.isoformat()
+    if offset and isinstance(offset, str) and len(offset) == 6 and offset[0] in "+-":
+        iso += offset
+    return iso
+
+
+def parse_exif(data: bytes) -> Dict[str, Any]:
+    """Orientation, capture time, GPS and camera from a TIFF-structured EXIF block"""
+    if data[:6] == b"Exif\0\0":
+        data = data[6:]
+    if len(data) < 8 or data[:2] not in (b"II", b"MM"):
+        return {}
+    endian = "<" if data[:2] == b"II" else ">"
+    (first,) = struct.unpack_from(f"{endian}I", data, 4)
+    ifd0 = _read_ifd(data, endian, first, IFD0_TAGS)
+    exif = _read_ifd(data, endian, ifd0.get(TAG_EXIF_IFD, 0), EXIF_TAGS)
+    gps = _read_ifd(data, endian, ifd0.get(TAG_GPS_IFD, 0), GPS_TAGS)
+
+    result: Dict[str, Any] = {}
+    if isinstance(ifd0.get(TAG_ORIENTATION), int) and 1 <= ifd0[TAG_ORIENTATION] <= 8:
+        result["orientation"] = ifd0[TAG_ORIENTATION]
+    taken = exif_time(exif.get(TAG_DATETIME_ORIGINAL), exif.get(TAG_OFFSET_TIME_ORIGINAL))
+    if taken:
+        result["takenAt"], result["takenAtSource"] = taken, "DateTimeOriginal"
+    elif exif_time(ifd0.get(TAG_DATETIME)):
+        result["takenAt"], result["takenAtSource"] = exif_time(ifd0[TAG_DATETIME]), "DateTime"
+    lat = _gps_degrees(gps.get(2), gps.get(1), "S")
+    lon = _gps_degrees(gps.get(4), gps.get(3), "W")
+    if lat is not None and lon is not None:
+        result["gps"] = {"lat": lat, "lon": lon}
+        if isinstance(gps.get(6), float):
+            result["gps"]["alt"] = round(-gps[6] if gps.get(5) == 1 else gps[6], 1)
+    camera = " ".join(v for v in (ifd0.get(TAG_MAKE), ifd0.get(TAG_MODEL)) if isinstance(v, str) and v)
+    if camera:
+        result["camera"] = camera
+    return result
+
+
+# -- ICC --
+
+def parse_icc(profile: bytes) -> Dict[str, Any]:
+    """Size, color space and description ('sRGB IEC61966-2.1', 'Display P3', ...) of an ICC profile"""
+    info: Dict[str, Any] = {"bytes": len(profile)}
+    if len(profile) < 132:
+        return info
+    info["colorSpace"] = profile[16:20].decode("latin-1").strip()
+    (tags,) = struct.unpack_from(">I", profile, 128)
+    for n in range(min(tags, (len(profile) - 132) // 12)):
+        signature, offset, size = struct.unpack_from(">4sII", profile, 132 + 12 * n)
+        if signature != b"desc" or offset + size > len(profile) or size < 12:
+            continue
+        kind = profile[offset:offset + 4]
+        if kind == b"desc":
+            (length,) = struct.unpack_from(">I", profile, offset + 8)
+            info["description"] = profile[offset + 12:offset + 12 + length].split(b"\0", 1)[0].decode("latin-1")
+        elif kind == b"mluc":
+            records, record_size = struct.unpack_from(">II", profile, offset + 8)
+            if records:
+                length, start = struct.unpack_from(">II", profile, offset + 16 + 4)
+                text = profile[offset + start:offset + start + length]
+                info["description"] = text.decode("utf-16-be", errors="replace").rstrip("\0")
+        break
+    return info
+
+
+# -- containers --
+
+def _scan_jpeg(f: BinaryIO) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"format": "jpeg"}
+    icc_chunks: Dict[int, bytes] = {}
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            break
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            break
+        code = marker[0]
+        if code == 0xD8 or code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):  # EOI, or SOS: compressed data follows
+            break
+        header = f.read(2)
+        if len(header) < 2:
+            break
+        length = struct.unpack(">H", header)[0] - 2
+        if code in SOF_MARKERS:
+            frame = f.read(length)
+            result["height"], result["width"] = struct.unpack_from(">HH", frame, 1)
+        elif code == 0xE1:
+            payload = f.read(length)
+            if payload.startswith(b"Exif\0\0") and "exif" not in result:
+                result["exif"] = parse_exif(payload)
+        elif code == 0xE2:
+            payload = f.read(length)
+            if payload.startswith(b"ICC_PROFILE\0") and len(payload) > 14:
+                icc_chunks[payload[12]] = payload[14:]
+        else:
+            f.seek(length, os.SEEK_CUR)
+    if icc_chunks:
+        result["icc"] = parse_icc(b"".join(icc_chunks[n] for n in sorted(icc_chunks)))
+    return result
+
+
+def _scan_png(f: BinaryIO) -> Dict[str, Any]:
+    """Chunks before the first IDAT (where libpng, Pillow and phones put eXIf and iCCP)"""
+    result: Dict[str, Any] = {"format": "png"}
+    f.seek(8)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, kind = struct.unpack(">I4s", header)
+        if kind in (b"IDAT", b"IEND"):
+            break
+        if kind == b"IHDR":
+            result["width"], result["height"] = struct.unpack(">II", f.read(8))
+            f.seek(length - 8 + 4, os.SEEK_CUR)
+        elif kind == b"eXIf":
+            result["exif"] = parse_exif(f.read(length))
+            f.seek(4, os.SEEK_CUR)
+        elif kind == b"iCCP":
+            data = f.read(length)
+            name, _, rest = data.partition(b"\0")
+            try:
+                result["icc"] = parse_icc(zlib.decompress(rest[1:]))
+            except zlib.error:
+                result["icc"] = {"bytes": 0, "description": name.decode("latin-1")}
+            f.seek(4, os.SEEK_CUR)
+        elif kind == b"sRGB":
+            result["icc"] = {"bytes": 0, "colorSpace": "RGB", "description": "sRGB (PNG sRGB chunk)"}
+            f.seek(length + 4, os.SEEK_CUR)
+        else:
+            f.seek(length + 4, os.SEEK_CUR)
+    return result
+
+
+def _scan_webp(f: BinaryIO) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"format": "webp"}
+    f.seek(12)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        kind, length = struct.unpack("<4sI", header)
+        padded = length + (length & 1)
+        if kind == b"VP8X":
+            data = f.read(padded)
+            result["width"] = int.from_bytes(data[4:7], "little") + 1
+            result["height"] = int.from_bytes(data[7:10], "little") + 1
+        elif kind == b"VP8 " and "width" not in result:
+            data = f.read(10)
+            width, height = struct.unpack_from("<HH", data, 6)
+            result["width"], result["height"] = width & 0x3FFF, height & 0x3FFF
+            f.seek(padded - 10, os.SEEK_CUR)
+        elif kind == b"VP8L" and "width" not in result:
+            data = f.read(5)
+            bits = int.from_bytes(data[1:5], "little")
+            result["width"], result["height"] = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            f.seek(padded - 5, os.SEEK_CUR)
+        elif kind == b"EXIF":
+            result["exif"] = parse_exif(f.read(padded)[:length])
+        elif kind == b"ICCP":
+            result["icc"] = parse_icc(f.read(padded)[:length])
+        else:
+            f.seek(padded, os.SEEK_CUR)
+    return result
+
+
+def _boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterable[Tuple[bytes, int, int]]:
+    """(type, payload start, payload end) for the ISO-BMFF boxes in data[start:end]"""
+    end = len(data) if end is None else end
+    position = start
+    while position + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, position)
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", data, position + 8)
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header:
+            break
+        yield kind, position + header, min(position + size, end)
+        position += size
+
+
+def _uint(data: bytes, offset: int, size: int) -> int:
+    return int.from_bytes(data[offset:offset + size], "big") if size else 0
+
+
+def _heif_meta(meta: bytes) -> Dict[str, Any]:
+    """Primary item, Exif item location and primary item properties from a 'meta' box payload"""
+    primary, exif_item = None, None
+    locations: Dict[int, List[Tuple[int, int]]] = {}
+    properties: List[Tuple[bytes, int, int]] = []
+    associations: Dict[int, List[int]] = {}
+    for kind, start, end in _boxes(meta, 4):  # 'meta' is a full box
+        version = meta[start]
+        if kind == b"pitm":
+            primary = _uint(meta, start + 4, 2 if version == 0 else 4)
+        elif kind == b"iinf":
+            count_size = 2 if version == 0 else 4
+            for entry, entry_start, _ in _boxes(meta, start + 4 + count_size, end):
+                entry_version = meta[entry_start]
+                if entry == b"infe" and entry_version >= 2:
+                    id_size = 2 if entry_version == 2 else 4
+                    item_id = _uint(meta, entry_start + 4, id_size)
+                    if meta[entry_start + 6 + id_size:entry_start + 10 + id_size] == b"Exif":
+                        exif_item = item_id
+        elif kind == b"iloc":
+            offset_size, length_size = meta[start + 4] >> 4, meta[start + 4] & 15
+            base_size, index_size = meta[start + 5] >> 4, (meta[start + 5] & 15) if version in (1, 2) else 0
+            position = start + 6
+            count = _uint(meta, position, 2 if version < 2 else 4)
+            position += 2 if version < 2 else 4
+            for _ in range(count):
+                item_id = _uint(meta, position, 2 if version < 2 else 4)
+                position += 2 if version < 2 else 4
+                if version in (1, 2):
+                    position += 2  # construction method
+                position += 2  # data reference index
+                base = _uint(meta, position, base_size)
+                position += base_size
+                extents = _uint(meta, position, 2)
+                position += 2
+                spans = []
+                for _ in range(extents):
+                    position += index_size
+                    offset = _uint(meta, position, offset_size)
+                    position += offset_size
+                    length = _uint(meta, position, length_size)
+                    position += length_size
+                    spans.append((base + offset, length))
+                locations[item_id] = spans
+        elif kind == b"iprp":
+            for child, child_start, child_end in _boxes(meta, start, end):
+                if child == b"ipco":
+                    properties = list(_boxes(meta, child_start, child_end))
+                elif child == b"ipma":
+                    child_version, flags = meta[child_start], meta[child_start + 3]
+                    position = child_start + 4
+                    entries = _uint(meta, position, 4)
+                    position += 4
+                    for _ in range(entries):
+                        item_id = _uint(meta, position, 2 if child_version < 1 else 4)
+                        position += 2 if child_version < 1 else 4
+                        count = meta[position]
+                        position += 1
+                        indexes = []
+                        for _ in range(count):
+                            if flags & 1:
+                                indexes.append(_uint(meta, position, 2) & 0x7FFF)
+                                position += 2
+                            else:
+                                indexes.append(meta[position] & 0x7F)
+                                position += 1
+                        associations[item_id] = indexes
+
+    result: Dict[str, Any] = {}
+    rotation, mirror = 0, None
+    for index in associations.get(primary, []):
+        if not 1 <= index <= len(properties):
+            continue
+        kind, start, end = properties[index - 1]
+        if kind == b"ispe":
+            result["width"], result["height"] = struct.unpack_from(">II", meta, start + 4)
+        elif kind == b"irot":
+            rotation = meta[start] & 3
+        elif kind == b"imir":
+            mirror = meta[start] & 1
+        elif kind == b"colr" and meta[start:start + 4] in (b"prof", b"rICC"):
+            result["icc"] = parse_icc(meta[start + 4:end])
+    result["orientation"] = HEIF_ORIENTATION[(rotation, mirror)]
+    if exif_item is not None and locations.get(exif_item):
+        result["exif_span"] = locations[exif_item][0]
+    return result
+
+
+def _scan_heif(f: BinaryIO) -> Dict[str, Any]:
+    """HEIC/AVIF: the 'meta' box, plus the Exif item it points to (a single extra read)"""
+    result: Dict[str, Any] = {"format": "heic"}
+    f.seek(0)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        size, kind = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size, header_size = struct.unpack(">Q", f.read(8))[0], 16
+        if kind == b"ftyp":
+            brand = f.read(size - header_size)[:4]
+            result["format"] = "avif" if brand in (b"avif", b"avis") else "heic"
+        elif kind == b"meta":
+            meta = _heif_meta(f.read(size - header_size))
+            span = meta.pop("exif_span", None)
+            result.update(meta)
+            if span:
+                f.seek(span[0])
+                block = f.read(span[1])
+                if len(block) > 4:
+                    tiff_start = 4 + struct.unpack(">I", block[:4])[0]
+                    exif = parse_exif(block[tiff_start:])
+                    exif.pop("orientation", None)  # HEIF orientation comes from irot/imir
+                    result["exif"] = exif
+            break
+        elif size == 0:
+            break
+        else:
+            f.seek(size - header_size, os.SEEK_CUR)
+    return result
+
+
+def scan_file(path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Metadata record for one photo, read from headers only
+
+    Keys: file, format, width/height (stored), orientation (EXIF 1-8),
+    orientedWidth/orientedHeight, takenAt (ISO) and takenAtSource, gps
+    {lat, lon, alt}, icc {bytes, colorSpace, description}, camera, bytes,
+    mtime. Unreadable files get an "error" key instead of raising.
+    """
+    path = Path(path)
+    stat = path.stat()
+    record: Dict[str, Any] = {"file": path.name, "bytes": stat.st_size, "mtime": stat.st_mtime}
+    try:
+        with open(path, "rb") as f:
+            head = f.read(16)
+            if head[:3] == b"\xff\xd8\xff":
+                found = _scan_jpeg(f)
+            elif head[:8] == b"\x89PNG\r\n\x1a\n":
+                found = _scan_png(f)
+            elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                found = _scan_webp(f)
+            elif head[4:8] == b"ftyp":
+                found = _scan_heif(f)
+            else:
+                return {**record, "error": "unsupported format"}
+    except (OSError, struct.error, IndexError, KeyError, ValueError) as e:
+        return {**record, "error": f"{type(e).__name__}: {e}"}
+
+    exif = found.pop("exif", {})
+    record.update(found)
+    for key in ("takenAt", "takenAtSource", "gps", "camera"):
+        if key in exif:
+            record[key] = exif[key]
+    record.setdefault("orientation", exif.get("orientation", 1))
+    if "width" in record:
+        swap = record["orientation"] >= 5
+        record["orientedWidth"] = record["height"] if swap else record["width"]
+        record["orientedHeight"] = record["width"] if swap else record["height"]
+    return record
+
+
+# -- directory scans --
+
+def iter_photo_files(paths: Sequence[Union[str, Path]], recursive: bool = True) -> List[Path]:
+    """Photo files under the given files/directories, sorted by path"""
+    found = []
+    for root in paths:
+        root = Path(root)
+        if root.is_file():
+            found.append(root)
+            continue
+        walker = root.rglob("*") if recursive else root.iterdir()
+        found.extend(p for p in walker if p.suffix.lower() in SCAN_EXTENSIONS and p.is_file())
+    return sorted(found)
+
+
+class MetadataCache:
+    """
+    Scan results keyed by absolute path, valid while mtime_ns and size match
+
+    Stored as one JSON file and written atomically, and only when something changed.
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["record"]
+        return None
+
+    def put(self, key: str, stat: os.stat_result, record: Dict[str, Any]):
+        self.entries[key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "record": record}
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_suffix(".tmp")
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "entries": self.entries}, f, separators=(",", ":"))
+        os.replace(partial, self.path)
+        self.dirty = False
+
+
+def _scan_chunk(paths: List[str]) -> List[Dict[str, Any]]:
+    return [scan_file(p) for p in paths]
+
+
+def scan_paths(
+    paths: Sequence[Union[str, Path]],
+    cache: Optional[MetadataCache] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Metadata for every file, from the cache where still valid, else scanned
+
+    Cache misses are split into chunks for a process pool (or scanned inline
+    for one worker or a single chunk). Records come back in input order with
+    their absolute "path" set.
+    """
+    start = time.perf_counter()
+    keys = [str(Path(p).resolve()) for p in paths]
+    records: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+    stats = [os.stat(k) for k in keys]
+    missing = []
+    for position, (key, stat) in enumerate(zip(keys, stats)):
+        cached = cache.get(key, stat) if cache is not None else None
+        if cached is not None:
+            records[position] = cached
+        else:
+            missing.append(position)
+
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    done = len(keys) - len(missing)
+    if on_progress and done:
+        on_progress(done, len(keys))
+
+    def collect(chunk: List[int], scanned: List[Dict[str, Any]]):
+        nonlocal done
+        for position, record in zip(chunk, scanned):
+            records[position] = record
+            if cache is not None and "error" not in record:
+                cache.put(keys[position], stats[position], record)
+        done += len(chunk)
+        if on_progress:
+            on_progress(done, len(keys))
+
+    if (workers or os.cpu_count() or 1) > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk, scanned in zip(chunks, pool.map(_scan_chunk, [[keys[i] for i in c] for c in chunks])):
+                collect(chunk, scanned)
+    else:
+        for chunk in chunks:
+            collect(chunk, _scan_chunk([keys[i] for i in chunk]))
+
+    if cache is not None:
+        cache.save()
+    results = [{**record, "path": key} for key, record in zip(keys, records)]
+    return results, {"files": len(keys), "cached": len(keys) - len(missing), "scanned": len(missing),
+                     "errors": sum("error" in r for r in results), "elapsed": time.perf_counter() - start}
+
+
+# -- ordering and grouping --
+
+def timestamp(record: Dict[str, Any]) -> float:
+    """Capture time in epoch seconds, falling back to file mtime"""
+    if record.get("takenAt"):
+        try:
+            return datetime.fromisoformat(record["takenAt"]).timestamp()
+        except ValueError:
+            pass
+    return record.get("mtime", 0.0)
+
+
+def distance_km(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """Great-circle (haversine) distance between two {lat, lon} points"""
+    lat1, lat2 = math.radians(a["lat"]), math.radians(b["lat"])
+    dlat, dlon = lat2 - lat1, math.radians(b["lon"] - a["lon"])
+    h = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def sort_chronologically(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(records, key=lambda r: (timestamp(r), r.get("path", r["file"])))
+
+
+def group_events(records: Iterable[Dict[str, Any]], gap_hours: float = 3.0,
+                 radius_km: float = 25.0) -> List[List[Dict[str, Any]]]:
+    """
+    Chronological events: a new group starts after a gap of more than
+    gap_hours, or when a photo was taken more than radius_km from the
+    previous located photo in the group
+    """
+    groups: List[List[Dict[str, Any]]] = []
+    last_time, last_place = None, None
+    for record in sort_chronologically(records):
+        moment, place = timestamp(record), record.get("gps")
+        new_group = (last_time is None or moment - last_time > gap_hours * 3600
+                     or (place and last_place and distance_km(place, last_place) > radius_km))
+        if new_group:
+            groups.append([])
+            last_place = None
+        groups[-1].append(record)
+        last_time = moment
+        last_place = place or last_place
+    return groups
+
+
+def to_features(groups: Sequence[Sequence[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Spread planner features (photobook.spreads) from grouped records, in album order"""
+    return [{"assetId": Path(r["file"]).stem, "width": r.get("orientedWidth"), "height": r.get("orientedHeight"),
+             "takenAt": r.get("takenAt") or r.get("mtime"), "cluster": number}
+            for number, group in enumerate(groups) for r in group]
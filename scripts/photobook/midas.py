@@ -0,0 +1,278 @@
+"""
+Minimal Midas completions client shared by the Python scripts
+
+Mirrors what test-vision-analysis.py does inline: OpenAI-format requests,
+optional bearer auth, and tolerant parsing of the (sometimes wrapped)
+response body. With on_delta, the completion is streamed as server-sent
+events the way geminiService.streamThemePreview reads them. With a
+deadline and a LatencyTracker (photobook/deadlines.py), timeouts follow the
+deployment's observed latency and the job's remaining time. Each call is an
+http.request span (photobook/tracing.py) while tracing is configured.
+Requests are dicts, or Body objects from precompiled templates
+(photobook/payloads.py) that are sent as their spliced bytes.
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import requests
+
+from . import tracing
+from .deadlines import Deadline, DeadlineExceeded, LatencyTracker, call_timeouts, classify_error, latency_key
+from .payloads import Body, count_images
+
+ENDPOINT = "https://midas.ai.bosch.com/ss1/api/v2/llm/completions"
+API_KEY = os.environ.get("REACT_APP_AZURE_API_KEY") or os.environ.get("MIDAS_API_KEY") or ""
+
+# Vision-capable deployments (same set as test-vision-analysis.py)
+VISION_MODELS = [
+    {"name": "Claude Sonnet-4", "deployment": "Claude-Sonnet-4"},
+    {"name": "GPT 4o", "deployment": "GPT 4o"},
+    {"name": "GPT 4.1", "deployment": "GPT 4.1"},
+    {"name": "Gemini 2.5 Pro", "deployment": "Gemini-2.5-pro"},
+    {"name": "Gemini 2.0 Flash", "deployment": "Gemini-2.0-flash"},
+]
+
+
+def load_model_configs() -> Dict[str, Any]:
+    """Load model-configs.json from the scripts directory"""
+    scripts_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(scripts_dir, "model-configs.json"), "r") as f:
+        return json.load(f)
+
+
+def select_models(name: Optional[str] = None) -> List[Dict[str, str]]:
+    """Return VISION_MODELS, or only the entry matching a name or deployment"""
+    if not name:
+        return list(VISION_MODELS)
+    return [m for m in VISION_MODELS if m["name"] == name or m["deployment"] == name]
+
+
+def build_headers(api_key: str = "") -> Dict[str, str]:
+    """Request headers; Authorization only when an API key is provided"""
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+
+def image_part(image_base64: str, image_type: str = "jpeg", detail: Optional[str] = None) -> Dict[str, Any]:
+    """Build an OpenAI-format image_url content part from base64 data"""
+    image_url: Dict[str, Any] = {"url": f"data:image/{image_type};base64,{image_base64}"}
+    if detail:
+        image_url["detail"] = detail
+    return {"type": "image_url", "image_url": image_url}
+
+
+def unwrap(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Midas API wraps the completion in a data object; accept both shapes"""
+    return data.get("data", data) if isinstance(data, dict) else {}
+
+
+def extract_content(data: Dict[str, Any]) -> str:
+    """Pull the assistant text out of a completion response"""
+    content = unwrap(data).get("choices", [{}])[0].get("message", {}).get("content", "")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def extract_usage(data: Dict[str, Any]) -> Dict[str, int]:
+    """Token usage block with missing counters reported as 0"""
+    usage = unwrap(data).get("usage") or {}
+    return {
+        "prompt_tokens": int(usage.get("prompt_tokens") or 0),
+        "completion_tokens": int(usage.get("completion_tokens") or 0),
+        "total_tokens": int(usage.get("total_tokens") or 0),
+    }
+
+
+def error_message(response: requests.Response) -> str:
+    """Best-effort error text from a non-200 response"""
+    try:
+        error_data = response.json()
+    except ValueError:
+        return response.text[:500] or f"HTTP {response.status_code}"
+    if not isinstance(error_data, dict):
+        return str(error_data)
+    error = error_data.get("error")
+    if isinstance(error, dict) and error.get("message"):
+        return error["message"]
+    return error_data.get("message") or str(error_data)
+
+
+def read_stream(response: requests.Response, on_delta: Callable[[str], None],
+                deadline: Optional[Deadline] = None) -> Tuple[str, Dict[str, int], Optional[float]]:
+    """
+    Content, usage and first-delta time (time.time()) of a streamed completion
+
+    Each `data:` event's delta content is passed to on_delta as it arrives.
+    A server that ignores "stream" and answers with one JSON body is
+    delivered as a single delta. Raises DeadlineExceeded if the deadline
+    passes while events are still arriving.
+    """
+    if "event-stream" not in response.headers.get("Content-Type", "event-stream"):
+        data = response.json()
+        content = extract_content(data)
+        first = time.time()
+        if content:
+            on_delta(content)
+        return content, extract_usage(data), first
+
+    parts: List[str] = []
+    usage = extract_usage({})
+    first = None
+    for line in response.iter_lines(decode_unicode=True):
+        if deadline is not None:
+            deadline.check()
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            event = unwrap(json.loads(data))
+        except ValueError:
+            continue
+        if event.get("usage"):
+            usage = extract_usage(event)
+        choices = event.get("choices") or [{}]
+        content = (choices[0].get("delta") or {}).get("content") or ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        if content:
+            if first is None:
+                first = time.time()
+            parts.append(content)
+            on_delta(content)
+    return "".join(parts), usage, first
+
+
+def post_completion(
+    request: Union[Dict[str, Any], Body],
+    api_key: str = "",
+    timeout: float = 60,
+    verify_ssl: bool = True,
+    session: Optional[requests.Session] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    deadline: Optional[Deadline] = None,
+    latency: Optional[LatencyTracker] = None,
+    kind: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    POST one completions request and normalize the outcome.
+
+    Never raises for HTTP or network failures; the returned dict always has
+    success, response_time (ms) and either response/usage or error plus
+    error_type (see deadlines.classify_error). With on_delta the request is
+    streamed: each content delta is passed to on_delta as it arrives, the
+    result also has first_delta_time (ms), and response is the whole text.
+
+    `timeout` applies to connecting and to reading. With `latency` it is
+    only the upper bound of the deployment's adaptive timeouts, and every
+    successful call's latency (time to first delta when streamed) is
+    recorded, under deadlines.latency_key with `kind` ("vision" or "text"
+    from the request when not given). With `deadline` both are capped by
+    the time left, and nothing is sent once the deadline is exhausted().
+    """
+    deployment = request.model if isinstance(request, Body) else request.get("model", "")
+    with tracing.span("http.request", tracing.KIND_CLIENT, deployment=deployment, stream=on_delta is not None) as span:
+        if isinstance(request, Body):
+            span.set(payload_bytes=request.size(stream=on_delta is not None))
+        elif span.recording:
+            # What requests will send; only measured while tracing, the body can be megabytes of base64
+            span.set(payload_bytes=len(json.dumps(request)))
+        result = _post_completion(request, api_key, timeout, verify_ssl, session, on_delta, deadline, latency, kind)
+        span.set(status_code=result.get("status_code"), error_type=result.get("error_type"),
+                 **(result.get("usage") or {}))
+        if not result["success"]:
+            span.error(result.get("error") or "failed")
+    return result
+
+
+def _post_completion(
+    request: Union[Dict[str, Any], Body],
+    api_key: str,
+    timeout: float,
+    verify_ssl: bool,
+    session: Optional[requests.Session],
+    on_delta: Optional[Callable[[str], None]],
+    deadline: Optional[Deadline],
+    latency: Optional[LatencyTracker],
+    kind: Optional[str],
+) -> Dict[str, Any]:
+    start_time = time.time()
+    poster = session or requests
+    deployment = request.model if isinstance(request, Body) else request.get("model", "")
+    if kind is None:
+        images = request.template.images if isinstance(request, Body) else count_images(request)
+        kind = "vision" if images else "text"
+    key = latency_key(deployment, kind, stream=on_delta is not None)
+    timeouts = call_timeouts(key, timeout, deadline, latency)
+    if deadline is not None and deadline.exhausted():
+        return {
+            "success": False,
+            "response_time": 0.0,
+            "error": f"Deadline exceeded before the call was sent ({deadline.remaining():.1f}s left)",
+            "error_type": "deadline",
+        }
+    if isinstance(request, Body):
+        body = {"data": request.data(stream=on_delta is not None)}
+    else:
+        body = {"json": {**request, "stream": True} if on_delta is not None else request}
+
+    try:
+        response = poster.post(
+            ENDPOINT, headers=build_headers(api_key), timeout=timeouts, verify=verify_ssl,
+            stream=on_delta is not None, **body,
+        )
+        # Closed on every path, streamed responses included, so the connection goes back to the pool
+        with response:
+            response_time = (time.time() - start_time) * 1000
+
+            if not response.ok:
+                return {
+                    "success": False,
+                    "response_time": response_time,
+                    "status_code": response.status_code,
+                    "error": error_message(response),
+                    "error_type": "http",
+                }
+
+            if on_delta is not None:
+                content, usage, first = read_stream(response, on_delta, deadline)
+                if latency is not None:
+                    latency.observe(key, (first or time.time()) - start_time)
+                return {
+                    "success": True,
+                    "response_time": (time.time() - start_time) * 1000,
+                    "first_delta_time": None if first is None else (first - start_time) * 1000,
+                    "status_code": response.status_code,
+                    "response": content,
+                    "usage": usage,
+                }
+
+            data = response.json()
+            if latency is not None:
+                latency.observe(key, response_time / 1000)
+            return {
+                "success": True,
+                "response_time": response_time,
+                "status_code": response.status_code,
+                "response": extract_content(data),
+                "usage": extract_usage(data),
+            }
+
+    except (requests.exceptions.RequestException, ValueError, DeadlineExceeded) as e:
+        error_type = classify_error(e, deadline)
+        if latency is not None and error_type == "read_timeout":
+            latency.timed_out(key)
+        return {
+            "success": False,
+            "response_time": (time.time() - start_time) * 1000,
+            "error": str(e),
+            "error_type": error_type,
+            "timeouts": list(timeouts),
+        }
@@ -0,0 +1,330 @@
+"""
+Packed-batch image analysis: several photos per vision request
+
+analyzeImage in claudeService sends one photo per completions call, so the
+analysis prompt is repeated for every image in the album. Packing puts K
+downscaled photos into a single multi-part content array, asks for an
+indexed JSON reply, and maps it back to one ImageSummary per photo. Photos
+whose entry is missing or malformed are retried one at a time with the
+single-image prompt, so a bad packed reply never loses an image. Entries
+that closed before a reply was cut off are kept. With on_summary, packed
+calls are streamed and each photo's summary is handed over as soon as its
+entry closes. Request bodies come from precompiled templates
+(photobook/payloads.py): per call only the photos' base64 is spliced in.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import tracing
+from .imaging import downscaled_jpeg, image_size, to_base64
+from .midas import image_part, post_completion
+from .payloads import Body, compiler, slot
+from .streamjson import ObjectStream, extract_objects
+
+# Same wording as claudeService.analyzeImage so single and packed runs compare fairly
+SINGLE_PROMPT = """Analyze this photo for professional editing. Provide exactly 3 lines:
+Line 1: Brief description of the subject and composition
+Line 2: Lighting quality and type (natural, studio, indoor, outdoor, etc.)
+Line 3: Overall mood/emotion conveyed
+
+Keep each line concise (1 sentence max). Focus on editing-relevant details. No numbering, just plain text lines."""
+
+PACKED_PROMPT = """You will receive {count} photos. Each photo is preceded by a label "Image N". Analyze every photo for professional editing.
+
+Return only valid JSON in this shape:
+{{"images": [{{"index": 1, "description": "...", "lighting": "...", "mood": "..."}}]}}
+
+- index: the N from the photo's label
+- description: brief description of the subject and composition
+- lighting: lighting quality and type (natural, studio, indoor, outdoor, etc.)
+- mood: overall mood/emotion conveyed
+
+Return exactly one entry per photo. Keep each field to one sentence. No markdown, no explanation."""
+
+SUMMARY_FIELDS = ("description", "lighting", "mood")
+
+FAILED_SUMMARY = {"description": "Analysis failed", "lighting": "Unknown", "mood": "Unknown"}
+
+_FENCE = re.compile(r"```(?:json)?\s*|\s*```")
+
+
+def prepare_images(
+    paths: Sequence[Path], max_edge: Optional[int] = 768, quality: int = 85
+) -> List[Dict[str, Any]]:
+    """Downscale photos for upload; image_id is the file stem, width and height are the uploaded size"""
+    prepared = []
+    with tracing.span("images.prepare", images=len(paths)):
+        for path in paths:
+            with tracing.span("image.prepare", image_id=Path(path).stem):
+                data = downscaled_jpeg(path, max_edge=max_edge, quality=quality)
+                width, height = image_size(data)
+                prepared.append({"image_id": Path(path).stem, "image_base64": to_base64(data), "bytes": len(data),
+                                 "width": width, "height": height})
+    return prepared
+
+
+def build_single_request(
+    deployment: str, image_base64: str, detail: Optional[str] = None, max_tokens: int = 200
+) -> Dict[str, Any]:
+    """One-photo request, equivalent to claudeService.analyzeImage"""
+    return {
+        "model": deployment,
+        "messages": [
+            {
+                "role": "user",
+                "content": [{"type": "text", "text": SINGLE_PROMPT}, image_part(image_base64, "jpeg", detail)],
+            }
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.3,
+    }
+
+
+def build_packed_request(
+    deployment: str,
+    images_base64: Sequence[str],
+    detail: Optional[str] = None,
+    tokens_per_image: int = 120,
+) -> Dict[str, Any]:
+    """Multi-photo request: shared instructions, then a label and image part per photo"""
+    content: List[Dict[str, Any]] = [{"type": "text", "text": PACKED_PROMPT.format(count=len(images_base64))}]
+    for index, image_base64 in enumerate(images_base64, start=1):
+        content.append({"type": "text", "text": f"Image {index}:"})
+        content.append(image_part(image_base64, "jpeg", detail))
+
+    return {
+        "model": deployment,
+        "messages": [{"role": "user", "content": content}],
+        "max_tokens": 60 + tokens_per_image * len(images_base64),
+        "temperature": 0.3,
+    }
+
+
+def single_body(
+    deployment: str, image_base64: str, detail: Optional[str] = None, max_tokens: int = 200
+) -> Body:
+    """build_single_request as a precompiled body, in the deployment's message format"""
+    template = compiler.template(
+        ("single", detail, max_tokens), deployment,
+        lambda: build_single_request(deployment, slot("image"), detail, max_tokens),
+    )
+    return template.body(image_base64)
+
+
+def packed_body(
+    deployment: str, images_base64: Sequence[str], detail: Optional[str] = None, tokens_per_image: int = 120
+) -> Body:
+    """build_packed_request as a precompiled body; one template per pack size"""
+    count = len(images_base64)
+    template = compiler.template(
+        ("packed", count, detail, tokens_per_image), deployment,
+        lambda: build_packed_request(deployment, [slot(f"image{n}") for n in range(count)], detail, tokens_per_image),
+    )
+    return template.body(*images_base64)
+
+
+def _load_json_object(content: str) -> Optional[Any]:
+    """Parse JSON from a reply that may carry markdown fences or surrounding prose"""
+    text = _FENCE.sub("", content or "").strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(text[start : end + 1])
+    except ValueError:
+        return None
+
+
+def packed_entry(entry: Any, count: int) -> Optional[Tuple[int, Dict[str, str]]]:
+    """(1-based index, fields) of one reply entry, or None if its index or any field is unusable"""
+    if not isinstance(entry, dict):
+        return None
+    try:
+        index = int(entry.get("index"))
+    except (TypeError, ValueError):
+        return None
+    fields = {field: entry.get(field) for field in SUMMARY_FIELDS}
+    if not 1 <= index <= count or not all(isinstance(value, str) and value.strip() for value in fields.values()):
+        return None
+    return index, {field: value.strip() for field, value in fields.items()}
+
+
+def parse_packed_reply(content: str, count: int) -> Dict[int, Dict[str, str]]:
+    """
+    Map a packed reply to {1-based index: fields}.
+
+    Entries with an out-of-range index, a duplicate index or a missing/empty
+    field are dropped so the caller falls back for exactly those photos.
+    A reply that does not parse as a whole (cut off at max_tokens) keeps
+    the entries that closed; the unfinished one is not repaired.
+    """
+    parsed = _load_json_object(content)
+    entries = parsed.get("images") if isinstance(parsed, dict) else parsed
+    if not isinstance(entries, list):
+        entries = extract_objects(content, "images", repair=False)
+
+    results: Dict[int, Dict[str, str]] = {}
+    for entry in entries:
+        unpacked = packed_entry(entry, count)
+        if unpacked and unpacked[0] not in results:
+            results[unpacked[0]] = unpacked[1]
+    return results
+
+
+def parse_single_reply(content: str) -> Optional[Dict[str, str]]:
+    """Three-line reply -> fields, with claudeService's defaults for short replies"""
+    lines = [line.strip() for line in (content or "").split("\n") if line.strip()]
+    if not lines:
+        return None
+    return {
+        "description": lines[0],
+        "lighting": lines[1] if len(lines) > 1 else "Natural lighting",
+        "mood": lines[2] if len(lines) > 2 else "Positive and engaging mood",
+    }
+
+
+def _add_usage(total: Dict[str, int], usage: Optional[Dict[str, int]]):
+    for key, value in (usage or {}).items():
+        total[key] = total.get(key, 0) + value
+
+
+def analyze_packed(
+    images: Sequence[Dict[str, Any]],
+    deployment: str,
+    pack_size: int = 4,
+    api_key: str = "",
+    verify_ssl: bool = True,
+    detail: Optional[str] = None,
+    timeout: float = 120,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    post: Callable[..., Dict[str, Any]] = post_completion,
+    on_summary: Optional[Callable[[int, Dict[str, str]], None]] = None,
+    **post_kwargs,
+) -> Dict[str, Any]:
+    """
+    Analyze prepared images K at a time with per-image single-call fallback.
+
+    images are dicts from prepare_images(). pack_size=1 sends the
+    single-image prompt for every photo, which is the baseline the packed
+    modes are compared against. on_progress receives (done, total) like
+    claudeService.analyzeImages. on_summary receives (position, summary)
+    once per photo, as soon as it is known: packed calls are streamed so a
+    summary arrives when its entry closes. post_kwargs (deadline, latency,
+    session) are passed to every call.
+
+    Returns summaries (ImageSummary dicts in input order), a record per API
+    call, the ids that needed a fallback call and the summed token usage.
+    """
+    if pack_size < 1:
+        raise ValueError(f"pack_size must be at least 1, got {pack_size}")
+    total = len(images)
+    summaries: List[Optional[Dict[str, str]]] = [None] * total
+    calls: List[Dict[str, Any]] = []
+    usage: Dict[str, int] = {}
+    fallback_ids: List[str] = []
+    done = 0
+
+    def analyze_single(position: int):
+        image = images[position]
+        with tracing.span("analyze.single", image_id=image["image_id"]):
+            result = post(
+                single_body(deployment, image["image_base64"], detail),
+                api_key=api_key,
+                timeout=timeout,
+                verify_ssl=verify_ssl,
+                **post_kwargs,
+            )
+            with tracing.span("response.parse"):
+                fields = parse_single_reply(result.get("response", "")) if result["success"] else None
+        calls.append(
+            {
+                "kind": "single",
+                "images": 1,
+                "success": result["success"],
+                "parsed": 1 if fields else 0,
+                "response_time": result["response_time"],
+                "usage": result.get("usage"),
+                "error": result.get("error"),
+                "error_type": result.get("error_type"),
+            }
+        )
+        _add_usage(usage, result.get("usage"))
+        summaries[position] = {"image_id": image["image_id"], **(fields or FAILED_SUMMARY)}
+        if on_summary:
+            on_summary(position, summaries[position])
+
+    with tracing.span("analyze", deployment=deployment, images=total, pack_size=pack_size):
+        for start in range(0, total, pack_size):
+            positions = list(range(start, min(start + pack_size, total)))
+
+            if pack_size <= 1:
+                analyze_single(positions[0])
+            else:
+                streamed: Dict[int, Dict[str, str]] = {}
+                stream = ObjectStream("images")
+
+                def on_delta(text: str):
+                    for entry in stream.feed(text):
+                        unpacked = packed_entry(entry, len(positions))
+                        if unpacked and unpacked[0] not in streamed:
+                            index, fields = unpacked
+                            streamed[index] = fields
+                            position = positions[index - 1]
+                            on_summary(position, {"image_id": images[position]["image_id"], **fields})
+
+                with tracing.span("analyze.pack", images=len(positions)) as span:
+                    result = post(
+                        packed_body(deployment, [images[p]["image_base64"] for p in positions], detail),
+                        api_key=api_key,
+                        timeout=timeout,
+                        verify_ssl=verify_ssl,
+                        **post_kwargs,
+                        **({"on_delta": on_delta} if on_summary else {}),
+                    )
+                    with tracing.span("response.parse"):
+                        parsed = {}
+                        if result["success"]:
+                            parsed = parse_packed_reply(result.get("response", ""), len(positions))
+                    span.set(parsed=len(parsed))
+                # Entries already handed over stand even if the stream broke off later
+                parsed = {**parsed, **streamed}
+                calls.append(
+                    {
+                        "kind": "packed",
+                        "images": len(positions),
+                        "success": result["success"],
+                        "parsed": len(parsed),
+                        "response_time": result["response_time"],
+                        "usage": result.get("usage"),
+                        "error": result.get("error"),
+                        "error_type": result.get("error_type"),
+                    }
+                )
+                _add_usage(usage, result.get("usage"))
+
+                for offset, position in enumerate(positions, start=1):
+                    if offset in parsed:
+                        summaries[position] = {"image_id": images[position]["image_id"], **parsed[offset]}
+                        if on_summary and offset not in streamed:
+                            on_summary(position, summaries[position])
+                    else:
+                        fallback_ids.append(images[position]["image_id"])
+                        analyze_single(position)
+
+            done += len(positions)
+            if on_progress:
+                on_progress(done, total)
+
+    return {
+        "summaries": summaries,
+        "calls": calls,
+        "fallback_ids": fallback_ids,
+        "usage": usage,
+    }
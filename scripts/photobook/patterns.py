@@ -0,0 +1,62 @@
+"""
+Procedurally drawn test images with known content
+
+Scaled-up versions of the create-test-image.py pattern, so benchmarks can
+include images whose ground truth (shapes, colors, caption) is known.
+"""
+
+import io
+from typing import List, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+# (fill color, box in the 400x300 reference layout) from create-test-image.py
+PATTERN_SHAPES = [
+    ("#FF6B6B", (50, 50, 130, 130)),
+    ("#4ECDC4", (160, 50, 240, 130)),
+    ("#45B7D1", (270, 50, 350, 130)),
+    ("#FFA07A", (105, 160, 185, 240)),
+    ("#98D8C8", (215, 160, 295, 240)),
+]
+
+PATTERN_SIZES = [(400, 300), (1600, 1200), (4000, 3000)]
+
+
+def load_font(size: int) -> ImageFont.ImageFont:
+    """A scalable TrueType font when one is installed, Pillow's default otherwise"""
+    for name in ("DejaVuSans.ttf", "Arial.ttf", "/System/Library/Fonts/Helvetica.ttc"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def draw_test_pattern(width: int = 400, height: int = 300, caption: str = "Test Pattern") -> Image.Image:
+    """The create-test-image.py layout scaled to width x height"""
+    sx, sy = width / 400, height / 300
+    image = Image.new("RGB", (width, height), color="#f0f0f0")
+    draw = ImageDraw.Draw(image)
+
+    for color, (x0, y0, x1, y1) in PATTERN_SHAPES:
+        draw.rectangle(
+            (x0 * sx, y0 * sy, x1 * sx, y1 * sy), fill=color, outline="#000000", width=max(2, round(2 * sx))
+        )
+
+    font = load_font(max(10, round(24 * sy)))
+    bbox = draw.textbbox((0, 0), caption, font=font)
+    draw.text(((width - (bbox[2] - bbox[0])) // 2, round(20 * sy)), caption, fill="#333333", font=font)
+    return image
+
+
+def pattern_corpus(sizes: List[Tuple[int, int]] = PATTERN_SIZES) -> List[Tuple[str, bytes]]:
+    """(name, PNG bytes) for the test pattern at each size"""
+    corpus = []
+    for width, height in sizes:
+        buffer = io.BytesIO()
+        draw_test_pattern(width, height).save(buffer, format="PNG")
+        corpus.append((f"pattern-{width}x{height}.png", buffer.getvalue()))
+    return corpus
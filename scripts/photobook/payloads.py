@@ -0,0 +1,263 @@
+"""
+Precompiled request bodies: serialize the fixed parts once, splice the rest
+
+Every completions call used to build the full nested request dict and
+have requests serialize it again with json=, long analysis prompt
+included, even though per call only the image data changes. A Template is
+compiled once from a request dict whose variable strings contain slot()
+markers: it is serialized the way requests would serialize it and cut
+into byte fragments around the slots. render() then only joins the
+fragments with the slot values, and the result is byte for byte what
+json= would have sent.
+
+Templates are compiled in the deployment's message format from
+model-configs.json (openai, standard or anthropic, see to_format), so the
+format branching also happens once per template instead of per call.
+Slot values are inserted as they are: they must need no JSON escaping,
+which holds for base64 data and plain identifiers (use escape() for
+anything else).
+"""
+
+import json
+import re
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+FORMATS = ("openai", "standard", "anthropic")
+DEFAULT_FORMAT = "openai"
+
+# The Messages API requires max_tokens
+ANTHROPIC_MAX_TOKENS = 1024
+
+# Slot markers are wrapped in U+241E (SYMBOL FOR RECORD SEPARATOR), which json.dumps writes as \u241e
+_MARK = "\u241e"
+_SLOT = re.compile(r"\\u241e([A-Za-z0-9_]+)\\u241e")
+_DATA_URL = re.compile(r"data:([^;,]+);base64,(.*)", re.S)
+
+
+def slot(name: str) -> str:
+    """Marker for a variable string (or part of one) in a request dict passed to Template"""
+    return f"{_MARK}{name}{_MARK}"
+
+
+def escape(text: str) -> str:
+    """text as it has to appear between the quotes of a JSON string"""
+    return json.dumps(text)[1:-1]
+
+
+def count_images(request: Dict[str, Any]) -> int:
+    """Image parts across all messages (in any of the FORMATS)"""
+    return sum(
+        1
+        for message in request.get("messages", [])
+        if isinstance(message.get("content"), list)
+        for part in message["content"]
+        if isinstance(part, dict) and part.get("type") in ("image_url", "image")
+    )
+
+
+def to_format(request: Dict[str, Any], format: str) -> Dict[str, Any]:
+    """
+    Convert an OpenAI-format request (what the builders in this package return) to a message format
+
+    standard (PAYLOAD_REFERENCE.md): deploymentName instead of model, every
+    message content is a list of parts and images are base64 image parts.
+    anthropic: system messages move to a top-level system prompt and images
+    are base64 image parts with their media type. Other keys keep their order.
+    """
+    if format == "openai":
+        return request
+    if format not in FORMATS:
+        raise ValueError(f"Unknown message format '{format}' (expected one of {', '.join(FORMATS)})")
+
+    if format == "standard":
+        converted: Dict[str, Any] = {"deploymentName": request.get("model", "")}
+        for key, value in request.items():
+            if key == "messages":
+                value = [
+                    {**message, "content": [{"type": "text", "text": message["content"]}]}
+                    if isinstance(message.get("content"), str)
+                    else {**message, "content": [_image_part(part, media_type=False) for part in message["content"]]}
+                    for message in value
+                ]
+            if key != "model":
+                converted[key] = value
+        return converted
+
+    converted = {}
+    system = [m["content"] for m in request.get("messages", []) if m.get("role") == "system"]
+    for key, value in request.items():
+        if key == "messages":
+            if system:
+                converted["system"] = "\n\n".join(
+                    text if isinstance(text, str) else "".join(part.get("text", "") for part in text)
+                    for text in system
+                )
+            value = [
+                {**message, "content": [_image_part(part, media_type=True) for part in message["content"]]}
+                if isinstance(message.get("content"), list) else message
+                for message in value if message.get("role") != "system"
+            ]
+        converted[key] = value
+    converted.setdefault("max_tokens", ANTHROPIC_MAX_TOKENS)
+    return converted
+
+
+def _image_part(part: Dict[str, Any], media_type: bool) -> Dict[str, Any]:
+    """An image_url part as an image part with a source; other parts as they are"""
+    if part.get("type") != "image_url":
+        return part
+    match = _DATA_URL.match(part["image_url"]["url"])
+    if not match:
+        return {"type": "image", "source": {"type": "url", "url": part["image_url"]["url"]}}
+    source = {"type": "base64", "media_type": match.group(1)} if media_type else {"type": "base64"}
+    return {"type": "image", "source": {**source, "data": match.group(2)}}
+
+
+class Template:
+    """
+    A request serialized once and cut at its slots
+
+    Fragments are kept for the request as it is and for the request with
+    "stream": true added, the change post_completion makes for streamed
+    calls, so both are spliced without touching the dict again.
+    """
+
+    def __init__(self, request: Dict[str, Any]):
+        self.model = request.get("model") or request.get("deploymentName") or ""
+        self.images = count_images(request)
+        self.fragments, self.slots = self._compile(request)
+        self.stream_fragments, stream_slots = self._compile({**request, "stream": True})
+        assert stream_slots == self.slots
+        self.fixed_bytes = sum(len(f) for f in self.fragments)
+        self.stream_fixed_bytes = sum(len(f) for f in self.stream_fragments)
+
+    @staticmethod
+    def _compile(request: Dict[str, Any]) -> Tuple[List[bytes], List[str]]:
+        # Same serialization as requests' json= (default separators, ASCII only)
+        text = json.dumps(request, allow_nan=False)
+        parts = _SLOT.split(text)
+        return [part.encode("ascii") for part in parts[::2]], parts[1::2]
+
+    def render(self, *values: str, stream: bool = False) -> bytes:
+        """The body with values in slot order (see .slots)"""
+        fragments = self.stream_fragments if stream else self.fragments
+        if len(values) != len(self.slots):
+            raise ValueError(f"Template has {len(self.slots)} slot(s) ({', '.join(self.slots)}), got {len(values)}")
+        chunks = [fragments[0]]
+        for value, fragment in zip(values, fragments[1:]):
+            chunks.append(value if isinstance(value, bytes) else value.encode("ascii"))
+            chunks.append(fragment)
+        return b"".join(chunks)
+
+    def body(self, *values: str) -> "Body":
+        return Body(self, values)
+
+
+class Body(Mapping):
+    """
+    A request ready to send: its template and slot values, spliced when sent
+
+    post_completion sends data(); code that reads requests as dicts (stand-in
+    deployments in benchmarks) still can, the body is decoded on first use.
+    """
+
+    __slots__ = ("template", "values", "_decoded")
+
+    def __init__(self, template: Template, values: Tuple[str, ...]):
+        self.template = template
+        self.values = values
+        self._decoded: Optional[Dict[str, Any]] = None
+
+    @property
+    def model(self) -> str:
+        return self.template.model
+
+    def data(self, stream: bool = False) -> bytes:
+        return self.template.render(*self.values, stream=stream)
+
+    def size(self, stream: bool = False) -> int:
+        """len(data(stream)) without building it"""
+        fixed = self.template.stream_fixed_bytes if stream else self.template.fixed_bytes
+        return fixed + sum(len(value) for value in self.values)
+
+    def _dict(self) -> Dict[str, Any]:
+        if self._decoded is None:
+            self._decoded = json.loads(self.data())
+        return self._decoded
+
+    def __getitem__(self, key: str) -> Any:
+        return self._dict()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._dict())
+
+    def __len__(self) -> int:
+        return len(self._dict())
+
+
+class PayloadCompiler:
+    """
+    Templates per deployment, in the format model-configs.json gives it; thread-safe
+
+    model-configs.json is read once, on first use. Deployments it does not
+    list use the openai format, which is what the request builders produce.
+    """
+
+    def __init__(self, formats: Optional[Dict[str, str]] = None):
+        self._formats = formats
+        self._templates: Dict[Hashable, Template] = {}
+        self._static: Dict[int, Tuple[Dict[str, Any], Template]] = {}
+        self._lock = threading.Lock()
+
+    def format(self, deployment: str) -> str:
+        if self._formats is None:
+            from .midas import load_model_configs
+
+            try:
+                config = load_model_configs()
+            except (OSError, ValueError):
+                config = {}
+            self._formats = {
+                model["deploymentName"]: model.get("format", DEFAULT_FORMAT)
+                for models in config.get("models", {}).values()
+                for model in models
+            }
+        return self._formats.get(deployment, DEFAULT_FORMAT)
+
+    def template(self, key: Hashable, deployment: str, build: Callable[[], Dict[str, Any]]) -> Template:
+        """
+        The template cached under (key, deployment), compiled on first use
+
+        build() returns the OpenAI-format request with slot() markers; key
+        must cover everything else build() depends on.
+        """
+        cache_key = (key, deployment)
+        template = self._templates.get(cache_key)
+        if template is None:
+            template = Template(to_format(build(), self.format(deployment)))
+            with self._lock:
+                template = self._templates.setdefault(cache_key, template)
+        return template
+
+    def static(self, request: Dict[str, Any]) -> Template:
+        """
+        A finished request without slots (a config's samplePayload), serialized once
+
+        The request is used as it is, in whatever format it already has, and
+        cached by identity: it must not be changed afterwards.
+        """
+        entry = self._static.get(id(request))
+        if entry is None or entry[0] is not request:
+            entry = (request, Template(request))
+            with self._lock:
+                self._static[id(request)] = entry
+        return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+
+# Shared by the request builders in packing.py and the test scripts
+compiler = PayloadCompiler()
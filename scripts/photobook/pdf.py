@@ -0,0 +1,502 @@
+"""
+Streaming PDF export for studio photobooks
+
+Pages are written to disk as they are rendered and only their object offsets
+are kept, so memory stays flat no matter how long the book is. Every photo is
+decoded once, resampled to the largest size any of its placements needs at the
+target DPI (never upscaled), and embedded as a single image XObject that all
+of those placements share. Shapes and text are drawn as vectors using the
+standard PDF fonts, so no font files are embedded.
+"""
+
+import io
+import math
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageOps
+
+from .document import (
+    CANVAS_DPI,
+    Color,
+    PhotoResolver,
+    apply_effect,
+    dash_pattern,
+    decode_data_url,
+    element_box,
+    iter_photo_elements,
+    oriented_size,
+    page_dimensions,
+    parse_color,
+    photo_crop,
+    photo_transform,
+    shape_primitives,
+    shape_stroke,
+    sorted_elements,
+    sorted_pages,
+)
+
+POINTS_PER_INCH = 72
+
+# Helvetica advance widths for ' ' .. '~' (1/1000 em, from the Adobe AFM)
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+# Width relative to Helvetica, close enough for line wrapping
+FONT_WIDTH_FACTORS = {
+    "Helvetica": 1.0, "Helvetica-Bold": 1.06, "Helvetica-Oblique": 1.0, "Helvetica-BoldOblique": 1.06,
+    "Times-Roman": 0.9, "Times-Bold": 1.0, "Times-Italic": 0.88, "Times-BoldItalic": 0.98,
+}
+
+KAPPA = 0.5522847498
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def standard_font(family: Optional[str], weight: Optional[str], style: Optional[str]) -> str:
+    """Pick the closest of the standard 14 PDF fonts for a CSS font"""
+    family = (family or "").lower()
+    bold = weight == "bold" or (str(weight).isdigit() and int(weight) >= 600)
+    italic = style == "italic"
+    if "mono" in family or "courier" in family:
+        return "Courier" + {(False, False): "", (True, False): "-Bold", (False, True): "-Oblique",
+                            (True, True): "-BoldOblique"}[(bold, italic)]
+    if ("serif" in family and "sans" not in family) or "times" in family or "georgia" in family:
+        return {(False, False): "Times-Roman", (True, False): "Times-Bold", (False, True): "Times-Italic",
+                (True, True): "Times-BoldItalic"}[(bold, italic)]
+    return "Helvetica" + {(False, False): "", (True, False): "-Bold", (False, True): "-Oblique",
+                          (True, True): "-BoldOblique"}[(bold, italic)]
+
+
+def text_width(text: str, font: str, size: float, letter_spacing: float = 0) -> float:
+    """Approximate rendered width of a line in page pixels"""
+    if font.startswith("Courier"):
+        units = 600 * len(text)
+    else:
+        units = sum(HELVETICA_WIDTHS[ord(c) - 32] if 32 <= ord(c) <= 126 else 556 for c in text)
+        units *= FONT_WIDTH_FACTORS.get(font, 1.0)
+    return units / 1000 * size + letter_spacing * len(text)
+
+
+def wrap_text(content: str, font: str, size: float, max_width: float, letter_spacing: float = 0) -> List[str]:
+    """Greedy word wrap like Konva.Text with wrap='word'"""
+    lines = []
+    for paragraph in content.split("\n"):
+        current = ""
+        for word in paragraph.split(" "):
+            candidate = f"{current} {word}" if current else word
+            if current and text_width(candidate, font, size, letter_spacing) > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+    return lines
+
+
+def pdf_string(text: str) -> bytes:
+    """Literal string in WinAnsiEncoding"""
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def fmt(value: float) -> str:
+    """Compact number formatting for content streams"""
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return text if text not in ("", "-0") else "0"
+
+
+class PdfWriter:
+    """Minimal incremental PDF file writer: objects go to disk as soon as they are added"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.file = open(path, "wb")
+        self.offsets: Dict[int, int] = {}
+        self.next_id = 1
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self) -> int:
+        """Allocate an object number to be written later"""
+        number = self.next_id
+        self.next_id += 1
+        return number
+
+    def write(self, number: int, body: Union[str, bytes]):
+        self.offsets[number] = self.file.tell()
+        data = body.encode("latin-1") if isinstance(body, str) else body
+        self.file.write(f"{number} 0 obj\n".encode() + data + b"\nendobj\n")
+
+    def add(self, body: Union[str, bytes]) -> int:
+        number = self.reserve()
+        self.write(number, body)
+        return number
+
+    def add_stream(self, entries: str, data: bytes, number: Optional[int] = None) -> int:
+        number = number or self.reserve()
+        header = f"<< {entries} /Length {len(data)} >>\nstream\n".encode("latin-1")
+        self.write(number, header + data + b"\nendstream")
+        return number
+
+    def close(self, root: int, info: int) -> int:
+        """Write the cross-reference table and trailer; returns the file size"""
+        xref_offset = self.file.tell()
+        lines = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        for number in range(1, self.next_id):
+            offset = self.offsets.get(number)
+            lines.append(f"{offset:010d} 00000 n \n" if offset is not None else "0000000000 65535 f \n")
+        lines.append(f"trailer\n<< /Size {self.next_id} /Root {root} 0 R /Info {info} 0 R >>\n")
+        lines.append(f"startxref\n{xref_offset}\n%%EOF\n")
+        self.file.write("".join(lines).encode("latin-1"))
+        size = self.file.tell()
+        self.file.close()
+        return size
+
+
+def plan_photo_assets(book: Dict[str, Any], resolver: PhotoResolver, dpi: int) -> Dict[Tuple, Dict[str, Any]]:
+    """
+    One entry per (photo, effect): source path, upright size and the scale that
+    satisfies its most demanding placement at the target DPI (capped at 1.0)
+    """
+    page_w, page_h = page_dimensions(book.get("config", {}))
+    assets: Dict[Tuple, Dict[str, Any]] = {}
+    sizes: Dict[str, Optional[Tuple[int, int]]] = {}
+    for _, element in iter_photo_elements(book):
+        photo_id = element["photoId"]
+        if photo_id not in sizes:
+            path = resolver.resolve(photo_id)
+            sizes[photo_id] = oriented_size(path) if path and path.exists() else None
+        if sizes[photo_id] is None:
+            continue
+        img_w, img_h = sizes[photo_id]
+        _, _, box_w, box_h = element_box(element, page_w, page_h)
+        if box_w <= 0 or box_h <= 0:
+            continue
+        _, _, crop_w, crop_h = photo_crop(img_w, img_h, box_w, box_h, photo_transform(element))
+        needed = max(box_w, box_h) * dpi / CANVAS_DPI / max(crop_w, crop_h)
+        key = asset_key(element)
+        asset = assets.setdefault(key, {"path": resolver.resolve(photo_id), "size": (img_w, img_h), "scale": 0.0,
+                                        "effect": element.get("effect"), "uses": 0})
+        asset["scale"] = min(1.0, max(asset["scale"], needed))
+        asset["uses"] += 1
+    return assets
+
+
+def asset_key(element: Dict[str, Any]) -> Tuple:
+    effect = element.get("effect") or {}
+    if effect.get("type", "none") == "none" or not effect.get("intensity"):
+        return (element["photoId"], None, 0)
+    return (element["photoId"], effect["type"], effect["intensity"])
+
+
+class PdfExporter:
+    """Render a photobook into a PDF one page at a time"""
+
+    def __init__(self, book: Dict[str, Any], resolver: PhotoResolver, dpi: int = 300, quality: int = 90):
+        self.book = book
+        self.resolver = resolver
+        self.dpi = dpi
+        self.quality = quality
+        self.page_w, self.page_h = page_dimensions(book.get("config", {}))
+        self.scale = POINTS_PER_INCH / CANVAS_DPI
+        self.assets = plan_photo_assets(book, resolver, dpi)
+
+        self.writer: Optional[PdfWriter] = None
+        self.images: Dict[Tuple, Tuple[int, int, int]] = {}  # key -> (object, width, height)
+        self.fonts: Dict[str, int] = {}
+        self.alphas: Dict[float, int] = {}
+        self.stats = {"pages": 0, "images_embedded": 0, "image_placements": 0, "jpeg_passthrough": 0,
+                      "missing_photos": 0, "stickers_skipped": 0, "image_bytes": 0}
+
+    # -- shared resources --
+
+    def font(self, name: str) -> int:
+        if name not in self.fonts:
+            self.fonts[name] = self.writer.add(
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>")
+        return self.fonts[name]
+
+    def alpha(self, value: float) -> int:
+        value = round(value, 2)
+        if value not in self.alphas:
+            self.alphas[value] = self.writer.add(f"<< /Type /ExtGState /ca {fmt(value)} /CA {fmt(value)} >>")
+        return self.alphas[value]
+
+    def embed_jpeg(self, data: bytes, width: int, height: int, gray: bool = False) -> int:
+        space = "/DeviceGray" if gray else "/DeviceRGB"
+        self.stats["images_embedded"] += 1
+        self.stats["image_bytes"] += len(data)
+        return self.writer.add_stream(
+            f"/Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace {space} "
+            f"/BitsPerComponent 8 /Filter /DCTDecode", data)
+
+    def embed_photo(self, key: Tuple) -> Optional[Tuple[int, int, int]]:
+        """Embed a planned photo on first use; later placements reuse the XObject"""
+        if key in self.images:
+            return self.images[key]
+        asset = self.assets.get(key)
+        if not asset:
+            return None
+        img_w, img_h = asset["size"]
+        target = (max(1, round(img_w * asset["scale"])), max(1, round(img_h * asset["scale"])))
+
+        with Image.open(asset["path"]) as source:
+            orientation = source.getexif().get(0x0112, 1)
+            untouched = target == (img_w, img_h) and not key[1] and orientation in (1, None)
+            if untouched and source.format == "JPEG" and source.mode in ("RGB", "L"):
+                # Already a JPEG at the right size: copy the bytes instead of re-encoding
+                self.stats["jpeg_passthrough"] += 1
+                number = self.embed_jpeg(Path(asset["path"]).read_bytes(), img_w, img_h, source.mode == "L")
+                self.images[key] = (number, img_w, img_h)
+                return self.images[key]
+            if source.format == "JPEG":
+                stored = target if orientation in (1, 2, 3, 4, None) else target[::-1]
+                source.draft("RGB", stored)
+            image = ImageOps.exif_transpose(source).convert("RGB")
+
+        if image.size != target:
+            image = image.resize(target, Image.LANCZOS, reducing_gap=3.0)
+        image = apply_effect(image, asset["effect"])
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.quality)
+        number = self.embed_jpeg(buffer.getvalue(), *image.size)
+        self.images[key] = (number, img_w, img_h)
+        return self.images[key]
+
+    def embed_sticker(self, url: str) -> Optional[Tuple[int, int, int]]:
+        """Raster stickers (data URLs or local files) as Flate images with a soft mask"""
+        key = ("sticker", url)
+        if key in self.images:
+            return self.images[key]
+        if url.startswith("data:"):
+            decoded = decode_data_url(url)
+            if not decoded or decoded[0] == "image/svg+xml":
+                return None
+            source: Any = io.BytesIO(decoded[1])
+        elif Path(url).is_file():
+            source = url
+        else:
+            return None
+        image = Image.open(source).convert("RGBA")
+        smask = None
+        alpha = image.getchannel("A")
+        if alpha.getextrema()[0] < 255:
+            smask = self.writer.add_stream(
+                f"/Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode",
+                zlib.compress(alpha.tobytes()))
+        entries = (f"/Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+                   f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode")
+        if smask:
+            entries += f" /SMask {smask} 0 R"
+        number = self.writer.add_stream(entries, zlib.compress(image.convert("RGB").tobytes()))
+        self.stats["images_embedded"] += 1
+        self.images[key] = (number, image.width, image.height)
+        return self.images[key]
+
+    # -- drawing --
+
+    @staticmethod
+    def element_matrix(x: float, y: float, rotation: float) -> str:
+        """Translate to the element origin and rotate clockwise around it (Konva semantics)"""
+        if not rotation:
+            return f"1 0 0 1 {fmt(x)} {fmt(y)} cm"
+        rad = math.radians(rotation)
+        cos, sin = math.cos(rad), math.sin(rad)
+        return f"{fmt(cos)} {fmt(sin)} {fmt(-sin)} {fmt(cos)} {fmt(x)} {fmt(y)} cm"
+
+    def set_fill(self, ops: List[str], color: Color, resources: Dict[str, Dict[str, int]]):
+        r, g, b, a = color
+        ops.append(f"{fmt(r / 255)} {fmt(g / 255)} {fmt(b / 255)} rg")
+        if a < 1:
+            number = self.alpha(a)
+            resources["ExtGState"][f"GS{number}"] = number
+            ops.append(f"/GS{number} gs")
+
+    @staticmethod
+    def set_stroke(ops: List[str], color: Color, width: float, dash: Optional[List[float]]):
+        r, g, b, _ = color
+        ops.append(f"{fmt(r / 255)} {fmt(g / 255)} {fmt(b / 255)} RG {fmt(width)} w")
+        ops.append(f"[{' '.join(fmt(d) for d in dash)}] 0 d" if dash else "[] 0 d")
+
+    @staticmethod
+    def path(primitive: Tuple) -> str:
+        kind = primitive[0]
+        if kind == "rect":
+            _, w, h, radius = primitive
+            radius = min(radius, w / 2, h / 2)
+            if radius <= 0:
+                return f"0 0 {fmt(w)} {fmt(h)} re"
+            k = radius * (1 - KAPPA)
+            return " ".join([
+                f"{fmt(radius)} 0 m {fmt(w - radius)} 0 l",
+                f"{fmt(w - k)} 0 {fmt(w)} {fmt(k)} {fmt(w)} {fmt(radius)} c {fmt(w)} {fmt(h - radius)} l",
+                f"{fmt(w)} {fmt(h - k)} {fmt(w - k)} {fmt(h)} {fmt(w - radius)} {fmt(h)} c {fmt(radius)} {fmt(h)} l",
+                f"{fmt(k)} {fmt(h)} 0 {fmt(h - k)} 0 {fmt(h - radius)} c 0 {fmt(radius)} l",
+                f"0 {fmt(k)} {fmt(k)} 0 {fmt(radius)} 0 c h",
+            ])
+        if kind == "ellipse":
+            _, cx, cy, rx, ry = primitive
+            ox, oy = rx * KAPPA, ry * KAPPA
+            return " ".join([
+                f"{fmt(cx + rx)} {fmt(cy)} m",
+                f"{fmt(cx + rx)} {fmt(cy + oy)} {fmt(cx + ox)} {fmt(cy + ry)} {fmt(cx)} {fmt(cy + ry)} c",
+                f"{fmt(cx - ox)} {fmt(cy + ry)} {fmt(cx - rx)} {fmt(cy + oy)} {fmt(cx - rx)} {fmt(cy)} c",
+                f"{fmt(cx - rx)} {fmt(cy - oy)} {fmt(cx - ox)} {fmt(cy - ry)} {fmt(cx)} {fmt(cy - ry)} c",
+                f"{fmt(cx + ox)} {fmt(cy - ry)} {fmt(cx + rx)} {fmt(cy - oy)} {fmt(cx + rx)} {fmt(cy)} c h",
+            ])
+        points = primitive[1]
+        segments = [f"{fmt(points[0][0])} {fmt(points[0][1])} m"]
+        segments += [f"{fmt(x)} {fmt(y)} l" for x, y in points[1:]]
+        return " ".join(segments) + " h"
+
+    def draw_image(self, ops: List[str], resources, image: Tuple[int, int, int], w: float, h: float,
+                   crop: Tuple[float, float, float, float], flip_h: bool, flip_v: bool):
+        number, img_w, img_h = image
+        resources["XObject"][f"Im{number}"] = number
+        crop_x, crop_y, crop_w, crop_h = crop
+        k = w / crop_w
+        ops.append(f"q 0 0 {fmt(w)} {fmt(h)} re W n")
+        if flip_h or flip_v:
+            ops.append(f"{-1 if flip_h else 1} 0 0 {-1 if flip_v else 1} {fmt(w if flip_h else 0)} "
+                       f"{fmt(h if flip_v else 0)} cm")
+        x0, y0 = -crop_x * k, -crop_y * k
+        full_w, full_h = img_w * k, img_h * k
+        # Image space has its first row at the top of the unit square; flip it into our y-down space
+        ops.append(f"{fmt(full_w)} 0 0 {fmt(-full_h)} {fmt(x0)} {fmt(y0 + full_h)} cm /Im{number} Do Q")
+
+    def draw_photo(self, ops: List[str], resources, element: Dict[str, Any], w: float, h: float):
+        image = self.embed_photo(asset_key(element))
+        if not image:
+            self.stats["missing_photos"] += 1
+            return
+        self.stats["image_placements"] += 1
+        transform = photo_transform(element)
+        crop = photo_crop(image[1], image[2], w, h, transform)
+        self.draw_image(ops, resources, image, w, h, crop, transform["flipHorizontal"], transform["flipVertical"])
+
+        frame = element.get("frame") or {}
+        color = parse_color(frame.get("color"))
+        if frame.get("enabled") and color:
+            width = frame.get("width", 1)
+            self.set_stroke(ops, color, width, dash_pattern(frame.get("style"), width))
+            ops.append(f"0 0 {fmt(w)} {fmt(h)} re S")
+            if frame.get("style") == "double":
+                inset = width * 2
+                ops.append(f"{fmt(inset)} {fmt(inset)} {fmt(w - inset * 2)} {fmt(h - inset * 2)} re S")
+
+    def draw_shape(self, ops: List[str], resources, element: Dict[str, Any], w: float, h: float):
+        fill = parse_color(element.get("fillColor"))
+        stroke, stroke_width, dash = shape_stroke(element)
+        if fill:
+            self.set_fill(ops, fill, resources)
+        if stroke and stroke_width:
+            self.set_stroke(ops, stroke, stroke_width, dash)
+        paint = "B" if fill and stroke and stroke_width else "f" if fill else "S" if stroke and stroke_width else None
+        if not paint:
+            return
+        for primitive in shape_primitives(element, w, h):
+            ops.append(f"{self.path(primitive)} {paint}")
+
+    def draw_text(self, ops: List[str], resources, element: Dict[str, Any], w: float, h: float):
+        background = parse_color(element.get("backgroundColor"))
+        if background:
+            self.set_fill(ops, background, resources)
+            ops.append(f"0 0 {fmt(w)} {fmt(h)} re f")
+
+        font = standard_font(element.get("fontFamily"), element.get("fontWeight"), element.get("fontStyle"))
+        number = self.font(font)
+        resources["Font"][f"F{number}"] = number
+        size = element.get("fontSize") or 16
+        padding = element.get("padding") or 0
+        spacing = element.get("letterSpacing") or 0
+        line_px = (element.get("lineHeight") or 1) * size
+        align = element.get("textAlign", "left")
+        color = parse_color(element.get("color")) or (0, 0, 0, 1.0)
+
+        self.set_fill(ops, color, resources)
+        ops.append(f"BT /F{number} {fmt(size)} Tf {fmt(spacing)} Tc")
+        inner = w - padding * 2
+        for index, line in enumerate(wrap_text(element.get("content", ""), font, size, inner, spacing)):
+            line_w = text_width(line, font, size, spacing)
+            x = padding + (inner - line_w if align == "right" else (inner - line_w) / 2 if align == "center" else 0)
+            # Konva draws each line with textBaseline 'middle'
+            baseline = padding + index * line_px + line_px / 2 + size * 0.35
+            ops.append(f"1 0 0 -1 {fmt(x)} {fmt(baseline)} Tm {pdf_string(line).decode('latin-1')} Tj")
+        ops.append("ET")
+
+    def draw_sticker(self, ops: List[str], resources, element: Dict[str, Any], w: float, h: float):
+        image = self.embed_sticker(element.get("stickerUrl", ""))
+        if not image:
+            self.stats["stickers_skipped"] += 1
+            return
+        self.draw_image(ops, resources, image, w, h, (0, 0, image[1], image[2]),
+                        bool(element.get("flipHorizontal")), bool(element.get("flipVertical")))
+
+    def render_page(self, page: Dict[str, Any], parent: int) -> int:
+        resources: Dict[str, Dict[str, int]] = {"XObject": {}, "Font": {}, "ExtGState": {}}
+        ops = [f"{fmt(self.scale)} 0 0 {fmt(-self.scale)} 0 {fmt(self.page_h * self.scale)} cm"]
+
+        background = parse_color((page.get("background") or {}).get("color")) or (255, 255, 255, 1.0)
+        ops.append("q")
+        self.set_fill(ops, background, resources)
+        ops.append(f"0 0 {self.page_w} {self.page_h} re f Q")
+
+        draw = {"photo": self.draw_photo, "shape": self.draw_shape, "text": self.draw_text,
+                "sticker": self.draw_sticker}
+        for element in sorted_elements(page):
+            handler = draw.get(element.get("type"))
+            if not handler:
+                continue
+            x, y, w, h = element_box(element, self.page_w, self.page_h)
+            if w <= 0 or h <= 0:
+                continue
+            ops.append("q " + self.element_matrix(x, y, element.get("rotation") or 0))
+            handler(ops, resources, element, w, h)
+            ops.append("Q")
+
+        content = self.writer.add_stream("/Filter /FlateDecode", zlib.compress("\n".join(ops).encode("latin-1")))
+        resource_text = " ".join(
+            f"/{kind} << {' '.join(f'/{name} {num} 0 R' for name, num in entries.items())} >>"
+            for kind, entries in resources.items() if entries)
+        width_pt, height_pt = self.page_w * self.scale, self.page_h * self.scale
+        return self.writer.add(
+            f"<< /Type /Page /Parent {parent} 0 R /MediaBox [0 0 {fmt(width_pt)} {fmt(height_pt)}] "
+            f"/Resources << /ProcSet [/PDF /Text /ImageC /ImageB] {resource_text} >> /Contents {content} 0 R >>")
+
+    def export(self, output_path: Union[str, Path], on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Write the PDF; returns export statistics"""
+        start = time.time()
+        self.writer = PdfWriter(output_path)
+        pages_id = self.writer.reserve()
+        kids = []
+        pages = sorted_pages(self.book)
+        for index, page in enumerate(pages):
+            kids.append(self.render_page(page, pages_id))
+            self.stats["pages"] += 1
+            if on_progress:
+                on_progress(index + 1, len(pages))
+
+        width_pt, height_pt = self.page_w * self.scale, self.page_h * self.scale
+        self.writer.write(pages_id, f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] "
+                                    f"/Count {len(kids)} /MediaBox [0 0 {fmt(width_pt)} {fmt(height_pt)}] >>")
+        catalog = self.writer.add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+        title = pdf_string(str(self.book.get("spineTitle") or self.book.get("id", "Photobook"))).decode("latin-1")
+        info = self.writer.add(f"<< /Title {title} /Producer (Photobook PDF export) >>")
+        self.stats["bytes"] = self.writer.close(catalog, info)
+        self.stats["unique_photos"] = len(self.assets)
+        self.stats["elapsed"] = time.time() - start
+        return self.stats
+
+
+def export_pdf(book: Dict[str, Any], resolver: PhotoResolver, output_path: Union[str, Path], dpi: int = 300,
+               quality: int = 90, on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """Render a photobook exported by exportService.exportAsJSON to a PDF file"""
+    return PdfExporter(book, resolver, dpi=dpi, quality=quality).export(output_path, on_progress)
@@ -0,0 +1,209 @@
+"""
+Budget-aware scheduling of vision calls on top of the usage ledger
+
+The scheduler decides, per call, which deployment and image size to use and
+how long to wait first:
+
+- throttle: wait until the trailing-minute tokens/spend leave room for the call
+- degrade: as the period budget runs down, downscale images first, then move
+  work to cheaper deployments, then to the cheapest at low detail
+- refuse: raise BudgetExhausted once the budget is spent
+
+run() plans, throttles and records a single call. For calls made elsewhere
+(analyze_packed in job-service.py --budget), plan() once per job and pass
+poster(decision) as their `post`: it throttles and records every call.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .accounting import UsageLedger, estimate_image_tokens
+from .midas import post_completion
+from .payloads import Body, count_images
+
+# Cheap vision-capable deployments work can be moved to
+DEFAULT_FALLBACK_MODELS = ["GPT 4o Mini", "Gemini-2.0-flash"]
+
+# Longest image edge per degradation level (None keeps the caller's size)
+DEFAULT_MAX_EDGES = [None, 1024, 768, 512]
+
+# (remaining budget fraction above which the level applies, level)
+DEGRADE_STEPS = [(0.5, 0), (0.25, 1), (0.10, 2), (0.0, 3)]
+
+# Estimated prompt text and completion tokens per call, on top of its images
+BASE_CALL_TOKENS = 800
+
+
+class BudgetExhausted(Exception):
+    """Raised when the period budget has no room left for another call"""
+
+
+class BudgetScheduler:
+    def __init__(
+        self,
+        ledger: UsageLedger,
+        budget: float,
+        tokens_per_minute: Optional[int] = None,
+        spend_per_minute: Optional[float] = None,
+        fallback_models: Sequence[str] = DEFAULT_FALLBACK_MODELS,
+        max_edges: Sequence[Optional[int]] = DEFAULT_MAX_EDGES,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.ledger = ledger
+        self.budget = budget
+        self.tokens_per_minute = tokens_per_minute
+        self.spend_per_minute = spend_per_minute
+        self.fallback_models = list(fallback_models)
+        self.max_edges = list(max_edges)
+        self.sleep = sleep
+
+    def remaining_fraction(self) -> float:
+        if self.budget <= 0:
+            return 0.0
+        return max(0.0, 1.0 - self.ledger.spent() / self.budget)
+
+    def level(self) -> int:
+        remaining = self.remaining_fraction()
+        for threshold, level in DEGRADE_STEPS:
+            if remaining > threshold:
+                return level
+        raise BudgetExhausted(f"Budget of {self.budget:.2f} {self.ledger.prices.currency} is spent")
+
+    def _cheaper_models(self, deployment: str) -> List[str]:
+        """Fallback models cheaper than deployment, most expensive first"""
+        rate = self.ledger.prices.blended_rate
+        cheaper = [m for m in self.fallback_models if rate(m) < rate(deployment)]
+        return sorted(cheaper, key=rate, reverse=True)
+
+    def plan(self, deployment: str, estimated_tokens: int = 2000) -> Dict[str, Any]:
+        """
+        Choose deployment, max image edge and detail for the next call.
+
+        Also steps down to a cheaper model whenever the estimated cost of the
+        call on the preferred one would overrun what is left of the budget.
+        """
+        level = self.level()
+        chosen = deployment
+        cheaper = self._cheaper_models(deployment)
+        if level == 2 and cheaper:
+            chosen = cheaper[0]
+        elif level >= 3 and cheaper:
+            chosen = cheaper[-1]
+
+        remaining = self.budget - self.ledger.spent()
+        for candidate in [chosen] + [m for m in cheaper if m != chosen]:
+            chosen = candidate
+            if self.ledger.prices.blended_rate(candidate) * estimated_tokens <= remaining:
+                break
+
+        return {
+            "requested": deployment,
+            "deployment": chosen,
+            "level": level,
+            "max_edge": self.max_edges[min(level, len(self.max_edges) - 1)],
+            "detail": "low" if level >= 3 else None,
+            "estimated_tokens": estimated_tokens,
+            "estimated_cost": self.ledger.prices.blended_rate(chosen) * estimated_tokens,
+        }
+
+    def wait_seconds(self, estimated_tokens: int, estimated_cost: float) -> float:
+        """Seconds until the trailing minute has room for this call (0 if now)"""
+        window = self.ledger.window(60.0)
+        if window["oldest"] is None:
+            return 0.0
+        over_tokens = self.tokens_per_minute and window["tokens"] + estimated_tokens > self.tokens_per_minute
+        over_spend = self.spend_per_minute and window["cost"] + estimated_cost > self.spend_per_minute
+        if not (over_tokens or over_spend):
+            return 0.0
+        # Wait for the oldest entry to age out; re-checked after sleeping
+        return max(0.05, window["oldest"] + 60.0 - time.time())
+
+    def throttle(self, decision: Dict[str, Any]) -> float:
+        """Block until the call fits the per-minute caps; returns seconds waited"""
+        waited = 0.0
+        while True:
+            wait = self.wait_seconds(decision["estimated_tokens"], decision["estimated_cost"])
+            if wait <= 0:
+                return waited
+            self.sleep(wait)
+            waited += wait
+
+    def run(
+        self,
+        deployment: str,
+        build_request: Callable[[Dict[str, Any]], Dict[str, Any]],
+        job_id: str = "default",
+        images: int = 0,
+        image_size: Optional[Sequence[int]] = None,
+        estimated_tokens: Optional[int] = None,
+        post: Callable[..., Dict[str, Any]] = post_completion,
+        **post_kwargs,
+    ) -> Dict[str, Any]:
+        """
+        Plan, throttle, send and record one call.
+
+        build_request receives the decision (deployment, max_edge, detail) and
+        returns the request body, so image downscaling happens only when the
+        scheduler asks for it.
+        """
+        image_tokens = 0
+        if image_size and images:
+            image_tokens = images * estimate_image_tokens(image_size[0], image_size[1])
+        if estimated_tokens is None:
+            estimated_tokens = image_tokens + BASE_CALL_TOKENS
+
+        decision = self.plan(deployment, estimated_tokens)
+        decision["waited"] = self.throttle(decision)
+
+        if image_size and images and decision["max_edge"]:
+            scale = min(1.0, decision["max_edge"] / max(image_size))
+            image_tokens = images * estimate_image_tokens(
+                round(image_size[0] * scale), round(image_size[1] * scale), decision["detail"] or "high"
+            )
+
+        result = post(build_request(decision), **post_kwargs)
+        self.ledger.record(
+            decision["deployment"],
+            result.get("usage"),
+            job_id=job_id,
+            image_tokens=image_tokens,
+            images=images,
+            success=result["success"],
+        )
+        return {**result, "decision": decision}
+
+    def poster(
+        self,
+        decision: Dict[str, Any],
+        job_id: str = "default",
+        tokens_per_image: int = 0,
+        post: Callable[..., Dict[str, Any]] = post_completion,
+    ) -> Callable[..., Dict[str, Any]]:
+        """
+        A post_completion stand-in for calls planned once with plan(decision)
+
+        Before each call it raises BudgetExhausted if the budget is spent and
+        waits for room in the per-minute caps; after it, the call is recorded
+        with tokens_per_image image tokens per image in the request.
+        """
+
+        def send(request: Any, **post_kwargs) -> Dict[str, Any]:
+            images = request.template.images if isinstance(request, Body) else count_images(request)
+            estimated_tokens = images * tokens_per_image + BASE_CALL_TOKENS
+            self.level()
+            self.throttle({
+                "estimated_tokens": estimated_tokens,
+                "estimated_cost": self.ledger.prices.blended_rate(decision["deployment"]) * estimated_tokens,
+            })
+            result = post(request, **post_kwargs)
+            self.ledger.record(
+                request.model if isinstance(request, Body) else request.get("model", decision["deployment"]),
+                result.get("usage"),
+                job_id=job_id,
+                image_tokens=images * tokens_per_image,
+                images=images,
+                success=result["success"],
+            )
+            return result
+
+        return send
@@ -0,0 +1,344 @@
+"""
+Shadow traffic: compare candidate vision deployments on real analysis work
+
+Picking a deployment for image analysis used to mean eyeballing one test
+photo in test-vision-analysis.py. A ShadowRunner answers each analyze call
+from the primary deployment exactly as analyze_packed does, and meanwhile
+sends the same prepared photos, with the same pack size, to one or more
+candidate deployments on background threads. The caller gets the primary's
+result as soon as it is ready; it never waits on a candidate or sees a
+candidate's errors, progress or partial results.
+
+When the primary and every candidate of a batch are done, one record is
+appended to a JSONL shadow log: wall time, per-call latency, failures and
+token usage for each deployment, every summary, and per photo how closely
+each candidate's ImageSummary agrees with the primary's (description,
+lighting and mood). aggregate() rolls logs up into one row per deployment
+for shadow-compare.py.
+
+Agreement is lexical, not semantic: textsim.summary_agreement is the
+Jaccard overlap of content words, so a faithful paraphrase scores near
+zero and the lowest-agreement photos are often just reworded answers.
+The numbers are only readable against the run-to-run noise floor: list
+the primary among the candidates, and judge the other candidates by how
+much of the primary's overlap with itself they reach (as sweep.recommend
+does with its noise floor).
+
+Shadowing multiplies API spend: sample_rate picks which batches are
+shadowed, and while max_pending batches are still waiting on candidates
+further batches are skipped (or, with block=True, wait for a slot).
+"""
+
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from . import tracing
+from .accounting import PriceTable
+from .packing import FAILED_SUMMARY, SUMMARY_FIELDS, analyze_packed
+from .textsim import summary_agreement
+
+# analyze_packed arguments that belong to the caller's job, not to shadow calls
+PRIMARY_ONLY = ("on_progress", "on_summary", "deadline")
+
+# Overall agreement at which a candidate's summary counts as matching the primary's
+AGREE_THRESHOLD = 0.5
+
+# What the agreement scores measure, recorded on every candidate row of a report
+AGREEMENT_MEASURE = "lexical overlap (Jaccard of content words)"
+
+
+def _failed(summary: Optional[Dict[str, str]]) -> bool:
+    return summary is None or summary.get("description") == FAILED_SUMMARY["description"]
+
+
+def run_stats(run: Dict[str, Any], elapsed_ms: float) -> Dict[str, Any]:
+    """What the shadow log keeps of one analyze_packed run"""
+    calls = run["calls"]
+    return {
+        "wall_ms": round(elapsed_ms, 1),
+        "calls": len(calls),
+        "failed_calls": sum(1 for call in calls if not call["success"]),
+        "call_ms": [round(call["response_time"], 1) for call in calls],
+        "fallbacks": len(run["fallback_ids"]),
+        "failed_images": sum(1 for summary in run["summaries"] if _failed(summary)),
+        "usage": run["usage"],
+        "summaries": [
+            None if summary is None else {field: summary.get(field) for field in SUMMARY_FIELDS}
+            for summary in run["summaries"]
+        ],
+    }
+
+
+def compare_summaries(
+    primary: Sequence[Optional[Dict[str, str]]], candidate: Sequence[Optional[Dict[str, str]]]
+) -> List[Optional[Dict[str, float]]]:
+    """Per-photo lexical overlap per field and overall; None where either side failed"""
+    return [
+        None if _failed(ours) or _failed(theirs)
+        else {field: round(score, 3) for field, score in summary_agreement(ours, theirs).items()}
+        for ours, theirs in zip(primary, candidate)
+    ]
+
+
+class _Batch:
+    """One shadowed analyze call: the primary's part and each candidate's, as they finish"""
+
+    def __init__(self, label: str, image_ids: List[str], primary: str, candidates: int):
+        self.label = label
+        self.image_ids = image_ids
+        self.primary_deployment = primary
+        self.primary: Optional[Dict[str, Any]] = None
+        self.candidates: List[Dict[str, Any]] = []
+        self.remaining = candidates + 1
+        self.lock = threading.Lock()
+
+    def add(self, part: Dict[str, Any], primary: bool = False) -> bool:
+        """Store a finished part; True once every part is in"""
+        with self.lock:
+            if primary:
+                self.primary = part
+            else:
+                self.candidates.append(part)
+            self.remaining -= 1
+            return self.remaining == 0
+
+
+class ShadowRunner:
+    """
+    analyze_packed for a primary deployment, mirrored to candidate deployments
+
+    Thread-safe; one runner is shared by every worker of a service. Call
+    close() (or drain()) before exiting so records of in-flight batches are
+    written.
+    """
+
+    def __init__(
+        self,
+        candidates: Sequence[str],
+        log_path: Optional[Union[str, Path]] = None,
+        sample_rate: float = 1.0,
+        max_pending: int = 2,
+        block: bool = False,
+        seed: Optional[int] = None,
+        on_record: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.candidates = list(candidates)
+        self.log_path = Path(log_path) if log_path else None
+        self.sample_rate = sample_rate
+        self.max_pending = max(1, max_pending)
+        self.block = block
+        self.on_record = on_record
+        self.stats = {"batches": 0, "shadowed": 0, "sampled_out": 0, "skipped_busy": 0, "candidate_errors": 0,
+                      "records": 0}
+        self._rng = random.Random(seed)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()
+        # Enough threads that candidates of the pending batches never queue behind each other
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self.candidates) * self.max_pending), thread_name_prefix="shadow"
+        )
+
+    def _admit(self) -> bool:
+        with self._changed:
+            self.stats["batches"] += 1
+            if not self.candidates:
+                return False
+            if self.sample_rate < 1 and self._rng.random() >= self.sample_rate:
+                self.stats["sampled_out"] += 1
+                return False
+            if self.block:
+                self._changed.wait_for(lambda: self._pending < self.max_pending)
+            elif self._pending >= self.max_pending:
+                self.stats["skipped_busy"] += 1
+                return False
+            self._pending += 1
+            self.stats["shadowed"] += 1
+            return True
+
+    def analyze(self, images: Sequence[Dict[str, Any]], deployment: str, label: str = "",
+                **kwargs) -> Dict[str, Any]:
+        """
+        analyze_packed(images, deployment, **kwargs), shadowed when admitted
+
+        kwargs other than on_progress, on_summary and deadline are passed
+        to the candidate runs too (pack_size, detail, api_key, latency, ...).
+        label names the batch in the shadow log (a job id, a corpus slice).
+        """
+        if not self._admit():
+            return analyze_packed(images, deployment, **kwargs)
+
+        batch = _Batch(label, [image["image_id"] for image in images], deployment, len(self.candidates))
+        shadow_kwargs = {key: value for key, value in kwargs.items() if key not in PRIMARY_ONLY}
+        for candidate in self.candidates:
+            self._executor.submit(self._run_candidate, batch, images, candidate, shadow_kwargs)
+
+        start = time.perf_counter()
+        try:
+            run = analyze_packed(images, deployment, **kwargs)
+        except BaseException as e:
+            # A cancelled or failed job has nothing to compare against; the candidates still finish
+            self._add(batch, {"deployment": deployment, "error": f"{type(e).__name__}: {e}"}, primary=True)
+            raise
+        self._add(batch, {"deployment": deployment, **run_stats(run, (time.perf_counter() - start) * 1000)},
+                  primary=True)
+        return run
+
+    def _run_candidate(self, batch: _Batch, images: Sequence[Dict[str, Any]], deployment: str,
+                       kwargs: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            with tracing.span("shadow", deployment=deployment, versus=batch.primary_deployment,
+                              images=len(images), label=batch.label):
+                run = analyze_packed(images, deployment, **kwargs)
+            part = {"deployment": deployment, **run_stats(run, (time.perf_counter() - start) * 1000)}
+        except Exception as e:
+            with self._lock:
+                self.stats["candidate_errors"] += 1
+            part = {"deployment": deployment, "error": f"{type(e).__name__}: {e}"}
+        self._add(batch, part)
+
+    def _add(self, batch: _Batch, part: Dict[str, Any], primary: bool = False):
+        if not batch.add(part, primary):
+            return
+        try:
+            if "error" not in batch.primary:
+                self._record(batch)
+        finally:
+            with self._changed:
+                self._pending -= 1
+                self._changed.notify_all()
+
+    def _record(self, batch: _Batch):
+        primary = batch.primary
+        candidates = []
+        for part in sorted(batch.candidates, key=lambda p: self.candidates.index(p["deployment"])):
+            if "error" not in part:
+                part = {**part, "agreement": compare_summaries(primary["summaries"], part["summaries"])}
+            candidates.append(part)
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "label": batch.label,
+            "image_ids": batch.image_ids,
+            "primary": primary,
+            "candidates": candidates,
+        }
+        if self.log_path:
+            line = json.dumps(record) + "\n"
+            with self._write_lock:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_path, "a") as f:
+                    f.write(line)
+        with self._lock:
+            self.stats["records"] += 1
+        if self.on_record:
+            self.on_record(record)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no shadowed batch is pending; False if timeout ran out first"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        drained = self.drain(timeout)
+        self._executor.shutdown(wait=drained, cancel_futures=not drained)
+        return drained
+
+
+def load_records(paths: Sequence[Union[str, Path]]) -> List[Dict[str, Any]]:
+    records = []
+    for path in paths:
+        with open(path, "r") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def aggregate(
+    records: Sequence[Dict[str, Any]], prices: Optional[PriceTable] = None, threshold: float = AGREE_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Roll shadow records up to one row per primary and per (candidate, primary)
+
+    Rows carry batches, images, failed images and errored runs, wall time
+    per photo, p50/p95 call latency, tokens and (with prices) cost per
+    photo. Candidate rows add the mean agreement (AGREEMENT_MEASURE) per
+    field and overall over the photos both sides answered, and the share at
+    or above threshold.
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for record in records:
+        primary = record["primary"]
+        groups.setdefault(("primary", primary["deployment"], None), []).append(primary)
+        for part in record["candidates"]:
+            groups.setdefault(("candidate", part["deployment"], primary["deployment"]), []).append(part)
+
+    rows = []
+    for (role, deployment, versus), parts in groups.items():
+        ok = [part for part in parts if "error" not in part]
+        images = sum(len(part["summaries"]) for part in ok)
+        calls = [ms for part in ok for ms in part["call_ms"]]
+        prompt = sum(part["usage"].get("prompt_tokens", 0) for part in ok)
+        completion = sum(part["usage"].get("completion_tokens", 0) for part in ok)
+        total = sum(part["usage"].get("total_tokens", 0) for part in ok)
+        row = {
+            "role": role,
+            "deployment": deployment,
+            "versus": versus,
+            "batches": len(parts),
+            "errors": len(parts) - len(ok),
+            "images": images,
+            "failed_images": sum(part["failed_images"] for part in ok),
+            "ms_per_image": sum(part["wall_ms"] for part in ok) / images if images else None,
+            "call_p50_ms": _percentile(calls, 0.5) if calls else None,
+            "call_p95_ms": _percentile(calls, 0.95) if calls else None,
+            "tokens_per_image": total / images if images else None,
+            "cost_per_image": prices.cost(deployment, prompt, completion) / images if prices and images else None,
+        }
+        if role == "candidate":
+            scores = [score for part in ok for score in part["agreement"] if score is not None]
+            row["compared"] = len(scores)
+            row["agreement_measure"] = AGREEMENT_MEASURE
+            row["agreement"] = {
+                field: statistics.mean(score[field] for score in scores) if scores else None
+                for field in (*SUMMARY_FIELDS, "overall")
+            }
+            row["agree_share"] = sum(1 for s in scores if s["overall"] >= threshold) / len(scores) if scores else None
+        rows.append(row)
+    rows.sort(key=lambda row: (row["role"] != "primary", row["versus"] or "", row["deployment"]))
+    return rows
+
+
+def disagreements(records: Sequence[Dict[str, Any]], deployment: str, versus: Optional[str] = None,
+                  count: int = 5) -> List[Dict[str, Any]]:
+    """The photos with the least word overlap between candidate and primary, both summaries side by side"""
+    found = []
+    for record in records:
+        if versus and record["primary"]["deployment"] != versus:
+            continue
+        for part in record["candidates"]:
+            if part["deployment"] != deployment or "error" in part:
+                continue
+            for position, score in enumerate(part["agreement"]):
+                if score is not None:
+                    found.append({
+                        "image_id": record["image_ids"][position],
+                        "label": record["label"],
+                        "overall": score["overall"],
+                        "primary": record["primary"]["summaries"][position],
+                        "candidate": part["summaries"][position],
+                    })
+    found.sort(key=lambda item: item["overall"])
+    return found[:count]
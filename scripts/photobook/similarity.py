@@ -0,0 +1,457 @@
+"""
+Similar-photo search over compact per-photo vectors
+
+Nothing in the pipeline can answer "photos like this one" or "a photo that
+matches this spread's palette"; groupImagesByTheme only compares summary
+strings for exact matches. Here each photo becomes one unit vector of DIM
+float32 values in three blocks, each unit length and scaled by the square
+root of its BLOCK_WEIGHTS entry, so a dot product is the weighted sum of the
+per-block cosines:
+
+- color: 4x4x4 RGB histogram, square-rooted (Hellinger), from a 64 px decode
+- layout: 8x8 luma grid with the mean removed (composition and light placement)
+- text: content words of the ImageSummary description, lighting and mood,
+  hashed into TEXT_DIM signed buckets
+
+SimilarityIndex is an inverted-file (IVF) index over those vectors. Spherical
+k-means centroids split the collection into LISTS_PER_SQRT * sqrt(n) lists,
+and a query scores only the `nprobe` lists whose centroids are closest.
+Vectors are stored as int8 with a per-vector scale (the default; NumPy
+widens int8 about four times faster than float16) or as float16. An insert
+goes straight into its nearest list and a delete is O(1). Centroids are
+retrained each time the collection grows RETRAIN_GROWTH-fold. save() writes the lists
+contiguously as .npy files and load() memory-maps them, so opening an index
+reads only the ids and a query touches only the lists it probes.
+"""
+
+import io
+import json
+import math
+import os
+import shutil
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from .textsim import SUMMARY_FIELDS, tokens
+
+DEFAULT_INDEX = Path.home() / ".cache" / "photobook" / "similar"
+
+# Feature layout
+FEATURE_EDGE = 64  # long edge of the decode every feature is taken from
+HIST_LEVELS = 4  # per RGB channel, 64 bins
+LAYOUT_GRID = 8
+TEXT_DIM = 128
+BLOCKS = {
+    "color": slice(0, HIST_LEVELS ** 3),
+    "layout": slice(HIST_LEVELS ** 3, HIST_LEVELS ** 3 + LAYOUT_GRID ** 2),
+    "text": slice(HIST_LEVELS ** 3 + LAYOUT_GRID ** 2, HIST_LEVELS ** 3 + LAYOUT_GRID ** 2 + TEXT_DIM),
+}
+DIM = BLOCKS["text"].stop
+BLOCK_WEIGHTS = {"color": 0.45, "layout": 0.25, "text": 0.3}
+
+# Index tuning, measured with similar-photos.py benchmark
+DTYPES = ("int8", "float16")
+MIN_TRAIN = 1024  # below this the index is one list, scanned exactly
+LISTS_PER_SQRT = 4  # nlist = LISTS_PER_SQRT * sqrt(n) at training time
+RETRAIN_GROWTH = 4
+TRAIN_SAMPLE_PER_LIST = 64
+KMEANS_ITERATIONS = 8
+DEFAULT_NPROBE = 16
+FORMAT_VERSION = 1
+
+Summary = Union[str, Dict[str, Any], None]
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+# -- features --
+
+def feature_rgb(source: Union[str, Path, bytes]) -> np.ndarray:
+    """Upright uint8 RGB at FEATURE_EDGE; JPEGs are drafted to the smallest DCT scale that covers it"""
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else os.fspath(source))
+    if image.format == "JPEG":
+        image.draft("RGB", (FEATURE_EDGE, FEATURE_EDGE))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((FEATURE_EDGE, FEATURE_EDGE), Image.BILINEAR)
+    return np.asarray(image)
+
+
+def color_histogram(rgb: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Square-rooted joint RGB histogram (unit length, so dot products are Bhattacharyya coefficients)"""
+    q = (rgb.reshape(-1, 3) // (256 // HIST_LEVELS)).astype(np.intp)
+    index = (q[:, 0] * HIST_LEVELS + q[:, 1]) * HIST_LEVELS + q[:, 2]
+    counts = np.bincount(index, weights=weights, minlength=HIST_LEVELS ** 3).astype(np.float32)
+    total = counts.sum()
+    return np.sqrt(counts / total) if total > 0 else counts
+
+
+def layout_grid(rgb: np.ndarray) -> np.ndarray:
+    """LAYOUT_GRID x LAYOUT_GRID luma means, centred and unit length (zero for a flat image)"""
+    luma = Image.fromarray(rgb).convert("L").resize((LAYOUT_GRID, LAYOUT_GRID), Image.BOX)
+    grid = np.asarray(luma, dtype=np.float32).ravel()
+    return _unit(grid - grid.mean())
+
+
+def text_vector(summary: Summary) -> np.ndarray:
+    """Signed feature hashing of an ImageSummary's content words (or of a bare description)"""
+    vector = np.zeros(TEXT_DIM, dtype=np.float32)
+    if isinstance(summary, dict):
+        summary = " ".join(str(summary.get(field) or "") for field in SUMMARY_FIELDS)
+    for word in tokens(summary):
+        h = zlib.crc32(word.encode("utf-8"))
+        vector[h % TEXT_DIM] += 1.0 if h & 0x80000000 else -1.0
+    return _unit(vector)
+
+
+def combine(blocks: Dict[str, np.ndarray], weights: Dict[str, float] = BLOCK_WEIGHTS) -> np.ndarray:
+    """Weighted block vector, renormalized so photos without a summary still rank on pixels"""
+    vector = np.zeros(DIM, dtype=np.float32)
+    for name, part in blocks.items():
+        vector[BLOCKS[name]] = part * math.sqrt(weights[name])
+    return _unit(vector)
+
+
+def photo_vector(source: Union[str, Path, bytes], summary: Summary = None) -> np.ndarray:
+    rgb = feature_rgb(source)
+    return combine({"color": color_histogram(rgb), "layout": layout_grid(rgb), "text": text_vector(summary)})
+
+
+def palette_vector(colors: Sequence[str], weights: Optional[Sequence[float]] = None) -> np.ndarray:
+    """Color-only query from hex colors (e.g. a spread's background and accents)"""
+    rgb = np.array([[int(c.lstrip("#")[i:i + 2], 16) for i in (0, 2, 4)] for c in colors], dtype=np.uint8)
+    hist = color_histogram(rgb, None if weights is None else np.asarray(weights, dtype=np.float64))
+    return combine({"color": hist})
+
+
+def only_blocks(vector: np.ndarray, names: Iterable[str]) -> np.ndarray:
+    """Query restricted to some blocks, e.g. ("color",) to match a palette and ignore content"""
+    masked = np.zeros_like(vector, dtype=np.float32)
+    for name in names:
+        masked[BLOCKS[name]] = vector[BLOCKS[name]]
+    return _unit(masked)
+
+
+def _vectorize_chunk(task: Tuple[List[str], List[Summary]]) -> List[Dict[str, Any]]:
+    records = []
+    for path, summary in zip(*task):
+        try:
+            records.append({"path": path, "vector": photo_vector(path, summary)})
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            records.append({"path": path, "error": f"{type(e).__name__}: {e}"})
+    return records
+
+
+def vectorize_paths(
+    paths: Sequence[Union[str, Path]],
+    summaries: Optional[Dict[str, Summary]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 32,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    {"path", "vector"} (or "error") per photo, in input order, with absolute paths
+
+    `summaries` maps absolute paths to ImageSummary dicts for the text block.
+    """
+    start = time.perf_counter()
+    keys = [str(Path(p).resolve()) for p in paths]
+    summaries = summaries or {}
+    tasks = [(keys[i:i + chunk_size], [summaries.get(k) for k in keys[i:i + chunk_size]])
+             for i in range(0, len(keys), chunk_size)]
+    records: List[Dict[str, Any]] = []
+
+    def collect(chunk: List[Dict[str, Any]]):
+        records.extend(chunk)
+        if on_progress:
+            on_progress(len(records), len(keys))
+
+    if (workers or os.cpu_count() or 1) > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(_vectorize_chunk, tasks):
+                collect(chunk)
+    else:
+        for task in tasks:
+            collect(_vectorize_chunk(task))
+
+    stats = {"photos": len(records), "errors": sum("error" in r for r in records),
+             "elapsed": time.perf_counter() - start}
+    return records, stats
+
+
+# -- index --
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    if len(centroids) == 1:
+        return np.zeros(len(vectors), dtype=np.int32)
+    return np.concatenate([np.argmax(vectors[i:i + chunk] @ centroids.T, axis=1)
+                           for i in range(0, len(vectors), chunk)] or [np.zeros(0)]).astype(np.int32)
+
+
+def _spherical_kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        empty = np.bincount(assign, minlength=k) == 0
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+        centroids = _unit_rows(sums)
+    return centroids
+
+
+class SimilarityIndex:
+    """
+    IVF index of unit vectors keyed by string id (usually the photo's absolute path)
+
+    add() replaces an existing id. Scores are cosine similarities computed
+    from the quantized vectors.
+    """
+
+    def __init__(self, dim: int = DIM, dtype: str = "int8", nprobe: int = DEFAULT_NPROBE):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype {dtype!r} (expected one of {', '.join(DTYPES)})")
+        self.dim = dim
+        self.dtype = dtype
+        self.nprobe = nprobe
+        self.trained_size = 0
+        self._codes = np.zeros((0, dim), dtype=dtype)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._list_of = np.zeros(0, dtype=np.int32)
+        self._slot = np.zeros(0, dtype=np.int32)
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._centroids = np.zeros((1, dim), dtype=np.float32)
+        self._members = [np.zeros(0, dtype=np.int32)]
+        self._sizes = [0]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, photo_id: str) -> bool:
+        return photo_id in self._rows
+
+    @property
+    def nlist(self) -> int:
+        return len(self._members)
+
+    def ids(self) -> List[str]:
+        return list(self._rows)
+
+    # -- storage --
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        peak = np.abs(vectors).max(axis=1)
+        scales = np.where(peak > 0, peak / 127, 1).astype(np.float32)
+        return np.rint(vectors / scales[:, None]).astype(np.int8), scales
+
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        return self._codes[rows].astype(np.float32) * self._scales[rows, None]
+
+    def _allocate(self, count: int) -> np.ndarray:
+        """Rows for `count` new vectors, reusing deleted rows first"""
+        reused = [self._free.pop() for _ in range(min(count, len(self._free)))]
+        start = len(self._ids)
+        needed = start + count - len(reused)
+        if needed > len(self._codes):
+            capacity = max(needed, 2 * len(self._codes), 64)
+            for name in ("_codes", "_scales", "_list_of", "_slot"):
+                old = getattr(self, name)
+                grown = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                grown[:start] = old[:start]
+                setattr(self, name, grown)
+        elif not self._codes.flags.writeable:
+            # Memory-mapped by load(); the first write copies it into memory
+            self._codes = np.array(self._codes)
+        self._ids.extend([None] * (needed - start))
+        return np.array(reused + list(range(start, needed)), dtype=np.intp)
+
+    def _push(self, list_id: int, row: int):
+        members, size = self._members[list_id], self._sizes[list_id]
+        if size == len(members):
+            members = self._members[list_id] = np.concatenate([members, np.zeros(max(16, size), dtype=np.int32)])
+        members[size] = row
+        self._slot[row] = size
+        self._list_of[row] = list_id
+        self._sizes[list_id] = size + 1
+
+    def _rebuild(self, rows: np.ndarray, lists: np.ndarray, nlist: int):
+        order = np.argsort(lists, kind="stable")
+        rows, lists = rows[order], lists[order]
+        counts = np.bincount(lists, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._members = [rows[offsets[i]:offsets[i + 1]].astype(np.int32) for i in range(nlist)]
+        self._sizes = counts.tolist()
+        self._list_of[rows] = lists
+        self._slot[rows] = np.arange(len(rows)) - np.repeat(offsets[:-1], counts)
+
+    # -- updates --
+
+    def add(self, photo_id: str, vector: np.ndarray):
+        self.add_many([photo_id], np.asarray(vector)[None, :])
+
+    def add_many(self, ids: Sequence[str], vectors: np.ndarray):
+        """Insert (or replace) vectors; retrains once the index outgrows its centroids"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError(f"{len(ids)} ids for {len(vectors)} vectors")
+        latest = {photo_id: i for i, photo_id in enumerate(ids)}
+        if len(latest) < len(ids):
+            ids, vectors = list(latest), vectors[list(latest.values())]
+        for photo_id in ids:
+            self.remove(photo_id)
+        vectors = _unit_rows(vectors)
+        rows = self._allocate(len(ids))
+        self._codes[rows], self._scales[rows] = self._encode(vectors)
+        for photo_id, row, list_id in zip(ids, rows.tolist(), _nearest(vectors, self._centroids).tolist()):
+            self._ids[row] = photo_id
+            self._rows[photo_id] = row
+            self._push(list_id, row)
+        if len(self) >= max(MIN_TRAIN, RETRAIN_GROWTH * self.trained_size):
+            self.train()
+
+    def remove(self, photo_id: str) -> bool:
+        row = self._rows.pop(photo_id, None)
+        if row is None:
+            return False
+        list_id, slot = int(self._list_of[row]), int(self._slot[row])
+        last = self._sizes[list_id] - 1
+        members = self._members[list_id]
+        members[slot] = members[last]
+        self._slot[members[slot]] = slot
+        self._sizes[list_id] = last
+        self._ids[row] = None
+        self._list_of[row] = -1
+        self._free.append(row)
+        return True
+
+    def train(self, nlist: Optional[int] = None, seed: int = 0):
+        """Re-cluster into `nlist` lists (default LISTS_PER_SQRT * sqrt(n); one list below MIN_TRAIN)"""
+        rows = np.fromiter(self._rows.values(), dtype=np.intp, count=len(self._rows))
+        if nlist is None:
+            nlist = int(LISTS_PER_SQRT * math.sqrt(len(rows))) if len(rows) >= MIN_TRAIN else 1
+        nlist = max(1, min(nlist, len(rows)))
+        if nlist == 1:
+            centroids = np.zeros((1, self.dim), dtype=np.float32)
+        else:
+            rng = np.random.default_rng(seed)
+            sample = rows
+            if len(rows) > nlist * TRAIN_SAMPLE_PER_LIST:
+                sample = np.sort(rng.choice(rows, nlist * TRAIN_SAMPLE_PER_LIST, replace=False))
+            centroids = _spherical_kmeans(self._decode(sample), nlist, KMEANS_ITERATIONS, rng)
+        lists = np.concatenate([_nearest(self._decode(rows[i:i + 8192]), centroids)
+                                for i in range(0, len(rows), 8192)] or [np.zeros(0, dtype=np.int32)])
+        self._centroids = centroids
+        self._rebuild(rows, lists, nlist)
+        self.trained_size = len(rows)
+
+    # -- queries --
+
+    def vector(self, photo_id: str) -> np.ndarray:
+        """Stored (dequantized) vector of an indexed photo"""
+        return self._decode(np.array([self._rows[photo_id]]))[0]
+
+    def search(self, vector: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Top-k (id, cosine) pairs from the `nprobe` nearest lists, best first"""
+        query = _unit(np.asarray(vector, dtype=np.float32).ravel())
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        if nprobe < self.nlist:
+            lists = np.argpartition(self._centroids @ query, -nprobe)[-nprobe:]
+        else:
+            lists = range(self.nlist)
+        rows = np.concatenate([self._members[i][:self._sizes[i]] for i in lists])
+        if not len(rows):
+            return []
+        scores = self._codes[rows].astype(np.float32) @ query
+        if self.dtype == "int8":
+            scores *= self._scales[rows]
+        excluded = set(exclude)
+        want = min(len(rows), k + len(excluded))
+        top = np.argpartition(scores, -want)[-want:]
+        results = []
+        for i in top[np.argsort(-scores[top])]:
+            photo_id = self._ids[rows[i]]
+            if photo_id not in excluded:
+                results.append((photo_id, float(scores[i])))
+                if len(results) == k:
+                    break
+        return results
+
+    def search_id(self, photo_id: str, k: int = 10, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        return self.search(self.vector(photo_id), k, nprobe, exclude=(photo_id,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"photos": len(self), "lists": self.nlist, "dtype": self.dtype, "nprobe": self.nprobe,
+                "trained_size": self.trained_size, "free_rows": len(self._free),
+                "vector_bytes": len(self) * (self.dim * np.dtype(self.dtype).itemsize + 4)}
+
+    # -- persistence --
+
+    def save(self, path: Union[str, Path]):
+        """Write the index as a directory of .npy files, lists contiguous; replaces `path` atomically"""
+        path = Path(path)
+        rows = np.concatenate([self._members[i][:self._sizes[i]] for i in range(self.nlist)]).astype(np.intp)
+        offsets = np.concatenate([[0], np.cumsum(self._sizes)]).astype(np.int64)
+        staging = path.with_name(path.name + ".tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        np.save(staging / "codes.npy", self._codes[rows])
+        np.save(staging / "scales.npy", self._scales[rows])
+        np.save(staging / "offsets.npy", offsets)
+        np.save(staging / "centroids.npy", self._centroids)
+        with open(staging / "ids.json", "w", encoding="utf-8") as f:
+            json.dump([self._ids[row] for row in rows.tolist()], f)
+        with open(staging / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "dim": self.dim, "dtype": self.dtype, "nprobe": self.nprobe,
+                       "trained_size": self.trained_size, "photos": len(rows)}, f, indent=2)
+        previous = path.with_name(path.name + ".old")
+        shutil.rmtree(previous, ignore_errors=True)
+        if path.exists():
+            path.rename(previous)
+        staging.rename(path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "SimilarityIndex":
+        """Open a saved index; with mmap the vectors stay on disk until the first insert"""
+        path = Path(path)
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index version {meta.get('version')!r} in {path}")
+        index = cls(meta["dim"], meta["dtype"], meta["nprobe"])
+        index.trained_size = meta["trained_size"]
+        index._codes = np.load(path / "codes.npy", mmap_mode="r" if mmap else None)
+        index._scales = np.load(path / "scales.npy")
+        index._centroids = np.load(path / "centroids.npy")
+        offsets = np.load(path / "offsets.npy")
+        with open(path / "ids.json", "r", encoding="utf-8") as f:
+            index._ids = json.load(f)
+        index._rows = {photo_id: row for row, photo_id in enumerate(index._ids)}
+        nlist = len(offsets) - 1
+        counts = np.diff(offsets)
+        index._list_of = np.repeat(np.arange(nlist, dtype=np.int32), counts)
+        index._slot = (np.arange(len(index._ids)) - np.repeat(offsets[:-1], counts)).astype(np.int32)
+        index._members = [np.arange(offsets[i], offsets[i + 1], dtype=np.int32) for i in range(nlist)]
+        index._sizes = counts.tolist()
+        return index
@@ -0,0 +1,403 @@
+"""
+Spread planning: optimal page breaks for an ordered photo sequence
+
+smartCreationService and photobookGenerator fill pages in array order (with
+Math.random() deciding heroes and collages). This planner treats the album
+like Knuth-Plass line breaking: photos stay in their chronological order, a
+page is a contiguous run of 1-K photos, and dynamic programming picks the
+breaks that minimize the total cost:
+
+- layout fit: how well the best template (photobook.layouts) matches the run
+- hero placement: heroes want a page to themselves, weak photos do not
+- chronology: long time spans on one page
+- cluster continuity: events split within a page, or between the left and
+  right page of one spread
+
+Hitting an exact page count would normally need a (photo, page) table. The
+page count constraint is instead folded into the cost as a per-page penalty
+(Lagrangian relaxation), and the penalty is binary-searched until the plan
+has the target number of pages, so each solve is O(n * K).
+"""
+
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .layouts import TemplateIndex, load_templates
+
+# Templates that are never used for interior pages
+NON_PAGE_CATEGORIES = ("cover", "back-cover")
+
+# Photos more than this far apart start a new cluster when features carry no cluster id
+CLUSTER_GAP_SECONDS = 3 * 3600
+
+# Cost weights
+ORIENTATION_MISMATCH = 1.0   # per photo in a slot of the wrong orientation
+HERO_SHARED = 1.5            # hero photo sharing its page
+WEAK_SOLO = 1.0              # scaled by (1 - quality / 100) for a non-hero alone on a page
+TIME_SPAN = 0.4              # times log1p(hours spanned by one page)
+CLUSTER_MIXED = 2.0          # per cluster change inside a page
+CLUSTER_SPLIT_SPREAD = 0.75  # cluster changes between the left and right page of a spread
+
+DEFAULT_QUALITY = 75.0
+# Page penalty search: stop once the bracket is this narrow (or after this many DP solves)
+LAMBDA_TOLERANCE = 1e-6
+LAMBDA_ITERATIONS = 60
+
+# Pages either side of the repaired plan that the banded exact DP explores
+BAND_WIDTH = 4
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) / 1000 if value > 1e11 else float(value)  # Date.now() milliseconds
+    text = str(value).replace("Z", "+00:00")
+    for parse in (datetime.fromisoformat, lambda t: datetime.strptime(t, "%Y:%m:%d %H:%M:%S")):
+        try:
+            return parse(text).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def _aspect(feature: Dict[str, Any]) -> float:
+    if feature.get("aspect"):
+        return float(feature["aspect"])
+    dims = feature.get("originalDimensions") or feature
+    if dims.get("width") and dims.get("height"):
+        return dims["width"] / dims["height"]
+    if feature.get("isPortrait"):
+        return 2 / 3
+    if feature.get("isLandscape"):
+        return 3 / 2
+    return 1.0
+
+
+def normalize_features(features: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Planner input from imageScores-style dicts, in album order
+
+    Accepts assetId (or id), aspect / width+height / originalDimensions /
+    isPortrait+isLandscape, isHero, quality (0-100), takenAt (ISO, EXIF or
+    epoch) and an optional cluster id. Missing clusters are derived from gaps
+    of more than CLUSTER_GAP_SECONDS between consecutive photos.
+    """
+    photos = []
+    cluster, last_time = 0, None
+    for position, feature in enumerate(features):
+        taken = _timestamp(feature.get("takenAt"))
+        if "cluster" in feature:
+            photo_cluster = feature["cluster"]
+        else:
+            if taken is not None and last_time is not None and taken - last_time > CLUSTER_GAP_SECONDS:
+                cluster += 1
+            photo_cluster = cluster
+        if taken is not None:
+            last_time = taken
+        photos.append({
+            "assetId": feature.get("assetId") or feature.get("id") or f"photo-{position + 1}",
+            "aspect": _aspect(feature),
+            "isHero": bool(feature.get("isHero")),
+            "quality": float(feature.get("quality", DEFAULT_QUALITY)),
+            "time": taken,
+            "cluster": photo_cluster,
+        })
+    return photos
+
+
+def page_templates(theme_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Interior page layouts: photobookGenerator grids plus templateService (one theme's, or all)"""
+    return [t for t in load_templates()
+            if t["category"] not in NON_PAGE_CATEGORIES
+            and (theme_id is None or t["theme_id"] in (None, theme_id))]
+
+
+def pick_cover(photos: Sequence[Dict[str, Any]]) -> int:
+    """Best-quality hero (earliest on ties), or the first photo, as in generateSpreadsFromAnalysis"""
+    heroes = [i for i, p in enumerate(photos) if p["isHero"]]
+    if not heroes:
+        return 0
+    return max(heroes, key=lambda i: (photos[i]["quality"], -i))
+
+
+class SpreadPlanner:
+    """
+    Optimal page breaks for one photo sequence
+
+    Page costs for every run of 1-K photos are computed once in __init__;
+    plan() then solves the break DP for a few dozen page penalties, which
+    only touches that table.
+    """
+
+    def __init__(self, photos: Sequence[Dict[str, Any]], first_page: int = 2,
+                 templates: Optional[List[Dict[str, Any]]] = None):
+        self.photos = list(photos)
+        self.first_page = first_page
+        self.index = TemplateIndex(templates if templates is not None else page_templates())
+        self.slot_counts = {e["count"] for e in self.index.entries}
+        self.max_per_page = max(self.slot_counts)
+        # cluster_break[i]: photo i starts a different cluster than photo i - 1
+        self.cluster_break = [i > 0 and self.photos[i]["cluster"] != self.photos[i - 1]["cluster"]
+                              for i in range(len(self.photos))]
+        self.page_costs = [[self._page_cost(i, k) for k in range(1, min(self.max_per_page, len(self.photos) - i) + 1)]
+                           for i in range(len(self.photos))]
+
+    def __len__(self) -> int:
+        return len(self.photos)
+
+    def _match(self, start: int, count: int) -> Dict[str, Any]:
+        """Best template with exactly `count` slots, so every photo on the page is placed"""
+        return self.index.query([p["aspect"] for p in self.photos[start:start + count]], top=1, slots=count)[0]
+
+    def _page_cost(self, start: int, count: int) -> float:
+        if count not in self.slot_counts:
+            return math.inf
+        photos = self.photos[start:start + count]
+        match = self._match(start, count)
+        cost = match["cost"] + ORIENTATION_MISMATCH * match["distance"]
+        if count > 1:
+            cost += HERO_SHARED * sum(p["isHero"] for p in photos)
+            cost += CLUSTER_MIXED * sum(self.cluster_break[start + 1:start + count])
+            times = [p["time"] for p in photos if p["time"] is not None]
+            if len(times) > 1:
+                cost += TIME_SPAN * math.log1p((max(times) - min(times)) / 3600)
+        elif not photos[0]["isHero"]:
+            cost += WEAK_SOLO * (1 - photos[0]["quality"] / 100)
+        return cost
+
+    def _split_cost(self, page_number: int, start: int) -> float:
+        """Cost of the break before a page that starts at photo `start`"""
+        if page_number % 2 == 1 and page_number > self.first_page and self.cluster_break[start]:
+            return CLUSTER_SPLIT_SPREAD  # right page of a spread, but a different cluster than the left
+        return 0.0
+
+    def _solve(self, penalty: float) -> Tuple[float, List[int]]:
+        """Minimum of cost + penalty * pages; returns (that value, page start indices)"""
+        n = len(self.photos)
+        inf = float("inf")
+        # State: photos placed, and the parity of the next page number
+        best = [[inf, inf] for _ in range(n + 1)]
+        pages = [[0, 0] for _ in range(n + 1)]
+        back: List[List[int]] = [[-1, -1] for _ in range(n + 1)]
+        start_parity = self.first_page % 2
+        best[0][start_parity] = 0.0
+        split = CLUSTER_SPLIT_SPREAD
+        for i in range(n):
+            costs = self.page_costs[i]
+            for parity in (0, 1):
+                base = best[i][parity]
+                if base == inf:
+                    continue
+                if parity == 1 and i > 0 and self.cluster_break[i]:
+                    base += split
+                base += penalty
+                count = pages[i][parity] + 1
+                nxt = 1 - parity
+                for k, cost in enumerate(costs, 1):
+                    total = base + cost
+                    current = best[i + k][nxt]
+                    # Ties go to fewer pages, so the page count is monotone in the penalty
+                    if total < current - 1e-12 or (total <= current + 1e-12 and count < pages[i + k][nxt]):
+                        best[i + k][nxt] = total
+                        pages[i + k][nxt] = count
+                        back[i + k][nxt] = i
+        parity = min((0, 1), key=lambda p: (best[n][p], pages[n][p]))
+        value, starts, i = best[n][parity], [], n
+        while i > 0:
+            i, parity = back[i][parity], 1 - parity
+            starts.append(i)
+        return value, starts[::-1]
+
+    def plan_cost(self, starts: Sequence[int]) -> float:
+        bounds = list(starts) + [len(self.photos)]
+        return sum(self.page_costs[a][b - a - 1] + self._split_cost(self.first_page + j, a)
+                   for j, (a, b) in enumerate(zip(bounds, bounds[1:])))
+
+    def page_range(self) -> Tuple[int, int]:
+        """Fewest and most pages the photos can fill"""
+        return -(-len(self.photos) // self.max_per_page), len(self.photos)
+
+    def plan(self, page_count: int) -> Dict[str, Any]:
+        """
+        Page start indices for exactly page_count pages (clamped to page_range)
+
+        Returns the breaks, their cost, and a Lagrangian lower bound on the
+        cost of any plan with that many pages; when the two are equal, the
+        plan is provably optimal.
+        """
+        low_pages, high_pages = self.page_range()
+        target = min(max(page_count, low_pages), high_pages)
+        ceiling = (sum(max(c for c in costs if c < math.inf) for costs in self.page_costs)
+                   + CLUSTER_SPLIT_SPREAD * len(self.photos) + 1.0)
+        low, high = -ceiling, ceiling
+        bound, solves = -math.inf, 0
+        starts: List[int] = []
+        while high - low > LAMBDA_TOLERANCE and solves < LAMBDA_ITERATIONS:
+            penalty = (low + high) / 2
+            value, candidate = self._solve(penalty)
+            solves += 1
+            bound = max(bound, value - penalty * target)
+            if len(candidate) == target:
+                starts = candidate
+                break
+            if len(candidate) > target:
+                low = penalty
+            else:
+                high, starts = penalty, candidate
+        if not starts:
+            starts = self._solve(high)[1]
+            solves += 1
+        repairs = 0
+        while len(starts) != target:
+            starts = self._repair(starts, target)
+            repairs += 1
+        if repairs:
+            starts = self._refine(starts)
+        cost = self.plan_cost(starts)
+        return {"starts": starts, "pages": target, "requested_pages": page_count, "cost": cost,
+                "lower_bound": min(bound, cost), "solves": solves, "repairs": repairs}
+
+    def _repair(self, starts: List[int], target: int) -> List[int]:
+        """
+        One split (too few pages) or merge (too many) with the smallest cost increase
+
+        Only needed when no penalty yields exactly `target` pages. Inserting
+        or removing a page flips the left/right position of every later page,
+        which a suffix sum of the spread-split differences accounts for.
+        """
+        n = len(self.photos)
+        bounds = list(starts) + [n]
+        count = len(starts)
+        now = [self._split_cost(self.first_page + j, starts[j]) for j in range(count)]
+        flipped = [self._split_cost(self.first_page + j + 1, starts[j]) for j in range(count)]
+        flip_suffix = [0.0] * (count + 1)
+        for j in range(count - 1, -1, -1):
+            flip_suffix[j] = flip_suffix[j + 1] + flipped[j] - now[j]
+
+        def cost(a: int, b: int) -> float:
+            return self.page_costs[a][b - a - 1]
+
+        best_delta, best_starts = math.inf, None
+        if count < target:
+            for j in range(count):
+                a, b = bounds[j], bounds[j + 1]
+                for m in range(a + 1, b):
+                    delta = (cost(a, m) + cost(m, b) - cost(a, b)
+                             + self._split_cost(self.first_page + j + 1, m) + flip_suffix[j + 1])
+                    if delta < best_delta:
+                        best_delta, best_starts = delta, starts[:j + 1] + [m] + starts[j + 1:]
+        else:
+            for j in range(count - 1):
+                a, m, b = bounds[j], bounds[j + 1], bounds[j + 2]
+                if b - a > self.max_per_page:
+                    continue
+                delta = cost(a, b) - cost(a, m) - cost(m, b) - now[j + 1] + flip_suffix[j + 2]
+                if delta < best_delta:
+                    best_delta, best_starts = delta, starts[:j + 1] + starts[j + 2:]
+        return best_starts
+
+    def _refine(self, starts: List[int], width: int = BAND_WIDTH) -> List[int]:
+        """
+        Exact page-count DP restricted to plans within `width` pages of `starts`
+
+        The per-page penalty cannot reach every page count (cost is not convex
+        in it, partly because pages alternate left/right), so a repaired plan
+        can be locally suboptimal. Re-solving in a band around it is
+        O(n * K * width) and recovers the optimum whenever it stays that close.
+        """
+        n, target = len(self.photos), len(starts)
+        # reference[i]: pages the reference plan starts before photo i
+        reference, page = [0] * (n + 1), 0
+        for i in range(n + 1):
+            while page < target and starts[page] < i:
+                page += 1
+            reference[i] = page
+        inf = math.inf
+        span = 2 * width + 1
+        best = [[inf] * span for _ in range(n + 1)]
+        back: List[List[Tuple[int, int]]] = [[(-1, -1)] * span for _ in range(n + 1)]
+        best[0][width] = 0.0
+        for i in range(n):
+            for slot in range(span):
+                base = best[i][slot]
+                if base == inf:
+                    continue
+                pages_done = reference[i] + slot - width
+                if pages_done >= target:
+                    continue
+                base += self._split_cost(self.first_page + pages_done, i)
+                for k, cost in enumerate(self.page_costs[i], 1):
+                    nxt = pages_done + 1 - reference[i + k] + width
+                    if 0 <= nxt < span and base + cost < best[i + k][nxt]:
+                        best[i + k][nxt] = base + cost
+                        back[i + k][nxt] = (i, slot)
+        slot = target - reference[n] + width
+        if not 0 <= slot < span or best[n][slot] >= self.plan_cost(starts) - 1e-12:
+            return starts
+        refined, i = [], n
+        while i > 0:
+            i, slot = back[i][slot]
+            refined.append(i)
+        return refined[::-1]
+
+    def pages(self, starts: Sequence[int]) -> List[Dict[str, Any]]:
+        """Page dicts for a plan: page number, position, photos, template and slot assignment"""
+        bounds = list(starts) + [len(self.photos)]
+        result = []
+        for j, (a, b) in enumerate(zip(bounds, bounds[1:])):
+            number = self.first_page + j
+            photos = self.photos[a:b]
+            match = self._match(a, b - a)
+            result.append({
+                "pageNumber": number,
+                "position": "left" if number % 2 == 0 else "right",
+                "photoIds": [p["assetId"] for p in photos],
+                "templateId": match["id"],
+                "assignment": {slot: photos[i]["assetId"] for slot, i in match["assignment"].items()},
+                "cost": round(self.page_costs[a][b - a - 1] + self._split_cost(number, a), 4),
+            })
+        return result
+
+
+def spreads_for(pages: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group pages into spreads the way PageSpread numbers them (page 1 is a lone right page)"""
+    spreads: Dict[int, Dict[str, Any]] = {}
+    for page in pages:
+        number = page["pageNumber"] // 2 + 1
+        spread = spreads.setdefault(number, {"spreadNumber": number, "leftPage": None, "rightPage": None})
+        spread[f"{page['position']}Page"] = page["pageNumber"]
+    return [spreads[n] for n in sorted(spreads)]
+
+
+def plan_spreads(features: Sequence[Dict[str, Any]], target_page_count: int, cover: bool = True,
+                 theme_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Full plan for an album, counterpart of generateSpreadsFromAnalysis
+
+    With `cover`, the best hero goes alone on page 1 (counted in
+    target_page_count) and the rest are planned from page 2.
+    """
+    photos = normalize_features(features)
+    cover_page = None
+    if cover and photos:
+        chosen = photos.pop(pick_cover(photos))
+        cover_page = {"pageNumber": 1, "position": "right", "photoIds": [chosen["assetId"]],
+                      "templateId": "cover-single", "assignment": {"slot-1": chosen["assetId"]}, "cost": 0.0}
+    pages = [cover_page] if cover_page else []
+    result: Dict[str, Any] = {"cost": 0.0, "lower_bound": 0.0, "solves": 0, "repairs": 0}
+    if photos:
+        planner = SpreadPlanner(photos, first_page=2 if cover_page else 1, templates=page_templates(theme_id))
+        result = planner.plan(target_page_count - len(pages))
+        pages += planner.pages(result["starts"])
+    return {
+        "pages": pages,
+        "spreads": spreads_for(pages),
+        "pageCount": len(pages),
+        "requestedPageCount": target_page_count,
+        "cost": round(result["cost"], 4),
+        "lowerBound": round(result["lower_bound"], 4),
+        "solves": result["solves"],
+        "repairs": result["repairs"],
+    }
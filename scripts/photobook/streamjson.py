@@ -0,0 +1,239 @@
+"""
+Incremental extraction of JSON objects from streamed model replies
+
+claudeService.analyzeImage, gptService.generateThemes and test_vision_model
+wait for the whole completion before parsing JSON out of it. ObjectStream is
+fed the reply as it streams in (post_completion's on_delta). It returns each
+element object of the reply's result array as soon as that object's closing
+brace arrives: a packed ImageSummary entry of {"images": [...]}, or a Theme
+of {"themes": [...]}. Layout and UI work can then start on the first theme
+while the model is still writing the rest.
+
+Markdown fences and prose before or after the JSON are skipped. A reply can
+stop early (max_tokens, a dropped connection). close() then repairs the
+unfinished element: it closes an open string, drops a dangling key or
+partial literal, and closes open brackets. The repaired object is kept only
+if the caller's validator accepts it.
+"""
+
+import json
+import re
+from typing import Any, Callable, List, Optional
+
+_START = re.compile(r"[{\[]")
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# Cut points tried by repair_json, newest first
+MAX_REPAIR_ATTEMPTS = 64
+# Consumed text kept before the buffer is trimmed
+TRIM_THRESHOLD = 1024
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "target", "element", "within", "key")
+
+    def __init__(self, kind: str, start: int, target: bool = False, element: bool = False, within: bool = False):
+        self.kind = kind
+        self.start = start
+        self.target = target  # an array whose element objects are extracted
+        self.element = element  # an object directly inside a target array
+        self.within = within  # inside an element, where arrays are just values
+        self.key = None  # (start, end) of the last string in an object
+
+
+class ObjectStream:
+    """
+    Feed text chunks, get back complete element objects in reply order
+
+    Elements are the objects of the top-level array, or of the outermost
+    array under `key` (any key when None). A reply that is a single
+    object with no such array yields that object once it closes.
+    `validate` filters what is returned, repaired objects included.
+    """
+
+    def __init__(self, key: Optional[str] = None, validate: Optional[Callable[[Any], bool]] = None):
+        self.key = key
+        self.validate = validate
+        self.objects: List[Any] = []
+        self.received = 0
+        self.complete = False  # the top-level value closed
+        self.invalid = 0  # closed elements that did not parse or validate
+        self.repaired = 0
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._string_start = 0
+
+    def _accept(self, value: Any, found: List[Any]) -> bool:
+        if self.validate is not None and not self.validate(value):
+            self.invalid += 1
+            return False
+        self.objects.append(value)
+        found.append(value)
+        return True
+
+    def _open(self, kind: str, start: int):
+        parent = self._stack[-1] if self._stack else None
+        if kind == "[":
+            target = parent is None
+            if parent is not None and parent.kind == "{" and not parent.within and parent.key:
+                target = self.key is None or json.loads(self._buffer[parent.key[0]:parent.key[1]]) == self.key
+            frame = _Frame(kind, start, target=target, within=bool(parent and parent.within))
+        else:
+            element = bool(parent and parent.kind == "[" and parent.target)
+            frame = _Frame(kind, start, element=element, within=element or bool(parent and parent.within))
+        self._stack.append(frame)
+
+    def _close(self, end: int, found: List[Any]):
+        frame = self._stack.pop()
+        if frame.element:
+            try:
+                self._accept(json.loads(self._buffer[frame.start:end]), found)
+            except ValueError:
+                self.invalid += 1
+        if self._stack:
+            return
+        try:
+            value = json.loads(self._buffer[frame.start:end])
+        except ValueError:
+            if not self.objects:
+                # A bracket in leading prose; look for the JSON after it
+                self._pos = frame.start + 1
+                return
+            value = None
+        self.complete = True
+        if isinstance(value, dict) and not self.objects and not self.invalid:
+            self._accept(value, found)
+
+    def _trim(self):
+        """Drop text that no open element, pending key or string still needs"""
+        cut = min(self._pos, self._string_start) if self._in_string else self._pos
+        element = next((frame for frame in self._stack if frame.element), None)
+        if element is not None:
+            cut = min(cut, element.start)
+        if self._stack and self._stack[-1].key:
+            cut = min(cut, self._stack[-1].key[0])
+        if cut < TRIM_THRESHOLD:
+            return
+        self._buffer = self._buffer[cut:]
+        self._pos -= cut
+        self._string_start -= cut
+        for frame in self._stack:
+            frame.start -= cut
+            if frame.key:
+                frame.key = (frame.key[0] - cut, frame.key[1] - cut)
+
+    def feed(self, text: str) -> List[Any]:
+        """Objects completed by this chunk"""
+        self.received += len(text)
+        if self.objects:
+            # Only needed whole while nothing has been extracted (prose retry, single-object replies)
+            self._trim()
+        self._buffer += text
+        buffer, found = self._buffer, []
+        while self._pos < len(buffer) and not self.complete:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                elif match.group() == "\\":
+                    if match.end() == len(buffer):
+                        self._pos = match.start()  # wait for the escaped character
+                        break
+                    self._pos = match.end() + 1
+                else:
+                    self._in_string = False
+                    self._pos = match.end()
+                    if self._stack[-1].kind == "{":
+                        self._stack[-1].key = (self._string_start, self._pos)
+                continue
+            match = (_STRUCTURE if self._stack else _START).search(buffer, self._pos)
+            if match is None:
+                self._pos = len(buffer)
+                break
+            char, self._pos = match.group(), match.end()
+            if char == '"':
+                self._in_string = True
+                self._string_start = match.start()
+            elif char in "{[":
+                self._open(char, match.start())
+            else:
+                self._close(self._pos, found)
+        return found
+
+    def close(self, repair: bool = True) -> List[Any]:
+        """End of reply: with `repair`, the unfinished element (or single object) if it can be salvaged"""
+        if self.complete or not self._stack or not repair:
+            return []
+        frame = next((f for f in self._stack if f.element), None)
+        if frame is None:
+            frame = self._stack[0]
+            if frame.kind != "{" or self.objects:
+                return []
+        repaired = repair_json(self._buffer[frame.start:])
+        found: List[Any] = []
+        if repaired is not None and self._accept(json.loads(repaired), found):
+            self.repaired += 1
+        return found
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Truncated JSON made parseable, keeping as much of it as possible
+
+    First closes an open string and every open bracket. If that still does
+    not parse (a dangling key, colon or partial literal), it retries from
+    the most recent complete value backwards. Returns None when nothing
+    parses.
+    """
+    closers: List[str] = []
+    cuts = []  # (position, closers open there)
+    in_string = escape = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                cuts.append((i + 1, len(closers)))
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+            cuts.append((i + 1, len(closers)))
+        elif char in "}]":
+            if closers:
+                closers.pop()
+            cuts.append((i + 1, len(closers)))
+        elif char == ",":
+            cuts.append((i, len(closers)))
+
+    def closed(prefix: str, depth: int) -> str:
+        return prefix + "".join(reversed(closers[:depth]))
+
+    attempts = []
+    if in_string:
+        attempts.append(closed(text[:len(text) - escape] + '"', len(closers)))
+    attempts.append(closed(text.rstrip().rstrip(","), len(closers)))
+    attempts.extend(closed(text[:position], depth) for position, depth in reversed(cuts[-MAX_REPAIR_ATTEMPTS:]))
+    for attempt in attempts:
+        try:
+            json.loads(attempt)
+        except ValueError:
+            continue
+        return attempt
+    return None
+
+
+def extract_objects(text: str, key: Optional[str] = None, validate: Optional[Callable[[Any], bool]] = None,
+                    repair: bool = True) -> List[Any]:
+    """Every element object of a complete (or truncated) reply, as ObjectStream would stream them"""
+    stream = ObjectStream(key, validate)
+    stream.feed(text or "")
+    stream.close(repair)
+    return stream.objects
@@ -0,0 +1,134 @@
+"""
+Resolution / JPEG quality / detail-level sweep for vision requests
+
+test_vision_model always uploads the file as-is with detail "high". The
+sweep re-encodes each corpus image at several operating points, measures
+latency, payload and tokens for each, and scores the answer against the
+full-resolution baseline answer for the same image and model.
+"""
+
+import itertools
+import statistics
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .imaging import downscaled_jpeg, to_base64
+from .midas import image_part
+
+# Prompt used by test-vision-analysis.py's test_vision_model
+DETAILED_PROMPT = """Analyze this image in detail. Describe:
+1. What you see in the image (objects, people, scene)
+2. Colors and composition
+3. Lighting conditions
+4. Overall mood or atmosphere
+5. Any text visible in the image
+
+Be specific and detailed."""
+
+BASELINE_LABEL = "full/original/high"
+
+
+def build_settings(
+    max_edges: Iterable[int], qualities: Iterable[int], details: Iterable[str]
+) -> List[Dict[str, Any]]:
+    """Cartesian product of operating points, smallest payloads first"""
+    settings = [
+        {"max_edge": edge, "quality": quality, "detail": detail}
+        for edge, quality, detail in itertools.product(sorted(max_edges), sorted(qualities), details)
+    ]
+    for setting in settings:
+        setting["label"] = setting_label(setting)
+    return settings
+
+
+def setting_label(setting: Dict[str, Any]) -> str:
+    """Short human-readable key such as 1024/q80/low"""
+    return f"{setting['max_edge']}/q{setting['quality']}/{setting['detail']}"
+
+
+def encode_variant(source: bytes, setting: Dict[str, Any]) -> Tuple[str, int]:
+    """Re-encode image bytes for a setting; returns (base64, payload bytes)"""
+    data = downscaled_jpeg(source, max_edge=setting["max_edge"], quality=setting["quality"])
+    return to_base64(data), len(data)
+
+
+def vision_request(
+    deployment: str, image_base64: str, image_type: str = "jpeg", detail: Optional[str] = "high"
+) -> Dict[str, Any]:
+    """The test_vision_model request with a configurable detail level"""
+    return {
+        "model": deployment,
+        "messages": [
+            {
+                "role": "user",
+                "content": [{"type": "text", "text": DETAILED_PROMPT}, image_part(image_base64, image_type, detail)],
+            }
+        ],
+        "max_tokens": 500,
+        "temperature": 0.3,
+    }
+
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def aggregate(records: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Roll per-request records up to one row per (model, setting).
+
+    Records carry model, label, success, response_time, payload_bytes,
+    total_tokens and (for non-baseline settings) similarity.
+    """
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault((record["model"], record["label"]), []).append(record)
+
+    rows = []
+    for (model, label), group in groups.items():
+        ok = [r for r in group if r["success"]]
+        similarities = [r["similarity"] for r in ok if r.get("similarity") is not None]
+        latencies = [r["response_time"] for r in ok]
+        rows.append(
+            {
+                "model": model,
+                "label": label,
+                "requests": len(group),
+                "failures": len(group) - len(ok),
+                "median_ms": statistics.median(latencies) if latencies else None,
+                "p90_ms": _percentile(latencies, 0.9) if latencies else None,
+                "mean_payload_kb": statistics.mean(r["payload_bytes"] for r in group) / 1024,
+                "mean_tokens": statistics.mean(r["total_tokens"] for r in ok) if ok else None,
+                "similarity": statistics.mean(similarities) if similarities else None,
+            }
+        )
+    return rows
+
+
+def recommend(
+    rows: Sequence[Dict[str, Any]], min_similarity: float, noise_floor: Optional[Dict[str, float]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Pick the fastest setting per model whose answers stay close to baseline.
+
+    The similarity bar is min_similarity, scaled by the model's own
+    baseline-vs-baseline agreement when noise_floor is given, since
+    temperature alone keeps two full-resolution answers from matching
+    exactly. Ties on latency go to the setting with fewer tokens.
+    """
+    picks: Dict[str, Dict[str, Any]] = {}
+    for model in sorted({row["model"] for row in rows}):
+        bar = min_similarity * (noise_floor or {}).get(model, 1.0)
+        candidates = [
+            row
+            for row in rows
+            if row["model"] == model
+            and row["label"] != BASELINE_LABEL
+            and row["failures"] == 0
+            and row["similarity"] is not None
+            and row["similarity"] >= bar
+        ]
+        if candidates:
+            best = min(candidates, key=lambda r: (r["median_ms"], r["mean_tokens"] or 0))
+            picks[model] = {**best, "similarity_bar": bar}
+    return picks
@@ -0,0 +1,47 @@
+"""
+Cheap lexical similarity for comparing model answers
+
+Used to score how closely a degraded or alternative run agrees with a
+baseline run without spending another model call on judging.
+"""
+
+import re
+from typing import Dict, Iterable, Optional, Set
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "with",
+}
+
+SUMMARY_FIELDS = ("description", "lighting", "mood")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokens(text: Optional[str]) -> Set[str]:
+    """Lowercase content words with crude plural folding"""
+    words = set()
+    for word in _WORD.findall((text or "").lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return words
+
+
+def similarity(a: Optional[str], b: Optional[str]) -> float:
+    """Jaccard overlap of content words, 1.0 for two empty strings"""
+    ta, tb = tokens(a), tokens(b)
+    if not ta and not tb:
+        return 1.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def summary_agreement(
+    a: Dict[str, str], b: Dict[str, str], fields: Iterable[str] = SUMMARY_FIELDS
+) -> Dict[str, float]:
+    """Per-field similarity of two ImageSummary dicts plus their mean as 'overall'"""
+    scores = {field: similarity(a.get(field), b.get(field)) for field in fields}
+    scores["overall"] = sum(scores.values()) / len(scores) if scores else 0.0
+    return scores
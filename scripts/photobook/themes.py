@@ -0,0 +1,390 @@
+"""
+Theme generation from image summaries (Python port of gptService)
+
+generate_themes sends every summary in one prompt, like gptService, so its
+prompt and latency grow with the album until it no longer fits the context.
+generate_themes_mapreduce shards the summaries (by event cluster when
+given), asks for candidate themes per shard concurrently, folds near-duplicate
+candidates locally, and merges the rest in one reduce call whose prompt size
+depends on the number of candidates, not photos.
+
+With on_theme, the call that produces the final themes is streamed and each
+theme is handed over as soon as its JSON object closes (streamjson). Replies
+that are cut off or wrapped in prose keep every theme that can be recovered.
+"""
+
+import hashlib
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Sequence, Tuple
+
+from . import tracing
+from .midas import post_completion
+from .streamjson import ObjectStream
+from .textsim import similarity
+
+THEMES_SYSTEM_PROMPT = "You are a professional photo editing consultant. Generate theme suggestions in JSON format."
+
+THEMES_PROMPT = """Based on these photo analyses, suggest {count} distinct editing themes.
+
+Photo Analysis:
+{summary_text}
+
+Generate {count} themes with these properties:
+- theme_id: unique lowercase identifier with underscores
+- name: catchy theme name (2-4 words)
+- mood: 2-3 word mood description
+- lighting: lighting style recommendation
+- background: background treatment
+- editing_style: specific editing approach
+
+Return only valid JSON with a "themes" array. No markdown, no explanation."""
+
+PREVIEW_PROMPT = """Based on these photos: {summary_text}
+
+Generate 5 short, insightful observations about the photos that would help in theme generation. Each observation should be one sentence. Start each with an action verb like "Detecting", "Identifying", "Recognizing", "Finding", "Analyzing"."""
+
+MAP_PROMPT = """These photo analyses are part {part} of {parts} of one photo album ({size} photos in this part).
+
+Photo Analysis:
+{summary_text}
+
+Suggest up to {count} distinct editing themes that suit these photos, with these properties:
+- theme_id: unique lowercase identifier with underscores
+- name: catchy theme name (2-4 words)
+- mood: 2-3 word mood description
+- lighting: lighting style recommendation
+- background: background treatment
+- editing_style: specific editing approach
+- photos: how many of the {size} photos the theme suits
+
+Return only valid JSON with a "themes" array. No markdown, no explanation."""
+
+REDUCE_PROMPT = """Candidate editing themes were suggested for different parts of one photo album of {total} photos. Each line is one candidate; "photos" is how many album photos it suits.
+
+{candidates}
+
+Merge them into {count} distinct themes for the whole album, preferring themes that suit more photos. Each theme has theme_id, name, mood, lighting, background and editing_style.
+
+Return only valid JSON with a "themes" array. No markdown, no explanation."""
+
+THEME_FIELDS = ("theme_id", "name", "mood", "lighting", "background", "editing_style")
+
+# Summaries per map call: about 2k prompt tokens, well inside every deployment's context
+DEFAULT_SHARD_SIZE = 40
+# Past this many shards, shards grow instead, so all map calls run in one concurrent wave
+MAX_SHARDS = 16
+CANDIDATES_PER_SHARD = 3
+# Candidates after local folding that go into the reduce prompt
+MAX_REDUCE_CANDIDATES = 24
+# Lexical similarity (name, mood, editing style) above which two candidates are folded
+FOLD_SIMILARITY = 0.5
+
+_FENCE = re.compile(r"```json\n?|\n?```")
+
+
+def summary_text(summaries: Sequence[Dict[str, str]], start: int = 1) -> str:
+    """The 'Image N: description. Lighting: ... Mood: ...' block gptService sends"""
+    return "\n".join(
+        f"Image {start + idx}: {s.get('description')}. Lighting: {s.get('lighting')}. Mood: {s.get('mood')}"
+        for idx, s in enumerate(summaries)
+    )
+
+
+def build_themes_request(
+    summaries: Sequence[Dict[str, str]], deployment: str = "GPT 4o", count: int = 4, max_tokens: int = 800
+) -> Dict[str, Any]:
+    return {
+        "model": deployment,
+        "messages": [
+            {"role": "system", "content": THEMES_SYSTEM_PROMPT},
+            {"role": "user", "content": THEMES_PROMPT.format(count=count, summary_text=summary_text(summaries))},
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+    }
+
+
+def parse_themes(content: str) -> List[Dict[str, str]]:
+    """Theme objects from a reply; raises ValueError like gptService on bad JSON"""
+    parsed = json.loads(_FENCE.sub("", content or "").strip())
+    themes = parsed.get("themes", []) if isinstance(parsed, dict) else parsed
+    return [t for t in themes if isinstance(t, dict)]
+
+
+def valid_theme(theme: Any) -> bool:
+    """A streamed or repaired theme is usable once it has a non-empty name"""
+    return isinstance(theme, dict) and isinstance(theme.get("name"), str) and bool(theme["name"].strip())
+
+
+def request_themes(
+    request: Dict[str, Any],
+    post: Callable[..., Dict[str, Any]] = post_completion,
+    on_theme: Optional[Callable[[Dict[str, Any]], None]] = None,
+    **post_kwargs,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Call result and themes for any themes-shaped request
+
+    With on_theme the request is streamed (post's on_delta) and every
+    returned theme is passed to on_theme once, as soon as its object closes.
+    A post that does not stream is handled too: its themes are all handed
+    over when it returns. Invalid or truncated JSON keeps the themes that
+    can be recovered (the last one repaired). The result fails only when
+    none can be recovered.
+    """
+    stream = ObjectStream("themes", valid_theme)
+
+    def on_delta(text: str):
+        for theme in stream.feed(text):
+            on_theme(theme)
+
+    result = post(request, **({**post_kwargs, "on_delta": on_delta} if on_theme else post_kwargs))
+    themes = None
+    if result["success"] and not on_theme:
+        try:
+            themes = parse_themes(result["response"])
+        except ValueError:
+            pass
+    if themes is None:
+        if result["success"] and not stream.received:
+            (on_delta if on_theme else stream.feed)(result["response"] or "")
+        for theme in stream.close():
+            if on_theme:
+                on_theme(theme)
+        themes = stream.objects
+        if themes and stream.repaired:
+            result = {**result, "repaired": stream.repaired}
+        if themes and not result["success"]:
+            result = {**result, "success": True, "partial": True}
+        elif not themes and not stream.complete and result["success"]:
+            result = {**result, "success": False, "error": "Invalid JSON response from GPT"}
+    return result, themes
+
+
+def generate_themes(
+    summaries: Sequence[Dict[str, str]],
+    deployment: str = "GPT 4o",
+    count: int = 4,
+    post: Callable[..., Dict[str, Any]] = post_completion,
+    on_theme: Optional[Callable[[Dict[str, Any]], None]] = None,
+    **post_kwargs,
+) -> Dict[str, Any]:
+    """One-shot theme generation; returns themes plus the raw call result"""
+    result, themes = request_themes(build_themes_request(summaries, deployment, count), post, on_theme, **post_kwargs)
+    return {**result, "themes": themes}
+
+
+def build_preview_request(summaries: Sequence[Dict[str, str]], deployment: str = "Gemini-2.5-pro",
+                          stream: bool = False) -> Dict[str, Any]:
+    """geminiService.streamThemePreview request (first 3 summaries only)"""
+    text = ". ".join(f"Image {idx + 1}: {s.get('description')}" for idx, s in enumerate(summaries[:3]))
+    request: Dict[str, Any] = {
+        "model": deployment,
+        "messages": [{"role": "user", "content": PREVIEW_PROMPT.format(summary_text=text)}],
+        "max_tokens": 200,
+        "temperature": 0.8,
+    }
+    if stream:
+        request["stream"] = True
+    return request
+
+
+# -- map-reduce --
+
+
+def shard_summaries(count: int, shard_size: int = DEFAULT_SHARD_SIZE,
+                    clusters: Optional[Sequence[Sequence[int]]] = None) -> List[List[int]]:
+    """
+    Summary indexes per shard, in album order
+
+    With clusters (index lists, e.g. group_events output) a shard describes
+    whole events: a cluster of at least a quarter shard is a shard of its own
+    (split evenly if larger than shard_size), and runs of smaller clusters are
+    packed together. Boundaries then only move around the cluster an edit
+    touched, so cached map results for the other shards stay valid.
+    """
+    if not clusters:
+        return [list(range(start, min(start + shard_size, count))) for start in range(0, count, shard_size)]
+    shards: List[List[int]] = []
+    run: List[int] = []
+    for cluster in clusters:
+        if len(cluster) < max(1, shard_size // 4):
+            if run and len(run) + len(cluster) > shard_size:
+                shards.append(run)
+                run = []
+            run.extend(cluster)
+            continue
+        if run:
+            shards.append(run)
+            run = []
+        parts = -(-len(cluster) // shard_size)
+        shards.extend(list(cluster[i * len(cluster) // parts:(i + 1) * len(cluster) // parts]) for i in range(parts))
+    if run:
+        shards.append(run)
+    return shards
+
+
+def build_map_request(summaries: Sequence[Dict[str, str]], part: int, parts: int, deployment: str = "GPT 4o",
+                      count: int = CANDIDATES_PER_SHARD, max_tokens: int = 600) -> Dict[str, Any]:
+    prompt = MAP_PROMPT.format(part=part, parts=parts, size=len(summaries), count=count,
+                               summary_text=summary_text(summaries))
+    return {
+        "model": deployment,
+        "messages": [{"role": "system", "content": THEMES_SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+    }
+
+
+def build_reduce_request(candidates: Sequence[Dict[str, Any]], total: int, deployment: str = "GPT 4o",
+                         count: int = 4, max_tokens: int = 800) -> Dict[str, Any]:
+    lines = "\n".join(json.dumps({k: c.get(k) for k in (*THEME_FIELDS[1:], "photos")}) for c in candidates)
+    return {
+        "model": deployment,
+        "messages": [
+            {"role": "system", "content": THEMES_SYSTEM_PROMPT},
+            {"role": "user", "content": REDUCE_PROMPT.format(total=total, candidates=lines, count=count)},
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.5,
+    }
+
+
+def _theme_text(theme: Dict[str, Any]) -> str:
+    return " ".join(str(theme.get(k) or "") for k in ("name", "mood", "editing_style"))
+
+
+def fold_candidates(candidates: Sequence[Dict[str, Any]], limit: int = MAX_REDUCE_CANDIDATES,
+                    threshold: float = FOLD_SIMILARITY) -> List[Dict[str, Any]]:
+    """
+    Fold lexically similar candidates (summing their photo counts) and keep the
+    `limit` that suit the most photos, so the reduce prompt stays bounded
+    """
+    folded: List[Dict[str, Any]] = []
+    for candidate in sorted(candidates, key=lambda c: -c["photos"]):
+        text = _theme_text(candidate)
+        match = next((f for f in folded if similarity(f["_text"], text) >= threshold), None)
+        if match is not None:
+            match["photos"] += candidate["photos"]
+        else:
+            folded.append({**candidate, "_text": text})
+    folded.sort(key=lambda f: -f["photos"])
+    return [{k: v for k, v in f.items() if k != "_text"} for f in folded[:limit]]
+
+
+def _shard_key(summaries: Sequence[Dict[str, str]], deployment: str, count: int) -> str:
+    text = json.dumps([deployment, count, [[s.get(f) for f in ("description", "lighting", "mood")] for s in summaries]])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def generate_themes_mapreduce(
+    summaries: Sequence[Dict[str, str]],
+    deployment: str = "GPT 4o",
+    count: int = 4,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    clusters: Optional[Sequence[Sequence[int]]] = None,
+    candidates_per_shard: int = CANDIDATES_PER_SHARD,
+    max_shards: int = MAX_SHARDS,
+    workers: Optional[int] = None,
+    cache: Optional[MutableMapping[str, List[Dict[str, Any]]]] = None,
+    post: Callable[..., Dict[str, Any]] = post_completion,
+    on_theme: Optional[Callable[[Dict[str, Any]], None]] = None,
+    **post_kwargs,
+) -> Dict[str, Any]:
+    """
+    Themes for an album of any size: concurrent map calls per shard, one reduce call
+
+    An album of up to two shards is a plain generate_themes call, as a
+    second round trip would cost more than the longer prompt. Above
+    max_shards shards the shard size doubles instead, and map calls run on
+    `workers` threads (default: one per shard), so latency is one map wave
+    plus the reduce however large the album is. `cache`
+    (shard content hash -> candidates) lets callers skip map calls for
+    shards whose summaries did not change. Failed shards are skipped as long
+    as one succeeds; if the reduce call fails, the top folded candidates are
+    returned instead with "fallback": True. on_theme streams the final call
+    (see request_themes); fallback themes are passed to it when returned.
+    Returns themes plus usage, calls, shards, candidates and map/reduce wall
+    times.
+    """
+    start = time.perf_counter()
+    shards = shard_summaries(len(summaries), shard_size, clusters)
+    while len(shards) > max_shards:
+        shard_size *= 2
+        shards = shard_summaries(len(summaries), shard_size, clusters)
+    if len(summaries) <= 2 * shard_size:
+        shards = [list(range(len(summaries)))]
+    if len(shards) <= 1:
+        result = generate_themes(summaries, deployment, count, post=post, on_theme=on_theme, **post_kwargs)
+        return {**result, "calls": 1, "shards": len(shards), "candidates": len(result["themes"]),
+                "cached_shards": 0, "map_seconds": 0.0, "reduce_seconds": time.perf_counter() - start}
+
+    usage: Dict[str, int] = {}
+    calls = 0
+    candidates: List[Dict[str, Any]] = []
+    keys = [_shard_key([summaries[i] for i in shard], deployment, candidates_per_shard) for shard in shards]
+    cached = {n for n, key in enumerate(keys) if cache is not None and key in cache}
+
+    def run_map(number: int) -> Dict[str, Any]:
+        shard = [summaries[i] for i in shards[number]]
+        request = build_map_request(shard, number + 1, len(shards), deployment, candidates_per_shard)
+        with tracing.span("themes.map", shard=number + 1, photos=len(shard)):
+            result, themes = request_themes(request, post, **post_kwargs)
+        for theme in themes:
+            photos = theme.get("photos")
+            theme["photos"] = min(len(shard), photos) if isinstance(photos, int) and photos > 0 else len(shard)
+        return {**result, "themes": themes}
+
+    pending = [n for n in range(len(shards)) if n not in cached]
+    with ThreadPoolExecutor(max_workers=max(1, workers or len(pending))) as pool:
+        for number, result in zip(pending, pool.map(tracing.bind(run_map), pending)):
+            calls += 1
+            for key, value in (result.get("usage") or {}).items():
+                usage[key] = usage.get(key, 0) + value
+            if result["success"] and result["themes"]:
+                candidates.extend(result["themes"])
+                if cache is not None:
+                    cache[keys[number]] = result["themes"]
+    for number in cached:
+        candidates.extend(dict(theme) for theme in cache[keys[number]])
+    map_seconds = time.perf_counter() - start
+
+    summary = {"calls": calls, "shards": len(shards), "cached_shards": len(cached), "shard_keys": keys,
+               "map_seconds": map_seconds}
+    if not candidates:
+        return {"success": False, "error": "Every map call failed", "themes": [], "usage": usage,
+                "candidates": 0, "reduce_seconds": 0.0, **summary}
+
+    folded = fold_candidates(candidates)
+    start = time.perf_counter()
+    with tracing.span("themes.reduce", candidates=len(folded)):
+        result, themes = request_themes(build_reduce_request(folded, len(summaries), deployment, count), post,
+                                        on_theme, **post_kwargs)
+    for key, value in (result.get("usage") or {}).items():
+        usage[key] = usage.get(key, 0) + value
+    summary.update(calls=calls + 1, candidates=len(folded), reduce_seconds=time.perf_counter() - start)
+    if not themes:
+        themes = [{k: c.get(k) for k in THEME_FIELDS} for c in folded[:count]]
+        for theme in themes if on_theme else []:
+            on_theme(theme)
+        return {"success": True, "fallback": True, "error": result.get("error") or "Invalid JSON response from GPT",
+                "themes": themes, "usage": usage, **summary}
+    return {"success": True, "themes": themes, "usage": usage, "response_time": result.get("response_time"),
+            **summary}
+
+
+def preview_sample(summaries: Sequence[Dict[str, str]], shards: Sequence[Sequence[int]],
+                   count: int = 3) -> List[Dict[str, str]]:
+    """
+    `count` summaries spread across the album's shards, for build_preview_request
+
+    geminiService previews from the first three photos only, which for a
+    large album all come from its first event.
+    """
+    if not shards:
+        return list(summaries[:count])
+    picks = [shards[round(n * (len(shards) - 1) / max(1, count - 1))][0] for n in range(min(count, len(shards)))]
+    return [summaries[i] for i in dict.fromkeys(picks)]
@@ -0,0 +1,318 @@
+"""
+Thumbnail pyramids with DCT-scaled decoding and a content-addressed LRU cache
+
+imageService.compressImage and the analysis path decode every photo at full
+size before shrinking it. Here a JPEG is decoded once with draft(), which has
+libjpeg scale by 1/2, 1/4 or 1/8 inside the IDCT, at the smallest scale that
+still covers the largest size bucket. Every smaller bucket is then resized
+from that level, so one reduced decode yields the whole pyramid.
+
+Levels are stored under the SHA-256 of the source bytes, so the same photo
+uploaded twice (or renamed) is decoded once. A SQLite index maps path +
+mtime + size to the digest, so warm lookups skip re-hashing, and it keeps
+last-use times for LRU eviction once the cache passes its byte budget.
+"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from PIL import Image, ImageOps
+
+# Long-edge pixels per bucket: PageThumbnailStrip, PhotoGrid, vision analysis inputs
+# (downscaled_jpeg's default), and compressImage's maxWidth for previews
+SIZE_BUCKETS = {"strip": 160, "grid": 320, "analysis": 768, "preview": 1920}
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "photobook" / "thumbnails"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+EVICT_TO = 0.9  # fraction of max_bytes left after an eviction pass
+JPEG_QUALITY = 85
+# A level up to this much larger than its bucket is stored as is: resampling
+# 2016 px down to 1920 costs more than the reduced decode itself
+BUCKET_SLACK = 1.1
+# Integer box reduce() first, then Lanczos over at most this factor
+REDUCING_GAP = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS levels (
+    digest TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, bucket)
+);
+CREATE INDEX IF NOT EXISTS levels_lru ON levels (last_used);
+"""
+
+
+def bucket_for(size: int, buckets: Sequence[int] = tuple(SIZE_BUCKETS.values())) -> int:
+    """Smallest bucket whose long edge covers `size` pixels (the largest bucket beyond that)"""
+    ordered = sorted(buckets)
+    return next((b for b in ordered if b >= size), ordered[-1])
+
+
+def draft_request(size: Tuple[int, int], long_edge: int) -> Tuple[int, int]:
+    """
+    Size to pass to draft() so the reduced decode still has `long_edge` pixels
+
+    draft() keeps both dimensions at or above the request, so the request
+    carries the image's own aspect ratio.
+    """
+    scale = long_edge / max(size)
+    return max(1, int(size[0] * scale)), max(1, int(size[1] * scale))
+
+
+def build_pyramid(data: bytes, buckets: Sequence[int], quality: int = JPEG_QUALITY) -> Dict[str, Any]:
+    """
+    Encoded JPEG levels for every bucket from one (DCT-reduced) decode
+
+    Returns {"levels": {bucket: (bytes, width, height)}, "source": (w, h),
+    "decoded": (w, h)}. Levels never upscale: a photo smaller than a bucket is
+    stored at its own size, and a level at most BUCKET_SLACK over its bucket
+    is kept unresampled, so a bucket means "covers at least this many px".
+    """
+    image = Image.open(io.BytesIO(data))
+    source = image.size
+    if image.format == "JPEG":
+        image.draft("RGB", draft_request(image.size, max(buckets)))
+    decoded = image.size
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    levels: Dict[int, Tuple[bytes, int, int]] = {}
+    current = image
+    for bucket in sorted(buckets, reverse=True):
+        if max(current.size) > bucket * BUCKET_SLACK:
+            scale = bucket / max(current.size)
+            size = (max(1, round(current.width * scale)), max(1, round(current.height * scale)))
+            current = current.resize(size, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+        buffer = io.BytesIO()
+        current.save(buffer, format="JPEG", quality=quality)
+        levels[bucket] = (buffer.getvalue(), current.width, current.height)
+    return {"levels": levels, "source": source, "decoded": decoded}
+
+
+def _write_atomic(path: Path, data: bytes):
+    partial = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.replace(partial, path)
+
+
+def _digest(path: str) -> Tuple[str, bytes]:
+    with open(path, "rb") as f:
+        data = f.read()
+    return hashlib.sha256(data).hexdigest(), data
+
+
+def _generate(task: Tuple[str, str, Tuple[int, ...], int]) -> Dict[str, Any]:
+    """Worker: hash a source, and build + write its pyramid unless every level already exists"""
+    path, directory, buckets, quality = task
+    digest, data = _digest(path)
+    objects = Path(directory) / "objects" / digest[:2]
+    targets = {b: objects / f"{digest}-{b}.jpg" for b in buckets}
+    result: Dict[str, Any] = {"path": path, "digest": digest, "read": len(data), "levels": {}}
+    if all(t.exists() for t in targets.values()):
+        result["built"] = False
+        for bucket, target in targets.items():
+            with Image.open(target) as image:
+                result["levels"][bucket] = (target.stat().st_size, image.width, image.height)
+        return result
+    try:
+        pyramid = build_pyramid(data, buckets, quality)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return {**result, "error": f"{type(e).__name__}: {e}"}
+    objects.mkdir(parents=True, exist_ok=True)
+    for bucket, (encoded, width, height) in pyramid["levels"].items():
+        _write_atomic(targets[bucket], encoded)
+        result["levels"][bucket] = (len(encoded), width, height)
+    result.update(built=True, source=pyramid["source"], decoded=pyramid["decoded"])
+    return result
+
+
+class ThumbnailCache:
+    """On-disk pyramid cache; safe to share between processes (SQLite WAL index)"""
+
+    def __init__(self, directory: Union[str, Path] = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 buckets: Sequence[int] = tuple(SIZE_BUCKETS.values()), quality: int = JPEG_QUALITY):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.buckets = tuple(sorted(buckets))
+        self.quality = quality
+        (self.directory / "objects").mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.directory / "index.db", timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def object_path(self, digest: str, bucket: int) -> Path:
+        return self.directory / "objects" / digest[:2] / f"{digest}-{bucket}.jpg"
+
+    def _known(self, conn: sqlite3.Connection, path: str, stat: os.stat_result) -> Optional[str]:
+        """Digest for an unchanged source whose whole pyramid is indexed, without reading it"""
+        row = conn.execute("SELECT digest FROM sources WHERE path = ? AND mtime_ns = ? AND size = ?",
+                           (path, stat.st_mtime_ns, stat.st_size)).fetchone()
+        if row is None:
+            return None
+        (count,) = conn.execute("SELECT COUNT(*) FROM levels WHERE digest = ?", (row["digest"],)).fetchone()
+        return row["digest"] if count == len(self.buckets) else None
+
+    def generate(self, paths: Sequence[Union[str, Path]], workers: Optional[int] = 1,
+                 on_progress: Optional[Callable[[int, int], None]] = None, evict: bool = True) -> Dict[str, Any]:
+        """
+        Make sure every source has a full pyramid; returns counts and timings
+
+        Sources already indexed at the same mtime and size are not read at
+        all. The rest are hashed, and decoded only if their content is new,
+        across a process pool when workers > 1. With evict, the cache is
+        trimmed back under max_bytes afterwards.
+        """
+        start = time.perf_counter()
+        keys = [str(Path(p).resolve()) for p in paths]
+        stats = {key: os.stat(key) for key in keys}
+        with self._connect() as conn:
+            pending = [key for key in keys if self._known(conn, key, stats[key]) is None]
+        tasks = [(key, str(self.directory), self.buckets, self.quality) for key in pending]
+        summary = {"sources": len(keys), "indexed": len(keys) - len(pending), "deduplicated": 0, "built": 0,
+                   "errors": 0, "bytes_read": 0, "bytes_written": 0}
+        done = summary["indexed"]
+
+        def record(results: List[Dict[str, Any]]):
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for result in results:
+                    if "error" in result:
+                        summary["errors"] += 1
+                        continue
+                    summary["bytes_read"] += result["read"]
+                    if result["built"]:
+                        summary["built"] += 1
+                        summary["bytes_written"] += sum(size for size, _, _ in result["levels"].values())
+                    else:
+                        summary["deduplicated"] += 1
+                    stat = stats[result["path"]]
+                    conn.execute("INSERT OR REPLACE INTO sources (path, mtime_ns, size, digest) VALUES (?, ?, ?, ?)",
+                                 (result["path"], stat.st_mtime_ns, stat.st_size, result["digest"]))
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO levels (digest, bucket, width, height, bytes, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [(result["digest"], bucket, width, height, size, now)
+                         for bucket, (size, width, height) in result["levels"].items()])
+                conn.execute("COMMIT")
+
+        batch: List[Dict[str, Any]] = []
+        if workers and workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(_generate, tasks, chunksize=4)
+                for result in results:
+                    batch.append(result)
+                    done += 1
+                    if len(batch) >= 64:
+                        record(batch)
+                        batch = []
+                    if on_progress:
+                        on_progress(done, len(keys))
+        else:
+            for task in tasks:
+                batch.append(_generate(task))
+                done += 1
+                if len(batch) >= 64:
+                    record(batch)
+                    batch = []
+                if on_progress:
+                    on_progress(done, len(keys))
+        if batch:
+            record(batch)
+        summary["evicted"] = self.evict() if evict else 0
+        summary["elapsed"] = time.perf_counter() - start
+        return summary
+
+    def get(self, path: Union[str, Path], size: int) -> Optional[Path]:
+        """
+        Cached JPEG for a source at the bucket covering `size` px (long edge)
+
+        Builds the pyramid on a miss and refreshes the level's LRU time on a
+        hit. Returns None if the source cannot be decoded.
+        """
+        key = str(Path(path).resolve())
+        bucket = bucket_for(size, self.buckets)
+        with self._connect() as conn:
+            digest = self._known(conn, key, os.stat(key))
+        built = digest is None or not self.object_path(digest, bucket).exists()
+        if built:
+            # Evicted below, once the requested level is marked as used and kept out of it
+            if self.generate([key], evict=False)["errors"]:
+                return None
+            with self._connect() as conn:
+                digest = self._known(conn, key, os.stat(key))
+            if digest is None:
+                return None
+        with self._connect() as conn:
+            conn.execute("UPDATE levels SET last_used = ? WHERE digest = ? AND bucket = ?",
+                         (time.time(), digest, bucket))
+        if built:
+            self.evict(keep=[(digest, bucket)])
+        return self.object_path(digest, bucket)
+
+    def total_bytes(self) -> int:
+        with self._connect() as conn:
+            (total,) = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM levels").fetchone()
+        return total
+
+    def evict(self, keep: Sequence[Tuple[str, int]] = ()) -> int:
+        """Drop least recently used levels, except keep's (digest, bucket), until back under EVICT_TO of max_bytes"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            (total,) = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM levels").fetchone()
+            if total <= self.max_bytes:
+                conn.execute("COMMIT")
+                return 0
+            victims = []
+            for row in conn.execute("SELECT digest, bucket, bytes FROM levels ORDER BY last_used, digest, bucket"):
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                if (row["digest"], row["bucket"]) in keep:
+                    continue
+                victims.append((row["digest"], row["bucket"]))
+                total -= row["bytes"]
+            conn.executemany("DELETE FROM levels WHERE digest = ? AND bucket = ?", victims)
+            conn.execute("COMMIT")
+        for digest, bucket in victims:
+            try:
+                self.object_path(digest, bucket).unlink()
+            except FileNotFoundError:
+                pass
+        return len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT bucket, COUNT(*) AS levels, SUM(bytes) AS bytes FROM levels "
+                                "GROUP BY bucket ORDER BY bucket").fetchall()
+            (sources,) = conn.execute("SELECT COUNT(*) FROM sources").fetchone()
+        return {"sources": sources, "buckets": {row["bucket"]: {"levels": row["levels"], "bytes": row["bytes"]}
+                                                for row in rows}}
@@ -0,0 +1,301 @@
+"""
+Tracing spans for the analysis pipeline, exported as OTLP-JSON files
+
+test-models.py and test-vision-analysis.py only print colored log lines,
+so there is no way to see where a 500-image batch spends its time. Library
+code opens a span per stage (image.load, image.preprocess, image.encode,
+http.request, response.parse, result.write) with `tracing.span(...)`; a
+script that wants the spans calls configure() with a file path, everything
+else gets a shared no-op span and pays next to nothing.
+
+Finished spans are buffered and appended to the file as one OTLP
+ExportTraceServiceRequest per line (resourceSpans -> scopeSpans -> spans),
+the layout the OpenTelemetry Collector's otlpjsonfile receiver reads, so
+the same file can be shipped to any backend later. trace-report.py renders
+per-stage times, the critical path and a flame graph from it.
+
+The current span is kept in a ContextVar: spans opened inside it become its
+children, in the same thread or in a pool thread running a bind()-wrapped
+function. Listeners (add_listener) are told when every span starts and ends,
+with or without a file; the memory profiler (photobook/memprofile.py)
+attributes allocations to stages this way. There is no dependency on the
+opentelemetry SDK.
+"""
+
+import atexit
+import json
+import os
+import random
+import socket
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+DEFAULT_SERVICE = "photobook-scripts"
+SCOPE = {"name": "photobook.tracing", "version": "1"}
+
+# OTLP SpanKind / StatusCode values
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+# Finished spans buffered before they are appended to the file
+FLUSH_SPANS = 512
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    """OTLP AnyValue for a Python scalar (int64 is a string in OTLP-JSON)"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_attribute_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def encode_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def decode_attributes(attributes: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Inverse of encode_attributes, for readers of the exported file"""
+    decoded = {}
+    for attribute in attributes or []:
+        value = attribute.get("value") or {}
+        if "intValue" in value:
+            decoded[attribute["key"]] = int(value["intValue"])
+        elif "arrayValue" in value:
+            decoded[attribute["key"]] = [next(iter(v.values()), None) for v in value["arrayValue"].get("values", [])]
+        else:
+            decoded[attribute["key"]] = next(iter(value.values()), None)
+    return decoded
+
+
+class NoopSpan:
+    """What span() returns while tracing is off; every method does nothing"""
+
+    recording = False
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def error(self, message: str):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+_current: ContextVar[Optional["Span"]] = ContextVar("photobook_span", default=None)
+_tracer: Optional["Tracer"] = None
+
+
+class Span:
+    """One timed stage; a context manager that makes itself the current span while open"""
+
+    __slots__ = ("tracer", "name", "kind", "trace_id", "span_id", "parent_id", "attributes", "start_ns", "end_ns",
+                 "status", "recording", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, kind: int, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        # Only spans that are exported are worth extra work to describe
+        self.recording = tracer.path is not None
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.status: Dict[str, Any] = {}
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        for listener in self.tracer.listeners:
+            listener.span_started(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end_ns = time.time_ns()
+        _current.reset(self._token)
+        if exc is not None and not self.status:
+            self.error(f"{exc_type.__name__}: {exc}")
+        for listener in self.tracer.listeners:
+            listener.span_ended(self)
+        self.tracer.finish(self)
+        return False
+
+    def set(self, **attributes):
+        """Add attributes; None values are left out"""
+        self.attributes.update(attributes)
+
+    def error(self, message: str):
+        """Mark the span failed without raising (e.g. a call that returned success=False)"""
+        self.status = {"code": STATUS_ERROR, "message": message[:500]}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": encode_attributes(self.attributes),
+            "status": self.status or {"code": STATUS_UNSET},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Tracer:
+    """
+    Buffers finished spans and appends them to an OTLP-JSON lines file; thread-safe
+
+    Each flush is a single append of one line, so several processes may
+    share a file. Without a path, spans only reach the listeners.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]], service: str = DEFAULT_SERVICE,
+                 flush_spans: int = FLUSH_SPANS):
+        self.path = Path(path) if path else None
+        self.flush_spans = flush_spans
+        self.listeners: List[Any] = []
+        self.resource = {
+            "attributes": encode_attributes(
+                {"service.name": service, "host.name": socket.gethostname(), "process.pid": os.getpid()}
+            )
+        }
+        self.exported = 0
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+
+    def span(self, name: str, kind: int = KIND_INTERNAL, **attributes) -> Span:
+        return Span(self, name, kind, _current.get(), attributes)
+
+    def finish(self, span: Span):
+        if self.path is None:
+            return
+        with self._lock:
+            self._buffer.append(span)
+            full = len(self._buffer) >= self.flush_spans
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        request = {
+            "resourceSpans": [
+                {"resource": self.resource, "scopeSpans": [{"scope": SCOPE, "spans": [s.to_otlp() for s in spans]}]}
+            ]
+        }
+        line = (json.dumps(request, separators=(",", ":")) + "\n").encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        self.exported += len(spans)
+
+
+def configure(path: Optional[Union[str, Path]], service: str = DEFAULT_SERVICE) -> Optional[Tracer]:
+    """Send spans to path from now on (None turns the file off); buffered spans are flushed at exit"""
+    global _tracer
+    shutdown()
+    listeners = _tracer.listeners if _tracer is not None else []
+    _tracer = Tracer(path, service) if path or listeners else None
+    if _tracer is not None:
+        _tracer.listeners = listeners
+    return _tracer
+
+
+def add_listener(listener: Any):
+    """
+    Call listener.span_started(span) and listener.span_ended(span) for every span
+
+    Both run on the thread that opens and closes the span; span_ended runs
+    before the span is exported, so attributes it sets are written too.
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(None)
+    _tracer.listeners = [*_tracer.listeners, listener]
+
+
+def remove_listener(listener: Any):
+    global _tracer
+    if _tracer is None:
+        return
+    _tracer.listeners = [existing for existing in _tracer.listeners if existing is not listener]
+    if not _tracer.listeners and _tracer.path is None:
+        _tracer = None
+
+
+def shutdown():
+    """Flush buffered spans; tracing stays configured"""
+    if _tracer is not None:
+        _tracer.flush()
+
+
+atexit.register(shutdown)
+
+
+def enabled() -> bool:
+    """Whether spans are being written to a file"""
+    return _tracer is not None and _tracer.path is not None
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes) -> Union[Span, NoopSpan]:
+    """
+    Context manager timing one stage, a child of the current span
+
+        with tracing.span("image.encode", quality=85) as s:
+            data = encode_jpeg(image, 85)
+            s.set(bytes=len(data))
+
+    Returns NOOP_SPAN unless configure() or add_listener() was called.
+    Attributes that cost something to compute should be guarded with
+    `if s.recording:`, which is true only for spans written to a file.
+    """
+    if _tracer is None:
+        return NOOP_SPAN
+    return _tracer.span(name, kind, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """fn with the caller's current span as parent, for functions run on pool threads"""
+    if _tracer is None:
+        return fn
+    parent = _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
@@ -0,0 +1,392 @@
+"""
+Lease-based work queue for spreading album processing over processes and hosts
+
+jobs.JobQueue runs whole pipeline stages inside one service process. This
+queue holds smaller units (a pack of photos to analyze, a chunk of photos to
+score or thumbnail, a few pages to rasterize) that any number of worker
+processes, on this host or others, take from a shared SQLite database. A
+coordinator enqueues a batch of units, workers lease them, and each unit's
+result is written back to the same database, which is the results sink.
+
+A lease lasts lease_seconds. Workers extend the leases of the units they
+are running with heartbeats, so a unit is only taken over when its worker
+stopped heartbeating (crashed, killed or cut off). The next lease() call
+from any worker returns such units to the queue, up to max_attempts leases
+per unit. Units are therefore run at least once; if a lost worker still
+finishes, the first result stored wins and later ones are dropped.
+
+WAL mode needs memory shared between the processes that open the
+database, so it only works when every worker runs on the host that holds
+the database file. For a database on a network volume shared between hosts,
+use journal_mode="delete" (a rollback journal with file locks).
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from multiprocessing import Process
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from . import tracing
+
+DEFAULT_LEASE_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+JOURNAL_MODES = ("wal", "delete")
+
+UNIT_STATUSES = ("queued", "leased", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS units_ready ON units (status, kind, id);
+CREATE INDEX IF NOT EXISTS units_leased ON units (status, lease_expires);
+CREATE INDEX IF NOT EXISTS units_by_batch ON units (batch, id);
+"""
+
+UnitHandler = Callable[[Dict[str, Any]], Any]
+
+
+def worker_name(suffix: str = "") -> str:
+    """host:pid[:suffix], unique across the hosts sharing a queue"""
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{name}:{suffix}" if suffix else name
+
+
+class WorkQueue:
+    """SQLite-backed unit queue with leases; safe to share between threads, processes and hosts"""
+
+    def __init__(self, path: str = "work.db", lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, journal_mode: str = "wal"):
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode '{journal_mode}' (expected one of {', '.join(JOURNAL_MODES)})")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.journal_mode = journal_mode
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode.upper()}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, kind: str, payloads: Sequence[Dict[str, Any]], batch: str = "default") -> List[int]:
+        """Queue one unit per payload; ids follow payload order"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            ids = [
+                conn.execute(
+                    "INSERT INTO units (batch, kind, payload, max_attempts, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (batch, kind, json.dumps(payload), self.max_attempts, now),
+                ).lastrowid
+                for payload in payloads
+            ]
+            conn.execute("COMMIT")
+        return ids
+
+    def _reclaim(self, conn: sqlite3.Connection, now: float) -> int:
+        """Expired leases back to queued, or failed once they used up max_attempts"""
+        conn.execute(
+            "UPDATE units SET status = 'failed', finished_at = ?, "
+            "error = 'Lease expired ' || attempts || ' time(s); last worker: ' || lease_owner "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+            (now, now),
+        )
+        return conn.execute(
+            "UPDATE units SET status = 'queued', lease_owner = NULL, lease_expires = NULL "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (now,),
+        ).rowcount
+
+    def lease(self, worker: str, kinds: Optional[Sequence[str]] = None, limit: int = 1) -> List[Dict[str, Any]]:
+        """Atomically lease up to `limit` of the oldest queued units, expired leases included"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reclaim(conn, now)
+            query = "SELECT * FROM units WHERE status = 'queued'"
+            params: List[Any] = []
+            if kinds:
+                query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+                params.extend(kinds)
+            rows = conn.execute(query + " ORDER BY id LIMIT ?", params + [limit]).fetchall()
+            conn.executemany(
+                "UPDATE units SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ? "
+                "WHERE id = ?",
+                [(worker, now + self.lease_seconds, row["id"]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        return [{**self._decode(row), "status": "leased", "attempts": row["attempts"] + 1} for row in rows]
+
+    def heartbeat(self, worker: str, unit_ids: Sequence[int]) -> List[int]:
+        """Extend this worker's leases; returns the ids it no longer holds"""
+        if not unit_ids:
+            return []
+        expires = time.time() + self.lease_seconds
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE units SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                [(expires, unit_id, worker) for unit_id in unit_ids],
+            )
+            held = {row["id"] for row in conn.execute(
+                f"SELECT id FROM units WHERE lease_owner = ? AND status = 'leased' "
+                f"AND id IN ({', '.join('?' for _ in unit_ids)})",
+                [worker, *unit_ids],
+            )}
+            conn.execute("COMMIT")
+        return [unit_id for unit_id in unit_ids if unit_id not in held]
+
+    def complete(self, unit_id: int, worker: str, result: Any) -> bool:
+        """Store a unit's result; False if another worker's result was stored first"""
+        result_json = json.dumps(result)
+        with self._connect() as conn:
+            stored = conn.execute(
+                "UPDATE units SET status = 'done', result = ?, error = NULL, worker = ?, lease_owner = NULL, "
+                "lease_expires = NULL, finished_at = ? WHERE id = ? AND status != 'done'",
+                (result_json, worker, time.time(), unit_id),
+            ).rowcount
+        return bool(stored)
+
+    def fail(self, unit_id: int, worker: str, error: str) -> Optional[str]:
+        """
+        Give a leased unit back after an error: queued again while it has
+        attempts left, else failed. Returns the new status, or None if the
+        worker no longer held the lease.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM units WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (unit_id, worker),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            status = "failed" if row["attempts"] >= row["max_attempts"] else "queued"
+            conn.execute(
+                "UPDATE units SET status = ?, error = ?, worker = ?, lease_owner = NULL, lease_expires = NULL, "
+                "finished_at = ? WHERE id = ?",
+                (status, error, worker, time.time() if status == "failed" else None, unit_id),
+            )
+            conn.execute("COMMIT")
+        return status
+
+    def counts(self, batch: Optional[str] = None, kinds: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """Units per status (every status present, 0 if none)"""
+        query = "SELECT status, COUNT(*) AS count FROM units WHERE 1 = 1"
+        params: List[Any] = []
+        if batch is not None:
+            query += " AND batch = ?"
+            params.append(batch)
+        if kinds:
+            query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+        with self._connect() as conn:
+            rows = conn.execute(query + " GROUP BY status", params).fetchall()
+        counts = {status: 0 for status in UNIT_STATUSES}
+        counts.update({row["status"]: row["count"] for row in rows})
+        return counts
+
+    def batches(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT batch, kind, status, COUNT(*) AS count, MIN(created_at) AS created_at, "
+                "MAX(finished_at) AS finished_at FROM units GROUP BY batch, kind, status ORDER BY MIN(id)"
+            ).fetchall()
+        found: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            entry = found.setdefault(row["batch"], {"batch": row["batch"], "kinds": set(),
+                                                    "created_at": row["created_at"], "finished_at": None,
+                                                    **{status: 0 for status in UNIT_STATUSES}})
+            entry["kinds"].add(row["kind"])
+            entry[row["status"]] += row["count"]
+            entry["finished_at"] = max(filter(None, [entry["finished_at"], row["finished_at"]]), default=None)
+        return [{**entry, "kinds": sorted(entry["kinds"])} for entry in found.values()]
+
+    def results(self, batch: str) -> List[Dict[str, Any]]:
+        """Every unit of a batch in enqueue order, with its result or error"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM units WHERE batch = ? ORDER BY id", (batch,)).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def wait(self, batch: str, poll_interval: float = 1.0,
+             on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """Block until no unit of the batch is queued or leased; on_progress gets (finished, total)"""
+        while True:
+            counts = self.counts(batch)
+            if on_progress:
+                on_progress(counts["done"] + counts["failed"], sum(counts.values()))
+            if not counts["queued"] and not counts["leased"]:
+                return counts
+            time.sleep(poll_interval)
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        unit = dict(row)
+        unit["payload"] = json.loads(unit["payload"])
+        unit["result"] = json.loads(unit["result"]) if unit["result"] else None
+        return unit
+
+
+class Worker:
+    """
+    Leases units of the handled kinds and runs them on `threads` threads
+
+    Threads suit I/O-bound units (vision calls); CPU-bound units (Pillow
+    work) scale with more worker processes instead (spawn_workers). A
+    heartbeat thread extends the leases of every running unit each third
+    of the lease. With exit_when_idle, run() returns once no unit of the
+    handled kinds is queued or leased anywhere.
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        handlers: Dict[str, UnitHandler],
+        name: Optional[str] = None,
+        threads: int = 1,
+        poll_interval: float = 0.5,
+        exit_when_idle: bool = False,
+        on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.name = name or worker_name()
+        self.threads = max(1, threads)
+        self.poll_interval = poll_interval
+        self.exit_when_idle = exit_when_idle
+        self.on_event = on_event or (lambda event, unit: None)
+        self.stats = {"done": 0, "failed": 0, "retried": 0, "duplicates": 0, "lost_leases": 0}
+        self._held: Dict[int, str] = {}  # unit id -> lease owner (thread name)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            with self._lock:
+                held = dict(self._held)
+            for owner in set(held.values()):
+                lost = self.queue.heartbeat(owner, [unit_id for unit_id, o in held.items() if o == owner])
+                for _ in lost:
+                    self._count("lost_leases")
+
+    def _run_unit(self, owner: str, unit: Dict[str, Any]):
+        with self._lock:
+            self._held[unit["id"]] = owner
+        self.on_event("started", unit)
+        with tracing.span("unit", unit_id=unit["id"], unit_kind=unit["kind"], batch=unit["batch"],
+                          attempt=unit["attempts"], worker=owner) as span:
+            try:
+                result = self.handlers[unit["kind"]](unit["payload"])
+                # Inside the try: a result that cannot be stored (not JSON-serializable) fails the unit
+                with tracing.span("result.write"):
+                    stored = self.queue.complete(unit["id"], owner, result)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                status = self.queue.fail(unit["id"], owner, f"{error}\n{traceback.format_exc(limit=5)}")
+                span.error(error)
+                span.set(outcome=status or "lost")
+                self._count("failed" if status == "failed" else "retried")
+                self.on_event(status or "lost", unit)
+            else:
+                span.set(outcome="done" if stored else "duplicate")
+                self._count("done" if stored else "duplicates")
+                self.on_event("done" if stored else "duplicate", unit)
+            finally:
+                with self._lock:
+                    self._held.pop(unit["id"], None)
+
+    def _work(self, owner: str):
+        kinds = list(self.handlers)
+        while not self._stop.is_set():
+            units = self.queue.lease(owner, kinds)
+            if not units:
+                if self.exit_when_idle:
+                    counts = self.queue.counts(kinds=kinds)
+                    if not counts["queued"] and not counts["leased"]:
+                        return
+                self._stop.wait(self.poll_interval)
+                continue
+            for unit in units:
+                self._run_unit(owner, unit)
+
+    def run(self) -> Dict[str, int]:
+        """Work until stop() (or idle, with exit_when_idle); returns unit counts"""
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"{self.name}-heartbeat", daemon=True)
+        heartbeat.start()
+        owners = [self.name if self.threads == 1 else f"{self.name}:{n}" for n in range(self.threads)]
+        threads = [threading.Thread(target=self._work, args=(owner,), name=owner, daemon=True) for owner in owners]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        finally:
+            self._stop.set()
+        return dict(self.stats)
+
+
+def _worker_process(path: str, queue_kwargs: Dict[str, Any], handlers: Dict[str, UnitHandler],
+                    worker_kwargs: Dict[str, Any], trace: Optional[str] = None):
+    tracing.configure(trace, service="work-queue")
+    try:
+        Worker(WorkQueue(path, **queue_kwargs), handlers, **worker_kwargs).run()
+    finally:
+        # multiprocessing children skip atexit handlers
+        tracing.shutdown()
+
+
+def spawn_workers(queue: WorkQueue, handlers: Dict[str, UnitHandler], processes: int,
+                  trace: Optional[str] = None, **worker_kwargs) -> List[Process]:
+    """
+    Start `processes` worker processes on this host, each running a Worker
+
+    handlers must be picklable (module-level functions or partials of them).
+    With `trace`, every process appends its spans to that OTLP-JSON file.
+    The caller joins the processes, or terminates them to stop early.
+    """
+    queue_kwargs = {"lease_seconds": queue.lease_seconds, "max_attempts": queue.max_attempts,
+                    "journal_mode": queue.journal_mode}
+    started = []
+    for _ in range(processes):
+        process = Process(target=_worker_process, args=(queue.path, queue_kwargs, handlers, worker_kwargs, trace),
+                          daemon=False)
+        process.start()
+        started.append(process)
+    return started
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Plan photobook pages and spreads with the dynamic-programming spread planner
+
+Features are imageScores-style dicts in album order (assetId, aspect or
+width/height, isHero, quality, takenAt, optional cluster), as a JSON list or an
+object with an "imageScores" array.
+
+Usage:
+    python scripts/plan-spreads.py plan --features features.json --pages 24 --output plan.json
+    python scripts/plan-spreads.py plan --images bucketlistly_images --pages 10 --theme warm_family_portrait
+    python scripts/plan-spreads.py benchmark --photos 1000,5000 --tries 100
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+from photobook.console import Colors, log, log_section
+from photobook.metadata import group_events, iter_photo_files, scan_paths, to_features
+from photobook.quality import analyze_paths
+from photobook.spreads import SpreadPlanner, normalize_features, plan_spreads
+
+
+def synthetic_features(count: int, seed: int = 42) -> list:
+    """An album of events: bursts of photos minutes apart, separated by hours or days"""
+    rng = random.Random(seed)
+    features, clock = [], 1_700_000_000.0
+    while len(features) < count:
+        clock += rng.choice([4, 8, 24, 72]) * 3600
+        for _ in range(min(rng.randint(3, 40), count - len(features))):
+            clock += rng.expovariate(1 / 180)
+            quality = min(100.0, max(20.0, rng.gauss(75, 12)))
+            features.append({
+                "assetId": f"photo-{len(features) + 1:05d}",
+                "aspect": rng.choices([1.5, 0.667, 1.0, 1.78], weights=[50, 30, 10, 10])[0],
+                "isHero": quality > 88 and rng.random() < 0.5,
+                "quality": round(quality, 1),
+                "takenAt": clock,
+            })
+    return features
+
+
+def even_schedule(count: int, pages: int) -> list:
+    """Page starts for photos spread as evenly as possible, in order (photobookGenerator's approach)"""
+    return [page * count // pages for page in range(pages)]
+
+
+def random_schedule(rng: random.Random, count: int, pages: int, max_per_page: int) -> list:
+    """Page starts for a random split into `pages` runs of 1..max_per_page photos"""
+    sizes = [1] * pages
+    open_pages = list(range(pages))
+    for _ in range(count - pages):
+        slot = rng.randrange(len(open_pages))
+        sizes[open_pages[slot]] += 1
+        if sizes[open_pages[slot]] == max_per_page:
+            open_pages[slot] = open_pages[-1]
+            open_pages.pop()
+    starts, position = [], 0
+    for size in sizes:
+        starts.append(position)
+        position += size
+    return starts
+
+
+def load_features(args) -> list:
+    if args.features:
+        with open(args.features, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data["imageScores"] if isinstance(data, dict) else data
+    records, _ = scan_paths(iter_photo_files([args.images], recursive=False)[:args.limit], workers=1)
+    features = to_features(group_events(records))
+    if args.quality:
+        scored, _ = analyze_paths([r["path"] for r in records], workers=1)
+        scores = {Path(r["path"]).stem: r["qualityScore"] for r in scored if "error" not in r}
+        for feature in features:
+            if feature["assetId"] in scores:
+                feature["quality"] = scores[feature["assetId"]]
+    return features
+
+
+def plan(args):
+    features = load_features(args)
+    start = time.perf_counter()
+    result = plan_spreads(features, args.pages, cover=not args.no_cover, theme_id=args.theme)
+    elapsed = time.perf_counter() - start
+
+    log_section(f"📐 Spread Plan ({len(features)} photos, {result['pageCount']} pages)")
+    if result["pageCount"] != args.pages:
+        log(f"⚠️  {args.pages} pages requested; {len(features)} photos fill {result['pageCount']}", Colors.YELLOW)
+    for spread in result["spreads"]:
+        sides = []
+        for side in ("leftPage", "rightPage"):
+            page = next((p for p in result["pages"] if p["pageNumber"] == spread[side]), None)
+            sides.append(f"{page['templateId']} ({len(page['photoIds'])})" if page else "—")
+        log(f"Spread {spread['spreadNumber']:>3}: {sides[0]:<28} | {sides[1]}", Colors.GRAY)
+    gap = result["cost"] - result["lowerBound"]
+    log(f"\nCost {result['cost']:.3f}, lower bound {result['lowerBound']:.3f}"
+        f"{' (optimal)' if gap < 1e-6 else f' (gap {gap:.3f})'}", Colors.GREEN)
+    log(f"⏱️  {elapsed * 1000:.0f} ms, {result['solves']} DP solves, {result['repairs']} repairs", Colors.GRAY)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        log(f"\n📝 Plan saved to: {args.output}", Colors.BLUE)
+
+
+def benchmark(args):
+    log_section("📐 Spread Planner Benchmark")
+    rows = []
+    for count in [int(c) for c in args.photos.split(",")]:
+        photos = normalize_features(synthetic_features(count, args.seed))
+        pages = max(1, count // args.per_page)
+
+        start = time.perf_counter()
+        planner = SpreadPlanner(photos)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        result = planner.plan(pages)
+        solve = time.perf_counter() - start
+
+        even_cost = planner.plan_cost(even_schedule(count, pages))
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        random_cost = min(planner.plan_cost(random_schedule(rng, count, pages, planner.max_per_page))
+                          for _ in range(args.tries))
+        random_time = time.perf_counter() - start
+
+        rows.append({"photos": count, "pages": pages, "build_s": round(build, 3), "plan_s": round(solve, 3),
+                     "solves": result["solves"], "repairs": result["repairs"], "cost": round(result["cost"], 3),
+                     "lower_bound": round(result["lower_bound"], 3), "even_cost": round(even_cost, 3),
+                     "random_cost": round(random_cost, 3), "random_s": round(random_time, 3)})
+        log(f"\n{count} photos -> {pages} pages", Colors.CYAN)
+        log(f"  Page cost table: {build:.2f}s   DP: {solve:.2f}s ({result['solves']} solves, "
+            f"{result['repairs']} repairs)", Colors.GRAY)
+        log(f"  DP plan:             cost {result['cost']:9.2f}  (lower bound {result['lower_bound']:.2f})",
+            Colors.GREEN)
+        log(f"  Even schedule:       cost {even_cost:9.2f}", Colors.YELLOW)
+        log(f"  Best of {args.tries} random:  cost {random_cost:9.2f}  in {random_time:.2f}s", Colors.YELLOW)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dynamic-programming spread planner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = sub.add_parser("plan", help="Plan pages and spreads for an album")
+    plan_parser.add_argument("--features", help="JSON features in album order")
+    plan_parser.add_argument("--images", help="Directory of photos, ordered and grouped by capture time")
+    plan_parser.add_argument("--limit", type=int, help="Photos to take from --images")
+    plan_parser.add_argument("--quality", action="store_true", help="Score --images for quality (score-quality.py)")
+    plan_parser.add_argument("--pages", type=int, default=10, help="targetPageCount, cover included (default: 10)")
+    plan_parser.add_argument("--no-cover", action="store_true", help="Plan every page, no hero cover")
+    plan_parser.add_argument("--theme", help="Also use this theme's templateService layouts")
+    plan_parser.add_argument("--output", help="Save the plan as JSON")
+
+    bench_parser = sub.add_parser("benchmark", help="Optimal plan vs even and random schedules")
+    bench_parser.add_argument("--photos", default="1000,5000", help="Album sizes (default: 1000,5000)")
+    bench_parser.add_argument("--per-page", type=int, default=3, help="Photos per page on average (default: 3)")
+    bench_parser.add_argument("--tries", type=int, default=100, help="Random schedules to try (default: 100)")
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    if args.command == "plan" and not (args.features or args.images):
+        parser.error("--features or --images is required")
+    {"plan": plan, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
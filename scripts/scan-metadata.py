@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Scan photo headers for capture time, orientation, GPS and ICC without decoding
+
+Results are cached (default ~/.cache/photobook/metadata.json) by path, mtime and
+size, so re-scans of an unchanged library only stat() each file.
+
+Usage:
+    python scripts/scan-metadata.py scan bucketlistly_images --output metadata.json
+    python scripts/scan-metadata.py scan ~/Photos --group --gap-hours 3 --radius-km 25
+    python scripts/scan-metadata.py scan ~/Photos --features features.json
+    python scripts/scan-metadata.py benchmark --images bucketlistly_images --synthetic 10000
+    python scripts/scan-metadata.py benchmark --corpus /tmp/corpus
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from PIL import Image
+
+from photobook.console import Colors, log, log_section
+from photobook.corpus import load_manifest, synthetic_library
+from photobook.metadata import (
+    DEFAULT_CACHE_PATH,
+    MetadataCache,
+    group_events,
+    iter_photo_files,
+    scan_paths,
+    to_features,
+)
+
+
+def progress_reporter(label: str):
+    reported = [0]
+
+    def on_progress(done: int, total: int):
+        if done - reported[0] >= max(1, total // 10) or done == total:
+            reported[0] = done
+            log(f"  {label}: {done}/{total}", Colors.GRAY)
+
+    return on_progress
+
+
+def scan(args):
+    files = iter_photo_files(args.paths, recursive=not args.no_recursive)
+    cache = None if args.no_cache else MetadataCache(args.cache)
+    log_section(f"🔎 Metadata Scan ({len(files)} files)")
+    records, stats = scan_paths(files, cache=cache, workers=args.workers, on_progress=progress_reporter("files"))
+
+    log(f"✅ {stats['files']} files in {stats['elapsed']:.2f}s "
+        f"({stats['cached']} cached, {stats['scanned']} scanned)", Colors.GREEN)
+    formats = Counter(r.get("format", "error") for r in records)
+    log(f"Formats: {', '.join(f'{k} {v}' for k, v in formats.most_common())}", Colors.GRAY)
+    log(f"Capture time: {sum('takenAt' in r for r in records)}, GPS: {sum('gps' in r for r in records)}, "
+        f"ICC: {sum('icc' in r for r in records)}, rotated: {sum(r.get('orientation', 1) != 1 for r in records)}",
+        Colors.GRAY)
+    for record in records:
+        if "error" in record:
+            log(f"⚠️  {record['file']}: {record['error']}", Colors.YELLOW)
+
+    groups = group_events(records, args.gap_hours, args.radius_km)
+    if args.group:
+        log_section(f"📅 {len(groups)} Events")
+        for number, group in enumerate(groups, 1):
+            located = [r["gps"] for r in group if r.get("gps")]
+            place = f" near {located[0]['lat']:.3f}, {located[0]['lon']:.3f}" if located else ""
+            first = group[0].get("takenAt") or datetime.fromtimestamp(group[0]["mtime"]).isoformat() + " (mtime)"
+            log(f"{number:>4}. {first}  {len(group)} photos{place}", Colors.GRAY)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"records": records, "events": [[r["path"] for r in g] for g in groups]}, f, indent=2)
+        log(f"\n📝 Metadata saved to: {args.output}", Colors.BLUE)
+    if args.features:
+        with open(args.features, "w", encoding="utf-8") as f:
+            json.dump(to_features(groups), f, indent=2)
+        log(f"📝 Spread planner features saved to: {args.features}", Colors.BLUE)
+
+
+def decode_baseline(files, sample: int) -> float:
+    """Seconds per photo to fully decode and read EXIF with Pillow"""
+    chosen = files[:sample]
+    start = time.perf_counter()
+    for path in chosen:
+        with Image.open(path) as image:
+            image.load()
+            image.getexif()
+    return (time.perf_counter() - start) / max(1, len(chosen))
+
+
+def measure(label: str, files, args, results: dict):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = MetadataCache(Path(tmp) / "metadata.json")
+        records, cold = scan_paths(files, cache=cache, workers=args.workers)
+        _, warm = scan_paths(files, cache=MetadataCache(cache.path), workers=args.workers)
+    start = time.perf_counter()
+    groups = group_events(records)
+    group_seconds = time.perf_counter() - start
+    per_decode = decode_baseline(files, args.decode_sample)
+
+    log(f"\n{label}: {len(files)} files", Colors.CYAN)
+    log(f"  Cold header scan:  {cold['elapsed']:7.2f}s  ({len(files) / cold['elapsed']:8.0f} files/s)", Colors.GREEN)
+    log(f"  Cached re-scan:    {warm['elapsed']:7.2f}s  ({len(files) / warm['elapsed']:8.0f} files/s)", Colors.GREEN)
+    log(f"  Sort + group:      {group_seconds:7.2f}s  ({len(groups)} events)", Colors.GREEN)
+    log(f"  Pillow full decode: {per_decode * 1000:.2f} ms/photo -> {per_decode * len(files):.1f}s estimated",
+        Colors.GRAY)
+    log(f"  Capture time {sum('takenAt' in r for r in records)}, GPS {sum('gps' in r for r in records)}, "
+        f"errors {cold['errors']}", Colors.GRAY)
+    results[label] = {"files": len(files), "cold_s": round(cold["elapsed"], 3), "cached_s": round(warm["elapsed"], 3),
+                      "group_s": round(group_seconds, 3), "events": len(groups),
+                      "decode_ms_per_photo": round(per_decode * 1000, 3)}
+    return records
+
+
+def check_corpus(corpus: str, records) -> int:
+    """Compare scanned records against a generate-corpus manifest; returns mismatches"""
+    expected = {e["file"]: e for e in load_manifest(corpus)["images"]}
+    mismatches = 0
+    for record in records:
+        entry = expected.get(record["file"])
+        if not entry:
+            continue
+        taken = datetime.strptime(entry["captured_at"], "%Y:%m:%d %H:%M:%S").isoformat()
+        ok = (record.get("takenAt") == taken and record.get("orientation") == entry["orientation"]
+              and (record.get("orientedWidth"), record.get("orientedHeight")) == (entry["width"], entry["height"]))
+        if entry["gps"]:
+            ok = ok and record.get("gps") is not None and all(
+                abs(record["gps"][k] - v) < 1e-3 for k, v in zip(("lat", "lon"), entry["gps"]))
+        else:
+            ok = ok and "gps" not in record
+        mismatches += not ok
+    return mismatches
+
+
+def benchmark(args):
+    log_section("🔎 Header Metadata Benchmark")
+    results = {}
+    if args.images:
+        measure(args.images, iter_photo_files([args.images]), args, results)
+    if args.corpus:
+        records = measure(f"corpus {args.corpus}", iter_photo_files([args.corpus]), args, results)
+        mismatches = check_corpus(args.corpus, records)
+        log(f"  Ground truth: {len(records) - mismatches}/{len(records)} match the manifest",
+            Colors.GREEN if mismatches == 0 else Colors.RED)
+    if args.synthetic:
+        directory = Path(tempfile.mkdtemp(prefix="photobook-metadata-"))
+        try:
+            start = time.perf_counter()
+            synthetic_library(directory, args.synthetic, args.seed)
+            log(f"\nBuilt {args.synthetic} synthetic JPEGs in {time.perf_counter() - start:.1f}s", Colors.GRAY)
+            measure(f"synthetic {args.synthetic}", iter_photo_files([directory]), args, results)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Header-only photo metadata scanner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = sub.add_parser("scan", help="Scan files or directories")
+    scan_parser.add_argument("paths", nargs="+")
+    scan_parser.add_argument("--no-recursive", action="store_true", help="Only the top level of each directory")
+    scan_parser.add_argument("--workers", type=int, help="Scan processes (default: CPU count)")
+    scan_parser.add_argument("--cache", default=str(DEFAULT_CACHE_PATH), help=f"Cache file (default: {DEFAULT_CACHE_PATH})")
+    scan_parser.add_argument("--no-cache", action="store_true")
+    scan_parser.add_argument("--group", action="store_true", help="Print chronological events")
+    scan_parser.add_argument("--gap-hours", type=float, default=3.0, help="New event after this gap (default: 3)")
+    scan_parser.add_argument("--radius-km", type=float, default=25.0, help="New event beyond this distance (default: 25)")
+    scan_parser.add_argument("--output", help="Save records and events as JSON")
+    scan_parser.add_argument("--features", help="Save plan-spreads.py features (album order, event clusters)")
+
+    bench_parser = sub.add_parser("benchmark", help="Throughput: cold scan, cached re-scan, full decode")
+    bench_parser.add_argument("--images", help="Directory of real photos")
+    bench_parser.add_argument("--corpus", help="generate-corpus.py output; results are checked against its manifest")
+    bench_parser.add_argument("--synthetic", type=int, default=0, help="Synthetic JPEGs to build and scan")
+    bench_parser.add_argument("--workers", type=int, help="Scan processes (default: CPU count)")
+    bench_parser.add_argument("--decode-sample", type=int, default=100, help="Photos for the decode baseline (default: 100)")
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    if args.command == "benchmark" and not (args.images or args.corpus or args.synthetic):
+        parser.error("benchmark needs --images, --corpus or --synthetic")
+    {"scan": scan, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Score photos for sharpness, noise, clipping, exposure and print resolution
+
+Flags unusable photos in bulk (QualityWarningBadge fields) before any vision
+call or layout work is spent on them.
+
+Usage:
+    python scripts/score-quality.py score bucketlistly_images --page-size A4 --per-page 3
+    python scripts/score-quality.py score ~/Photos --flagged-only --output quality.json
+    python scripts/score-quality.py benchmark --images bucketlistly_images
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+from photobook.console import Colors, log, log_section
+from photobook.metadata import iter_photo_files
+from photobook.quality import ANALYSIS_EDGE, LUMA, PAGE_SIZES, PHOTOS_PER_PAGE, PRINT_DPI, analyze_paths, measure
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+
+# Degraded copies for the benchmark: name -> (transform, issues that should be flagged)
+DEGRADATIONS = ["original", "blur", "noise", "dark", "bright", "small"]
+EXPECTED = {
+    "original": set(),
+    "blur": {"blurry"},
+    "noise": {"noisy"},
+    "dark": {"underexposed", "crushed_shadows"},
+    "bright": {"overexposed", "clipped_highlights"},
+    "small": {"low_resolution"},
+}
+
+
+def progress_reporter(label: str):
+    reported = [0]
+
+    def on_progress(done: int, total: int):
+        if done - reported[0] >= max(1, total // 10) or done == total:
+            reported[0] = done
+            log(f"  {label}: {done}/{total}", Colors.GRAY)
+
+    return on_progress
+
+
+def score(args):
+    files = iter_photo_files(args.paths)
+    log_section(f"🔬 Photo Quality ({len(files)} photos, {args.page_size}, {args.per_page} per page)")
+    records, stats = analyze_paths(files, args.page_size, args.per_page, args.print_dpi, workers=args.workers,
+                                   on_progress=progress_reporter("photos"))
+
+    for record in records:
+        name = Path(record["path"]).name
+        if "error" in record:
+            log(f"❌ {name}: {record['error']}", Colors.RED)
+        elif record["qualityWarning"] or not args.flagged_only:
+            color = Colors.YELLOW if record["qualityWarning"] else Colors.GRAY
+            log(f"{record['qualityScore']:>4}  {name:<40} {record['effectiveDpi']:>6.0f} dpi  "
+                f"{', '.join(record['issues']) or 'ok'}", color)
+
+    issues = Counter(issue for r in records for issue in r.get("issues", []))
+    log(f"\n✅ {stats['photos']} photos in {stats['elapsed']:.2f}s "
+        f"({stats['elapsed'] * 1000 / max(1, stats['photos']):.1f} ms/photo): {stats['flagged']} flagged", Colors.GREEN)
+    if issues:
+        log(f"Issues: {', '.join(f'{k} {v}' for k, v in issues.most_common())}", Colors.GRAY)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2)
+        log(f"\n📝 Quality records saved to: {args.output}", Colors.BLUE)
+
+
+def degrade(image: Image.Image, kind: str, rng: np.random.Generator) -> Image.Image:
+    """One degraded copy; blur and noise are sized relative to ANALYSIS_EDGE so they survive the downscale"""
+    scale = max(image.size) / ANALYSIS_EDGE
+    if kind == "blur":
+        return image.filter(ImageFilter.GaussianBlur(1.5 * scale))
+    if kind == "noise":
+        pixels = np.asarray(image, dtype=np.float32)
+        return Image.fromarray(np.clip(pixels + rng.normal(0, 6 * scale, pixels.shape), 0, 255).astype(np.uint8))
+    if kind == "dark":
+        return ImageEnhance.Brightness(image).enhance(0.2)
+    if kind == "bright":
+        return ImageEnhance.Brightness(image).enhance(3.0)
+    if kind == "small":
+        return image.resize((image.width // 6, image.height // 6), Image.LANCZOS)
+    return image
+
+
+def full_decode_metrics(path: Path) -> None:
+    """Baseline: decode at full size and measure there (no draft, no downscale)"""
+    with Image.open(path) as image:
+        luma = np.asarray(ImageOps.exif_transpose(image).convert("RGB"), dtype=np.float32) @ LUMA
+    measure(luma)
+
+
+def python_laplacian_variance(luma: list) -> float:
+    """The same Laplacian variance as per-pixel Python loops, for the vectorization comparison"""
+    values = []
+    for y in range(1, len(luma) - 1):
+        above, row, below = luma[y - 1], luma[y], luma[y + 1]
+        for x in range(1, len(row) - 1):
+            values.append(above[x] + below[x] + row[x - 1] + row[x + 1] - 4 * row[x])
+    mean = sum(values) / len(values)
+    return sum((v - mean) ** 2 for v in values) / len(values)
+
+
+def benchmark(args):
+    sources = iter_photo_files([args.images])[:args.limit]
+    if not sources:
+        log(f"❌ No images found in {args.images}", Colors.RED)
+        sys.exit(1)
+    workers = args.workers or os.cpu_count() or 1
+    log_section(f"🔬 Quality Scorer Benchmark ({len(sources)} photos x {len(DEGRADATIONS)} variants)")
+    rng = np.random.default_rng(args.seed)
+    root = Path(tempfile.mkdtemp(prefix="photobook-quality-"))
+    try:
+        labels = {}
+        for path in sources:
+            with Image.open(path) as image:
+                image = ImageOps.exif_transpose(image).convert("RGB")
+                # Phone-sized sources, so low_resolution only fires for the "small" copies
+                if max(image.size) < args.source_edge:
+                    factor = args.source_edge / max(image.size)
+                    image = image.resize((round(image.width * factor), round(image.height * factor)), Image.BICUBIC)
+            for kind in DEGRADATIONS:
+                target = root / f"{path.stem}-{kind}.jpg"
+                degrade(image, kind, rng).save(target, format="JPEG", quality=90)
+                labels[str(target.resolve())] = kind
+        files = sorted(labels)
+        log(f"Prepared {len(files)} JPEGs at {args.source_edge} px long edge", Colors.GRAY)
+
+        records, stats = analyze_paths(files, workers=workers, on_progress=progress_reporter("photos"))
+        per_photo = stats["elapsed"] / max(1, len(files))
+
+        sample = files[:args.decode_sample]
+        start = time.perf_counter()
+        for path in sample:
+            full_decode_metrics(Path(path))
+        full_per_photo = (time.perf_counter() - start) / max(1, len(sample))
+
+        with Image.open(files[0]) as image:
+            image.draft("L", (ANALYSIS_EDGE, ANALYSIS_EDGE))
+            image = image.convert("L")
+            image.thumbnail((ANALYSIS_EDGE, ANALYSIS_EDGE))
+            luma = np.asarray(image, dtype=np.float32)
+        start = time.perf_counter()
+        python_laplacian_variance(luma.tolist())
+        python_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(10):
+            measure(luma)
+        numpy_seconds = (time.perf_counter() - start) / 10
+
+        log_section("Detection")
+        detection = {}
+        for kind in DEGRADATIONS:
+            group = [r for r in records if labels[r["path"]] == kind]
+            if kind == "original":
+                hits = sum(not r["qualityWarning"] for r in group)
+                log(f"  {kind:<9} {hits:>4}/{len(group)} not flagged", Colors.GREEN)
+            else:
+                hits = sum(bool(EXPECTED[kind] & set(r["issues"])) for r in group)
+                log(f"  {kind:<9} {hits:>4}/{len(group)} flagged as {' or '.join(sorted(EXPECTED[kind]))}",
+                    Colors.GREEN if hits == len(group) else Colors.YELLOW)
+            detection[kind] = {"photos": len(group), "correct": hits}
+
+        log_section("Throughput")
+        log(f"Draft decode + NumPy metrics: {per_photo * 1000:7.1f} ms/photo ({stats['elapsed']:.1f}s, "
+            f"{workers} workers)", Colors.GREEN)
+        log(f"Full decode + NumPy metrics:  {full_per_photo * 1000:7.1f} ms/photo (from {len(sample)})", Colors.YELLOW)
+        log(f"All metrics in NumPy ({luma.shape[1]}x{luma.shape[0]}): {numpy_seconds * 1000:7.1f} ms; "
+            f"Laplacian variance alone as Python loops: {python_seconds * 1000:.0f} ms", Colors.GRAY)
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"photos": len(files), "source_edge": args.source_edge, "workers": workers,
+                           "detection": detection, "draft_ms_per_photo": round(per_photo * 1000, 2),
+                           "full_decode_ms_per_photo": round(full_per_photo * 1000, 2),
+                           "numpy_metrics_ms": round(numpy_seconds * 1000, 2),
+                           "python_laplacian_ms": round(python_seconds * 1000, 1)}, f, indent=2)
+            log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized photo quality scorer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    score_parser = sub.add_parser("score", help="Score files or directories")
+    score_parser.add_argument("paths", nargs="+")
+    score_parser.add_argument("--page-size", choices=sorted(PAGE_SIZES), default="A4", help="Target page (default: A4)")
+    score_parser.add_argument("--per-page", type=int, default=PHOTOS_PER_PAGE,
+                              help=f"Photos per page the slot size assumes (default: {PHOTOS_PER_PAGE})")
+    score_parser.add_argument("--print-dpi", type=int, default=PRINT_DPI, help=f"Target DPI (default: {PRINT_DPI})")
+    score_parser.add_argument("--workers", type=int, help="Analysis processes (default: CPU count)")
+    score_parser.add_argument("--flagged-only", action="store_true", help="Only list photos with issues")
+    score_parser.add_argument("--output", help="Save quality records as JSON")
+
+    bench_parser = sub.add_parser("benchmark", help="Detection on degraded copies, and throughput")
+    bench_parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Source photos")
+    bench_parser.add_argument("--limit", type=int, help="Source photos to use")
+    bench_parser.add_argument("--source-edge", type=int, default=3000, help="Upscale sources to this long edge")
+    bench_parser.add_argument("--workers", type=int, help="Analysis processes (default: CPU count)")
+    bench_parser.add_argument("--decode-sample", type=int, default=20, help="Photos for the full-decode baseline")
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    {"score": score, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Shadow-traffic comparison of vision deployments for image analysis
+
+Replays a photo corpus to a primary deployment and one or more candidates
+at the same time (photobook/shadow.py): only the primary's answers are
+used, the candidates' answers are compared with them. Live jobs are
+shadowed the same way with `job-service.py serve --shadow ...`. Every
+shadowed batch is a line in a JSONL shadow log; the report rolls logs up
+into latency, tokens, cost and agreement of the ImageSummary fields
+(description, lighting, mood) per deployment, plus the photos where a
+candidate disagreed most. Agreement is lexical overlap of content words,
+not semantic similarity: paraphrases score low.
+
+Put the primary among the candidates to measure its own run-to-run
+overlap, the noise floor the other candidates must be read against; they
+are then also shown relative to it.
+
+The benchmark replays real photos against a simulated endpoint (latency,
+wording and token use differ per deployment) with shadowing off and on,
+to show what shadowing costs the primary path.
+
+Usage:
+    python scripts/shadow-compare.py replay --primary Claude-Sonnet-4 --candidates "GPT 4.1" Gemini-2.5-pro --no-verify-ssl
+    python scripts/shadow-compare.py replay --candidates Claude-Sonnet-4 Gemini-2.0-flash --pack-size 4 --limit 40
+    python scripts/shadow-compare.py report shadow-log.jsonl --examples 5 --output comparison.json
+    python scripts/shadow-compare.py benchmark --photos 400 --batch-size 8
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from photobook import tracing
+from photobook.accounting import DEFAULT_PRICES_PATH, PriceTable
+from photobook.console import Colors, log, log_section, positive_int
+from photobook.imaging import list_images
+from photobook.packing import SINGLE_PROMPT, analyze_packed, prepare_images
+from photobook.shadow import AGREE_THRESHOLD, ShadowRunner, aggregate, disagreements, load_records
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+DEFAULT_LOG = str(Path(__file__).parent / "shadow-log.jsonl")
+
+# Simulated deployments: median call, share of words taken from the scene, token use relative to the first
+PROFILES = {
+    "Claude-Sonnet-4": {"call_ms": 70, "fidelity": 0.85, "tokens": 1.0},
+    "GPT 4.1": {"call_ms": 50, "fidelity": 0.75, "tokens": 0.9},
+    "Gemini-2.0-flash": {"call_ms": 25, "fidelity": 0.55, "tokens": 0.8},
+}
+
+# What the simulated models "see": one scene per photo, picked from its bytes
+SCENES = [
+    ("A hiker standing on a rocky mountain ridge above the clouds", "Bright natural daylight from a clear sky",
+     "Adventurous and free"),
+    ("A crowded street market with colourful fruit stalls and vendors", "Soft overcast outdoor light",
+     "Lively and busy"),
+    ("Fishing boats pulled up on a quiet beach at sunset", "Warm golden hour sunlight", "Calm and peaceful"),
+    ("Monks walking through an old temple courtyard", "Diffuse natural light in open shade",
+     "Serene and contemplative"),
+    ("A city skyline reflected in a river at night", "Artificial street lights with long exposure",
+     "Moody and atmospheric"),
+    ("A plate of street food on a wooden table", "Indoor window light from the side", "Warm and inviting"),
+]
+FILLER = ["scenic", "vivid", "striking", "gentle", "wide", "travel", "classic", "bold", "open", "rich"]
+
+
+class SimulatedEndpoint:
+    """
+    requests.Session stand-in answering analysis requests per PROFILES
+
+    Each answer keeps a scene word with the deployment's fidelity and puts
+    a filler word in its place otherwise, so two answers agree about as
+    much as their fidelities allow, and a deployment disagrees a little
+    with itself from call to call.
+    """
+
+    def __init__(self, rng: random.Random, sigma: float = 0.3, time_scale: float = 1.0):
+        self.rng = rng
+        self.sigma = sigma
+        self.time_scale = time_scale
+
+    def answer(self, text: str, fidelity: float) -> str:
+        return " ".join(word if self.rng.random() < fidelity else self.rng.choice(FILLER) for word in text.split())
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        request = kwargs["json"] if "json" in kwargs else json.loads(kwargs["data"])
+        profile = PROFILES.get(request["model"], PROFILES["Claude-Sonnet-4"])
+        parts = request["messages"][-1]["content"]
+        photos = [part["image_url"]["url"] for part in parts if part.get("type") == "image_url"]
+        scenes = [SCENES[zlib.crc32(photo[-256:].encode()) % len(SCENES)] for photo in photos]
+        answers = [[self.answer(field, profile["fidelity"]) for field in scene] for scene in scenes]
+        if parts[0].get("text") == SINGLE_PROMPT:
+            content = "\n".join(answers[0])
+        else:
+            content = json.dumps({"images": [
+                {"index": n, "description": d, "lighting": l, "mood": m} for n, (d, l, m) in enumerate(answers, 1)
+            ]})
+        median = profile["call_ms"] * (1 + 0.25 * (len(photos) - 1)) / 1000
+        time.sleep(self.rng.lognormvariate(math.log(median), self.sigma) * self.time_scale)
+        prompt_tokens = int((150 + 800 * len(photos)) * profile["tokens"])
+        completion_tokens = int(40 * len(photos) * profile["tokens"])
+        body = {"choices": [{"message": {"content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}}
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(body).encode("utf-8")
+        return response
+
+
+def chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[start : start + size] for start in range(0, len(items), max(1, size))]
+
+
+def fmt(value: Optional[float], pattern: str = "{:.2f}") -> str:
+    return "-" if value is None else pattern.format(value)
+
+
+def print_comparison(rows: List[Dict[str, Any]], records: List[Dict[str, Any]], examples: int, threshold: float):
+    log(f"  {'Deployment':<28} {'Photos':>7} {'Failed':>7} {'ms/photo':>9} {'Call p50':>9} {'Call p95':>9} "
+        f"{'Tok/photo':>10} {'$/1k photos':>12}", Colors.GRAY)
+    for row in rows:
+        name = row["deployment"] + (" (primary)" if row["role"] == "primary" else "")
+        failed = row["failed_images"] + row["errors"]
+        per_1k = None if row["cost_per_image"] is None else row["cost_per_image"] * 1000
+        log(f"  {name:<28} {row['images']:>7} {failed:>7} {fmt(row['ms_per_image'], '{:.0f}'):>9} "
+            f"{fmt(row['call_p50_ms'], '{:.0f}ms'):>9} {fmt(row['call_p95_ms'], '{:.0f}ms'):>9} "
+            f"{fmt(row['tokens_per_image'], '{:.0f}'):>10} "
+            f"{fmt(per_1k, '{:.2f}'):>12}",
+            Colors.CYAN if row["role"] == "primary" else Colors.RESET)
+
+    candidates = [row for row in rows if row["role"] == "candidate"]
+    if not candidates:
+        return
+    floors = {row["versus"]: row["agreement"]["overall"] for row in candidates if row["deployment"] == row["versus"]}
+    log(f"\n  Lexical overlap with the primary's summaries, Jaccard of content words "
+        f"(≥{threshold:g} counts as agreeing):", Colors.GRAY)
+    if not floors:
+        log("  ⚠️  No noise floor: add the primary to --candidates; paraphrases score low, so these "
+            "numbers only mean something relative to the primary's overlap with itself", Colors.YELLOW)
+    log(f"  {'Candidate':<20} {'vs':<18} {'Photos':>7} {'Description':>12} {'Lighting':>9} {'Mood':>6} "
+        f"{'Overall':>8} {'Agree':>6} {'vs self':>8}", Colors.GRAY)
+    for row in candidates:
+        agreement, floor = row["agreement"], floors.get(row["versus"])
+        relative = agreement["overall"] / floor if floor and agreement["overall"] is not None else None
+        log(f"  {row['deployment']:<20} {row['versus']:<18} {row['compared']:>7} "
+            f"{fmt(agreement['description']):>12} {fmt(agreement['lighting']):>9} {fmt(agreement['mood']):>6} "
+            f"{fmt(agreement['overall']):>8} {fmt(row['agree_share'], '{:.0%}'):>6} "
+            f"{fmt(relative, '{:.0%}'):>8}")
+
+    primaries = {row["deployment"]: row for row in rows if row["role"] == "primary"}
+    log("")
+    for row in candidates:
+        primary = primaries[row["versus"]]
+        if row["deployment"] == row["versus"] or not row["compared"]:
+            continue
+        speed = primary["ms_per_image"] / row["ms_per_image"]
+        parts = [f"{speed:.2f}x the primary's speed"]
+        if row["cost_per_image"] is not None and primary["cost_per_image"]:
+            parts.append(f"{row['cost_per_image'] / primary['cost_per_image']:.0%} of its cost")
+        floor = floors.get(row["versus"])
+        if floor and row["agreement"]["overall"] is not None:
+            parts.append(f"word overlap {row['agreement']['overall'] / floor:.0%} of {row['versus']}'s self-overlap")
+        log(f"  {row['deployment']} vs {row['versus']}: " + ", ".join(parts), Colors.GREEN)
+
+    for row in candidates:
+        lowest = disagreements(records, row["deployment"], row["versus"], examples) if row["deployment"] != row["versus"] else []
+        if lowest:
+            log(f"\n  Lowest word overlap, {row['deployment']} vs {row['versus']} (often rewording, check "
+                f"the text):", Colors.GRAY)
+        for item in lowest:
+            log(f"    {item['image_id']} ({item['overall']:.2f})", Colors.YELLOW)
+            log(f"      {row['versus']}: {item['primary']['description']}", Colors.GRAY)
+            log(f"      {row['deployment']}: {item['candidate']['description']}", Colors.GRAY)
+
+
+def save(path: Optional[str], report: Dict[str, Any]):
+    if not path:
+        return
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    log(f"\n📝 Results saved to: {path}", Colors.BLUE)
+
+
+def replay(args):
+    from photobook.midas import API_KEY
+
+    if args.no_verify_ssl:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    paths = list_images(args.images, args.limit)
+    if not paths:
+        log(f"❌ No images found in {args.images}", Colors.RED)
+        sys.exit(1)
+    tracing.configure(args.trace, service="shadow-compare")
+    log_section(f"🪞 Shadow Replay: {args.primary} vs {', '.join(args.candidates)}")
+    log(f"{len(paths)} photos, {args.batch_size} per batch, K={args.pack_size}; log: {args.log}", Colors.GRAY)
+
+    images = prepare_images(paths, max_edge=args.max_edge)
+    records: List[Dict[str, Any]] = []
+    runner = ShadowRunner(args.candidates, log_path=args.log, max_pending=args.max_pending, block=True,
+                          on_record=records.append)
+    try:
+        for number, batch in enumerate(chunks(images, args.batch_size), start=1):
+            start = time.perf_counter()
+            run = runner.analyze(
+                batch, args.primary, label=f"replay {number}", pack_size=args.pack_size, detail=args.detail,
+                api_key=args.api_key or API_KEY, verify_ssl=not args.no_verify_ssl, timeout=args.timeout,
+            )
+            failed = sum(1 for call in run["calls"] if not call["success"])
+            log(f"  Batch {number}: {len(batch)} photos from {args.primary} in {time.perf_counter() - start:.1f}s"
+                + (f" ({failed} failed calls)" if failed else ""), Colors.RED if failed else Colors.GRAY)
+        log("\nWaiting for candidates to finish...", Colors.GRAY)
+    finally:
+        runner.close()
+
+    prices = PriceTable.load(args.prices)
+    rows = aggregate(records, prices, args.threshold)
+    log_section("📊 Comparison")
+    print_comparison(rows, records, args.examples, args.threshold)
+    save(args.output, {"config": vars(args), "rows": rows, "stats": runner.stats})
+
+
+def report(args):
+    records = load_records(args.files)
+    if not records:
+        log("❌ No shadow records in " + ", ".join(args.files), Colors.RED)
+        sys.exit(1)
+    rows = aggregate(records, PriceTable.load(args.prices), args.threshold)
+    log_section(f"📊 Shadow Comparison ({len(records)} batches, {records[0]['timestamp'][:16]} to "
+                f"{records[-1]['timestamp'][:16]})")
+    print_comparison(rows, records, args.examples, args.threshold)
+    save(args.output, {"files": args.files, "rows": rows})
+
+
+def benchmark(args):
+    available = list_images(args.images)
+    if not available:
+        log(f"❌ No images found in {args.images}", Colors.RED)
+        sys.exit(1)
+    candidates = args.candidates or list(PROFILES)
+    log_section(f"🪞 Shadow Benchmark ({args.photos} photos, {args.batch_size} per batch, K={args.pack_size}, "
+                f"simulated endpoint)")
+    prepared = prepare_images(available, max_edge=args.max_edge)
+    images = [{**prepared[n % len(prepared)], "image_id": f"{prepared[n % len(prepared)]['image_id']}-{n}"}
+              for n in range(args.photos)]
+    batches = chunks(images, args.batch_size)
+    endpoint = SimulatedEndpoint(random.Random(args.seed), time_scale=args.time_scale)
+
+    def run(analyze) -> List[float]:
+        times = []
+        for number, batch in enumerate(batches, start=1):
+            start = time.perf_counter()
+            analyze(batch, args.primary, pack_size=args.pack_size, session=endpoint, label=f"batch {number}")
+            times.append((time.perf_counter() - start) * 1000)
+        return times
+
+    off = run(lambda batch, deployment, label, **kwargs: analyze_packed(batch, deployment, **kwargs))
+    records: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        runner = ShadowRunner(candidates, log_path=Path(tmp) / "shadow.jsonl", max_pending=args.max_pending,
+                              on_record=records.append)
+        start = time.perf_counter()
+        on = run(runner.analyze)
+        primary_done = time.perf_counter() - start
+        runner.close()
+        drained = time.perf_counter() - start
+        log_bytes = (Path(tmp) / "shadow.jsonl").stat().st_size if records else 0
+
+    def percentile(values: List[float], fraction: float) -> float:
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    log(f"  Primary batches, shadowing off: p50 {percentile(off, 0.5):>6.0f}ms  p95 {percentile(off, 0.95):>6.0f}ms  "
+        f"total {sum(off) / 1000:.2f}s", Colors.CYAN)
+    log(f"  Primary batches, shadowing on:  p50 {percentile(on, 0.5):>6.0f}ms  p95 {percentile(on, 0.95):>6.0f}ms  "
+        f"total {primary_done:.2f}s (candidates done at {drained:.2f}s)", Colors.CYAN)
+    stats = runner.stats
+    log(f"  Shadowed {stats['shadowed']} of {stats['batches']} batches ({stats['skipped_busy']} skipped while "
+        f"{args.max_pending} were pending), {log_bytes / 1024:.0f} KB of shadow log", Colors.GRAY)
+
+    rows = aggregate(records, PriceTable.load(args.prices), args.threshold)
+    log_section("📊 Comparison (simulated)")
+    print_comparison(rows, records, args.examples, args.threshold)
+    save(args.output, {"config": vars(args), "primary_off_ms": off, "primary_on_ms": on, "stats": stats,
+                       "rows": rows})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vision deployments on shadowed analysis traffic")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_report_options(p: argparse.ArgumentParser):
+        p.add_argument("--prices", default=DEFAULT_PRICES_PATH, help="Price table (default: model-prices.json)")
+        p.add_argument("--threshold", type=float, default=AGREE_THRESHOLD,
+                       help=f"Overall word overlap that counts as agreeing (default: {AGREE_THRESHOLD})")
+        p.add_argument("--examples", type=int, default=3, help="Lowest-overlap photos shown per candidate")
+        p.add_argument("--output", help="Save the comparison as JSON")
+
+    replay_parser = sub.add_parser("replay", help="Replay a photo corpus to a primary and candidate deployments")
+    replay_parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Directory of photos")
+    replay_parser.add_argument("--limit", type=int, help="Only the first N photos")
+    replay_parser.add_argument("--primary", default="Claude-Sonnet-4", help="Deployment whose answers are used")
+    replay_parser.add_argument("--candidates", nargs="+", required=True, help="Deployments to shadow")
+    replay_parser.add_argument("--batch-size", type=int, default=8, help="Photos per analyze call (default: 8)")
+    replay_parser.add_argument("--pack-size", type=positive_int, default=1, help="Photos per vision request (default: 1)")
+    replay_parser.add_argument("--max-edge", type=int, default=768, help="Upload size (default: 768)")
+    replay_parser.add_argument("--detail", choices=["low", "high", "auto"], help="Image detail level")
+    replay_parser.add_argument("--max-pending", type=int, default=2,
+                               help="Batches the primary may run ahead of the candidates (default: 2)")
+    replay_parser.add_argument("--timeout", type=float, default=120, help="Per-call timeout (default: 120s)")
+    replay_parser.add_argument("--log", default=DEFAULT_LOG,
+                               help="Shadow log to append to (default: scripts/shadow-log.jsonl)")
+    replay_parser.add_argument("--api-key", help="Midas API key (optional)")
+    replay_parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL verification (for corporate APIs)")
+    replay_parser.add_argument("--trace", help="Append OTLP-JSON spans to this file (see trace-report.py)")
+    add_report_options(replay_parser)
+
+    report_parser = sub.add_parser("report", help="Comparison report from shadow logs")
+    report_parser.add_argument("files", nargs="+", help="Shadow logs (replay or job-service serve --shadow)")
+    add_report_options(report_parser)
+
+    bench_parser = sub.add_parser("benchmark", help="Shadowing off vs on against a simulated endpoint")
+    bench_parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Directory of photos (cycled)")
+    bench_parser.add_argument("--photos", type=int, default=400, help="Photos replayed (default: 400)")
+    bench_parser.add_argument("--primary", default="Claude-Sonnet-4", choices=list(PROFILES))
+    bench_parser.add_argument("--candidates", nargs="+", choices=list(PROFILES),
+                              help="Shadowed deployments (default: all, the primary included)")
+    bench_parser.add_argument("--batch-size", type=int, default=8, help="Photos per analyze call (default: 8)")
+    bench_parser.add_argument("--pack-size", type=positive_int, default=4, help="Photos per vision request (default: 4)")
+    bench_parser.add_argument("--max-edge", type=int, default=768, help="Upload size (default: 768)")
+    bench_parser.add_argument("--max-pending", type=int, default=2, help="Shadowed batches in flight (default: 2)")
+    bench_parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply simulated latencies")
+    bench_parser.add_argument("--seed", type=int, default=42)
+    add_report_options(bench_parser)
+
+    args = parser.parse_args()
+    {"replay": replay, "report": report, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
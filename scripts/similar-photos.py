@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Find photos like a photo, a set of photos or a palette
+
+Builds and queries a SimilarityIndex of color, layout and summary-text
+vectors. The index is updated in place: build adds new photos, re-adds
+changed ones with --refresh, and drops missing ones with --prune.
+
+Usage:
+    python scripts/similar-photos.py build bucketlistly_images --summaries album.json
+    python scripts/similar-photos.py query bucketlistly_images/photo.jpg --k 8
+    python scripts/similar-photos.py query spread/a.jpg spread/b.jpg --blocks color
+    python scripts/similar-photos.py palette "#1d3557,#457b9d,#f1faee" --k 8
+    python scripts/similar-photos.py remove bucketlistly_images/photo.jpg
+    python scripts/similar-photos.py benchmark --photos 100000 --queries 500
+"""
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from photobook.console import Colors, log, log_section
+from photobook.metadata import iter_photo_files
+from photobook.similarity import (BLOCK_WEIGHTS, BLOCKS, DEFAULT_INDEX, DEFAULT_NPROBE, DTYPES, HIST_LEVELS,
+                                  SimilarityIndex, only_blocks, palette_vector, photo_vector, text_vector,
+                                  vectorize_paths)
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+
+
+def progress_reporter(label: str):
+    reported = [0]
+
+    def on_progress(done: int, total: int):
+        if done - reported[0] >= max(1, total // 10) or done == total:
+            reported[0] = done
+            log(f"  {label}: {done}/{total}", Colors.GRAY)
+
+    return on_progress
+
+
+def open_index(args, create: bool = False) -> SimilarityIndex:
+    path = Path(args.index)
+    if (path / "meta.json").exists():
+        return SimilarityIndex.load(path)
+    if create:
+        return SimilarityIndex(dtype=args.dtype)
+    log(f"❌ No index at {path} (run build first)", Colors.RED)
+    sys.exit(1)
+
+
+def load_summaries(path: str) -> Dict[str, Any]:
+    """Absolute path -> ImageSummary from `album-analysis.py show --output` or a list of {path, summary}"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    photos = data.get("photos", []) if isinstance(data, dict) else data
+    return {str(Path(p["path"]).resolve()): p.get("summary") or p for p in photos if p.get("path")}
+
+
+def build(args):
+    index = open_index(args, create=True)
+    keys = [str(Path(p).resolve()) for p in iter_photo_files(args.paths)]
+    pending = keys if args.refresh else [k for k in keys if k not in index]
+    log_section(f"🔎 Similar-photos index ({len(keys)} photos, {len(pending)} to add)")
+    summaries = load_summaries(args.summaries) if args.summaries else None
+    records, stats = vectorize_paths(pending, summaries, workers=args.workers, on_progress=progress_reporter("photos"))
+    for record in records:
+        if "error" in record:
+            log(f"❌ {Path(record['path']).name}: {record['error']}", Colors.RED)
+    good = [r for r in records if "vector" in r]
+    if good:
+        index.add_many([r["path"] for r in good], np.stack([r["vector"] for r in good]))
+    removed = 0
+    if args.prune:
+        present = set(keys)
+        removed = sum(index.remove(photo_id) for photo_id in index.ids() if photo_id not in present)
+    index.save(args.index)
+    info = index.stats()
+    log(f"\n✅ Added {len(good)}, removed {removed} in {stats['elapsed']:.2f}s; {info['photos']} photos in "
+        f"{info['lists']} lists ({info['dtype']}, {info['vector_bytes'] / 1024 ** 2:.1f} MB) at {args.index}",
+        Colors.GREEN)
+
+
+def print_results(results, elapsed: float, output: str = None):
+    log(f"{len(results)} results in {elapsed * 1000:.2f} ms", Colors.GRAY)
+    for photo_id, score in results:
+        log(f"  {score:6.3f}  {photo_id}", Colors.CYAN)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump([{"id": photo_id, "score": round(score, 4)} for photo_id, score in results], f, indent=2)
+        log(f"\n📝 Results saved to: {output}", Colors.BLUE)
+
+
+def query(args):
+    index = open_index(args)
+    keys = [str(Path(p).resolve()) for p in args.photos]
+    vectors = [index.vector(k) if k in index else photo_vector(k) for k in keys]
+    vector = np.mean(vectors, axis=0)
+    if args.blocks:
+        vector = only_blocks(vector, args.blocks.split(","))
+    log_section(f"🔎 Photos like {', '.join(Path(k).name for k in keys)}")
+    start = time.perf_counter()
+    results = index.search(vector, k=args.k, nprobe=args.nprobe, exclude=keys)
+    print_results(results, time.perf_counter() - start, args.output)
+
+
+def palette(args):
+    index = open_index(args)
+    colors = [c.strip() for c in args.colors.split(",") if c.strip()]
+    log_section(f"🔎 Photos matching {' '.join(colors)}")
+    start = time.perf_counter()
+    results = index.search(palette_vector(colors), k=args.k, nprobe=args.nprobe)
+    print_results(results, time.perf_counter() - start, args.output)
+
+
+def remove(args):
+    index = open_index(args)
+    removed = sum(index.remove(str(Path(p).resolve())) for p in args.photos)
+    index.save(args.index)
+    log(f"🧹 Removed {removed} photos; {len(index)} left", Colors.GREEN)
+
+
+# -- benchmark --
+
+WORDS = ["beach", "temple", "market", "mountain", "harbor", "lantern", "street", "food", "sunset", "forest", "river",
+         "family", "friends", "portrait", "hiker", "boat", "city", "rooftop", "desert", "camp", "snow", "lake",
+         "cabin", "festival", "noodle", "vendor", "children", "dog", "bridge", "train", "garden", "waterfall",
+         "cathedral", "alley", "cafe", "museum", "night", "morning", "golden", "overcast", "neon", "calm", "joyful",
+         "nostalgic", "adventurous", "romantic", "candid", "posed", "wide", "close"]
+
+
+def synthetic_vectors(count: int, seed: int, events: int) -> np.ndarray:
+    """
+    Photos in events of shared palette, layout tendency and subject words,
+    each perturbed per photo, blocked and weighted like photo_vector
+    """
+    rng = np.random.default_rng(seed)
+    words = random.Random(seed)
+    bins = HIST_LEVELS ** 3
+    event = rng.integers(0, events, count)
+    palettes = rng.dirichlet(np.full(bins, 0.08), events)
+    colors = rng.gamma(palettes[event] * 60 + 0.02)
+    colors = np.sqrt(colors / colors.sum(axis=1, keepdims=True))
+    layouts = rng.normal(size=(events, BLOCKS["layout"].stop - BLOCKS["layout"].start))
+    layout = layouts[event] + 0.7 * rng.normal(size=(count, layouts.shape[1]))
+    layout -= layout.mean(axis=1, keepdims=True)
+    subjects = [words.sample(WORDS, 4) for _ in range(events)]
+    text = np.stack([text_vector(" ".join(subjects[e][:words.randint(2, 4)] + words.sample(WORDS, 2)))
+                     for e in event.tolist()])
+    blocks = []
+    for name, part in (("color", colors), ("layout", layout), ("text", text)):
+        norms = np.linalg.norm(part, axis=1, keepdims=True)
+        blocks.append(part / np.where(norms > 0, norms, 1) * np.sqrt(BLOCK_WEIGHTS[name]))
+    vectors = np.hstack(blocks).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top(vectors: np.ndarray, alive: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    scores = queries @ vectors.T
+    scores[:, ~alive] = -np.inf
+    return [set(np.argpartition(row, -k)[-k:].tolist()) for row in scores]
+
+
+def timed_queries(index: SimilarityIndex, queries: np.ndarray, truth: List[set], k: int, nprobe: int):
+    latencies, hits = [], 0
+    for vector, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = index.search(vector, k=k, nprobe=nprobe)
+        latencies.append(time.perf_counter() - start)
+        hits += len(expected & {int(photo_id) for photo_id, _ in results})
+    latencies = np.array(latencies) * 1000
+    return {"nprobe": nprobe, "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "recall": round(hits / (k * len(queries)), 3)}
+
+
+def benchmark(args):
+    results: Dict[str, Any] = {"photos": args.photos, "queries": args.queries, "k": args.k}
+    log_section(f"🔎 Similar-photos Benchmark ({args.photos:,} photos, {args.queries} queries, top {args.k})")
+
+    images = iter_photo_files([args.images]) if Path(args.images).exists() else []
+    records, stats = vectorize_paths(images, workers=1) if images else ([], {})
+    if records:
+        results["feature_ms"] = round(stats["elapsed"] * 1000 / len(records), 2)
+        log(f"Features: {results['feature_ms']} ms per photo ({len(records)} photos from {args.images})", Colors.GRAY)
+    else:
+        log(f"⚠️  No readable photos in {args.images}; skipping feature timing", Colors.YELLOW)
+
+    events = max(1, args.photos // 25)
+    data = synthetic_vectors(args.photos + args.queries, args.seed, events)
+    data, queries = data[:args.photos], data[args.photos:]
+    ids = [str(i) for i in range(args.photos)]
+    alive = np.ones(args.photos, dtype=bool)
+
+    start = time.perf_counter()
+    truth = exact_top(data, alive, queries, args.k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    brute = []
+    for vector in queries[:50]:
+        start = time.perf_counter()
+        scores = data @ vector
+        np.argpartition(scores, -args.k)[-args.k:]
+        brute.append(time.perf_counter() - start)
+    results["float32_scan_ms"] = round(float(np.median(brute)) * 1000, 2)
+    log(f"Exact float32 scan: {results['float32_scan_ms']} ms per query "
+        f"({data.nbytes / 1024 ** 2:.0f} MB of vectors; batched ground truth {exact_ms:.2f} ms/query)", Colors.YELLOW)
+
+    root = Path(tempfile.mkdtemp(prefix="photobook-similar-"))
+    try:
+        for dtype in args.dtypes.split(","):
+            log_section(f"{dtype} IVF")
+            index = SimilarityIndex(dtype=dtype)
+            start = time.perf_counter()
+            for i in range(0, args.photos, args.batch):
+                index.add_many(ids[i:i + args.batch], data[i:i + args.batch])
+            build_s = time.perf_counter() - start
+            info = index.stats()
+            row: Dict[str, Any] = {"build_s": round(build_s, 2), "lists": info["lists"],
+                                   "vector_mb": round(info["vector_bytes"] / 1024 ** 2, 1)}
+            log(f"Built by {args.batch}-photo batches in {build_s:.2f}s (retrains included): {info['lists']} lists, "
+                f"{row['vector_mb']} MB of vectors", Colors.GRAY)
+
+            row["sweep"] = [timed_queries(index, queries, truth, args.k, nprobe)
+                            for nprobe in (int(v) for v in args.nprobe.split(","))]
+            row["sweep"].append(timed_queries(index, queries[:50], truth[:50], args.k, index.nlist))
+            for entry in row["sweep"]:
+                label = "all lists" if entry["nprobe"] == index.nlist else f"nprobe {entry['nprobe']:>3}"
+                log(f"  {label:<10} recall@{args.k} {entry['recall']:.3f}, p50 {entry['p50_ms']:.2f} ms, "
+                    f"p95 {entry['p95_ms']:.2f} ms", Colors.GREEN if entry["p95_ms"] < 5 else Colors.YELLOW)
+
+            # Incremental updates on the trained index
+            extra = synthetic_vectors(1000, args.seed + 1, max(1, events // 25))
+            start = time.perf_counter()
+            for i, vector in enumerate(extra):
+                index.add(f"new-{i}", vector)
+            insert_us = (time.perf_counter() - start) * 1e6 / len(extra)
+            doomed = random.Random(args.seed).sample(range(args.photos), 1000)
+            start = time.perf_counter()
+            for i in doomed:
+                index.remove(ids[i])
+            delete_us = (time.perf_counter() - start) * 1e6 / len(doomed)
+            alive[doomed] = False
+            leaked = sum(photo_id.isdigit() and not alive[int(photo_id)]
+                         for vector in queries[:100] for photo_id, _ in index.search(vector, k=args.k))
+            row.update({"insert_us": round(insert_us, 1), "delete_us": round(delete_us, 1)})
+            log(f"Single inserts {insert_us:.1f} µs, deletes {delete_us:.1f} µs "
+                f"({leaked} deleted photos returned afterwards)", Colors.GREEN if not leaked else Colors.RED)
+            for photo_id in [f"new-{i}" for i in range(len(extra))]:
+                index.remove(photo_id)
+
+            # Memory-mapped reload
+            target = root / dtype
+            start = time.perf_counter()
+            index.save(target)
+            save_s = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = SimilarityIndex.load(target)
+            load_ms = (time.perf_counter() - start) * 1000
+            truth_after = exact_top(data, alive, queries, args.k)
+            reloaded = timed_queries(loaded, queries, truth_after, args.k, loaded.nprobe)
+            disk_mb = sum(p.stat().st_size for p in target.iterdir()) / 1024 ** 2
+            row.update({"save_s": round(save_s, 2), "load_ms": round(load_ms, 1), "disk_mb": round(disk_mb, 1),
+                        "reloaded": reloaded})
+            log(f"Saved {disk_mb:.1f} MB in {save_s:.2f}s, mmap load {load_ms:.0f} ms; after 1,000 deletes: "
+                f"recall@{args.k} {reloaded['recall']:.3f}, p50 {reloaded['p50_ms']:.2f} ms, "
+                f"p95 {reloaded['p95_ms']:.2f} ms", Colors.GREEN)
+            alive[:] = True
+            results[dtype] = row
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-photo index")
+    parser.add_argument("--index", default=str(DEFAULT_INDEX), help=f"Index directory (default: {DEFAULT_INDEX})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Add photos (files or directories) to the index")
+    build_parser.add_argument("paths", nargs="+")
+    build_parser.add_argument("--summaries", help="album-analysis.py show --output JSON for the text block")
+    build_parser.add_argument("--dtype", choices=DTYPES, default="int8", help="Storage for a new index (default: int8)")
+    build_parser.add_argument("--refresh", action="store_true", help="Re-vectorize photos already indexed")
+    build_parser.add_argument("--prune", action="store_true", help="Remove indexed photos not among the paths")
+    build_parser.add_argument("--workers", type=int, help="Processes (default: CPU count)")
+
+    for name, help_text in (("query", "Photos like one photo or the mean of several"),
+                            ("palette", "Photos matching comma-separated hex colors")):
+        query_parser = sub.add_parser(name, help=help_text)
+        if name == "query":
+            query_parser.add_argument("photos", nargs="+")
+            query_parser.add_argument("--blocks", help=f"Compare only these blocks ({','.join(BLOCKS)})")
+        else:
+            query_parser.add_argument("colors")
+        query_parser.add_argument("--k", type=int, default=10, help="Results (default: 10)")
+        query_parser.add_argument("--nprobe", type=int, help=f"Lists to scan (default: {DEFAULT_NPROBE})")
+        query_parser.add_argument("--output", help="Save results as JSON")
+
+    remove_parser = sub.add_parser("remove", help="Remove photos from the index")
+    remove_parser.add_argument("photos", nargs="+")
+
+    bench_parser = sub.add_parser("benchmark", help="Recall and latency on synthetic vectors")
+    bench_parser.add_argument("--photos", type=int, default=100000, help="Indexed photos (default: 100000)")
+    bench_parser.add_argument("--queries", type=int, default=500, help="Queries (default: 500)")
+    bench_parser.add_argument("--k", type=int, default=10)
+    bench_parser.add_argument("--nprobe", default="4,8,16,32", help="nprobe values to sweep (default: 4,8,16,32)")
+    bench_parser.add_argument("--dtypes", default="int8,float16", help="Storage types (default: int8,float16)")
+    bench_parser.add_argument("--batch", type=int, default=1000, help="Photos per add_many (default: 1000)")
+    bench_parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Real photos to time features on")
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    {"build": build, "query": query, "palette": palette, "remove": remove, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
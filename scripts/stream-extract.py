@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Extract summaries and themes from model replies as they stream
+
+Feeds a reply (a file, stdin or a live Midas stream) to ObjectStream and
+prints each ImageSummary or Theme object the moment it closes. The
+benchmark streams simulated replies at a realistic decode rate and checks
+that fenced, chatty, bare-array and truncated replies are recovered.
+
+Usage:
+    python scripts/stream-extract.py extract reply.txt --key themes
+    cat reply.txt | python scripts/stream-extract.py extract - --key images --no-repair
+    python scripts/stream-extract.py themes --summaries summaries.json --deployment "GPT 4o" --no-verify-ssl
+    python scripts/stream-extract.py benchmark --tokens-per-second 50 --replies 500
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+from photobook.console import Colors, log, log_section, positive_int
+from photobook.packing import SUMMARY_FIELDS, analyze_packed
+from photobook.streamjson import ObjectStream
+from photobook.themes import THEME_FIELDS, generate_themes, parse_themes, valid_theme
+
+WORDS = ["golden", "light", "warm", "coastal", "film", "grain", "soft", "shadows", "muted", "teal", "street", "market",
+         "evening", "lanterns", "travel", "candid", "moments", "quiet", "mornings", "mountain", "air", "crisp", "blue",
+         "hour", "festival", "glow", "natural", "surroundings", "faded", "pastel", "tones", "high", "contrast"]
+
+
+def describe(data: Any) -> str:
+    if isinstance(data, dict):
+        return data.get("name") or data.get("description") or json.dumps(data)[:60]
+    return json.dumps(data)[:60]
+
+
+def extract(args):
+    text = sys.stdin.read() if args.file == "-" else open(args.file, "r", encoding="utf-8").read()
+    stream = ObjectStream(args.key)
+    log_section(f"🌊 Streaming {len(text):,} characters in {args.chunk}-character deltas")
+    for offset in range(0, len(text), args.chunk):
+        for obj in stream.feed(text[offset:offset + args.chunk]):
+            log(f"  @{min(offset + args.chunk, len(text)):>7,}  {describe(obj)}", Colors.GREEN)
+    for obj in stream.close(repair=not args.no_repair):
+        log(f"  repaired  {describe(obj)}", Colors.YELLOW)
+    status = "complete" if stream.complete else "truncated"
+    log(f"\n{len(stream.objects)} objects ({status}, {stream.repaired} repaired, {stream.invalid} invalid)",
+        Colors.GREEN if stream.objects else Colors.RED)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(stream.objects, f, indent=2)
+        log(f"\n📝 Objects saved to: {args.output}", Colors.BLUE)
+
+
+def themes(args):
+    with open(args.summaries, "r", encoding="utf-8") as f:
+        summaries = json.load(f)
+    summaries = summaries.get("summaries", summaries) if isinstance(summaries, dict) else summaries
+    if args.no_verify_ssl:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    from photobook.midas import API_KEY
+
+    log_section(f"🌊 Streaming {args.count} themes from {args.deployment} ({len(summaries)} summaries)")
+    start = time.perf_counter()
+
+    def on_theme(theme: Dict[str, Any]):
+        log(f"  {time.perf_counter() - start:6.2f}s  {theme.get('name')} ({theme.get('mood')})", Colors.GREEN)
+
+    result = generate_themes(summaries, args.deployment, args.count, on_theme=on_theme,
+                             api_key=args.api_key or API_KEY, verify_ssl=not args.no_verify_ssl)
+    if not result["success"]:
+        log(f"❌ {result.get('error')}", Colors.RED)
+        sys.exit(1)
+    first = result.get("first_delta_time")
+    log(f"\nFirst token {first / 1000:.2f}s, reply complete {time.perf_counter() - start:.2f}s" if first else
+        f"\nReply complete {time.perf_counter() - start:.2f}s", Colors.GRAY)
+
+
+# -- benchmark --
+
+def phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def theme_reply(rng: random.Random, count: int) -> List[Dict[str, str]]:
+    return [{field: phrase(rng, 2 if field in ("theme_id", "name") else rng.randint(8, 16)) for field in THEME_FIELDS}
+            for _ in range(count)]
+
+
+def wrap(rng: random.Random, payload: Any, style: str) -> str:
+    body = json.dumps(payload, indent=2)
+    if style == "fenced":
+        return f"```json\n{body}\n```"
+    if style == "prose":
+        return f"Here are the themes I found [based on the photos]:\n\n{body}\n\nLet me know if you want changes!"
+    return body
+
+
+class StreamingDeployment:
+    """post_completion stand-in that decodes a fixed reply at `tokens_per_second`, ~4 characters per token"""
+
+    def __init__(self, reply: str, tokens_per_second: float, first_token: float, time_scale: float):
+        self.reply = reply
+        self.delay = time_scale / tokens_per_second
+        self.first_token = first_token * time_scale
+
+    def __call__(self, request: Dict[str, Any], on_delta=None, **kwargs) -> Dict[str, Any]:
+        start = time.perf_counter()
+        time.sleep(self.first_token)
+        for offset in range(0, len(self.reply), 4):
+            time.sleep(self.delay)
+            if on_delta:
+                on_delta(self.reply[offset:offset + 4])
+        return {"success": True, "response": self.reply, "response_time": (time.perf_counter() - start) * 1000,
+                "usage": {"completion_tokens": len(self.reply) // 4}}
+
+
+def arrival(args, reply: str, run) -> Dict[str, Any]:
+    """Seconds (unscaled) at which each object reached the callback, and the full reply time"""
+    model = StreamingDeployment(reply, args.tokens_per_second, args.first_token, args.time_scale)
+    arrivals: List[float] = []
+    start = time.perf_counter()
+    run(model, lambda *_: arrivals.append((time.perf_counter() - start) / args.time_scale))
+    total = (time.perf_counter() - start) / args.time_scale
+    return {"objects": len(arrivals), "first_s": round(arrivals[0], 2) if arrivals else None,
+            "arrivals_s": [round(a, 2) for a in arrivals], "reply_s": round(total, 2)}
+
+
+def benchmark(args):
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {}
+    log_section(f"🌊 Streaming Extraction Benchmark ({args.tokens_per_second:g} tokens/s, "
+                f"{args.first_token:g}s to first token)")
+
+    reply = wrap(rng, {"themes": theme_reply(rng, args.themes)}, "fenced")
+    themes_run = arrival(args, reply, lambda model, on_theme: generate_themes(
+        [], count=args.themes, post=model, on_theme=on_theme))
+    results["themes"] = themes_run
+    log(f"Themes ({args.themes}, {len(reply) // 4} tokens): first at {themes_run['first_s']}s, all by "
+        f"{themes_run['arrivals_s'][-1]}s; the whole reply (when parsing could start today) at "
+        f"{themes_run['reply_s']}s", Colors.GREEN)
+
+    entries = [{"index": n, **{field: phrase(rng, rng.randint(8, 14)) for field in SUMMARY_FIELDS}}
+               for n in range(1, args.pack_size + 1)]
+    reply = wrap(rng, {"images": entries}, "plain")
+    images = [{"image_id": f"photo-{n}", "image_base64": ""} for n in range(args.pack_size)]
+    packed_run = arrival(args, reply, lambda model, on_summary: analyze_packed(
+        images, "Claude-Sonnet-4", pack_size=args.pack_size, post=model, on_summary=on_summary))
+    results["packed"] = packed_run
+    log(f"Packed summaries ({args.pack_size} photos, {len(reply) // 4} tokens): first at {packed_run['first_s']}s, "
+        f"whole reply at {packed_run['reply_s']}s", Colors.GREEN)
+
+    log_section(f"Recovery over {args.replies} replies")
+    styles = ["plain", "fenced", "prose", "bare array", "truncated"]
+    recovery = {style: {"replies": 0, "themes": 0, "parse_themes": 0, "streamed": 0, "exact": 0} for style in styles}
+    for number in range(args.replies):
+        style = styles[number % len(styles)]
+        expected = theme_reply(rng, args.themes)
+        payload = expected if style == "bare array" else {"themes": expected}
+        text = wrap(rng, payload, "prose" if style == "prose" else "fenced" if style == "fenced" else "plain")
+        if style == "truncated":
+            text = text[:rng.randint(len(text) // 4, len(text) - 5)]
+        try:
+            baseline = len(parse_themes(text))
+        except ValueError:
+            baseline = 0
+        stream = ObjectStream("themes", valid_theme)
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, 12)
+            stream.feed(text[position:position + size])
+            position += size
+        stream.close()
+        row = recovery[style]
+        row["replies"] += 1
+        row["themes"] += len(expected)
+        row["parse_themes"] += baseline
+        row["streamed"] += len(stream.objects)
+        row["exact"] += sum(got == want for got, want in zip(stream.objects, expected))
+    for style, row in recovery.items():
+        log(f"  {style:<11} parse_themes {row['parse_themes']:>5}/{row['themes']} themes, streamed "
+            f"{row['streamed']:>5} ({row['exact']} exact)", Colors.GREEN if row["streamed"] >= row["parse_themes"]
+            else Colors.RED)
+    results["recovery"] = recovery
+
+    text = json.dumps({"themes": theme_reply(rng, 2000)})
+    start = time.perf_counter()
+    stream = ObjectStream("themes", valid_theme)
+    for offset in range(0, len(text), 4):
+        stream.feed(text[offset:offset + 4])
+    streamed_s = time.perf_counter() - start
+    start = time.perf_counter()
+    json.loads(text)
+    loads_s = time.perf_counter() - start
+    results["us_per_delta"] = round(streamed_s * 1e6 / (len(text) / 4), 2)
+    results["us_per_kb"] = round(streamed_s * 1e6 / (len(text) / 1024), 1)
+    log(f"\nParser cost on a {len(text) / 1024:.0f} KB reply: {results['us_per_delta']} µs per 4-character delta, "
+        f"{results['us_per_kb']} µs per KB (json.loads of the whole reply: "
+        f"{loads_s * 1e6 / (len(text) / 1024):.1f} µs per KB)", Colors.GRAY)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental JSON extraction from streamed replies")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    extract_parser = sub.add_parser("extract", help="Stream a saved reply through the extractor")
+    extract_parser.add_argument("file", help="Reply text, or - for stdin")
+    extract_parser.add_argument("--key", help="Array whose objects to extract (default: the first array)")
+    extract_parser.add_argument("--chunk", type=int, default=8, help="Characters per delta (default: 8)")
+    extract_parser.add_argument("--no-repair", action="store_true", help="Drop an unfinished last object")
+    extract_parser.add_argument("--output", help="Save the objects as JSON")
+
+    themes_parser = sub.add_parser("themes", help="Generate themes live, printing each as it streams in")
+    themes_parser.add_argument("--summaries", required=True, help="JSON file with an ImageSummary list")
+    themes_parser.add_argument("--deployment", default="GPT 4o")
+    themes_parser.add_argument("--count", type=int, default=4)
+    themes_parser.add_argument("--api-key", help="Midas API key (optional)")
+    themes_parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL verification")
+
+    bench_parser = sub.add_parser("benchmark", help="Time to first object and recovery on simulated replies")
+    bench_parser.add_argument("--tokens-per-second", type=float, default=50, help="Decode rate (default: 50)")
+    bench_parser.add_argument("--first-token", type=float, default=1.0, help="Seconds to first token (default: 1)")
+    bench_parser.add_argument("--themes", type=int, default=4, help="Themes per reply (default: 4)")
+    bench_parser.add_argument("--pack-size", type=positive_int, default=4, help="Photos per packed reply (default: 4)")
+    bench_parser.add_argument("--replies", type=int, default=500, help="Replies in the recovery check (default: 500)")
+    bench_parser.add_argument("--time-scale", type=float, default=0.05,
+                              help="Fraction of simulated time actually slept (default: 0.05)")
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    {"extract": extract, "themes": themes, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Query and benchmark the layout template index
+
+Templates come from scripts/layout-templates.json, a mirror of templateService
+TEMPLATES and photobookGenerator's layouts. Run `sync` after changing either
+TypeScript file (or `sync --check` in CI to catch drift).
+
+Usage:
+    python scripts/template-index.py sync
+    python scripts/template-index.py sync --check
+    python scripts/template-index.py query --aspects 1.5,0.67,0.67 --top 5
+    python scripts/template-index.py query --images bucketlistly_images --limit 3 --theme warm_family_portrait
+    python scripts/template-index.py benchmark --synthetic 5000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from photobook.console import Colors, log, log_section
+from photobook.document import oriented_size
+from photobook.imaging import list_images
+from photobook.layouts import DEFAULT_TEMPLATES_PATH, TemplateIndex, extract_templates, load_templates
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def synthetic_templates(count: int, seed: int = 42) -> list:
+    """Random grid-ish layouts with 1-8 slots, to show how lookups scale with library size"""
+    rng = random.Random(seed)
+    templates = []
+    for n in range(count):
+        slots = []
+        for s in range(rng.randint(1, 8)):
+            slots.append({"id": f"slot-{s + 1}", "x": 5, "y": 5,
+                          "width": rng.uniform(15, 90), "height": rng.uniform(15, 90), "rotation": 0})
+        templates.append({"id": f"synthetic-{n}", "source": "synthetic", "name": f"synthetic-{n}",
+                          "theme_id": f"theme-{n % 12}", "category": rng.choice(["single", "grid", "collage", "story"]),
+                          "pageSize": {"width": 2480, "height": 3508}, "slots": slots})
+    return templates
+
+
+def sync(args):
+    templates = extract_templates(REPO_ROOT)
+    mirror = {
+        "generatedFrom": ["src/services/templateService.ts", "src/services/photobook-studio/photobookGenerator.ts"],
+        "templates": templates,
+    }
+    text = json.dumps(mirror, indent=2) + "\n"
+    if args.check:
+        current = DEFAULT_TEMPLATES_PATH.read_text(encoding="utf-8") if DEFAULT_TEMPLATES_PATH.exists() else ""
+        if current != text:
+            log(f"❌ {DEFAULT_TEMPLATES_PATH.name} is out of date; run template-index.py sync", Colors.RED)
+            sys.exit(1)
+        log(f"✅ {DEFAULT_TEMPLATES_PATH.name} matches the TypeScript layouts", Colors.GREEN)
+        return
+    DEFAULT_TEMPLATES_PATH.write_text(text, encoding="utf-8")
+    log(f"✅ Wrote {len(templates)} templates to {DEFAULT_TEMPLATES_PATH}", Colors.GREEN)
+
+
+def query(args):
+    if args.aspects:
+        aspects = [float(a) for a in args.aspects.split(",")]
+    elif args.images:
+        sizes = [oriented_size(p) for p in list_images(args.images, args.limit)]
+        aspects = [w / h for w, h in sizes]
+    else:
+        log("❌ --aspects or --images is required", Colors.RED)
+        sys.exit(1)
+
+    index = TemplateIndex(load_templates())
+    start = time.perf_counter()
+    results = index.query(aspects, top=args.top, theme_id=args.theme, category=args.category, source=args.source)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+
+    log_section("🧩 Template Matches")
+    log(f"Photo aspect ratios: {', '.join(f'{a:.2f}' for a in aspects)}", Colors.GRAY)
+    for rank, result in enumerate(results, 1):
+        log(f"{rank}. {result['id']:<24} slots {result['slots']}  distance {result['distance']}  "
+            f"cost {result['cost']:.3f}", Colors.GREEN if result["distance"] == 0 else Colors.YELLOW)
+        log(f"   {json.dumps(result['assignment'])}", Colors.GRAY)
+    log(f"\n⏱️  {elapsed_us:.0f} µs (first query for this shape builds its plan)", Colors.GRAY)
+
+
+def benchmark(args):
+    rng = random.Random(args.seed)
+    libraries = [("repo templates", load_templates())]
+    if args.synthetic:
+        libraries.append((f"repo + {args.synthetic} synthetic", load_templates() + synthetic_templates(args.synthetic)))
+
+    log_section("🧩 Template Index Benchmark")
+    for label, templates in libraries:
+        start = time.perf_counter()
+        index = TemplateIndex(templates)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # Photo sets for hundreds of spreads: 1-6 photos, mixed orientations
+        queries = [[rng.choice([rng.uniform(0.5, 0.8), rng.uniform(0.9, 1.1), rng.uniform(1.3, 1.8)])
+                    for _ in range(rng.randint(1, 6))] for _ in range(args.queries)]
+        for aspects in queries[:50]:
+            index.query(aspects, top=args.top)  # warm the per-shape plans
+
+        indexed, linear, mismatches = [], [], 0
+        for aspects in queries:
+            start = time.perf_counter()
+            result = index.query(aspects, top=args.top)
+            indexed.append((time.perf_counter() - start) * 1e6)
+            start = time.perf_counter()
+            reference = index.linear_query(aspects, top=args.top)
+            linear.append((time.perf_counter() - start) * 1e6)
+            if [r["id"] for r in result] != reference:
+                mismatches += 1
+
+        def pct(values, q):
+            return sorted(values)[min(len(values) - 1, int(len(values) * q))]
+
+        log(f"\n{label}: {len(index)} templates, {len(index.buckets)} buckets, built in {build_ms:.1f} ms", Colors.CYAN)
+        log(f"  Index:  p50 {statistics.median(indexed):7.1f} µs   p99 {pct(indexed, 0.99):7.1f} µs", Colors.GREEN)
+        log(f"  Linear: p50 {statistics.median(linear):7.1f} µs   p99 {pct(linear, 0.99):7.1f} µs", Colors.GRAY)
+        log(f"  Same top-{args.top} as a full scan: {args.queries - mismatches}/{args.queries}",
+            Colors.GREEN if mismatches == 0 else Colors.RED)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layout template index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = sub.add_parser("sync", help="Regenerate layout-templates.json from the TypeScript sources")
+    sync_parser.add_argument("--check", action="store_true", help="Only verify the mirror is current")
+
+    query_parser = sub.add_parser("query", help="Best templates for a set of photos")
+    query_parser.add_argument("--aspects", help="Comma-separated width/height ratios, e.g. 1.5,0.67")
+    query_parser.add_argument("--images", help="Directory of photos to read sizes from")
+    query_parser.add_argument("--limit", type=int, default=3, help="Photos to take from --images (default: 3)")
+    query_parser.add_argument("--top", type=int, default=5, help="Templates to return (default: 5)")
+    query_parser.add_argument("--theme", help="Only templates for this theme_id")
+    query_parser.add_argument("--category", help="Only this category (single, collage, grid, story, ...)")
+    query_parser.add_argument("--source", choices=["templateService", "photobookGenerator"])
+
+    bench_parser = sub.add_parser("benchmark", help="Index vs linear scan latency")
+    bench_parser.add_argument("--queries", type=int, default=2000, help="Random photo sets (default: 2000)")
+    bench_parser.add_argument("--synthetic", type=int, default=5000, help="Extra synthetic templates (default: 5000)")
+    bench_parser.add_argument("--top", type=int, default=5, help="Templates per query (default: 5)")
+    bench_parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    {"sync": sync, "query": query, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -9,6 +9,11 @@ Usage:
     python scripts/test-models.py --verbose
     python scripts/test-models.py --dry-run
     python scripts/test-models.py --check
+    python scripts/test-models.py --deadline 120
+    python scripts/test-models.py --trace trace.jsonl
+
+Per-model timeouts follow the latencies observed in earlier runs
+(~/.cache/photobook/latency.json, see photobook/deadlines.py), up to 30s.
 """
 
 import json
@@ -20,6 +25,14 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 import requests
 
+from photobook import payloads, tracing
+from photobook.deadlines import (
+    DEFAULT_LATENCY_PATH, TIMEOUT_ERRORS, Deadline, LatencyTracker, call_timeouts, classify_error, latency_key
+)
+
+# Longest a single model test waits (connect and read)
+MAX_TIMEOUT = 30
+
 # Try to load .env file support
 try:
     from dotenv import load_dotenv
@@ -202,10 +215,25 @@ def test_model(
     api_key: Optional[str],
     model: Dict[str, Any],
     verbose: bool = False,
-    verify_ssl: bool = True
+    verify_ssl: bool = True,
+    deadline: Optional[Deadline] = None,
+    latency: Optional[LatencyTracker] = None
 ) -> Dict[str, Any]:
-    """Test a single model"""
+    """Test a single model; timeouts adapt to its observed latency and the run's deadline"""
     start_time = time.time()
+    key = latency_key(model['deploymentName'], 'ping')
+    timeouts = call_timeouts(key, MAX_TIMEOUT, deadline, latency)
+
+    if deadline is not None and deadline.exhausted():
+        return {
+            'model': model['name'],
+            'deploymentName': model['deploymentName'],
+            'format': model['format'],
+            'success': False,
+            'responseTime': 0,
+            'error': 'Run deadline exceeded before the call was sent',
+            'errorType': 'deadline'
+        }
 
     try:
         log(f"  Testing {model['name']} ({model['deploymentName']})...", Colors.GRAY)
@@ -218,13 +246,19 @@ def test_model(
         if api_key:
             headers['Authorization'] = f'Bearer {api_key}'
 
-        response = requests.post(
-            endpoint,
-            headers=headers,
-            json=model['samplePayload'],
-            timeout=30,
-            verify=verify_ssl
-        )
+        # The samplePayload exactly as configured, serialized once
+        body = payloads.compiler.static(model['samplePayload']).render()
+
+        with tracing.span('http.request', tracing.KIND_CLIENT, deployment=model['deploymentName']) as span:
+            span.set(payload_bytes=len(body))
+            response = requests.post(
+                endpoint,
+                headers=headers,
+                data=body,
+                timeout=timeouts,
+                verify=verify_ssl
+            )
+            span.set(status_code=response.status_code)
 
         response_time = int((time.time() - start_time) * 1000)
 
@@ -241,7 +275,8 @@ def test_model(
                 'success': False,
                 'responseTime': response_time,
                 'statusCode': response.status_code,
-                'error': error_msg
+                'error': error_msg,
+                'errorType': 'http'
             }
 
             # Include full error response in verbose mode
@@ -250,18 +285,22 @@ def test_model(
 
             return result
 
-        data = response.json()
+        with tracing.span('response.parse'):
+            data = response.json()
+            usage = data.get('data', data).get('usage') or {}
+            if latency is not None:
+                latency.observe(key, response_time / 1000)
 
-        # Extract response text based on format
-        response_text = ''
-        if model['format'] == 'openai':
-            response_text = data.get('choices', [{}])[0].get('message', {}).get('content', '')
-        else:
-            content = data.get('choices', [{}])[0].get('message', {}).get('content', '')
-            if isinstance(content, list):
-                response_text = content[0].get('text', '') if content else ''
-            elif isinstance(content, str):
-                response_text = content
+            # Extract response text based on format
+            response_text = ''
+            if model['format'] == 'openai':
+                response_text = data.get('choices', [{}])[0].get('message', {}).get('content', '')
+            else:
+                content = data.get('choices', [{}])[0].get('message', {}).get('content', '')
+                if isinstance(content, list):
+                    response_text = content[0].get('text', '') if content else ''
+                elif isinstance(content, str):
+                    response_text = content
 
         result = {
             'model': model['name'],
@@ -270,7 +309,12 @@ def test_model(
             'success': True,
             'responseTime': response_time,
             'statusCode': response.status_code,
-            'response': response_text
+            'response': response_text,
+            'usage': {
+                'prompt_tokens': usage.get('prompt_tokens', 0),
+                'completion_tokens': usage.get('completion_tokens', 0),
+                'total_tokens': usage.get('total_tokens', 0)
+            }
         }
 
         if verbose and response_text:
@@ -280,20 +324,28 @@ def test_model(
 
     except requests.exceptions.RequestException as e:
         response_time = int((time.time() - start_time) * 1000)
+        error_type = classify_error(e, deadline)
+        if latency is not None and error_type == 'read_timeout':
+            latency.timed_out(key)
         return {
             'model': model['name'],
             'deploymentName': model['deploymentName'],
             'format': model['format'],
             'success': False,
             'responseTime': response_time,
-            'error': str(e)
+            'error': str(e),
+            'errorType': error_type,
+            'timeouts': list(timeouts)
         }
 
 def test_all_models(
     api_key: Optional[str],
     specific_model: Optional[str] = None,
     verbose: bool = False,
-    verify_ssl: bool = True
+    verify_ssl: bool = True,
+    ledger_path: Optional[str] = None,
+    deadline_seconds: Optional[float] = None,
+    latency_path: Optional[str] = str(DEFAULT_LATENCY_PATH)
 ):
     """Test all available models"""
     log_section('MIDAS API Model Availability Test')
@@ -315,6 +367,18 @@ def test_all_models(
     if specific_model:
         log(f"Testing specific model: {specific_model}", Colors.YELLOW)
 
+    deadline = Deadline.after(deadline_seconds)
+    if deadline_seconds:
+        log(f"Run deadline: {deadline_seconds:g}s", Colors.GRAY)
+    latency = LatencyTracker(latency_path) if latency_path else None
+
+    # Optional usage accounting (see photobook/accounting.py)
+    ledger = None
+    if ledger_path is not None:
+        from photobook.accounting import DEFAULT_LEDGER_PATH, PriceTable, UsageLedger
+        ledger = UsageLedger(PriceTable.load(), ledger_path or DEFAULT_LEDGER_PATH)
+        log(f"Recording usage to: {ledger.path}", Colors.GRAY)
+
     results: List[Dict[str, Any]] = []
     total_tests = 0
     success_count = 0
@@ -332,8 +396,15 @@ def test_all_models(
                 continue
 
             total_tests += 1
-            result = test_model(config['endpoint'], api_key, model, verbose, verify_ssl)
+            with tracing.span('model.test', deployment=model['deploymentName'], category=category) as span:
+                result = test_model(config['endpoint'], api_key, model, verbose, verify_ssl, deadline, latency)
+                span.set(error_type=result.get('errorType'), **(result.get('usage') or {}))
+                if not result['success']:
+                    span.error(result.get('error') or 'failed')
             results.append(result)
+            if ledger:
+                ledger.record(model['deploymentName'], result.get('usage'), job_id='model-test',
+                              success=result['success'])
 
             if result['success']:
                 success_count += 1
@@ -346,6 +417,8 @@ def test_all_models(
                 log(f"  ❌ {result['model']} - {result['responseTime']}ms", Colors.RED)
                 if result.get('statusCode'):
                     log(f"     Status: {result['statusCode']}", Colors.RED)
+                if result.get('errorType') in TIMEOUT_ERRORS:
+                    log(f"     ⏱️  {result['errorType'].replace('_', ' ')}", Colors.YELLOW)
                 if result.get('error'):
                     error_preview = result['error'][:200]
                     log(f"     Error: {error_preview}", Colors.RED)
@@ -363,6 +436,13 @@ def test_all_models(
     log(f"❌ Failed: {fail_count}", Colors.RED)
     success_rate = (success_count / total_tests * 100) if total_tests > 0 else 0
     log(f"Success rate: {success_rate:.1f}%", Colors.CYAN)
+    total_tokens = sum(r.get('usage', {}).get('total_tokens', 0) for r in results)
+    log(f"Total tokens: {total_tokens}", Colors.CYAN)
+    timed_out = [r for r in results if r.get('errorType') in TIMEOUT_ERRORS]
+    if timed_out:
+        log(f"⏱️  Timed out: {len(timed_out)}", Colors.YELLOW)
+    if latency is not None:
+        latency.save()
 
     # Save results to file
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -376,7 +456,7 @@ def test_all_models(
         'results': results
     }
 
-    with open(results_path, 'w') as f:
+    with tracing.span('result.write', path=results_path), open(results_path, 'w') as f:
         json.dump(output_data, f, indent=2)
 
     log(f"\n📝 Results saved to: {results_path}", Colors.BLUE)
@@ -415,6 +495,8 @@ Examples:
   python scripts/test-models.py --verbose            # Show detailed output
   python scripts/test-models.py --dry-run            # Validate config without API calls
   python scripts/test-models.py --check              # Check payload validity
+  python scripts/test-models.py --deadline 120       # Fail remaining calls fast after 120s
+  python scripts/test-models.py --trace trace.jsonl  # Record spans for trace-report.py
         """
     )
 
@@ -454,6 +536,39 @@ Examples:
         action='store_true'
     )
 
+    parser.add_argument(
+        '--ledger',
+        help='Record token usage/cost to the usage ledger (optional path)',
+        nargs='?',
+        const='',
+        default=None
+    )
+
+    parser.add_argument(
+        '--deadline',
+        help='Seconds for the whole run; calls are cut short or skipped once it passes',
+        type=float,
+        default=None
+    )
+
+    parser.add_argument(
+        '--latency',
+        help=f'Observed latencies used for adaptive timeouts (default: {DEFAULT_LATENCY_PATH})',
+        default=str(DEFAULT_LATENCY_PATH)
+    )
+
+    parser.add_argument(
+        '--trace',
+        help='Append OTLP-JSON spans of this run to a file (see trace-report.py)',
+        default=None
+    )
+
+    parser.add_argument(
+        '--fixed-timeouts',
+        help=f'Always wait the full {MAX_TIMEOUT}s instead of adapting to observed latency',
+        action='store_true'
+    )
+
     args = parser.parse_args()
 
     # Show environment info
@@ -475,12 +590,17 @@ Examples:
             sys.exit(0)
 
         # Normal test mode
-        test_all_models(
-            api_key=args.api_key,
-            specific_model=args.model,
-            verbose=args.verbose,
-            verify_ssl=not args.no_verify_ssl
-        )
+        tracing.configure(args.trace, service='test-models')
+        with tracing.span('model-test', model=args.model):
+            test_all_models(
+                api_key=args.api_key,
+                specific_model=args.model,
+                verbose=args.verbose,
+                verify_ssl=not args.no_verify_ssl,
+                ledger_path=args.ledger,
+                deadline_seconds=args.deadline,
+                latency_path=None if args.fixed_timeouts else args.latency
+            )
     except KeyboardInterrupt:
         log('\n\n⚠️  Tests interrupted by user', Colors.YELLOW)
         sys.exit(130)
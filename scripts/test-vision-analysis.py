@@ -10,6 +10,18 @@ Usage:
     python scripts/test-vision-analysis.py --image photo.jpg --model "GPT 4o"
     python scripts/test-vision-analysis.py --generate-test-image
     python scripts/test-vision-analysis.py --image photo.jpg --verbose
+    python scripts/test-vision-analysis.py --image photo.jpg --deadline 90
+    python scripts/test-vision-analysis.py --image photo.jpg --trace trace.jsonl
+    python scripts/test-vision-analysis.py --image photo.jpg --profile-memory memory.json --memory-budget 40
+
+With --trace, the run is recorded as OTLP-JSON spans (image load, each
+model's request and parse, writing results); see trace-report.py. With
+--profile-memory, peak and retained memory per stage and call site are
+reported (photobook/memprofile.py), and --memory-budget fails the run when
+RSS grows by more than that many MB per image.
+
+Per-model timeouts follow the latencies observed in earlier runs
+(~/.cache/photobook/latency.json, see photobook/deadlines.py), up to 60s.
 """
 
 import os
@@ -23,10 +35,18 @@ from pathlib import Path
 from typing import Optional, Dict, Any, List
 import requests
 
+from photobook import payloads, tracing
+from photobook.deadlines import (
+    DEFAULT_LATENCY_PATH, TIMEOUT_ERRORS, Deadline, LatencyTracker, call_timeouts, classify_error, latency_key
+)
+
 # Configuration
 ENDPOINT = "https://midas.ai.bosch.com/ss1/api/v2/llm/completions"
 API_KEY = os.environ.get("REACT_APP_AZURE_API_KEY") or os.environ.get("MIDAS_API_KEY") or ""
 
+# Longest a single vision call waits (connect and read)
+MAX_TIMEOUT = 60
+
 # Models to test (vision-capable)
 VISION_MODELS = [
     {"name": "Claude Sonnet-4", "deployment": "Claude-Sonnet-4"},
@@ -63,8 +83,12 @@ def log_section(title: str):
 def image_to_base64(image_path: str) -> str:
     """Convert image file to base64 string"""
     try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
+        with tracing.span("image.load", path=image_path) as span:
+            with open(image_path, "rb") as image_file:
+                data = image_file.read()
+            span.set(bytes=len(data))
+        with tracing.span("image.encode"):
+            return base64.b64encode(data).decode("utf-8")
     except Exception as e:
         raise Exception(f"Failed to read image file: {e}")
 
@@ -109,6 +133,40 @@ def save_test_image(base64_data: str, output_path: str):
     log(f"✅ Test image saved to: {output_path}", Colors.GREEN)
 
 
+def build_vision_request(deployment: str, image_base64: str, image_type: str = "jpeg") -> Dict[str, Any]:
+    """The vision request (OpenAI format) sent to every model"""
+    return {
+        "model": deployment,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": """Analyze this image in detail. Describe:
+1. What you see in the image (objects, people, scene)
+2. Colors and composition
+3. Lighting conditions
+4. Overall mood or atmosphere
+5. Any text visible in the image
+
+Be specific and detailed.""",
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/{image_type};base64,{image_base64}",
+                            "detail": "high",
+                        },
+                    },
+                ],
+            }
+        ],
+        "max_tokens": 500,
+        "temperature": 0.3,
+    }
+
+
 def test_vision_model(
     model: Dict[str, str],
     image_base64: str,
@@ -116,50 +174,44 @@ def test_vision_model(
     api_key: str = "",
     verbose: bool = False,
     verify_ssl: bool = True,
+    deadline: Optional[Deadline] = None,
+    latency: Optional[LatencyTracker] = None,
 ) -> Dict[str, Any]:
-    """Test vision analysis with a single model"""
+    """Test vision analysis with a single model; timeouts adapt to its observed latency and the run's deadline"""
     start_time = time.time()
+    key = latency_key(model["deployment"], "vision")
+    timeouts = call_timeouts(key, MAX_TIMEOUT, deadline, latency)
+
+    if deadline is not None and deadline.exhausted():
+        return {
+            "model": model["name"],
+            "success": False,
+            "response_time": 0.0,
+            "error": "Run deadline exceeded before the call was sent",
+            "error_type": "deadline",
+        }
 
     try:
         log(f"  Testing {model['name']}...", Colors.GRAY)
 
-        # Prepare the vision request (OpenAI format)
-        request = {
-            "model": model["deployment"],
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": """Analyze this image in detail. Describe:
-1. What you see in the image (objects, people, scene)
-2. Colors and composition
-3. Lighting conditions
-4. Overall mood or atmosphere
-5. Any text visible in the image
-
-Be specific and detailed.""",
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/{image_type};base64,{image_base64}",
-                                "detail": "high",
-                            },
-                        },
-                    ],
-                }
-            ],
-            "max_tokens": 500,
-            "temperature": 0.3,
-        }
+        # Only the image data changes between calls; the rest of the body is serialized once per model
+        template = payloads.compiler.template(
+            ("vision-test", image_type), model["deployment"],
+            lambda: build_vision_request(model["deployment"], payloads.slot("image"), image_type),
+        )
+        request = template.body(image_base64)
 
         headers = {"Content-Type": "application/json"}
         if api_key:
             headers["Authorization"] = f"Bearer {api_key}"
 
-        response = requests.post(ENDPOINT, headers=headers, json=request, timeout=60, verify=verify_ssl)
+        with tracing.span("http.request", tracing.KIND_CLIENT, deployment=model["deployment"]) as span:
+            if span.recording:
+                span.set(payload_bytes=request.size())
+            response = requests.post(
+                ENDPOINT, headers=headers, data=request.data(), timeout=timeouts, verify=verify_ssl
+            )
+            span.set(status_code=response.status_code)
         response_time = (time.time() - start_time) * 1000  # Convert to ms
 
         if not response.ok:
@@ -172,47 +224,52 @@ Be specific and detailed.""",
                 "error": error_data.get("error", {}).get("message")
                 or error_data.get("message")
                 or str(error_data),
+                "error_type": "http",
             }
 
-        data = response.json()
+        with tracing.span("response.parse"):
+            data = response.json()
 
-        # Handle both wrapped and unwrapped responses
-        wrapped_data = data.get("data", data)
-        content = wrapped_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-        tokens_used = wrapped_data.get("usage", {}).get("total_tokens")
+            # Handle both wrapped and unwrapped responses
+            wrapped_data = data.get("data", data)
+            content = wrapped_data.get("choices", [{}])[0].get("message", {}).get("content", "")
+            usage = wrapped_data.get("usage") or {}
+            tokens_used = usage.get("total_tokens")
+        if latency is not None:
+            latency.observe(key, response_time / 1000)
 
         return {
             "model": model["name"],
+            "deployment": model["deployment"],
             "success": True,
             "response_time": response_time,
             "status_code": response.status_code,
             "response": content,
             "tokens_used": tokens_used,
+            "usage": {
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": tokens_used or 0,
+            },
         }
 
     except Exception as e:
         response_time = (time.time() - start_time) * 1000
+        error_type = classify_error(e, deadline)
+        if latency is not None and error_type == "read_timeout":
+            latency.timed_out(key)
         return {
             "model": model["name"],
             "success": False,
             "response_time": response_time,
             "error": str(e),
+            "error_type": error_type,
+            "timeouts": list(timeouts),
         }
 
 
-def main():
-    """Main test function"""
-    parser = argparse.ArgumentParser(description="Test Midas API vision capabilities")
-    parser.add_argument("--image", help="Path to local image file")
-    parser.add_argument("--url", help="URL to image file")
-    parser.add_argument("--model", help="Test specific model only")
-    parser.add_argument("--api-key", help="Midas API key (optional)")
-    parser.add_argument("--verbose", "-v", action="store_true", help="Show full responses")
-    parser.add_argument("--generate-test-image", action="store_true", help="Generate test pattern")
-    parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL verification (for corporate APIs)")
-
-    args = parser.parse_args()
-
+def run_tests(args):
+    """Load the image, test each model and save the results"""
     log_section("🔍 Midas API Vision/Image Analysis Test")
 
     # Handle test image generation
@@ -285,6 +342,22 @@ def main():
     # Get API key
     api_key = args.api_key or API_KEY
 
+    # Optional usage accounting (see photobook/accounting.py)
+    ledger = None
+    image_tokens = 0
+    if args.ledger is not None:
+        from photobook.accounting import DEFAULT_LEDGER_PATH, PriceTable, UsageLedger, estimate_image_tokens
+        from photobook.imaging import image_size
+
+        ledger = UsageLedger(PriceTable.load(), args.ledger or DEFAULT_LEDGER_PATH)
+        log(f"Recording usage to: {ledger.path}", Colors.GRAY)
+        # build_vision_request asks for detail "high"; SVG has no pixel size to estimate from
+        size = image_size(base64.b64decode(image_base64))
+        image_tokens = estimate_image_tokens(*size, "high") if size else 0
+
+    deadline = Deadline.after(args.deadline)
+    latency = None if args.fixed_timeouts else LatencyTracker(args.latency)
+
     # Run tests
     log_section("Running Vision Analysis Tests")
     results: List[Dict[str, Any]] = []
@@ -298,16 +371,32 @@ def main():
         log("⚠️  SSL verification disabled", Colors.YELLOW)
 
     for model in models_to_test:
-        result = test_vision_model(
-            model, image_base64, image_type, api_key, args.verbose, verify_ssl=not args.no_verify_ssl
-        )
+        with tracing.span("model.test", deployment=model["deployment"]) as span:
+            result = test_vision_model(
+                model, image_base64, image_type, api_key, args.verbose, verify_ssl=not args.no_verify_ssl,
+                deadline=deadline, latency=latency,
+            )
+            span.set(error_type=result.get("error_type"), **(result.get("usage") or {}))
+            if not result["success"]:
+                span.error(result.get("error") or "failed")
         results.append(result)
+        if ledger:
+            entry = ledger.record(
+                model["deployment"], result.get("usage"), job_id=args.job_id, image_tokens=image_tokens, images=1,
+                success=result["success"],
+            )
+            result["cost"] = entry["cost"]
 
         if result["success"]:
             success_count += 1
             log(f"  ✅ {result['model']} - {result['response_time']:.0f}ms", Colors.GREEN)
             if result.get("tokens_used"):
-                log(f"     Tokens used: {result['tokens_used']}", Colors.GRAY)
+                usage = result["usage"]
+                log(
+                    f"     Tokens used: {result['tokens_used']} "
+                    f"(prompt {usage['prompt_tokens']}, completion {usage['completion_tokens']})",
+                    Colors.GRAY,
+                )
             if args.verbose and result.get("response"):
                 log(f"\n     Response:", Colors.CYAN)
                 response_text = result["response"][:500]
@@ -320,6 +409,8 @@ def main():
             log(f"  ❌ {result['model']} - {result['response_time']:.0f}ms", Colors.RED)
             if result.get("status_code"):
                 log(f"     Status: {result['status_code']}", Colors.RED)
+            if result.get("error_type") in TIMEOUT_ERRORS:
+                log(f"     ⏱️  {result['error_type'].replace('_', ' ')}", Colors.YELLOW)
             if result.get("error"):
                 log(f"     Error: {result['error'][:200]}", Colors.RED)
 
@@ -340,10 +431,19 @@ def main():
     if successful_results:
         avg_time = sum(r["response_time"] for r in successful_results) / len(successful_results)
         log(f"Average response time: {avg_time:.0f}ms", Colors.CYAN)
+        total_tokens = sum(r.get("tokens_used") or 0 for r in successful_results)
+        log(f"Total tokens: {total_tokens}", Colors.CYAN)
+    if ledger:
+        log(f"Cost this run: {sum(r.get('cost', 0) for r in results):.4f} {ledger.prices.currency}", Colors.CYAN)
+    timed_out = [r for r in results if r.get("error_type") in TIMEOUT_ERRORS]
+    if timed_out:
+        log(f"⏱️  Timed out: {len(timed_out)}", Colors.YELLOW)
+    if latency is not None:
+        latency.save()
 
     # Save results to file
     results_path = Path(__file__).parent / "vision-test-results.json"
-    with open(results_path, "w") as f:
+    with tracing.span("result.write", path=str(results_path)), open(results_path, "w") as f:
         json.dump(
             {
                 "timestamp": datetime.now().isoformat(),
@@ -378,6 +478,56 @@ def main():
     print("\n")
 
 
+def report_memory(report: Dict[str, Any], path: str, budget_mb: Optional[float]):
+    """Log and save the memory report; exit with BUDGET_EXIT_CODE when over budget"""
+    from photobook.memprofile import BUDGET_EXIT_CODE, budget_error, summary_lines, write_report
+
+    log_section("🧠 Memory Profile")
+    for line in summary_lines(report):
+        log(line, Colors.GRAY if line.startswith("    ") else Colors.CYAN)
+    write_report(report, path)
+    log(f"\n📝 Memory report saved to: {path}", Colors.BLUE)
+    error = budget_error(report, budget_mb)
+    if error:
+        log(f"❌ Over memory budget: {error}", Colors.RED)
+        sys.exit(BUDGET_EXIT_CODE)
+
+
+def main():
+    """Main test function"""
+    parser = argparse.ArgumentParser(description="Test Midas API vision capabilities")
+    parser.add_argument("--image", help="Path to local image file")
+    parser.add_argument("--url", help="URL to image file")
+    parser.add_argument("--model", help="Test specific model only")
+    parser.add_argument("--api-key", help="Midas API key (optional)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show full responses")
+    parser.add_argument("--generate-test-image", action="store_true", help="Generate test pattern")
+    parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL verification (for corporate APIs)")
+    parser.add_argument("--ledger", nargs="?", const="", help="Record token usage/cost to the usage ledger (optional path)")
+    parser.add_argument("--job-id", default="vision-test", help="Job id for ledger entries (default: vision-test)")
+    parser.add_argument("--deadline", type=float, help="Seconds for the whole run; calls are cut short or skipped once it passes")
+    parser.add_argument("--latency", default=str(DEFAULT_LATENCY_PATH), help="Observed latencies used for adaptive timeouts")
+    parser.add_argument("--fixed-timeouts", action="store_true", help=f"Always wait the full {MAX_TIMEOUT}s per model")
+    parser.add_argument("--trace", help="Append OTLP-JSON spans of this run to a file (see trace-report.py)")
+    parser.add_argument("--profile-memory", nargs="?", const="", metavar="REPORT",
+                        help="Profile memory per stage and call site; report path (default: memory-report.json)")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="Fail (exit 3) if RSS grows by more than this per image; implies --profile-memory")
+
+    args = parser.parse_args()
+
+    tracing.configure(args.trace, service="test-vision-analysis")
+    profiler = None
+    if args.profile_memory is not None or args.memory_budget:
+        from photobook.memprofile import MemoryProfiler
+
+        profiler = MemoryProfiler().start()
+    with tracing.span("vision-test", image=args.image or args.url, model=args.model):
+        run_tests(args)
+    if profiler is not None:
+        report_memory(profiler.stop(), args.profile_memory or "memory-report.json", args.memory_budget)
+
+
 if __name__ == "__main__":
     try:
         main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Build and serve thumbnail pyramids from the content-addressed cache
+
+Every photo gets one JPEG per size bucket (strip 160, grid 320, analysis 768,
+preview 1920 px long edge) from a single DCT-scaled decode.
+
+Usage:
+    python scripts/thumbnail-cache.py generate bucketlistly_images --workers 4
+    python scripts/thumbnail-cache.py get bucketlistly_images/110330454446-main-image.jpg --size 300
+    python scripts/thumbnail-cache.py stats
+    python scripts/thumbnail-cache.py benchmark --images bucketlistly_images --photos 1000
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from photobook.console import Colors, log, log_section, positive_int
+from photobook.metadata import iter_photo_files
+from photobook.thumbnails import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, SIZE_BUCKETS, ThumbnailCache
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+
+
+def progress_reporter(label: str):
+    reported = [0]
+
+    def on_progress(done: int, total: int):
+        if done - reported[0] >= max(1, total // 10) or done == total:
+            reported[0] = done
+            log(f"  {label}: {done}/{total}", Colors.GRAY)
+
+    return on_progress
+
+
+def parse_buckets(value: str) -> tuple:
+    return tuple(SIZE_BUCKETS[v] if v in SIZE_BUCKETS else int(v) for v in value.split(","))
+
+
+def open_cache(args) -> ThumbnailCache:
+    return ThumbnailCache(args.cache_dir, max_bytes=int(args.max_mb * 1024 * 1024), buckets=parse_buckets(args.buckets))
+
+
+def generate(args):
+    cache = open_cache(args)
+    files = iter_photo_files(args.paths)
+    log_section(f"🖼️  Thumbnail Pyramids ({len(files)} photos)")
+    summary = cache.generate(files, workers=args.workers or os.cpu_count(), on_progress=progress_reporter("photos"))
+    log(f"✅ {summary['sources']} photos in {summary['elapsed']:.2f}s: {summary['built']} built, "
+        f"{summary['deduplicated']} duplicate content, {summary['indexed']} already cached", Colors.GREEN)
+    log(f"Read {summary['bytes_read'] / 1024 ** 2:.1f} MB, wrote {summary['bytes_written'] / 1024 ** 2:.1f} MB, "
+        f"evicted {summary['evicted']} levels", Colors.GRAY)
+    if summary["errors"]:
+        log(f"⚠️  {summary['errors']} photos could not be decoded", Colors.YELLOW)
+
+
+def get(args):
+    path = open_cache(args).get(args.path, args.size)
+    if path is None:
+        log(f"❌ Could not decode {args.path}", Colors.RED)
+        sys.exit(1)
+    print(path)
+
+
+def stats(args):
+    summary = open_cache(args).stats()
+    log_section("🖼️  Thumbnail Cache")
+    log(f"{summary['sources']} source paths indexed in {args.cache_dir}", Colors.GRAY)
+    for bucket, info in summary["buckets"].items():
+        log(f"  {bucket:>5}px: {info['levels']:>6} levels  {info['bytes'] / 1024 ** 2:8.1f} MB")
+
+
+def phone_sized_sources(images: str, directory: Path, count: int, size: tuple) -> list:
+    """
+    `count` distinct phone-resolution JPEGs: each source photo is upscaled and
+    encoded once, then copied with a unique COM segment so every file has its
+    own content hash (and gets decoded) while costing no extra encodes
+    """
+    bases = []
+    for path in iter_photo_files([images]):
+        try:
+            with Image.open(path) as image:
+                image = ImageOps.exif_transpose(image).convert("RGB")
+                if image.width < image.height:
+                    image = image.resize((size[1], size[0]), Image.BICUBIC)
+                else:
+                    image = image.resize(size, Image.BICUBIC)
+        except OSError:
+            continue
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        bases.append(buffer.getvalue())
+    if not bases:
+        return []
+    files = []
+    for index in range(count):
+        body = bases[index % len(bases)]
+        comment = f"photobook benchmark copy {index}".encode()
+        target = directory / f"upload-{index:05d}.jpg"
+        with open(target, "wb") as f:
+            f.write(body[:2] + b"\xff\xfe" + (len(comment) + 2).to_bytes(2, "big") + comment + body[2:])
+        files.append(target)
+    return files
+
+
+def full_decode_pyramid(path: Path, buckets: tuple) -> None:
+    """The compressImage approach: decode the full bitmap, then draw it smaller for each size"""
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for bucket in buckets:
+            scale = min(1.0, bucket / max(image.size))
+            resized = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                   Image.LANCZOS)
+            resized.save(io.BytesIO(), format="JPEG", quality=85)
+
+
+def benchmark(args):
+    buckets = parse_buckets(args.buckets)
+    width, height = (int(v) for v in args.source_size.split("x"))
+    workers = args.workers or os.cpu_count() or 1
+    log_section(f"🖼️  Thumbnail Pyramid Benchmark ({args.photos} photos, {width}x{height})")
+    log(f"Buckets: {', '.join(str(b) for b in buckets)} px, {workers} workers", Colors.GRAY)
+
+    root = Path(tempfile.mkdtemp(prefix="photobook-thumbnails-"))
+    try:
+        (root / "uploads").mkdir()
+        start = time.perf_counter()
+        files = phone_sized_sources(args.images, root / "uploads", args.photos, (width, height))
+        if not files:
+            log(f"❌ No images found in {args.images}", Colors.RED)
+            sys.exit(1)
+        megabytes = sum(f.stat().st_size for f in files) / 1024 ** 2
+        log(f"Prepared {len(files)} uploads ({megabytes:.0f} MB) in {time.perf_counter() - start:.1f}s", Colors.GRAY)
+
+        start = time.perf_counter()
+        for path in files:
+            with open(path, "rb") as f:
+                hashlib.sha256(f.read()).hexdigest()
+        read_seconds = time.perf_counter() - start
+
+        cache = ThumbnailCache(root / "cache", max_bytes=DEFAULT_MAX_BYTES, buckets=buckets)
+        cold = cache.generate(files, workers=workers, on_progress=progress_reporter("pyramids"))
+        warm = cache.generate(files, workers=workers)
+
+        sample = files[:args.decode_sample]
+        start = time.perf_counter()
+        for path in sample:
+            full_decode_pyramid(path, buckets)
+        full_per_photo = (time.perf_counter() - start) / max(1, len(sample))
+
+        start = time.perf_counter()
+        for path in files[:200]:
+            cache.get(path, 300)
+        get_ms = (time.perf_counter() - start) * 1000 / max(1, min(200, len(files)))
+
+        level_bytes = cache.total_bytes()
+        budget = ThumbnailCache(root / "cache", max_bytes=level_bytes // 2, buckets=buckets)
+        evicted = budget.evict()
+
+        per_photo = cold["elapsed"] / max(1, len(files))
+        log_section("Results")
+        log(f"Read + SHA-256 only:      {read_seconds:6.1f}s  ({read_seconds * 1000 / len(files):6.2f} ms/photo, "
+            f"page-cache reads)", Colors.GRAY)
+        log(f"Pyramids, draft decode:   {cold['elapsed']:6.1f}s  ({per_photo * 1000:6.2f} ms/photo)", Colors.GREEN)
+        log(f"Pyramids, full decode:    {full_per_photo * len(files):6.1f}s  ({full_per_photo * 1000:6.2f} ms/photo, "
+            f"estimated from {len(sample)})", Colors.YELLOW)
+        log(f"Speedup from draft():     {full_per_photo / per_photo:.1f}x", Colors.GREEN)
+        log(f"Re-run (indexed, no reads): {warm['elapsed']:.2f}s; get() hit: {get_ms:.2f} ms", Colors.GREEN)
+        log(f"Cache: {level_bytes / 1024 ** 2:.1f} MB of levels; halving the budget evicted {evicted} LRU levels",
+            Colors.GRAY)
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"photos": len(files), "source_size": args.source_size, "buckets": buckets,
+                           "workers": workers, "read_s": round(read_seconds, 2), "draft_s": round(cold["elapsed"], 2),
+                           "full_decode_s_estimated": round(full_per_photo * len(files), 2),
+                           "warm_s": round(warm["elapsed"], 3), "get_hit_ms": round(get_ms, 3),
+                           "cache_mb": round(level_bytes / 1024 ** 2, 1)}, f, indent=2)
+            log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thumbnail pyramid cache")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help=f"Cache directory (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help="Cache budget before LRU eviction (default: 2048)")
+    parser.add_argument("--buckets", default=",".join(SIZE_BUCKETS),
+                        help=f"Bucket names or pixel sizes (default: {','.join(SIZE_BUCKETS)})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = sub.add_parser("generate", help="Build pyramids for files or directories")
+    generate_parser.add_argument("paths", nargs="+")
+    generate_parser.add_argument("--workers", type=int, help="Decode processes (default: CPU count)")
+
+    get_parser = sub.add_parser("get", help="Print the cached thumbnail path for a photo")
+    get_parser.add_argument("path")
+    get_parser.add_argument("--size", type=int, default=320, help="Long edge needed in px (default: 320)")
+
+    sub.add_parser("stats", help="Levels and bytes per bucket")
+
+    bench_parser = sub.add_parser("benchmark", help="Draft-decoded pyramids vs full decodes for an upload")
+    bench_parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Source photos to upscale and copy")
+    bench_parser.add_argument("--photos", type=positive_int, default=1000, help="Upload size (default: 1000)")
+    bench_parser.add_argument("--source-size", default="4032x3024", help="Upload resolution (default: 4032x3024)")
+    bench_parser.add_argument("--workers", type=int, help="Decode processes (default: CPU count)")
+    bench_parser.add_argument("--decode-sample", type=int, default=50, help="Photos for the full-decode baseline")
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    {"generate": generate, "get": get, "stats": stats, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Where a traced batch spent its time: per-stage totals, critical path, flame graph
+
+Reads the OTLP-JSON span files written with --trace by test-models.py,
+test-vision-analysis.py, benchmark-packing.py, job-service.py serve and
+work-queue.py worker (photobook/tracing.py), and reports:
+
+- per stage (span name): calls, total and self time, p50/p95 duration, errors
+- the critical path: the chain of spans that set each trace's end-to-end
+  time, with concurrent work that did not delay it left out
+- requests per deployment: calls, payload bytes, tokens
+- a flame graph of self time, as folded stacks (flamegraph.pl, speedscope)
+  and/or a standalone SVG
+
+The benchmark runs a simulated batch (real photos cycled up to --photos,
+prepared for upload, analyzed in packs against a stand-in endpoint) with
+tracing off and on, to measure what tracing costs and what it shows.
+
+Usage:
+    python scripts/trace-report.py summary trace.jsonl
+    python scripts/trace-report.py summary trace.jsonl --root analyze --top 10 --output report.json
+    python scripts/trace-report.py flamegraph trace.jsonl --svg flame.svg --folded flame.folded
+    python scripts/trace-report.py benchmark --photos 500 --pack-size 4 --call-ms 40
+"""
+
+import argparse
+import html
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from photobook import tracing
+from photobook.console import Colors, log, log_section, positive_int
+from photobook.imaging import list_images
+from photobook.packing import SINGLE_PROMPT, analyze_packed, prepare_images
+
+DEFAULT_IMAGES = Path(__file__).parent.parent / "bucketlistly_images"
+
+# Stages whose time is spent waiting on the endpoint rather than working locally
+REMOTE_STAGES = ("http.request",)
+
+
+def load_spans(paths: List[str]) -> List[Dict[str, Any]]:
+    """Every span in the files, flattened, with times in seconds and decoded attributes"""
+    spans = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                for resource_spans in json.loads(line).get("resourceSpans", []):
+                    resource = tracing.decode_attributes(resource_spans.get("resource", {}).get("attributes"))
+                    for scope_spans in resource_spans.get("scopeSpans", []):
+                        for span in scope_spans.get("spans", []):
+                            spans.append({
+                                "trace_id": span["traceId"],
+                                "span_id": span["spanId"],
+                                "parent_id": span.get("parentSpanId") or None,
+                                "name": span["name"],
+                                "start": int(span["startTimeUnixNano"]) / 1e9,
+                                "end": int(span["endTimeUnixNano"]) / 1e9,
+                                "attributes": tracing.decode_attributes(span.get("attributes")),
+                                "error": (span.get("status") or {}).get("code") == tracing.STATUS_ERROR,
+                                "service": resource.get("service.name"),
+                                "children": [],
+                            })
+    return spans
+
+
+def build_trees(spans: List[Dict[str, Any]], root_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Link children to parents; roots are spans whose parent is not in the files (or named root_name)"""
+    by_id = {(span["trace_id"], span["span_id"]): span for span in spans}
+    roots = []
+    for span in spans:
+        parent = by_id.get((span["trace_id"], span["parent_id"])) if span["parent_id"] else None
+        if parent is not None:
+            parent["children"].append(span)
+        else:
+            roots.append(span)
+    if root_name:
+        found: List[Dict[str, Any]] = []
+        stack = list(roots)
+        while stack:
+            span = stack.pop()
+            if span["name"] == root_name:
+                found.append(span)
+            else:
+                stack.extend(span["children"])
+        roots = found
+    for span in spans:
+        span["children"].sort(key=lambda child: child["start"])
+    return sorted(roots, key=lambda span: span["start"])
+
+
+def walk(roots: List[Dict[str, Any]]):
+    """(span, stack of names down to it) for every span under roots"""
+    stack = [(root, (root["name"],)) for root in reversed(roots)]
+    while stack:
+        span, names = stack.pop()
+        yield span, names
+        stack.extend((child, names + (child["name"],)) for child in reversed(span["children"]))
+
+
+def self_time(span: Dict[str, Any]) -> float:
+    """Duration not covered by any child (overlapping children counted once)"""
+    covered = 0.0
+    cursor = span["start"]
+    for child in span["children"]:
+        start, end = max(child["start"], cursor), min(child["end"], span["end"])
+        if end > start:
+            covered += end - start
+            cursor = end
+    return max(0.0, span["end"] - span["start"] - covered)
+
+
+def critical_path(span: Dict[str, Any], until: Optional[float] = None) -> List[Tuple[str, float]]:
+    """
+    (name, seconds) segments of the chain that ends span at `until`
+
+    Walking back from the end, the child that finished last before the
+    current point is what the span was waiting on; time with no child
+    running is the span's own. Segments add up to the span's duration.
+    """
+    path: List[Tuple[str, float]] = []
+    point = span["end"] if until is None else min(until, span["end"])
+    children = span["children"]
+    while point > span["start"]:
+        waiting = [c for c in children if c["start"] < point]
+        if not waiting:
+            break
+        child = max(waiting, key=lambda c: min(c["end"], point))
+        child_end = min(child["end"], point)
+        if point > child_end:
+            path.append((span["name"], point - child_end))
+        path.extend(critical_path(child, child_end))
+        point = max(child["start"], span["start"])
+        children = [c for c in children if c is not child]
+    if point > span["start"]:
+        path.append((span["name"], point - span["start"]))
+    return path
+
+
+def quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def summarize(roots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stages: Dict[str, Dict[str, Any]] = {}
+    deployments: Dict[str, Dict[str, int]] = {}
+    for span, _ in walk(roots):
+        duration = span["end"] - span["start"]
+        stage = stages.setdefault(span["name"], {"count": 0, "total_s": 0.0, "self_s": 0.0, "errors": 0,
+                                                 "durations": []})
+        stage["count"] += 1
+        stage["total_s"] += duration
+        stage["self_s"] += self_time(span)
+        stage["errors"] += span["error"]
+        stage["durations"].append(duration)
+        attributes = span["attributes"]
+        if span["name"] in REMOTE_STAGES and attributes.get("deployment"):
+            entry = deployments.setdefault(attributes["deployment"], {"calls": 0, "payload_bytes": 0,
+                                                                      "prompt_tokens": 0, "completion_tokens": 0})
+            entry["calls"] += 1
+            for key in ("payload_bytes", "prompt_tokens", "completion_tokens"):
+                entry[key] += int(attributes.get(key) or 0)
+    for stage in stages.values():
+        durations = stage.pop("durations")
+        stage["p50_ms"] = quantile(durations, 0.5) * 1000
+        stage["p95_ms"] = quantile(durations, 0.95) * 1000
+
+    critical: Dict[str, float] = {}
+    for root in roots:
+        for name, seconds in critical_path(root):
+            critical[name] = critical.get(name, 0.0) + seconds
+    wall = sum(root["end"] - root["start"] for root in roots)
+    return {
+        "traces": len(roots),
+        "wall_s": wall,
+        "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["self_s"])),
+        "critical_path": dict(sorted(critical.items(), key=lambda item: -item[1])),
+        "deployments": deployments,
+    }
+
+
+def print_summary(report: Dict[str, Any], top: int):
+    wall = report["wall_s"] or 1e-9
+    log(f"{report['traces']} trace(s), {report['wall_s']:.2f}s end to end", Colors.GRAY)
+
+    log_section("⏱️  Stages (by self time)")
+    log(f"  {'Stage':<22} {'Calls':>7} {'Total':>9} {'Self':>9} {'p50':>9} {'p95':>9} {'Errors':>7}", Colors.GRAY)
+    for name, stage in list(report["stages"].items())[:top]:
+        log(f"  {name:<22} {stage['count']:>7} {stage['total_s']:>8.2f}s {stage['self_s']:>8.2f}s "
+            f"{stage['p50_ms']:>7.1f}ms {stage['p95_ms']:>7.1f}ms {stage['errors']:>7}",
+            Colors.RED if stage["errors"] else Colors.CYAN)
+
+    log_section("🧭 Critical Path")
+    for name, seconds in list(report["critical_path"].items())[:top]:
+        if seconds / wall < 0.001:
+            continue
+        bar = "█" * max(1, round(40 * seconds / wall))
+        color = Colors.YELLOW if name in REMOTE_STAGES else Colors.GREEN
+        log(f"  {name:<22} {seconds:>8.2f}s {seconds / wall:>6.1%}  {bar}", color)
+
+    if report["deployments"]:
+        log_section("🌐 Requests")
+        for deployment, entry in report["deployments"].items():
+            log(f"  {deployment:<20} {entry['calls']:>6} calls  {entry['payload_bytes'] / 1024 ** 2:>8.1f} MB sent  "
+                f"{entry['prompt_tokens']:>9} prompt + {entry['completion_tokens']:>7} completion tokens",
+                Colors.CYAN)
+
+
+def summary(args):
+    roots = build_trees(load_spans(args.files), args.root)
+    if not roots:
+        log("❌ No spans found" + (f" named {args.root}" if args.root else ""), Colors.RED)
+        sys.exit(1)
+    log_section(f"🔭 Trace Report ({', '.join(args.files)})")
+    report = summarize(roots)
+    print_summary(report, args.top)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        log(f"\n📝 Report saved to: {args.output}", Colors.BLUE)
+
+
+def folded_stacks(roots: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Self time in microseconds per stack of span names"""
+    folded: Dict[str, int] = {}
+    for span, names in walk(roots):
+        micros = round(self_time(span) * 1e6)
+        if micros:
+            key = ";".join(names)
+            folded[key] = folded.get(key, 0) + micros
+    return folded
+
+
+def render_svg(folded: Dict[str, int], title: str, width: int = 1200, row: int = 18) -> str:
+    """Flame graph (root at the bottom, width = share of summed self time) as a standalone SVG"""
+    tree: Dict[str, Any] = {"children": {}, "value": 0}
+    for stack, micros in folded.items():
+        node = tree
+        node["value"] += micros
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"children": {}, "value": 0})
+            node["value"] += micros
+    total = tree["value"] or 1
+    rects: List[Tuple[str, int, float, int, float]] = []
+    depth_max = 0
+
+    def draw(node: Dict[str, Any], x: float, depth: int):
+        nonlocal depth_max
+        for name, child in sorted(node["children"].items()):
+            w = child["value"] / total * (width - 20)
+            if w >= 0.5:
+                depth_max = max(depth_max, depth)
+                rects.append((name, child["value"], x, depth, w))
+                draw(child, x, depth + 1)
+            x += w
+
+    draw(tree, 10.0, 0)
+    height = (depth_max + 1) * row + 60
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" '
+        f'font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="#fdf6e3"/>',
+        f'<text x="10" y="22" font-size="15">{html.escape(title)}</text>',
+    ]
+    for name, micros, x, depth, w in rects:
+        y = height - 20 - (depth + 1) * row
+        hue = zlib.crc32(name.encode("utf-8"))
+        fill = f"rgb({205 + hue % 50},{80 + (hue >> 8) % 120},{40 + (hue >> 16) % 50})"
+        label = name if w > 7 * len(name) + 6 else name[: max(0, int(w / 7) - 2)] + ".." if w > 28 else ""
+        tip = f"{name}: {micros / 1e6:.3f}s ({micros / total:.1%})"
+        parts.append(
+            f'<g><title>{html.escape(tip)}</title><rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" '
+            f'fill="{fill}" rx="2"/><text x="{x + 3:.1f}" y="{y + row - 5}">{html.escape(label)}</text></g>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def flamegraph(args):
+    roots = build_trees(load_spans(args.files), args.root)
+    if not roots:
+        log("❌ No spans found" + (f" named {args.root}" if args.root else ""), Colors.RED)
+        sys.exit(1)
+    if not args.folded and not args.svg:
+        log("❌ Nothing to write: pass --folded and/or --svg", Colors.RED)
+        sys.exit(1)
+    folded = folded_stacks(roots)
+    log_section(f"🔥 Flame Graph ({len(roots)} trace(s), {len(folded)} stacks)")
+    if args.folded:
+        with open(args.folded, "w") as f:
+            for stack, micros in sorted(folded.items()):
+                f.write(f"{stack} {micros}\n")
+        log(f"📝 Folded stacks saved to: {args.folded}", Colors.BLUE)
+    if args.svg:
+        with open(args.svg, "w") as f:
+            f.write(render_svg(folded, f"Self time by span: {', '.join(args.files)}"))
+        log(f"📝 SVG saved to: {args.svg}", Colors.BLUE)
+    log("\nWidths sum self time over concurrent spans; the critical path is in `summary`", Colors.GRAY)
+
+
+class SimulatedEndpoint:
+    """
+    requests.Session stand-in answering analysis requests after a lognormal delay
+
+    Packed replies drop each entry with probability drop_rate, so some
+    photos take the single-image fallback path as they do against the API.
+    """
+
+    def __init__(self, rng: random.Random, call_ms: float, sigma: float, drop_rate: float):
+        self.rng = rng
+        self.call_ms = call_ms
+        self.sigma = sigma
+        self.drop_rate = drop_rate
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        request = kwargs["json"] if "json" in kwargs else json.loads(kwargs["data"])
+        parts = request["messages"][-1]["content"]
+        images = sum(1 for part in parts if part.get("type") == "image_url")
+        if parts[0].get("text") == SINGLE_PROMPT:
+            content = "A traveller on a mountain ridge\nSoft natural daylight\nCalm and open"
+        else:
+            entries = [{"index": n, "description": "A traveller on a mountain ridge", "lighting": "Soft daylight",
+                        "mood": "Calm"} for n in range(1, images + 1) if self.rng.random() >= self.drop_rate]
+            content = json.dumps({"images": entries})
+        time.sleep(self.rng.lognormvariate(math.log(self.call_ms / 1000), self.sigma))
+        body = {"choices": [{"message": {"content": content}}],
+                "usage": {"prompt_tokens": 150 + 800 * images, "completion_tokens": 40 * images,
+                          "total_tokens": 150 + 840 * images}}
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(body).encode("utf-8")
+        return response
+
+
+def run_batch(args, paths: List[Path]) -> float:
+    endpoint = SimulatedEndpoint(random.Random(args.seed), args.call_ms, args.sigma, args.drop_rate)
+    start = time.perf_counter()
+    with tracing.span("batch", photos=len(paths), pack_size=args.pack_size):
+        images = prepare_images(paths, max_edge=args.max_edge)
+        analyze_packed(images, "Claude-Sonnet-4", pack_size=args.pack_size, session=endpoint)
+    return time.perf_counter() - start
+
+
+def span_cost(count: int) -> float:
+    """Seconds per empty span, including export"""
+    start = time.perf_counter()
+    for _ in range(count):
+        with tracing.span("noop", number=1):
+            pass
+    tracing.shutdown()
+    return (time.perf_counter() - start) / count
+
+
+def benchmark(args):
+    available = list_images(args.images)
+    if not available:
+        log(f"❌ No images found in {args.images}", Colors.RED)
+        sys.exit(1)
+    paths = [available[n % len(available)] for n in range(args.photos)]
+    log_section(f"🔭 Tracing Benchmark ({args.photos} photos from {len(available)} files, K={args.pack_size}, "
+                f"{args.call_ms:g}ms simulated calls)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_path = Path(args.trace or Path(tmp) / "trace.jsonl")
+        if trace_path.exists():
+            trace_path.unlink()
+        tracing.configure(None)
+        run_batch(args, paths[: min(len(paths), 2 * len(available))])  # warm the page cache
+        off = run_batch(args, paths)
+        tracing.configure(trace_path, service="trace-report-benchmark")
+        on = run_batch(args, paths)
+        tracing.shutdown()
+        spans = sum(1 for _ in walk(build_trees(load_spans([str(trace_path)]))))
+        size = trace_path.stat().st_size
+
+        tracing.configure(None)
+        disabled_ns = span_cost(args.span_loops) * 1e9
+        tracing.configure(Path(tmp) / "spans.jsonl")
+        enabled_ns = span_cost(args.span_loops) * 1e9
+        tracing.configure(None)
+
+        log(f"  Batch, tracing off: {off:>7.2f}s", Colors.CYAN)
+        log(f"  Batch, tracing on:  {on:>7.2f}s  ({(on - off) / off:+.1%}, {spans} spans, "
+            f"{size / 1024:.0f} KB of OTLP-JSON)", Colors.CYAN)
+        log(f"  Per span: {disabled_ns:.0f} ns off, {enabled_ns / 1000:.1f} µs on (including export)", Colors.GRAY)
+
+        report = summarize(build_trees(load_spans([str(trace_path)]), "batch"))
+        print_summary(report, args.top)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "batch_off_s": off, "batch_on_s": on, "spans": spans,
+                       "trace_bytes": size, "span_ns_off": disabled_ns, "span_ns_on": enabled_ns,
+                       "report": report}, f, indent=2, default=str)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage, critical-path and flame-graph reports from span files")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = sub.add_parser("summary", help="Stage times, critical path and requests per deployment")
+    summary_parser.add_argument("files", nargs="+", help="OTLP-JSON span files")
+    summary_parser.add_argument("--root", help="Only the subtrees of spans with this name (e.g. analyze, job)")
+    summary_parser.add_argument("--top", type=int, default=15, help="Rows per table (default: 15)")
+    summary_parser.add_argument("--output", help="Save the report as JSON")
+
+    flame_parser = sub.add_parser("flamegraph", help="Folded stacks and/or SVG of self time")
+    flame_parser.add_argument("files", nargs="+", help="OTLP-JSON span files")
+    flame_parser.add_argument("--root", help="Only the subtrees of spans with this name")
+    flame_parser.add_argument("--folded", help="Write folded stacks (flamegraph.pl / speedscope input)")
+    flame_parser.add_argument("--svg", help="Write a standalone SVG flame graph")
+
+    bench_parser = sub.add_parser("benchmark", help="Traced vs untraced simulated batch")
+    bench_parser.add_argument("--images", default=str(DEFAULT_IMAGES), help="Directory of photos (cycled)")
+    bench_parser.add_argument("--photos", type=int, default=500, help="Photos in the batch (default: 500)")
+    bench_parser.add_argument("--pack-size", type=positive_int, default=4, help="Photos per request (default: 4)")
+    bench_parser.add_argument("--max-edge", type=int, default=768, help="Upload size (default: 768)")
+    bench_parser.add_argument("--call-ms", type=float, default=40, help="Median simulated call (default: 40ms)")
+    bench_parser.add_argument("--sigma", type=float, default=0.35, help="Lognormal latency spread (default: 0.35)")
+    bench_parser.add_argument("--drop-rate", type=float, default=0.03,
+                              help="Share of packed entries missing from replies (default: 0.03)")
+    bench_parser.add_argument("--span-loops", type=int, default=100000, help="Empty spans timed per mode")
+    bench_parser.add_argument("--trace", help="Keep the traced run's spans in this file")
+    bench_parser.add_argument("--top", type=int, default=12)
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    {"summary": summary, "flamegraph": flamegraph, "benchmark": benchmark}[args.command](args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
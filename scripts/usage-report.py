@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Report token usage and spend from the usage ledger
+
+Reads the JSONL ledger written by photobook/accounting.py (via
+test-vision-analysis.py --ledger, test-models.py --ledger or the budget
+scheduler) and prints this month's totals per deployment and per job.
+
+Usage:
+    python scripts/usage-report.py
+    python scripts/usage-report.py --budget 500 --by job_id
+    python scripts/usage-report.py --ledger /data/usage-ledger.jsonl --json
+"""
+
+import argparse
+import json
+import sys
+
+from photobook.accounting import DEFAULT_LEDGER_PATH, DEFAULT_PRICES_PATH, PriceTable, UsageLedger
+from photobook.console import Colors, log, log_section
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize token usage and cost for the current month")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH, help="Ledger path (default: scripts/usage-ledger.jsonl)")
+    parser.add_argument("--prices", default=DEFAULT_PRICES_PATH, help="Price table (default: scripts/model-prices.json)")
+    parser.add_argument("--by", choices=["deployment", "job_id"], default="deployment", help="Grouping")
+    parser.add_argument("--budget", type=float, help="Monthly budget, to show what is left")
+    parser.add_argument("--json", action="store_true", help="Print totals as JSON")
+
+    args = parser.parse_args()
+    prices = PriceTable.load(args.prices)
+    ledger = UsageLedger(prices, args.ledger)
+    totals = ledger.totals(by=args.by)
+
+    if args.json:
+        print(json.dumps({"by": args.by, "totals": totals, "spent": ledger.spent()}, indent=2))
+        return
+
+    log_section(f"💰 Token Usage This Month (by {args.by})")
+    if not totals:
+        log("No usage recorded yet", Colors.YELLOW)
+        return
+
+    log(f"{'':<32} {'calls':>6} {'prompt':>10} {'image*':>9} {'completion':>11} {'cost':>10}", Colors.GRAY)
+    for name, group in sorted(totals.items(), key=lambda item: -item[1]["cost"]):
+        log(
+            f"{name:<32} {group['calls']:>6} {group['prompt_tokens']:>10} {group['image_tokens']:>9} "
+            f"{group['completion_tokens']:>11} {group['cost']:>10.4f}",
+            Colors.CYAN,
+        )
+    log("* image tokens are estimated and included in prompt tokens", Colors.GRAY)
+
+    spent = ledger.spent()
+    log(f"\nTotal spent: {spent:.4f} {prices.currency}", Colors.CYAN)
+    if args.budget:
+        remaining = args.budget - spent
+        color = Colors.GREEN if remaining > args.budget * 0.25 else Colors.YELLOW if remaining > 0 else Colors.RED
+        log(f"Remaining budget: {remaining:.4f} {prices.currency} ({remaining / args.budget:.0%})", color)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except FileNotFoundError as e:
+        log(f"❌ {e}", Colors.RED)
+        sys.exit(1)
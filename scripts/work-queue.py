@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Shared work queue: spread album processing over worker processes and hosts
+
+A coordinator splits a job into units (packs of photos to analyze, chunks
+of photos to score or thumbnail, pages to rasterize) and enqueues them as
+a batch. Workers on any number of hosts lease units from the same SQLite
+database, heartbeat while they run them and write each result back to it.
+Units of a worker that dies are retried once its lease expires.
+
+Usage:
+    python scripts/work-queue.py enqueue analyze --images bucketlistly_images --per-unit 4 --batch trip
+    python scripts/work-queue.py enqueue quality --images bucketlistly_images --per-unit 16
+    python scripts/work-queue.py enqueue rasterize --book photobook.json --photos ./photos --output-dir pages/
+    python scripts/work-queue.py worker --processes 4 --threads 8 --exit-when-idle --no-verify-ssl
+    python scripts/work-queue.py worker --processes 4 --exit-when-idle --trace trace.jsonl
+    python scripts/work-queue.py --db /mnt/shared/work.db --journal delete worker --processes 8
+    python scripts/work-queue.py status
+    python scripts/work-queue.py results trip --output summaries.json
+    python scripts/work-queue.py benchmark --units 200 --call-seconds 0.2
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Any, Dict, List
+
+from photobook import tracing
+from photobook.console import Colors, log, log_section, positive_int
+from photobook.imaging import list_images
+from photobook.workqueue import (
+    DEFAULT_LEASE_SECONDS,
+    DEFAULT_MAX_ATTEMPTS,
+    JOURNAL_MODES,
+    Worker,
+    WorkQueue,
+    spawn_workers,
+)
+
+DEFAULT_DB = str(Path(__file__).parent / "work.db")
+UNIT_KINDS = ["analyze", "quality", "thumbnails", "rasterize"]
+
+
+# Unit handlers: module-level so worker processes can unpickle them
+
+def analyze_unit(payload: Dict[str, Any], api_key: str = "", verify_ssl: bool = True) -> Dict[str, Any]:
+    from photobook.packing import analyze_packed, prepare_images
+
+    images = prepare_images([Path(p) for p in payload["paths"]], max_edge=payload.get("max_edge", 768))
+    run = analyze_packed(images, payload.get("deployment", "Claude-Sonnet-4"),
+                         pack_size=payload.get("pack_size", len(images)), api_key=api_key, verify_ssl=verify_ssl)
+    return {"summaries": run["summaries"], "usage": run["usage"], "fallbacks": len(run["fallback_ids"])}
+
+
+def quality_unit(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from photobook.quality import analyze_paths
+
+    records, _ = analyze_paths(payload["paths"], payload.get("page_size", "A4"), workers=1)
+    return records
+
+
+def thumbnails_unit(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from photobook.thumbnails import DEFAULT_CACHE_DIR, ThumbnailCache
+
+    return ThumbnailCache(payload.get("cache_dir") or DEFAULT_CACHE_DIR).generate(payload["paths"], workers=1)
+
+
+@lru_cache(maxsize=2)
+def _rasterizer(book_path: str, photos: str, dpi: int):
+    from photobook.document import PhotoResolver, load_photobook, sorted_pages
+    from photobook.raster import PageRasterizer
+
+    book = load_photobook(book_path)
+    return PageRasterizer(book, PhotoResolver(photos or None), dpi), sorted_pages(book)
+
+
+def rasterize_unit(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from photobook.raster import encode_page, page_filename
+
+    rasterizer, pages = _rasterizer(payload["book"], payload.get("photos", ""), payload["dpi"])
+    output_dir = Path(payload["output_dir"])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for index in payload["pages"]:
+        number = pages[index].get("pageNumber", index + 1)
+        data = encode_page(rasterizer.render(pages[index]), payload["format"])
+        path = output_dir / page_filename(number, payload["format"])
+        partial_path = path.with_suffix(".tmp")
+        partial_path.write_bytes(data)
+        os.replace(partial_path, path)
+        written.append({"page": number, "file": str(path), "bytes": len(data)})
+    return written
+
+
+def simulated_call(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Benchmark stand-in for an I/O-bound vision call"""
+    time.sleep(payload["seconds"])
+    return {"unit": payload["unit"], "pid": os.getpid()}
+
+
+def make_handlers(args) -> Dict[str, Any]:
+    from photobook.midas import API_KEY
+
+    return {
+        "analyze": partial(analyze_unit, api_key=args.api_key or API_KEY, verify_ssl=not args.no_verify_ssl),
+        "quality": quality_unit,
+        "thumbnails": thumbnails_unit,
+        "rasterize": rasterize_unit,
+    }
+
+
+def open_queue(args) -> WorkQueue:
+    return WorkQueue(args.db, lease_seconds=args.lease, max_attempts=args.max_attempts, journal_mode=args.journal)
+
+
+def chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), max(1, size))]
+
+
+def enqueue(args, queue: WorkQueue):
+    batch = args.batch or f"{args.kind}-{time.strftime('%Y%m%d-%H%M%S')}"
+    if args.kind == "rasterize":
+        if not args.book or not args.output_dir:
+            log("❌ rasterize needs --book and --output-dir", Colors.RED)
+            sys.exit(1)
+        from photobook.document import load_photobook
+
+        page_count = len(load_photobook(args.book)["pages"])
+        common = {"book": str(Path(args.book).resolve()), "photos": str(Path(args.photos).resolve()) if args.photos else "",
+                  "output_dir": str(Path(args.output_dir).resolve()), "dpi": args.dpi, "format": args.format}
+        payloads = [{**common, "pages": pages} for pages in chunks(list(range(page_count)), args.per_unit)]
+    else:
+        if not args.images:
+            log(f"❌ {args.kind} needs --images DIR", Colors.RED)
+            sys.exit(1)
+        paths = [str(p.resolve()) for p in list_images(args.images, args.limit)]
+        payloads = [{"paths": pack} for pack in chunks(paths, args.per_unit)]
+        for payload in payloads:
+            if args.kind == "analyze":
+                payload.update(deployment=args.deployment, pack_size=args.pack_size or len(payload["paths"]))
+            elif args.kind == "thumbnails" and args.cache_dir:
+                payload["cache_dir"] = str(Path(args.cache_dir).resolve())
+
+    ids = queue.enqueue(args.kind, payloads, batch=batch)
+    log(f"✅ Queued {len(ids)} {args.kind} unit(s) as batch '{batch}' in {queue.path}", Colors.GREEN)
+    if args.wait:
+        counts = queue.wait(batch, on_progress=lambda done, total: print(f"\r  {done}/{total} units", end="", flush=True))
+        print()
+        log(f"Done: {counts['done']}, failed: {counts['failed']}", Colors.GREEN if not counts["failed"] else Colors.YELLOW)
+
+
+def worker(args, queue: WorkQueue):
+    handlers = make_handlers(args)
+    if args.kinds:
+        handlers = {kind: handlers[kind] for kind in args.kinds}
+    if args.no_verify_ssl:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    log_section("👷 Work Queue Worker")
+    log(f"Queue: {queue.path} ({queue.journal_mode}, {queue.lease_seconds:g}s leases)", Colors.GRAY)
+    log(f"{args.processes} process(es) x {args.threads} thread(s) for: {', '.join(handlers)}", Colors.GRAY)
+    if args.trace:
+        log(f"Tracing to: {args.trace}", Colors.GRAY)
+    if args.processes > 1:
+        processes = spawn_workers(queue, handlers, args.processes, trace=args.trace, threads=args.threads,
+                                  exit_when_idle=args.exit_when_idle)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            raise
+        return
+
+    def on_event(event: str, unit: Dict[str, Any]):
+        color = {"done": Colors.GREEN, "failed": Colors.RED, "queued": Colors.YELLOW}.get(event, Colors.GRAY)
+        log(f"  [{event}] unit {unit['id']} {unit['kind']} (batch {unit['batch']}, attempt {unit['attempts']})", color)
+
+    tracing.configure(args.trace, service="work-queue")
+    stats = Worker(queue, handlers, threads=args.threads, exit_when_idle=args.exit_when_idle, on_event=on_event).run()
+    log(f"\nDone: {stats['done']}, retried: {stats['retried']}, failed: {stats['failed']}, "
+        f"duplicates: {stats['duplicates']}", Colors.CYAN)
+
+
+def status(args, queue: WorkQueue):
+    log_section("Batches")
+    for batch in queue.batches():
+        if args.batch and batch["batch"] != args.batch:
+            continue
+        total = sum(batch[s] for s in ("queued", "leased", "done", "failed"))
+        color = Colors.RED if batch["failed"] else Colors.GREEN if batch["done"] == total else Colors.BLUE
+        log(f"  {batch['batch']:<32} {','.join(batch['kinds']):<12} {batch['done']:>5}/{total:<5} done  "
+            f"{batch['leased']:>4} leased  {batch['queued']:>5} queued  {batch['failed']:>4} failed", color)
+
+
+def results(args, queue: WorkQueue):
+    units = queue.results(args.batch)
+    if not units:
+        log(f"❌ No units in batch '{args.batch}'", Colors.RED)
+        sys.exit(1)
+    merged: List[Any] = []
+    for unit in units:
+        result = unit["result"]
+        if unit["kind"] == "analyze" and result:
+            merged.extend(result["summaries"])
+        elif isinstance(result, list):
+            merged.extend(result)
+        elif result is not None:
+            merged.append(result)
+    failed = [unit for unit in units if unit["status"] == "failed"]
+    for unit in failed:
+        log(f"  ❌ unit {unit['id']}: {(unit['error'] or '').splitlines()[0][:120]}", Colors.RED)
+    log(f"{len(units)} unit(s), {len(merged)} result(s), {len(failed)} failed", Colors.CYAN)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(merged, f, indent=2)
+        log(f"📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def run_batch(db: str, journal: str, units: int, seconds: float, processes: int, threads: int,
+              lease: float = DEFAULT_LEASE_SECONDS, kill_after: float = 0.0) -> Dict[str, Any]:
+    """Time one batch of simulated calls; with kill_after, SIGKILL the first worker that long into the run"""
+    queue = WorkQueue(db, lease_seconds=lease, journal_mode=journal)
+    batch = f"bench-{processes}x{threads}-{time.time()}"
+    queue.enqueue("simulated", [{"unit": n, "seconds": seconds} for n in range(units)], batch=batch)
+    start = time.perf_counter()
+    workers = spawn_workers(queue, {"simulated": simulated_call}, processes, threads=threads,
+                            exit_when_idle=True, poll_interval=0.05)
+    if kill_after:
+        time.sleep(kill_after)
+        os.kill(workers[0].pid, signal.SIGKILL)
+    counts = queue.wait(batch, poll_interval=0.02)
+    elapsed = time.perf_counter() - start
+    for process in workers:
+        process.join()
+    done = queue.results(batch)
+    return {
+        "processes": processes,
+        "threads": threads,
+        "units": units,
+        "seconds": round(elapsed, 2),
+        "units_per_second": round(units / elapsed, 1),
+        "done": counts["done"],
+        "failed": counts["failed"],
+        "retried": sum(1 for unit in done if unit["attempts"] > 1),
+        "worker_pids": len({unit["result"]["pid"] for unit in done if unit["result"]}),
+    }
+
+
+def benchmark(args):
+    results: Dict[str, Any] = {"config": vars(args)}
+    with tempfile.TemporaryDirectory() as tmp:
+        log_section(f"👷 Work Queue Benchmark ({args.units} simulated {args.call_seconds:g}s calls per batch)")
+        scaling = []
+        for processes, threads in [(1, 1), (1, 8), (2, 8), (4, 8)]:
+            run = run_batch(os.path.join(tmp, "scale.db"), "wal", args.units, args.call_seconds, processes, threads)
+            scaling.append(run)
+            log(f"  {processes} process(es) x {threads} thread(s): {run['seconds']:>6.2f}s "
+                f"({run['units_per_second']} units/s)", Colors.GREEN)
+        results["scaling"] = scaling
+
+        log_section(f"Queue overhead ({args.overhead_units} empty units)")
+        overhead = []
+        for journal in JOURNAL_MODES:
+            for processes in (1, 4):
+                run = run_batch(os.path.join(tmp, f"overhead-{journal}.db"), journal, args.overhead_units, 0.0,
+                                processes, 1)
+                run["journal"] = journal
+                overhead.append(run)
+                log(f"  {journal:<6} {processes} process(es): {run['units_per_second']:>7} units/s "
+                    f"({1000 / run['units_per_second']:.2f} ms per lease + complete)", Colors.GREEN)
+        results["overhead"] = overhead
+
+        log_section(f"Crash recovery (worker killed after {args.kill_after:g}s, {args.crash_lease:g}s leases)")
+        crash = run_batch(os.path.join(tmp, "crash.db"), "wal", args.units, args.call_seconds, 2, 4,
+                          lease=args.crash_lease, kill_after=args.kill_after)
+        results["crash"] = crash
+        log(f"  {crash['done']}/{crash['units']} done, {crash['failed']} failed, {crash['retried']} re-leased after "
+            f"the kill, finished in {crash['seconds']:.2f}s", Colors.GREEN if crash["done"] == args.units else Colors.RED)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        log(f"\n📝 Results saved to: {args.output}", Colors.BLUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared work queue for album processing")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite queue path (default: scripts/work.db)")
+    parser.add_argument("--journal", choices=JOURNAL_MODES, default="wal",
+                        help="wal for workers on one host; delete for a database on a shared network volume")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f"Seconds a unit stays leased without a heartbeat (default: {DEFAULT_LEASE_SECONDS:g})")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"Leases per unit before it fails (default: {DEFAULT_MAX_ATTEMPTS})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = sub.add_parser("enqueue", help="Split work into units and queue them as a batch")
+    enqueue_parser.add_argument("kind", choices=UNIT_KINDS)
+    enqueue_parser.add_argument("--batch", help="Batch name (default: kind and timestamp)")
+    enqueue_parser.add_argument("--per-unit", type=int, default=4, help="Photos or pages per unit (default: 4)")
+    enqueue_parser.add_argument("--images", help="Directory of photos (analyze, quality, thumbnails)")
+    enqueue_parser.add_argument("--limit", type=int, help="Only the first N photos")
+    enqueue_parser.add_argument("--deployment", default="Claude-Sonnet-4", help="Vision deployment (analyze)")
+    enqueue_parser.add_argument("--pack-size", type=positive_int, help="Photos per vision request (analyze; default: the whole unit)")
+    enqueue_parser.add_argument("--cache-dir", help="Thumbnail cache on the shared volume (thumbnails)")
+    enqueue_parser.add_argument("--book", help="exportAsJSON photobook (rasterize)")
+    enqueue_parser.add_argument("--photos", help="Directory of <photoId>.<ext> files (rasterize)")
+    enqueue_parser.add_argument("--output-dir", help="Directory for the page images (rasterize)")
+    enqueue_parser.add_argument("--dpi", type=int, default=150)
+    enqueue_parser.add_argument("--format", choices=["png", "jpeg"], default="png")
+    enqueue_parser.add_argument("--wait", action="store_true", help="Wait until every unit is done or failed")
+
+    worker_parser = sub.add_parser("worker", help="Lease and run units until stopped")
+    worker_parser.add_argument("--processes", type=int, default=1, help="Worker processes on this host (default: 1)")
+    worker_parser.add_argument("--threads", type=int, default=1,
+                               help="Threads per process; raise for I/O-bound analyze units (default: 1)")
+    worker_parser.add_argument("--kinds", nargs="+", choices=UNIT_KINDS, help="Only these unit kinds")
+    worker_parser.add_argument("--exit-when-idle", action="store_true", help="Exit once nothing is queued or leased")
+    worker_parser.add_argument("--api-key", help="Midas API key (optional)")
+    worker_parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL verification (for corporate APIs)")
+    worker_parser.add_argument("--trace", help="Append OTLP-JSON spans to this file (see trace-report.py)")
+
+    status_parser = sub.add_parser("status", help="Units per batch and status")
+    status_parser.add_argument("--batch")
+
+    results_parser = sub.add_parser("results", help="Collect a batch's results in enqueue order")
+    results_parser.add_argument("batch")
+    results_parser.add_argument("--output", help="Save the merged results as JSON")
+
+    bench_parser = sub.add_parser("benchmark", help="Scaling, queue overhead and crash recovery on simulated calls")
+    bench_parser.add_argument("--units", type=int, default=200)
+    bench_parser.add_argument("--call-seconds", type=float, default=0.2, help="Simulated call latency (default: 0.2)")
+    bench_parser.add_argument("--overhead-units", type=int, default=2000)
+    bench_parser.add_argument("--crash-lease", type=float, default=1.0, help="Lease length in the crash run (default: 1)")
+    bench_parser.add_argument("--kill-after", type=float, default=1.0, help="Seconds before a worker is killed")
+    bench_parser.add_argument("--output", help="Save results as JSON")
+
+    args = parser.parse_args()
+    if args.command == "benchmark":
+        benchmark(args)
+        return
+    queue = open_queue(args)
+    {"enqueue": enqueue, "worker": worker, "status": status, "results": results}[args.command](args, queue)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        log("\n\n⚠️  Interrupted by user", Colors.YELLOW)
+        sys.exit(130)
@@ -108,3 +108,172 @@ export async function analyzeImages(
 
   return summaries;
 }
+
+/**
+ * Parse a packed reply into fields keyed by 1-based image index.
+ * Entries with a bad index or a missing field are dropped so the caller
+ * can fall back to single-image analysis for exactly those images.
+ */
+function parsePackedReply(
+  content: string,
+  count: number
+): Map<number, Omit<ImageSummary, 'image_id'>> {
+  const results = new Map<number, Omit<ImageSummary, 'image_id'>>();
+  const cleanContent = content.replace(/```json\n?|\n?```/g, '').trim();
+  const start = cleanContent.indexOf('{');
+  const end = cleanContent.lastIndexOf('}');
+  if (start === -1 || end <= start) return results;
+
+  let parsed: any;
+  try {
+    parsed = JSON.parse(cleanContent.slice(start, end + 1));
+  } catch (parseError) {
+    return results;
+  }
+
+  const entries = Array.isArray(parsed?.images) ? parsed.images : [];
+  for (const entry of entries) {
+    const index = Number(entry?.index);
+    if (!Number.isInteger(index) || index < 1 || index > count || results.has(index)) continue;
+
+    const { description, lighting, mood } = entry;
+    if ([description, lighting, mood].every((field) => typeof field === 'string' && field.trim())) {
+      results.set(index, { description: description.trim(), lighting: lighting.trim(), mood: mood.trim() });
+    }
+  }
+
+  return results;
+}
+
+/**
+ * Downscale a base64 photo so its longest edge is at most maxEdge, re-encoded
+ * as JPEG (what photobook/packing.prepare_images does for the Python tools).
+ * Photos that are already small enough or fail to decode are returned as-is
+ */
+function downscaleForUpload(imageBase64: string, maxEdge: number, quality = 0.85): Promise<string> {
+  return new Promise((resolve) => {
+    const img = new Image();
+
+    img.onload = () => {
+      const scale = maxEdge / Math.max(img.width, img.height);
+      const canvas = document.createElement('canvas');
+      const ctx = canvas.getContext('2d');
+      if (scale >= 1 || !ctx) {
+        resolve(imageBase64);
+        return;
+      }
+
+      canvas.width = Math.max(1, Math.round(img.width * scale));
+      canvas.height = Math.max(1, Math.round(img.height * scale));
+      ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
+      resolve(canvas.toDataURL('image/jpeg', quality).split(',')[1]);
+    };
+
+    img.onerror = () => resolve(imageBase64);
+    img.src = `data:image/jpeg;base64,${imageBase64}`;
+  });
+}
+
+/**
+ * Analyze several images per request (packed-batch mode)
+ * Downscales each photo to maxEdge, sends packSize of them in one multi-part
+ * content array with indexed instructions, then falls back to analyzeImage
+ * for any image whose entry is missing or malformed in the reply
+ */
+export async function analyzeImagesPacked(
+  imagesBase64: string[],
+  packSize = 4,
+  onProgress?: (index: number, total: number) => void,
+  maxEdge = 768
+): Promise<ImageSummary[]> {
+  if (!Number.isInteger(packSize) || packSize < 1) {
+    throw new RangeError(`packSize must be a whole number of at least 1, got ${packSize}`);
+  }
+
+  const summaries: ImageSummary[] = [];
+
+  for (let start = 0; start < imagesBase64.length; start += packSize) {
+    const pack = await Promise.all(
+      imagesBase64.slice(start, start + packSize).map((imageBase64) => downscaleForUpload(imageBase64, maxEdge))
+    );
+    let parsed = new Map<number, Omit<ImageSummary, 'image_id'>>();
+
+    try {
+      addBreadcrumb('Starting packed image analysis', 'azure', { model: 'claude', images: pack.length });
+
+      const content: any[] = [
+        {
+          type: 'text',
+          text: `You will receive ${pack.length} photos. Each photo is preceded by a label "Image N". Analyze every photo for professional editing.
+
+Return only valid JSON in this shape:
+{"images": [{"index": 1, "description": "...", "lighting": "...", "mood": "..."}]}
+
+- index: the N from the photo's label
+- description: brief description of the subject and composition
+- lighting: lighting quality and type (natural, studio, indoor, outdoor, etc.)
+- mood: overall mood/emotion conveyed
+
+Return exactly one entry per photo. Keep each field to one sentence. No markdown, no explanation.`,
+        },
+      ];
+      pack.forEach((imageBase64, idx) => {
+        content.push({ type: 'text', text: `Image ${idx + 1}:` });
+        content.push({ type: 'image_url', image_url: { url: `data:image/jpeg;base64,${imageBase64}` } });
+      });
+
+      const response = await fetch(AZURE_API_URL, {
+        method: 'POST',
+        headers: getHeaders(),
+        body: JSON.stringify({
+          model: azureConfig.deployments.claude,
+          messages: [{ role: 'user', content }],
+          max_tokens: 60 + 120 * pack.length,
+          temperature: 0.3,
+        }),
+      });
+
+      if (!response.ok) {
+        const errorText = await response.text();
+        throw new Error(`Claude API error: ${response.status} - ${errorText}`);
+      }
+
+      const responseData = await response.json();
+      const data = responseData.data || responseData;
+      parsed = parsePackedReply(data.choices?.[0]?.message?.content || '', pack.length);
+
+      addBreadcrumb('Packed image analysis completed', 'azure', {
+        tokens: data.usage?.total_tokens,
+        parsed: parsed.size,
+      });
+    } catch (error) {
+      captureError(error as Error, { service: 'claude', operation: 'analyzeImagesPacked' });
+    }
+
+    for (let idx = 0; idx < pack.length; idx++) {
+      const i = start + idx;
+      const fields = parsed.get(idx + 1);
+
+      if (fields) {
+        summaries.push({ image_id: `img_${Date.now()}_${i}`, ...fields });
+        continue;
+      }
+
+      try {
+        summaries.push(await analyzeImage(pack[idx]));
+      } catch (error) {
+        console.error(`Failed to analyze image ${i + 1}:`, error);
+        summaries.push({
+          image_id: `img_${Date.now()}_${i}`,
+          description: 'Analysis failed',
+          lighting: 'Unknown',
+          mood: 'Unknown',
+        });
+      }
+    }
+
+    onProgress?.(Math.min(start + packSize, imagesBase64.length), imagesBase64.length);
+  }
+
+  return summaries;
+}
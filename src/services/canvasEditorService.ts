@@ -134,7 +134,7 @@ export function applyFilter(
 
   switch (filterType) {
     case 'vintage':
-      applyVintageFilter(konvaImage, intensity);
+      applyVintageFilter(filters, intensity);
       break;
     case 'bw':
       filters.push(Konva.Filters.Grayscale);
@@ -164,14 +164,26 @@ export function applyFilter(
 // Filter Implementations
 // ============================================================================
 
-function applyVintageFilter(konvaImage: Konva.Image, intensity: number): void {
-  // Vintage = Sepia + desaturation + vignette + slight blur
-  const filters: any[] = [];
-  filters.push(Konva.Filters.Sepia);
-  filters.push(Konva.Filters.HSL);
-  konvaImage.saturation(-0.2 * (intensity / 100));
+function applyVintageFilter(filters: any[], intensity: number): void {
+  // Vintage = Sepia + desaturation, appended after the adjustment filters.
+  // Konva.Filters.HSL reads the node's saturation, which the saturation
+  // adjustment owns, so the desaturation is its own filter: HSL's matrix
+  // with hue 0 and a fixed saturation (photobook/filters.py mirrors this)
+  const s = Math.pow(2, -0.2 * (intensity / 100));
+  const desaturateFilter = (imageData: ImageData) => {
+    const { data } = imageData;
+    for (let i = 0; i < data.length; i += 4) {
+      const r = data[i];
+      const g = data[i + 1];
+      const b = data[i + 2];
+      data[i] = (0.299 + 0.701 * s) * r + (0.587 - 0.587 * s) * g + (0.114 - 0.114 * s) * b; // R
+      data[i + 1] = (0.299 - 0.299 * s) * r + (0.587 + 0.413 * s) * g + (0.114 - 0.114 * s) * b; // G
+      data[i + 2] = (0.299 - 0.3 * s) * r + (0.587 - 0.586 * s) * g + (0.114 + 0.886 * s) * b; // B
+    }
+  };
 
-  konvaImage.filters(filters);
+  filters.push(Konva.Filters.Sepia);
+  filters.push(desaturateFilter);
 }
 
 function applyVignetteFilter(konvaImage: Konva.Image, intensity: number): void {